@@ -1,32 +1,127 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from models.database import get_db
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from models.database import Laptop, get_catalogue_version, get_db, get_read_db
 from models.schemas import (
     LaptopResponse, LaptopCreate, LaptopUpdate, LaptopSearchParams,
     RecommendationResponse
 )
-from services.laptop_service import LaptopService, RecommendationService
+from services.laptop_service import CATALOGUE_FIELDS, LaptopService, RecommendationService
+from services.popularity import click_through_rate, decayed_score, get_score_epoch
+import base64
+import hashlib
 
 laptop_router = APIRouter(prefix="/laptops", tags=["laptops"])
 
-@laptop_router.get("/", response_model=List[LaptopResponse])
+def _catalogue_etag(request: Request, db: Session, body: str = "") -> str:
+    """
+    Strong ETag for a catalogue read
+    
+    Combines the persisted catalogue version (bumped in the transaction of
+    every laptop write, from any process) with the path, query and body.
+    Checking it costs one primary-key read instead of the page query. The
+    version's timestamp keeps tags from a re-created database from matching.
+    """
+    version, changed_at = get_catalogue_version(db)
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha256(
+        f"{changed_at}|{request.url.path}?{query}|{body}".encode("utf-8")
+    ).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if If-None-Match already names this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    if "*" in tags or etag in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return None
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CATALOGUE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+def _encode_cursor(cursor: Tuple[int, int]) -> str:
+    return base64.urlsafe_b64encode(f"{cursor[0]}:{cursor[1]}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[int, int]]:
+    if not cursor:
+        return None
+    try:
+        decoded = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        price, laptop_id = decoded.split(":")
+        return int(price), int(laptop_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _catalogue_page(
+    request: Request,
+    db: Session,
+    filters: Sequence[Any],
+    limit: int,
+    cursor: Optional[str],
+    fields: Optional[str],
+    body: str = ""
+) -> Response:
+    """
+    Keyset-paginated, projected catalogue response with ETag revalidation
+    
+    The body is a JSON list; the next page's cursor is in the X-Next-Cursor
+    header (absent on the last page).
+    """
+    etag = _catalogue_etag(request, db, body)
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+    
+    rows, next_cursor = LaptopService.page_laptops(
+        db, filters, limit=limit, cursor=_decode_cursor(cursor), fields=_parse_fields(fields)
+    )
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = _encode_cursor(next_cursor)
+    return JSONResponse(content=jsonable_encoder(rows), headers=headers)
+
+@laptop_router.get("/", response_model=List[Dict[str, Any]])
 def get_laptops(
-    skip: int = Query(0, ge=0),
+    request: Request,
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. brand,model,price_pkr"),
+    db: Session = Depends(get_read_db)
 ):
-    """Get all laptops with pagination"""
-    laptops = LaptopService.get_laptops(db, skip=skip, limit=limit)
-    return laptops
+    """Get all laptops, cheapest first, one page at a time"""
+    return _catalogue_page(request, db, [], limit, cursor, fields)
 
-@laptop_router.get("/{laptop_id}", response_model=LaptopResponse)
-def get_laptop(laptop_id: int, db: Session = Depends(get_db)):
+@laptop_router.get("/{laptop_id}", response_model=Dict[str, Any])
+def get_laptop(
+    laptop_id: int,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated columns"),
+    db: Session = Depends(get_read_db)
+):
     """Get laptop by ID"""
-    laptop = LaptopService.get_laptop(db, laptop_id)
-    if not laptop:
+    etag = _catalogue_etag(request, db)
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+    
+    rows, _ = LaptopService.page_laptops(db, [Laptop.id == laptop_id], limit=1, fields=_parse_fields(fields))
+    if not rows:
         raise HTTPException(status_code=404, detail="Laptop not found")
-    return laptop
+    return JSONResponse(
+        content=jsonable_encoder(rows[0]),
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
 
 @laptop_router.post("/", response_model=LaptopResponse)
 def create_laptop(laptop: LaptopCreate, db: Session = Depends(get_db)):
@@ -53,40 +148,66 @@ def delete_laptop(laptop_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Laptop not found")
     return {"message": "Laptop deleted successfully"}
 
-@laptop_router.post("/search", response_model=List[LaptopResponse])
-def search_laptops(params: LaptopSearchParams, db: Session = Depends(get_db)):
+@laptop_router.post("/search", response_model=List[Dict[str, Any]])
+def search_laptops(
+    params: LaptopSearchParams,
+    request: Request,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
     """Search laptops with filters"""
-    return LaptopService.search_laptops(db, params)
+    return _catalogue_page(
+        request, db, LaptopService.search_filters(params), limit, cursor, fields,
+        body=params.model_dump_json()
+    )
 
-@laptop_router.get("/budget/{min_price}/{max_price}", response_model=List[LaptopResponse])
+@laptop_router.get("/budget/{min_price}/{max_price}", response_model=List[Dict[str, Any]])
 def get_laptops_by_budget(
     min_price: int,
     max_price: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get laptops within budget range"""
-    return LaptopService.get_laptops_by_budget(db, min_price, max_price)
+    return _catalogue_page(
+        request, db, LaptopService.budget_filters(min_price, max_price), limit, cursor, fields
+    )
 
-@laptop_router.get("/category/{category}", response_model=List[LaptopResponse])
+@laptop_router.get("/category/{category}", response_model=List[Dict[str, Any]])
 def get_laptops_by_category(
     category: str,
+    request: Request,
     max_price: Optional[int] = None,
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_read_db)
 ):
     """Get laptops for specific category (FSC Student, Programming, etc.)"""
-    return LaptopService.get_laptops_for_category(db, category, max_price)
+    return _catalogue_page(
+        request, db, LaptopService.category_filters(category, max_price), limit, cursor, fields
+    )
 
 @laptop_router.get("/popular/top", response_model=List[dict])
 def get_popular_laptops(
     limit: int = Query(10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Get most recommended laptops"""
+    """Get the most popular laptops (recent recommendations and clicks count most)"""
     results = RecommendationService.get_popular_laptops(db, limit)
+    epoch = get_score_epoch(db)
     return [
         {
             "laptop": LaptopResponse.from_orm(laptop),
-            "recommendation_count": count
+            "recommendation_count": popularity.recommendation_count,
+            "click_count": popularity.click_count,
+            "click_through_rate": round(click_through_rate(popularity), 4),
+            "popularity_score": round(decayed_score(popularity.score, epoch=epoch), 4)
         }
-        for laptop, count in results
+        for laptop, popularity in results
     ]
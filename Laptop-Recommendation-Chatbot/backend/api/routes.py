@@ -1,31 +1,61 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from models.schemas import ChatMessage, ChatResponse
-from models.database import get_db, UserSession
+from typing import Any, Dict, Optional
+from models.schemas import ChatMessage, ChatResponse, RecommendationClick
+from models.database import get_db, SessionLocal, UserSession
+from core.concurrency import run_blocking
 from services.conversation_manager import ConversationFlowManager
+from services.session_store import session_store
+from services.event_logger import event_logger
+from services.rag_service import RAGService
+import json
 import uuid
 
 chat_router = APIRouter()
 
+# Stateless and thread-safe, so shared by every request
+conversation_manager = ConversationFlowManager()
+
+# Created on first use so the module imports without an OpenAI key
+_rag_service: Optional[RAGService] = None
+
+def get_rag_service() -> RAGService:
+    global _rag_service
+    if _rag_service is None:
+        _rag_service = RAGService()
+    return _rag_service
+
+def close_rag_service():
+    """Close the shared RAG service if it was created"""
+    if _rag_service is not None:
+        _rag_service.close()
+
+def _ensure_session(db: Session, session_id: str):
+    """Create the user session row if it does not exist yet"""
+    session = db.query(UserSession).filter(UserSession.session_id == session_id).first()
+    if not session:
+        session = UserSession(
+            session_id=session_id,
+            conversation_history=[],
+            preferences={}
+        )
+        db.add(session)
+        db.commit()
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @chat_router.post("/chat", response_model=ChatResponse)
 async def chat(message: ChatMessage, db: Session = Depends(get_db)):
     try:
         session_id = message.session_id or str(uuid.uuid4())
         
-        # Ensure session exists
-        session = db.query(UserSession).filter(UserSession.session_id == session_id).first()
-        if not session:
-            session = UserSession(
-                session_id=session_id,
-                conversation_history=[],
-                preferences={}
-            )
-            db.add(session)
-            db.commit()
-        
-        # Use conversation manager
-        conversation_manager = ConversationFlowManager(db)
-        response, recommendations = conversation_manager.generate_response(
+        # Use conversation manager; it creates the session on first use and
+        # its ORM work runs off the event loop
+        response, recommendations = await run_blocking(
+            conversation_manager.generate_response,
+            db,
             session_id,
             message.message
         )
@@ -33,25 +63,66 @@ async def chat(message: ChatMessage, db: Session = Depends(get_db)):
         return ChatResponse(
             response=response,
             session_id=session_id,
-            recommendations=recommendations
+            recommendations=recommendations,
+            impression_ids=[r["impression_id"] for r in recommendations] if recommendations else None
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@chat_router.post("/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """
+    Stream the chat response as Server-Sent Events
+    
+    Events: "cards" (laptops, sent once ranking finishes), "token"
+    (explanation text), "done" (full response) or "error".
+    """
+    session_id = message.session_id or str(uuid.uuid4())
+    rag_service = get_rag_service()
+    
+    async def event_stream():
+        # The stream outlives request dependencies, so it owns its session
+        db = SessionLocal()
+        try:
+            await run_blocking(_ensure_session, db, session_id)
+            async for event in rag_service.stream_recommendation(message.message, session_id, db):
+                yield _format_sse(event["event"], event["data"])
+        except Exception as e:
+            print(f"Error streaming chat response: {e}")
+            yield _format_sse("error", {"detail": str(e)})
+        finally:
+            db.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@chat_router.post("/recommendations/click")
+async def recommendation_click(click: RecommendationClick):
+    """Record a click on a recommended laptop; written in the background"""
+    event_logger.log_click(click.session_id, click.laptop_id, click.impression_id)
+    return {"status": "queued"}
+
 @chat_router.get("/health")
 async def health():
     return {"status": "healthy"}
 
+@chat_router.get("/sessions/stats")
+async def session_stats():
+    """Hit rate, eviction and flush counters for both session stores"""
+    return {
+        "conversation": session_store.get_stats(),
+        "rag": await run_blocking(_rag_service.sessions.get_stats) if _rag_service is not None else None,
+        "events": event_logger.get_stats()
+    }
+
 @chat_router.get("/session/{session_id}")
 async def get_session(session_id: str, db: Session = Depends(get_db)):
-    """Get session conversation history"""
-    session = db.query(UserSession).filter(UserSession.session_id == session_id).first()
+    """Get session conversation history, including turns not yet flushed"""
+    session = await run_blocking(session_store.history, db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return {
-        "session_id": session.session_id,
-        "conversation_history": session.conversation_history,
-        "preferences": session.preferences,
-        "created_at": session.created_at
-    }
+    return session
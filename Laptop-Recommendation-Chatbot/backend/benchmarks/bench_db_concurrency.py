@@ -0,0 +1,122 @@
+"""
+Load test for the database layer under concurrent chats
+Compares the old engine (default journaling, one shared pool) with the tuned WAL engine and read-only pool
+"""
+import sys
+import os
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from core.db_engine import create_db_engine
+from models.database import Base, ConversationTurn, Laptop, UserSession
+from models.seed_data import get_sample_laptops
+
+def build_engines(config: str, url: str, threads: int):
+    """Return (write_engine, read_engine) for a configuration name"""
+    if config == "baseline":
+        # What models/database.py used to create
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        return engine, engine
+    write_engine = create_db_engine(url, pool_size=threads, max_overflow=0)
+    read_engine = create_db_engine(url, pool_size=threads, max_overflow=0, read_only=True)
+    return write_engine, read_engine
+
+def seed(engine):
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine).begin() as db:
+        db.add_all(Laptop(**laptop) for laptop in get_sample_laptops())
+
+def chat_turn(WriteSession, ReadSession, session_id: str, budget: int):
+    """The database work of one /api/chat message: a catalogue read, then the turn write"""
+    read_db = ReadSession()
+    try:
+        laptops = read_db.query(Laptop).filter(
+            Laptop.price_pkr.between(int(budget * 0.8), int(budget * 1.2))
+        ).order_by(Laptop.price_pkr).limit(3).all()
+    finally:
+        read_db.close()
+    
+    with WriteSession.begin() as db:
+        if db.get(UserSession, session_id) is None:
+            db.add(UserSession(session_id=session_id, conversation_history=[], preferences={}))
+            db.flush()
+        db.add(ConversationTurn(session_id=session_id, role="user", content=f"budget {budget}"))
+        db.add(ConversationTurn(
+            session_id=session_id,
+            role="assistant",
+            content=", ".join(f"{l.brand} {l.model}" for l in laptops) or "No matches"
+        ))
+
+def run_config(config: str, threads: int, chats: int, sessions: int) -> dict:
+    """Run the workload against a fresh database file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+        write_engine, read_engine = build_engines(config, url, threads)
+        seed(write_engine)
+        WriteSession = sessionmaker(bind=write_engine)
+        ReadSession = sessionmaker(bind=read_engine)
+        session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+        
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        
+        def one(i: int):
+            start = time.perf_counter()
+            try:
+                chat_turn(WriteSession, ReadSession, session_ids[i % sessions], 60000 + (i % 20) * 10000)
+            except Exception as e:
+                with lock:
+                    errors.append(type(e).__name__)
+                return
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(one, range(chats)))
+        elapsed = time.perf_counter() - start
+        
+        write_engine.dispose()
+        read_engine.dispose()
+    
+    latencies.sort()
+    return {
+        "config": config,
+        "chats_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        "errors": len(errors)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent chat workers")
+    parser.add_argument("--chats", type=int, default=2000, help="Chat messages per configuration")
+    parser.add_argument("--sessions", type=int, default=200, help="Distinct chat sessions")
+    args = parser.parse_args()
+    
+    results = [run_config(config, args.threads, args.chats, args.sessions) for config in ("baseline", "tuned")]
+    
+    print(f"Threads: {args.threads}, chats: {args.chats}, sessions: {args.sessions}")
+    for r in results:
+        print(
+            f"{r['config']:>9}: {r['chats_per_sec']:8.1f} chats/s  "
+            f"p50 {r['p50_ms']:7.2f} ms  p95 {r['p95_ms']:7.2f} ms  errors {r['errors']}"
+        )
+    baseline, tuned = results
+    if baseline["chats_per_sec"]:
+        print(f"  Speedup: {tuned['chats_per_sec'] / baseline['chats_per_sec']:8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Micro-benchmark for chat message analysis
+Compares the compiled intent detector with the previous per-request pattern loop
+"""
+import sys
+import os
+import argparse
+import re
+import timeit
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import intent_detector
+
+# Messages from the demo conversation, README examples and chat logs
+CORPUS = [
+    "Hi",
+    "Hello!",
+    "السلام علیکم",
+    "Assalam o alaikum, I need help choosing a laptop",
+    "Hi, I'm an FSC student looking for a laptop",
+    "Hi, I'm an FSC student with a budget of 80k PKR",
+    "I'm an FSC pre-engineering student",
+    "My budget is around 80,000 PKR",
+    "budget 100000",
+    "80k to 120k",
+    "I can spend 70 se 90 hazar",
+    "Something cheap please",
+    "I also need it for basic programming",
+    "I need a laptop for programming under 80,000 PKR",
+    "Hi, I need a laptop for programming under 80,000 PKR",
+    "Show me gaming laptops",
+    "I want to play PUBG and GTA V smoothly",
+    "Which laptop is good for video editing in Premiere Pro and Photoshop?",
+    "What's the best laptop for engineering students?",
+    "I use AutoCAD, SolidWorks and MATLAB for my university projects",
+    "Mostly MS Office, Excel and Word for my business",
+    "Compare HP and Dell laptops",
+    "Compare HP vs Dell laptops",
+    "Lenovo vs ASUS, which is better?",
+    "Tell me about the HP Pavilion 15",
+    "Is the Dell Inspiron 15 3530 worth it?",
+    "Is an i5 enough or should I get Ryzen 7?",
+    "Where can I buy laptops in Pakistan?",
+    "Is Czone reliable? Do they give warranty?",
+    "kahan se lun, daraz ya paklap?",
+    "I'm doing computer science at uni and need 16GB RAM",
+    "MBBS student, need something light with good battery",
+    "Graphic design and illustrator work, budget 150k",
+    "Thanks, that helps",
+    "ok",
+]
+
+# Previous implementation: pattern table built per request, raw strings per search
+def legacy_intent_patterns():
+    return {
+        intent: list(patterns)
+        for intent, patterns in intent_detector.INTENT_PATTERNS.items()
+    }
+
+def legacy_analyze(message):
+    intent_patterns = legacy_intent_patterns()
+    message_lower = message.lower()
+    
+    intent = intent_detector.Intent.UNKNOWN
+    for candidate, patterns in intent_patterns.items():
+        if any(re.search(pattern, message_lower) for pattern in patterns):
+            intent = candidate
+            break
+    
+    budget = (None, None)
+    range_match = re.search(r'(\d+)k?\s*(to|se|tak|-)\s*(\d+)k?', message_lower)
+    if range_match:
+        min_val, max_val = int(range_match.group(1)), int(range_match.group(3))
+        budget = (min_val * 1000 if min_val < 1000 else min_val, max_val * 1000 if max_val < 1000 else max_val)
+    else:
+        single_match = re.search(r'(\d+)k?\s*(rupees|pkr|rs)?', message_lower)
+        if single_match:
+            value = int(single_match.group(1))
+            value = value * 1000 if value < 1000 else value
+            budget = (int(value * 0.8), int(value * 1.2))
+    
+    use_case_keywords = {label: list(words) for label, words in intent_detector.USE_CASE_KEYWORDS.items()}
+    use_cases = [
+        label for label, words in use_case_keywords.items()
+        if any(word in message_lower for word in words)
+    ]
+    
+    brand_list = ["HP", "Dell", "Lenovo", "ASUS", "Acer", "MSI", "Apple"]
+    brands = [brand for brand in brand_list if brand.lower() in message_lower]
+    
+    student_type = None
+    if "fsc" in message_lower or "intermediate" in message_lower:
+        student_type = "FSC"
+    elif "university" in message_lower or "uni" in message_lower:
+        student_type = "Uni"
+    
+    major = None
+    if any(word in message_lower for word in ["cs", "computer science", "software"]):
+        major = "CS"
+    elif "engineering" in message_lower:
+        major = "Engineering"
+    elif "medical" in message_lower or "mbbs" in message_lower:
+        major = "Medical"
+    
+    return intent_detector.MessageAnalysis(intent, budget[0], budget[1], use_cases, brands, student_type, major)
+
+def check_equivalence():
+    """Fail loudly if the compiled detector disagrees with the old logic"""
+    for message in CORPUS:
+        expected = legacy_analyze(message)
+        actual = intent_detector.analyze(message)
+        if expected != actual:
+            raise AssertionError(f"Mismatch for {message!r}:\n  legacy:   {expected}\n  compiled: {actual}")
+
+def bench(func, repeat: int, number: int) -> float:
+    """Best per-message time in microseconds"""
+    timer = timeit.Timer(lambda: [func(message) for message in CORPUS])
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / (number * len(CORPUS)) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs (best is reported)")
+    parser.add_argument("--number", type=int, default=200, help="Corpus passes per run")
+    args = parser.parse_args()
+    
+    check_equivalence()
+    
+    legacy = bench(legacy_analyze, args.repeat, args.number)
+    compiled = bench(intent_detector.analyze, args.repeat, args.number)
+    
+    print(f"Messages:  {len(CORPUS)}")
+    print(f"Legacy:    {legacy:8.2f} us/message")
+    print(f"Compiled:  {compiled:8.2f} us/message")
+    print(f"Speedup:   {legacy / compiled:8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+"""
+Offline evaluation and latency benchmark for the recommendation pipeline
+Replays a labelled query set through RecommendationEngine and ConversationFlowManager against stubbed OpenAI endpoints, and reports retrieval quality and per-stage latency as JSON/HTML
+"""
+import sys
+import os
+import argparse
+import asyncio
+import hashlib
+import html
+import json
+import math
+import platform
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+# Add parent directory to path
+sys.path.append(BACKEND_DIR)
+
+from benchmarks.stub_openai import StubOpenAIServer
+
+DEFAULT_QUERIES = os.path.join(BENCH_DIR, "eval_queries.json")
+
+# Conversation replayed through ConversationFlowManager; the labelled query is the middle turn
+FLOW_TURNS = (("flow.greeting", "Hi"), ("flow.query", None), ("flow.follow_up", "What do you recommend?"))
+
+def recall_at_k(ranked: Sequence[str], relevant: Dict[str, int], k: int) -> float:
+    """Share of the relevant laptops found in the top k"""
+    wanted = {name for name, grade in relevant.items() if grade > 0}
+    if not wanted:
+        return 0.0
+    return len(wanted.intersection(ranked[:k])) / len(wanted)
+
+def ndcg_at_k(ranked: Sequence[str], relevant: Dict[str, int], k: int) -> float:
+    """Normalized discounted cumulative gain of the top k, with graded relevance"""
+    def dcg(grades):
+        return sum((2 ** grade - 1) / math.log2(position + 2) for position, grade in enumerate(grades))
+    
+    ideal = dcg(sorted(relevant.values(), reverse=True)[:k])
+    if not ideal:
+        return 0.0
+    return dcg([relevant.get(name, 0) for name in ranked[:k]]) / ideal
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """q-th percentile (0-100) with linear interpolation between ranks"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def latency_summary(values: Sequence[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99/max of a list of milliseconds"""
+    return {
+        "n": len(values),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3) if values else 0.0
+    }
+
+def quality_metrics(ranked: Sequence[str], relevant: Dict[str, int], ks: Sequence[int]) -> Dict[str, float]:
+    metrics = {}
+    for k in ks:
+        metrics[f"recall@{k}"] = round(recall_at_k(ranked, relevant, k), 4)
+        metrics[f"ndcg@{k}"] = round(ndcg_at_k(ranked, relevant, k), 4)
+    return metrics
+
+def mean_metrics(rows: List[Dict[str, float]]) -> Dict[str, float]:
+    """Macro average of per-query metrics"""
+    if not rows:
+        return {}
+    return {name: round(sum(row[name] for row in rows) / len(rows), 4) for name in rows[0]}
+
+def load_queries(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        queries = json.load(f)
+    for entry in queries:
+        if not entry.get("id") or not entry.get("query") or not entry.get("relevant"):
+            raise ValueError(f"Query entries need id, query and relevant: {entry}")
+    return queries
+
+def git_revision() -> Dict[str, Any]:
+    """Current commit and whether the working tree has uncommitted changes"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        return {"commit": commit, "dirty": bool(status.strip())}
+    except Exception:
+        return {"commit": None, "dirty": None}
+
+def configure_environment(workdir: str, base_url: str, args):
+    """
+    Point settings at the stub server and throwaway storage
+    
+    Must run before any backend module is imported, as settings are read at import.
+    """
+    if "core.config" in sys.modules:
+        raise RuntimeError("Backend settings were imported before the benchmark environment was set")
+    
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": base_url,
+        "VECTOR_BACKEND": "numpy",
+        "NUMPY_INDEX_PATH": os.path.join(workdir, "vector_index.npz"),
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "DATABASE_READ_URL": "",
+        "EVENT_LOG_PATH": "",
+        "RESPONSE_CACHE_PATH": "",
+        "RESPONSE_CACHE_SIZE": os.environ.get("RESPONSE_CACHE_SIZE", "512") if args.response_cache else "0",
+        "HYBRID_SEARCH": "false" if args.dense_only else "true"
+    })
+
+class RetrievalRecorder:
+    """Keeps the results of a vector store's latest search for scoring"""
+    
+    def __init__(self, vector_store):
+        self.last: Optional[List[Dict[str, Any]]] = None
+        search, asearch = vector_store.search, vector_store.asearch
+        
+        def recorded_search(*args, **kwargs):
+            self.last = search(*args, **kwargs)
+            return self.last
+        
+        async def recorded_asearch(*args, **kwargs):
+            self.last = await asearch(*args, **kwargs)
+            return self.last
+        
+        vector_store.search = recorded_search
+        vector_store.asearch = recorded_asearch
+
+class PipelineBenchmark:
+    """Seeded catalogue, indexed documents and the pipeline objects under test"""
+    
+    def __init__(self, mode: str = "async", n_results: int = 3):
+        from models.database import SessionLocal, Laptop, init_db
+        from models.seed_data import get_sample_laptops
+        from scripts.initialize_vector_store import laptop_to_dict
+        from services.conversation_manager import ConversationFlowManager
+        from services.document_processor import DocumentProcessor
+        from services.event_logger import RecommendationEventLogger
+        from services.recommendation_engine import RecommendationEngine
+        from services.session_store import SessionStore
+        
+        self.mode = mode
+        self.n_results = n_results
+        self.SessionLocal = SessionLocal
+        
+        init_db()
+        db = SessionLocal()
+        try:
+            db.add_all(Laptop(**laptop) for laptop in get_sample_laptops())
+            db.commit()
+            laptops = db.query(Laptop).order_by(Laptop.id).all()
+            self.names = {laptop.id: f"{laptop.brand} {laptop.model}" for laptop in laptops}
+            documents = DocumentProcessor.batch_create_documents([laptop_to_dict(laptop) for laptop in laptops])
+        finally:
+            db.close()
+        
+        self.engine = RecommendationEngine()
+        self.engine.vector_store.add_documents(documents)
+        self.retrieval = RetrievalRecorder(self.engine.vector_store)
+        
+        # Nothing is flushed during the run; close() writes it once
+        self.sessions = SessionStore(flush_interval=3600, flush_batch=10 ** 9)
+        self.events = RecommendationEventLogger(flush_interval=3600, flush_batch=10 ** 9)
+        self.flow = ConversationFlowManager(sessions=self.sessions, events=self.events)
+    
+    def replay_engine(self, query: str) -> Dict[str, Any]:
+        """Run one query through RecommendationEngine; returns timings and ranked laptop names"""
+        self.retrieval.last = None
+        db = self.SessionLocal()
+        try:
+            if self.mode == "async":
+                result = asyncio.run(self.engine.aget_recommendations(query, db, n_results=self.n_results))
+            else:
+                result = self.engine.get_recommendations(query, db, n_results=self.n_results)
+        finally:
+            db.close()
+        
+        return {
+            "success": result.get("success", False),
+            "error": result.get("error"),
+            "timings": {f"engine.{stage}": ms for stage, ms in result.get("stage_timings_ms", {}).items()},
+            "outcomes": result.get("stage_outcomes", {}),
+            "retrieved": [self.names.get(r["laptop_id"], str(r["laptop_id"])) for r in self.retrieval.last or []],
+            "recommended": [self.names.get(r["id"], str(r["id"])) for r in result.get("recommendations", [])]
+        }
+    
+    def replay_flow(self, query: str) -> Dict[str, Any]:
+        """Run a short conversation ending in the query's recommendations through ConversationFlowManager"""
+        session_id = f"bench-{uuid.uuid4().hex}"
+        timings = {}
+        recommended: List[Dict[str, Any]] = []
+        db = self.SessionLocal()
+        try:
+            total = time.perf_counter()
+            for stage, message in FLOW_TURNS:
+                start = time.perf_counter()
+                _, cards = self.flow.generate_response(db, session_id, message or query)
+                timings[stage] = (time.perf_counter() - start) * 1000
+                recommended = cards or recommended
+            timings["flow.total"] = (time.perf_counter() - total) * 1000
+        finally:
+            db.close()
+        
+        return {"timings": timings, "recommended": [card["name"] for card in recommended]}
+    
+    def close(self):
+        self.sessions.close()
+        self.events.close()
+
+def run_benchmark(queries: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    """Replay the query set warmup + repeat times; quality comes from the first pass"""
+    from core.config import settings
+    
+    bench = PipelineBenchmark(mode=args.mode, n_results=args.n_results)
+    latencies: Dict[str, List[float]] = {}
+    speculation: List[str] = []
+    per_query: Dict[str, Dict[str, Any]] = {}
+    errors = 0
+    
+    try:
+        for pass_number in range(args.warmup + args.repeat):
+            measured = pass_number >= args.warmup
+            for entry in queries:
+                engine_run = bench.replay_engine(entry["query"])
+                flow_run = bench.replay_flow(entry["query"])
+                if engine_run["error"]:
+                    errors += 1
+                
+                if measured:
+                    for stage, ms in {**engine_run["timings"], **flow_run["timings"]}.items():
+                        latencies.setdefault(stage, []).append(ms)
+                    if "speculative_retrieval" in engine_run["outcomes"]:
+                        speculation.append(engine_run["outcomes"]["speculative_retrieval"])
+                
+                if entry["id"] not in per_query:
+                    per_query[entry["id"]] = {
+                        "query": entry["query"],
+                        "success": engine_run["success"],
+                        "retrieved": engine_run["retrieved"],
+                        "recommended": engine_run["recommended"],
+                        "flow": flow_run["recommended"],
+                        "metrics": {
+                            "retrieval": quality_metrics(engine_run["retrieved"], entry["relevant"], args.k),
+                            "recommendations": quality_metrics(engine_run["recommended"], entry["relevant"], args.k),
+                            "flow": quality_metrics(flow_run["recommended"], entry["relevant"], args.k)
+                        }
+                    }
+    finally:
+        bench.close()
+    
+    return {
+        "config": {
+            "mode": args.mode,
+            "n_results": args.n_results,
+            "k": list(args.k),
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+            "stub_latency_ms": args.stub_latency_ms,
+            "vector_backend": settings.VECTOR_BACKEND,
+            "hybrid_search": settings.HYBRID_SEARCH,
+            "ivf_lists": settings.IVF_LISTS,
+            "popularity_prior_weight": settings.POPULARITY_PRIOR_WEIGHT,
+            "response_cache": bool(settings.RESPONSE_CACHE_SIZE)
+        },
+        "quality": {
+            section: mean_metrics([row["metrics"][section] for row in per_query.values()])
+            for section in ("retrieval", "recommendations", "flow")
+        },
+        "latency_ms": {stage: latency_summary(values) for stage, values in sorted(latencies.items())},
+        "speculative_retrieval": speculation_summary(speculation),
+        "errors": errors,
+        "queries": per_query
+    }
+
+def speculation_summary(outcomes: Sequence[str]) -> Dict[str, Any]:
+    """How often speculative retrieval was used rather than discarded"""
+    used = sum(1 for outcome in outcomes if outcome == "used")
+    discarded = sum(1 for outcome in outcomes if outcome == "discarded")
+    return {
+        "used": used,
+        "discarded": discarded,
+        "hit_rate": round(used / (used + discarded), 4) if used + discarded else None
+    }
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Metric-by-metric differences from a baseline report
+    
+    Returns:
+        Rows with section, metric, baseline, current and delta; latency
+        rows also carry the current/baseline ratio
+    """
+    rows = []
+    for section, metrics in current["quality"].items():
+        for metric, value in metrics.items():
+            before = baseline.get("quality", {}).get(section, {}).get(metric)
+            if before is not None:
+                rows.append({
+                    "section": section, "metric": metric, "baseline": before,
+                    "current": value, "delta": round(value - before, 4)
+                })
+    for stage, summary in current["latency_ms"].items():
+        for metric in ("p50", "p95", "p99"):
+            before = baseline.get("latency_ms", {}).get(stage, {}).get(metric)
+            if before is not None:
+                rows.append({
+                    "section": stage, "metric": metric, "baseline": before,
+                    "current": summary[metric], "delta": round(summary[metric] - before, 3),
+                    "ratio": round(summary[metric] / before, 3) if before else None
+                })
+    return rows
+
+def html_table(header: Sequence[str], rows: Sequence[Sequence[Any]]) -> str:
+    head = "".join(f"<th>{html.escape(str(cell))}</th>" for cell in header)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>"
+        for row in rows
+    )
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+def render_html(report: Dict[str, Any]) -> str:
+    """Self-contained HTML page for a report (and its comparison, if any)"""
+    meta = report["meta"]
+    sections = [
+        "<h2>Run</h2>",
+        html_table(["setting", "value"], [
+            *meta.items(), *report["config"].items(),
+            *((f"speculative_retrieval.{name}", value) for name, value in report.get("speculative_retrieval", {}).items())
+        ]),
+        "<h2>Quality</h2>",
+        html_table(
+            ["section", *next(iter(report["quality"].values()), {}).keys()],
+            [[section, *metrics.values()] for section, metrics in report["quality"].items()]
+        ),
+        "<h2>Latency (ms)</h2>",
+        html_table(
+            ["stage", "n", "mean", "p50", "p95", "p99", "max"],
+            [[stage, *summary.values()] for stage, summary in report["latency_ms"].items()]
+        )
+    ]
+    if report.get("comparison"):
+        sections += [
+            f"<h2>Compared with {html.escape(str(report['baseline']['commit']))}</h2>",
+            html_table(
+                ["section", "metric", "baseline", "current", "delta", "ratio"],
+                [[r["section"], r["metric"], r["baseline"], r["current"], r["delta"], r.get("ratio", "")]
+                 for r in report["comparison"]]
+            )
+        ]
+    sections += [
+        "<h2>Queries</h2>",
+        html_table(
+            ["id", "query", "retrieved", "recommended", "flow"],
+            [[query_id, row["query"], ", ".join(row["retrieved"]), ", ".join(row["recommended"]), ", ".join(row["flow"])]
+             for query_id, row in report["queries"].items()]
+        )
+    ]
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>Pipeline benchmark {html.escape(str(meta['commit']))}</title>"
+        "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin-bottom:1.5em}"
+        "th,td{border:1px solid #ccc;padding:4px 8px;text-align:left;font-size:14px}th{background:#f3f3f3}</style>"
+        "</head><body><h1>Recommendation pipeline benchmark</h1>" + "".join(sections) + "</body></html>"
+    )
+
+def print_summary(report: Dict[str, Any]):
+    print(f"Commit: {report['meta']['commit']}{' (dirty)' if report['meta']['dirty'] else ''}, "
+          f"queries: {report['meta']['queries']}, errors: {report['errors']}")
+    print("\nQuality (mean over queries)")
+    for section, metrics in report["quality"].items():
+        print(f"  {section:>15}: " + "  ".join(f"{name} {value:.3f}" for name, value in metrics.items()))
+    speculation = report.get("speculative_retrieval", {})
+    if speculation.get("hit_rate") is not None:
+        print(f"\nSpeculative retrieval: used {speculation['used']}, discarded {speculation['discarded']} "
+              f"(hit rate {speculation['hit_rate']:.1%})")
+    print("\nLatency (ms)")
+    for stage, summary in report["latency_ms"].items():
+        print(f"  {stage:>28}: p50 {summary['p50']:8.2f}  p95 {summary['p95']:8.2f}  p99 {summary['p99']:8.2f}")
+    if report.get("comparison"):
+        print(f"\nChange since {report['baseline']['commit']}")
+        for row in report["comparison"]:
+            if row["delta"]:
+                change = f"x{row['ratio']}" if row.get("ratio") else f"{row['delta']:+}"
+                print(f"  {row['section']:>28} {row['metric']:>10}: {row['baseline']} -> {row['current']} ({change})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Labelled query set (JSON)")
+    parser.add_argument("--mode", choices=("async", "sync"), default="async",
+                        help="Engine entry point: aget_recommendations (as served by /api/chat) or get_recommendations")
+    parser.add_argument("--k", default="3,5,10", help="Cut-offs for recall@k and nDCG@k")
+    parser.add_argument("--n-results", type=int, default=3, help="Recommendations per query")
+    parser.add_argument("--repeat", type=int, default=5, help="Measured passes over the query set")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured passes first (fills the embedding cache)")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Delay added to every stub response")
+    parser.add_argument("--dense-only", action="store_true", help="Turn off BM25 fusion (HYBRID_SEARCH=false) to compare against it")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Keep the generated-answer cache on (off by default so generate is measured every pass)")
+    parser.add_argument("--output", default="pipeline_report.json", help="JSON report path")
+    parser.add_argument("--html", help="Also write an HTML report here")
+    parser.add_argument("--compare", help="Baseline JSON report to diff against")
+    args = parser.parse_args()
+    
+    try:
+        args.k = sorted({int(k) for k in args.k.split(",") if k.strip()})
+        queries = load_queries(args.queries)
+        baseline = None
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                baseline = json.load(f)
+    except Exception as e:
+        print(f"Error loading benchmark inputs: {e}")
+        sys.exit(1)
+    
+    with open(args.queries, "rb") as f:
+        query_set_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    output = os.path.abspath(args.output)
+    html_output = os.path.abspath(args.html) if args.html else None
+    
+    server = StubOpenAIServer(latency_ms=args.stub_latency_ms).start()
+    cwd = os.getcwd()
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as workdir:
+        # The embedding cache lives in the working directory
+        os.chdir(workdir)
+        try:
+            configure_environment(workdir, server.base_url, args)
+            report = run_benchmark(queries, args)
+        finally:
+            os.chdir(cwd)
+            server.stop()
+    
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "query_set": os.path.basename(args.queries),
+            "query_set_sha256": query_set_hash,
+            "queries": len(queries),
+            "stub_requests": dict(server.requests),
+            "wall_seconds": round(time.perf_counter() - started, 2)
+        },
+        **report
+    }
+    if baseline is not None:
+        report["baseline"] = {
+            "commit": baseline.get("meta", {}).get("commit"),
+            "timestamp": baseline.get("meta", {}).get("timestamp")
+        }
+        if baseline.get("meta", {}).get("query_set_sha256") != query_set_hash:
+            print("Warning: the baseline used a different query set; quality deltas are not comparable")
+        report["comparison"] = compare_reports(report, baseline)
+    
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    if html_output:
+        with open(html_output, "w", encoding="utf-8") as f:
+            f.write(render_html(report))
+    
+    print_summary(report)
+    print(f"\nReport written to {output}" + (f" and {html_output}" if html_output else ""))
+
+if __name__ == "__main__":
+    main()
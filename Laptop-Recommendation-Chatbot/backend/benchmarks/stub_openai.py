@@ -0,0 +1,200 @@
+"""
+Local OpenAI-compatible endpoints for offline benchmarks
+Deterministic /embeddings and /chat/completions answers, so runs need no API key and are repeatable
+"""
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words the requirement extractor stub maps to the extractor's use cases
+USE_CASE_WORDS = {
+    "programming": ("programming", "coding", "software", "developer"),
+    "gaming": ("gaming", "games"),
+    "studies": ("student", "fsc", "classes", "university"),
+    "engineering": ("engineering", "autocad", "matlab", "solidworks"),
+    "data_science": ("data science", "machine learning"),
+    "video_editing": ("video editing", "content creation"),
+    "graphic_design": ("graphic design", "photoshop"),
+    "office_work": ("office", "business", "documents")
+}
+
+def hashed_embedding(text: str, dimensions: int) -> np.ndarray:
+    """
+    Bag-of-words vector with hashed token positions, L2-normalized
+    
+    Texts sharing words get a positive cosine similarity, which is enough
+    for retrieval to order documents meaningfully without a real model.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        slot = int.from_bytes(digest[:4], "little") % dimensions
+        vector[slot] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def extract_requirements(message: str) -> Dict[str, Any]:
+    """Stand-in for the GPT requirement extractor: budgets like 90k or 150k to 200k, and use cases"""
+    text = message.lower()
+    amounts = [int(amount) * 1000 for amount in re.findall(r"(\d+)\s*k\b", text)]
+    budget = None
+    if len(amounts) >= 2:
+        budget = {"min": min(amounts[:2]), "max": max(amounts[:2])}
+    elif amounts:
+        budget = {"min": 0, "max": amounts[0]}
+    
+    use_cases = [
+        use_case for use_case, words in USE_CASE_WORDS.items()
+        if any(word in text for word in words)
+    ]
+    return {"budget": budget, "use_case": use_cases or None, "brand_preference": None}
+
+def recommendation_reply(prompt: str) -> List[Dict[str, Any]]:
+    """Stand-in for the advisor: one entry per laptop listed in the prompt, in prompt order"""
+    try:
+        laptops = json.loads(prompt.split("Top Recommended Laptops:\n", 1)[1].split("\n\nPlease provide", 1)[0])
+    except (IndexError, ValueError):
+        return []
+    return [
+        {
+            "laptop_id": laptop["id"],
+            "rank": rank,
+            "reason": f"The {laptop['brand']} {laptop['model']} fits the stated needs and budget.",
+            "key_strengths": list(laptop.get("ideal_for") or [])[:3],
+            "considerations": "Check local availability and warranty."
+        }
+        for rank, laptop in enumerate(laptops, 1)
+    ]
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    """
+    OpenAI-compatible server on 127.0.0.1 for benchmark runs
+    
+    Point OPENAI_BASE_URL at base_url. latency_ms is added to every
+    response to stand in for network and model time.
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, latency_ms: float = 0.0, dimensions: int = 256):
+        super().__init__(("127.0.0.1", 0), StubOpenAIHandler)
+        self.latency_ms = latency_ms
+        self.dimensions = dimensions
+        self.lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+    
+    def start(self) -> "StubOpenAIServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-openai", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+    
+    def count(self, endpoint: str):
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+    
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+        
+        if self.path.endswith("/embeddings"):
+            server.count("embeddings")
+            self._send_json(self._embeddings(body))
+        elif self.path.endswith("/chat/completions"):
+            server.count("chat")
+            content = self._chat_content(body["messages"])
+            if body.get("stream"):
+                self._send_stream(body["model"], content)
+            else:
+                self._send_json({
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+                })
+        else:
+            self._send_json({"error": {"message": f"Unknown endpoint {self.path}"}}, status=404)
+    
+    def _embeddings(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        data = []
+        for index, text in enumerate(texts):
+            vector = hashed_embedding(text, self.server.dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": 1, "total_tokens": 1}
+        }
+    
+    def _chat_content(self, messages: List[Dict[str, Any]]) -> str:
+        system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        prompt = messages[-1]["content"] if messages else ""
+        if "requirement extractor" in system:
+            return json.dumps(extract_requirements(prompt))
+        if "Top Recommended Laptops:" in prompt:
+            return json.dumps(recommendation_reply(prompt))
+        return "Happy to help you choose a laptop. What will you use it for, and what is your budget in PKR?"
+    
+    def _send_json(self, payload: Dict[str, Any], status: int = 200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_stream(self, model: str, content: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "delta": {"content": word if i == 0 else f" {word}"},
+                    "finish_reason": "stop" if i == len(words) - 1 else None
+                }]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
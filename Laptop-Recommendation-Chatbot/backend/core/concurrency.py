@@ -0,0 +1,30 @@
+"""
+Bounded thread pools for blocking work (ORM queries, index lookups) called from async code
+and for background stages started from synchronous code
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+import asyncio
+import functools
+from core.config import settings
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_POOL_SIZE,
+    thread_name_prefix="blocking"
+)
+
+# Separate pool: sync request handlers already run on _executor and wait on
+# these, so sharing it could leave every worker waiting on queued work
+_background_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_POOL_SIZE,
+    thread_name_prefix="background"
+)
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking callable on the shared pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def start_blocking(func: Callable[..., Any], *args, **kwargs) -> Future:
+    """Start a blocking callable in the background from synchronous code"""
+    return _background_executor.submit(func, *args, **kwargs)
@@ -3,9 +3,55 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")  # empty = api.openai.com
+    EMBEDDING_CONCURRENCY: int = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+    EMBEDDING_TPM_LIMIT: int = int(os.getenv("EMBEDDING_TPM_LIMIT", 1000000))
+    EMBEDDING_BATCH_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_TOKENS", 20000))
     CHROMA_PERSIST_DIR: str = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "chroma")  # chroma or numpy
+    NUMPY_INDEX_PATH: str = os.getenv("NUMPY_INDEX_PATH", "./vector_index.npz")
+    IVF_LISTS: int = int(os.getenv("IVF_LISTS", 0))  # 0 = brute force
+    IVF_PROBES: int = int(os.getenv("IVF_PROBES", 4))
+    HYBRID_SEARCH: bool = os.getenv("HYBRID_SEARCH", "true").lower() == "true"  # BM25 + dense fusion
+    RRF_K: int = int(os.getenv("RRF_K", 60))
+    LEXICAL_WEIGHT: float = float(os.getenv("LEXICAL_WEIGHT", 0.5))  # BM25 ranking's weight in fusion (dense = 1)
+    INDEX_RELOAD_SECONDS: float = float(os.getenv("INDEX_RELOAD_SECONDS", 5))  # how often searches look for an index rewritten by another process
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", 512))
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", 3600))  # seconds
+    RESPONSE_CACHE_PATH: str = os.getenv("RESPONSE_CACHE_PATH", "")  # empty = in-memory only
+    RESPONSE_CACHE_SAVE_INTERVAL: float = float(os.getenv("RESPONSE_CACHE_SAVE_INTERVAL", 30))  # seconds
+    SESSION_CACHE_SIZE: int = int(os.getenv("SESSION_CACHE_SIZE", 1024))  # sessions kept in memory
+    SESSION_FLUSH_INTERVAL: float = float(os.getenv("SESSION_FLUSH_INTERVAL", 2.0))  # seconds
+    SESSION_FLUSH_BATCH: int = int(os.getenv("SESSION_FLUSH_BATCH", 64))  # queued turns that force a flush
+    SESSION_CONTEXT_TURNS: int = int(os.getenv("SESSION_CONTEXT_TURNS", 20))
+    RAG_SESSION_BACKEND: str = os.getenv("RAG_SESSION_BACKEND", "memory")  # memory or sqlite
+    RAG_SESSION_PATH: str = os.getenv("RAG_SESSION_PATH", "./rag_sessions.db")  # sqlite backend only
+    RAG_SESSION_MAX: int = int(os.getenv("RAG_SESSION_MAX", 10000))
+    RAG_SESSION_TTL: int = int(os.getenv("RAG_SESSION_TTL", 3600))  # idle seconds
+    RAG_SESSION_MAX_TURNS: int = int(os.getenv("RAG_SESSION_MAX_TURNS", 20))
+    RAG_SESSION_SUMMARIZE: bool = os.getenv("RAG_SESSION_SUMMARIZE", "true").lower() == "true"
+    BLOCKING_POOL_SIZE: int = int(os.getenv("BLOCKING_POOL_SIZE", 8))  # threads for ORM work in async routes
     PORT: int = int(os.getenv("PORT", 8000))
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./laptop_recommendations.db")
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")  # replica for catalogue reads; empty = DATABASE_URL
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 0))  # 0 = BLOCKING_POOL_SIZE
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 8))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))  # seconds
+    SQLITE_WAL: bool = os.getenv("SQLITE_WAL", "true").lower() == "true"
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # FULL, NORMAL or OFF
+    SQLITE_CACHE_MB: int = int(os.getenv("SQLITE_CACHE_MB", 64))  # per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    POPULARITY_HALF_LIFE_DAYS: float = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", 14))
+    POPULARITY_CLICK_WEIGHT: float = float(os.getenv("POPULARITY_CLICK_WEIGHT", 5))  # a click counts as this many impressions
+    POPULARITY_PRIOR_WEIGHT: float = float(os.getenv("POPULARITY_PRIOR_WEIGHT", 0.1))  # share of the ranking score; 0 = off
+    POPULARITY_REFRESH_SECONDS: float = float(os.getenv("POPULARITY_REFRESH_SECONDS", 60))
+    EVENT_LOG_PATH: str = os.getenv("EVENT_LOG_PATH", "./events/recommendations.jsonl")  # empty = database only
+    EVENT_LOG_MAX_BYTES: int = int(os.getenv("EVENT_LOG_MAX_BYTES", 64 * 1024 * 1024))  # per log part before rotating (0 = never)
+    EVENT_FLUSH_INTERVAL: float = float(os.getenv("EVENT_FLUSH_INTERVAL", 5.0))  # seconds
+    EVENT_FLUSH_BATCH: int = int(os.getenv("EVENT_FLUSH_BATCH", 256))  # queued events that force a flush
+    EVENT_QUEUE_MAX: int = int(os.getenv("EVENT_QUEUE_MAX", 100000))
+    EVENT_MAX_ATTEMPTS: int = int(os.getenv("EVENT_MAX_ATTEMPTS", 3))  # failed flushes before a session's events are dead-lettered
+    EVENT_DEAD_LETTER_PATH: str = os.getenv("EVENT_DEAD_LETTER_PATH", "./events/dead_letter.jsonl")  # empty = drop
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,94 @@
+"""
+SQLAlchemy engine factory with connection pool sizing and SQLite tuning
+SQLite files get WAL journaling and per-connection pragmas; other databases only get the pool settings
+"""
+from typing import Any, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+def is_sqlite_file(url: str) -> bool:
+    """True for SQLite databases stored in a file (not :memory:)"""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+def sqlite_pragmas(
+    wal: bool = True,
+    synchronous: str = "NORMAL",
+    cache_mb: int = 64,
+    busy_timeout_ms: int = 5000,
+    read_only: bool = False
+) -> Dict[str, Any]:
+    """
+    PRAGMA values applied to every new SQLite connection
+    
+    Args:
+        wal: Write-ahead log, so readers don't block the writer or each other
+        synchronous: FULL, NORMAL or OFF; NORMAL is durable against crashes in WAL mode
+        cache_mb: Page cache per connection
+        busy_timeout_ms: How long a writer waits for the lock before "database is locked"
+        read_only: Reject writes on this connection (query_only)
+    
+    Returns:
+        Ordered pragma name -> value
+    """
+    pragmas: Dict[str, Any] = {"busy_timeout": busy_timeout_ms}
+    if wal:
+        pragmas["journal_mode"] = "WAL"
+    pragmas["synchronous"] = synchronous
+    # Negative cache_size is in KiB instead of pages
+    pragmas["cache_size"] = -cache_mb * 1024
+    pragmas["temp_store"] = "MEMORY"
+    if read_only:
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+def create_db_engine(
+    url: str,
+    pool_size: int = 8,
+    max_overflow: int = 8,
+    pool_timeout: float = 30,
+    read_only: bool = False,
+    **pragma_options: Any
+) -> Engine:
+    """
+    Create an engine with a bounded connection pool
+    
+    Args:
+        url: Database URL
+        pool_size: Connections kept open (size to the threads doing ORM work)
+        max_overflow: Extra connections allowed under bursts
+        pool_timeout: Seconds to wait for a free connection
+        read_only: Open SQLite connections with query_only
+        **pragma_options: Passed to sqlite_pragmas
+    
+    Returns:
+        Configured engine
+    """
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite" and not is_sqlite_file(url):
+        # In-memory databases live in a single connection; keep SQLAlchemy's default pool
+        return create_engine(url, connect_args={"check_same_thread": False})
+    
+    kwargs: Dict[str, Any] = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": pool_timeout,
+        "pool_pre_ping": backend != "sqlite"
+    }
+    if backend == "sqlite":
+        # Pooled connections move between threads; the pool hands each to one thread at a time
+        kwargs["connect_args"] = {"check_same_thread": False}
+    
+    engine = create_engine(url, **kwargs)
+    
+    if backend == "sqlite":
+        pragmas = sqlite_pragmas(read_only=read_only, **pragma_options)
+        
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.close()
+    
+    return engine
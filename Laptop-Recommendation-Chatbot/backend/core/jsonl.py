@@ -0,0 +1,169 @@
+"""
+Streaming JSON Lines files with size-based rotation and optional gzip compression
+"""
+from typing import Any, Dict, Iterator, List, Optional, Union
+from pathlib import Path
+import gzip
+import json
+import zlib
+
+def _part_name(base: Path, part: int, compress: bool) -> Path:
+    suffix = ".jsonl.gz" if compress else ".jsonl"
+    return base.with_name(f"{_stem(base)}.{part:05d}{suffix}")
+
+def _stem(base: Path) -> str:
+    name = base.name
+    for suffix in (".gz", ".jsonl"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+def part_files(path: Union[str, Path]) -> List[Path]:
+    """
+    Files making up a JSON Lines export, in write order
+    
+    Args:
+        path: A single .jsonl/.jsonl.gz file, a directory, or the base path
+            given to JsonLinesWriter
+    
+    Returns:
+        Existing part files
+    """
+    path = Path(path)
+    if path.is_dir():
+        return sorted(p for p in path.iterdir() if p.name.endswith((".jsonl", ".jsonl.gz")))
+    if path.is_file():
+        return [path]
+    return _numbered_parts(path)
+
+def _numbered_parts(base: Path) -> List[Path]:
+    return sorted(base.parent.glob(f"{_stem(base)}.[0-9][0-9][0-9][0-9][0-9].jsonl*"))
+
+class JsonLinesWriter:
+    """
+    Append records to JSON Lines part files as they arrive
+    
+    Writes <stem>.00001.jsonl, <stem>.00002.jsonl, ... starting after the
+    highest existing part, so a resumed or repeated run never overwrites
+    earlier output. Parts are created exclusively, so writers in separate
+    processes sharing a base path skip each other's parts instead of
+    truncating them. A new part starts once max_bytes of JSON have been
+    written to the current one. Lines are flushed every flush_every records,
+    so a crash loses at most that many.
+    """
+    
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_bytes: int = 0,
+        compress: bool = False,
+        flush_every: int = 1
+    ):
+        """
+        Args:
+            path: Base path, e.g. data/scraped_laptops.jsonl
+            max_bytes: Uncompressed bytes per part (0 = never rotate)
+            compress: Write gzip parts
+            flush_every: Records between flushes to disk
+        """
+        self.base = Path(path)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.flush_every = max(1, flush_every)
+        
+        self.base.parent.mkdir(parents=True, exist_ok=True)
+        existing = _numbered_parts(self.base)
+        self._part = int(existing[-1].name[len(_stem(self.base)) + 1:][:5]) if existing else 0
+        
+        self.parts: List[Path] = []
+        self.count = 0
+        self._file = None
+        self._bytes = 0
+        self._unflushed = 0
+    
+    def _open_next(self):
+        self._close_file()
+        while True:
+            self._part += 1
+            path = _part_name(self.base, self._part, self.compress)
+            try:
+                self._file = gzip.open(path, "xb") if self.compress else open(path, "xb")
+                break
+            except FileExistsError:
+                # Another writer on the same base path took this part
+                continue
+        self._bytes = 0
+        self.parts.append(path)
+    
+    def write(self, record: Dict[str, Any]):
+        """Append one record"""
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        
+        if self._file is None or (self.max_bytes and self._bytes and self._bytes + len(line) > self.max_bytes):
+            self._open_next()
+        
+        self._file.write(line)
+        self._bytes += len(line)
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+    
+    def flush(self):
+        if self._file is None:
+            return
+        # A gzip sync flush leaves everything written so far decompressible
+        if self.compress:
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            self._file.flush()
+        self._unflushed = 0
+    
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def close(self):
+        self._close_file()
+    
+    def __enter__(self) -> "JsonLinesWriter":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def read_jsonl(path: Union[str, Path], limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield records from a JSON Lines export
+    
+    A truncated last line (e.g. from a crashed crawl) ends that part
+    instead of failing the whole read.
+    
+    Args:
+        path: File, directory or writer base path (see part_files)
+        limit: Stop after this many records
+    
+    Yields:
+        Decoded records
+    """
+    count = 0
+    for part in part_files(path):
+        opener = gzip.open if part.name.endswith(".gz") else open
+        with opener(part, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping unreadable line in {part}: {e}")
+                        continue
+                    yield record
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+            except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+                print(f"Stopped reading truncated file {part}: {e}")
@@ -3,10 +3,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import uvicorn
 
-from api.routes import chat_router
+from api.routes import chat_router, close_rag_service
 from api.laptop_routes import laptop_router
 from core.config import settings
 from models.database import init_db
+from services.session_store import session_store
+from services.event_logger import event_logger
 
 load_dotenv()
 
@@ -30,5 +32,12 @@ app.include_router(laptop_router, prefix="/api")
 def root():
     return {"message": "Laptop Recommendation API"}
 
+@app.on_event("shutdown")
+def flush_sessions():
+    """Write queued session changes, recommendation events and cached responses before the process exits"""
+    session_store.close()
+    event_logger.close()
+    close_rag_service()
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=settings.PORT, reload=True)
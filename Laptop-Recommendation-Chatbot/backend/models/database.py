@@ -1,13 +1,40 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, JSON, Text, Index
+from sqlalchemy import delete, insert, inspect, select, text, update
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship, validates
 from datetime import datetime
-import os
+from typing import Dict, Iterable, Optional, Tuple
+from core.config import settings
+from core.db_engine import create_db_engine, is_sqlite_file
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./laptop_recommendations.db")
+DATABASE_URL = settings.DATABASE_URL
+
+def _engine(url: str, read_only: bool = False):
+    return create_db_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE or settings.BLOCKING_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        read_only=read_only,
+        wal=settings.SQLITE_WAL,
+        synchronous=settings.SQLITE_SYNCHRONOUS,
+        cache_mb=settings.SQLITE_CACHE_MB,
+        busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS
+    )
+
+engine = _engine(DATABASE_URL)
+
+# Catalogue reads use their own pool so they never wait behind chat writes for
+# a connection; for a SQLite file that is a query-only pool on the same file
+if settings.DATABASE_READ_URL:
+    read_engine = _engine(settings.DATABASE_READ_URL, read_only=True)
+elif is_sqlite_file(DATABASE_URL):
+    read_engine = _engine(DATABASE_URL, read_only=True)
+else:
+    read_engine = engine
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
 def get_db():
@@ -18,6 +45,14 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Dependency for routes that only read the catalogue"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 class Laptop(Base):
     __tablename__ = "laptops"
     
@@ -39,24 +74,124 @@ class Laptop(Base):
     
     # Relationships
     recommendations = relationship("Recommendation", back_populates="laptop")
+    categories = relationship("LaptopCategory", cascade="all, delete-orphan")
+    popularity = relationship("LaptopPopularity", uselist=False, cascade="all, delete-orphan", back_populates="laptop")
+    
+    __table_args__ = (
+        # One row per product; the scraper upserts on it
+        Index("ix_laptops_brand_model", "brand", "model", unique=True),
+    )
+    
+    @validates("ideal_for")
+    def _sync_categories(self, key, ideal_for):
+        """Keep laptop_categories in step whenever ideal_for is assigned"""
+        current = {row.category: row for row in self.categories}
+        self.categories = [
+            current.get(category) or LaptopCategory(category=category)
+            for category in dict.fromkeys(ideal_for or [])
+        ]
+        return ideal_for
     
     def __repr__(self):
         return f"<Laptop {self.brand} {self.model} - PKR {self.price_pkr}>"
 
+class LaptopCategory(Base):
+    """One row per (laptop, ideal_for category), so category filters use an index instead of scanning JSON"""
+    __tablename__ = "laptop_categories"
+    
+    laptop_id = Column(Integer, ForeignKey("laptops.id", ondelete="CASCADE"), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_laptop_categories_category_laptop_id", "category", "laptop_id"),
+    )
+    
+    def __repr__(self):
+        return f"<LaptopCategory {self.laptop_id} {self.category}>"
+
+class LaptopPopularity(Base):
+    """
+    Running recommendation and click totals per laptop (see services.popularity)
+    
+    score is a time-decayed sum kept relative to the epoch in
+    popularity_state, so ordering by it stays correct as time passes
+    without rewriting rows (until the epoch itself moves).
+    """
+    __tablename__ = "laptop_popularity"
+    
+    laptop_id = Column(Integer, ForeignKey("laptops.id", ondelete="CASCADE"), primary_key=True)
+    recommendation_count = Column(Integer, nullable=False, default=0)
+    click_count = Column(Integer, nullable=False, default=0)
+    score = Column(Float, nullable=False, default=0.0, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    laptop = relationship("Laptop", back_populates="popularity")
+    
+    def __repr__(self):
+        return f"<LaptopPopularity {self.laptop_id} ({self.recommendation_count} shown, {self.click_count} clicked)>"
+
+class CatalogueState(Base):
+    """
+    Single-row catalogue version, bumped in the same transaction as every laptop write
+    
+    Workers and scripts share it through the database, so any process can
+    tell whether what it derived from the catalogue (e.g. ETags) is stale.
+    """
+    __tablename__ = "catalogue_state"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<CatalogueState v{self.version}>"
+
+class PopularityState(Base):
+    """Single-row epoch that laptop_popularity scores are stored relative to (see services.popularity)"""
+    __tablename__ = "popularity_state"
+    
+    id = Column(Integer, primary_key=True)
+    score_epoch = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<PopularityState epoch={self.score_epoch}>"
+
 class UserSession(Base):
     __tablename__ = "user_sessions"
     
     session_id = Column(String(100), primary_key=True, index=True)
-    conversation_history = Column(JSON, default=list)  # [{"role": "user", "content": "..."}]
+    conversation_history = Column(JSON, default=list)  # legacy; new turns go to conversation_turns
     preferences = Column(JSON, default=dict)  # {"budget": 100000, "field": "programming"}
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     recommendations = relationship("Recommendation", back_populates="session")
+    turns = relationship("ConversationTurn", back_populates="session", order_by="ConversationTurn.id")
     
     def __repr__(self):
         return f"<UserSession {self.session_id}>"
 
+class ConversationTurn(Base):
+    """One message in a session, appended rather than rewritten"""
+    __tablename__ = "conversation_turns"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(100), ForeignKey("user_sessions.session_id"), nullable=False)
+    role = Column(String(20), nullable=False)  # user, assistant
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    session = relationship("UserSession", back_populates="turns")
+    
+    __table_args__ = (
+        Index("ix_conversation_turns_session_id_id", "session_id", "id"),
+    )
+    
+    def __repr__(self):
+        return f"<ConversationTurn {self.session_id} #{self.id} {self.role}>"
+
 class Recommendation(Base):
     __tablename__ = "recommendations"
     
@@ -64,6 +199,7 @@ class Recommendation(Base):
     session_id = Column(String(100), ForeignKey("user_sessions.session_id"), nullable=False)
     laptop_id = Column(Integer, ForeignKey("laptops.id"), nullable=False)
     rank = Column(Integer, nullable=False)  # 1, 2, 3 for top recommendations
+    impression_id = Column(String(32), nullable=True, index=True)  # matches click reports to this row
     reason_generated = Column(Text, nullable=True)  # AI-generated explanation
     clicked = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -75,7 +211,113 @@ class Recommendation(Base):
     def __repr__(self):
         return f"<Recommendation {self.session_id} -> Laptop {self.laptop_id} (Rank {self.rank})>"
 
+def replace_laptop_categories(db: Session, categories_by_id: Dict[int, Iterable[str]]):
+    """
+    Rewrite the category rows of laptops written without the ORM (bulk upserts)
+    
+    Args:
+        db: Database session; the caller commits
+        categories_by_id: laptop id -> its ideal_for list
+    """
+    if not categories_by_id:
+        return
+    table = LaptopCategory.__table__
+    db.execute(delete(table).where(table.c.laptop_id.in_(list(categories_by_id))))
+    rows = [
+        {"laptop_id": laptop_id, "category": category}
+        for laptop_id, categories in categories_by_id.items()
+        for category in dict.fromkeys(categories or [])
+    ]
+    if rows:
+        db.execute(insert(table), rows)
+
+def backfill_laptop_categories(bind=None) -> int:
+    """
+    Add category rows for laptops that have none (databases created before the table existed)
+    
+    Returns:
+        Number of laptops backfilled
+    """
+    laptops = Laptop.__table__
+    with Session(bind=bind or engine) as db, db.begin():
+        missing = {
+            laptop_id: ideal_for
+            for laptop_id, ideal_for in db.execute(
+                select(laptops.c.id, laptops.c.ideal_for).where(
+                    laptops.c.id.not_in(select(LaptopCategory.__table__.c.laptop_id))
+                )
+            )
+        }
+        replace_laptop_categories(db, missing)
+    return len(missing)
+
+def add_missing_columns(bind=None) -> int:
+    """
+    Add nullable columns (and their indexes) that existing tables predate
+    
+    create_all() only creates missing tables, so columns added to a model
+    later are added here.
+    
+    Returns:
+        Number of columns added
+    """
+    bind = bind or engine
+    existing_tables = set(inspect(bind).get_table_names())
+    added = 0
+    with bind.begin() as connection:
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                for index in table.indexes:
+                    if column.name in index.columns:
+                        index.create(connection, checkfirst=True)
+                added += 1
+    return added
+
+CATALOGUE_STATE_ID = 1
+
+def bump_catalogue_version(db: Session):
+    """
+    Advance the catalogue version after laptops are inserted, updated or deleted
+    
+    Args:
+        db: Session holding the laptop writes; the caller commits
+    """
+    table = CatalogueState.__table__
+    now = datetime.utcnow()
+    result = db.execute(
+        update(table)
+        .where(table.c.id == CATALOGUE_STATE_ID)
+        .values(version=table.c.version + 1, updated_at=now)
+    )
+    if not result.rowcount:
+        db.execute(insert(table).values(id=CATALOGUE_STATE_ID, version=1, updated_at=now))
+
+def get_catalogue_version(db: Session) -> Tuple[int, Optional[datetime]]:
+    """Current catalogue version and when it last changed; (0, None) before any write"""
+    table = CatalogueState.__table__
+    row = db.execute(
+        select(table.c.version, table.c.updated_at).where(table.c.id == CATALOGUE_STATE_ID)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
 def init_db():
     """Create all tables"""
     Base.metadata.create_all(bind=engine)
+    added = add_missing_columns()
+    if added:
+        print(f"Added {added} columns to existing tables")
+    with Session(bind=engine) as db, db.begin():
+        if db.get(CatalogueState, CATALOGUE_STATE_ID) is None:
+            db.add(CatalogueState(id=CATALOGUE_STATE_ID, version=0, updated_at=datetime.utcnow()))
+    backfilled = backfill_laptop_categories()
+    if backfilled:
+        print(f"Indexed categories for {backfilled} laptops")
     print("Database tables created successfully!")
@@ -96,6 +96,12 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str
     recommendations: Optional[List[LaptopResponse]] = None
+    impression_ids: Optional[List[str]] = None  # send back with /api/recommendations/click
+
+class RecommendationClick(BaseModel):
+    session_id: str
+    laptop_id: int
+    impression_id: Optional[str] = None
 
 # Search/Filter Schemas
 class LaptopSearchParams(BaseModel):
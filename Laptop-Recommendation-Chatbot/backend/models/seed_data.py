@@ -1,7 +1,14 @@
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, insert, update, tuple_, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from models.database import Laptop, SessionLocal, init_db
+from models.database import Laptop, SessionLocal, bump_catalogue_version, init_db, replace_laptop_categories
+from core.jsonl import read_jsonl
 from datetime import datetime
 
+# Columns refreshed when a scraped laptop is seen again
+SCRAPED_UPDATE_COLUMNS = ("price_pkr", "source_url")
+
 def get_sample_laptops():
     """Sample Pakistani laptop data with realistic PKR prices (2024)"""
     return [
@@ -256,6 +263,149 @@ def get_sample_laptops():
         }
     ]
 
+def laptop_from_scraped(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Map a cleaned scraper item to laptops table columns
+    
+    Returns:
+        Column values, or None if the item has no usable price
+    """
+    if not item.get("price_available", False):
+        return None
+    
+    return {
+        "brand": item.get("brand", "Unknown"),
+        "model": item.get("model", item.get("full_name", "Unknown")),
+        "cpu": item.get("cpu", "Unknown"),
+        "ram_gb": item.get("ram_gb", 8),
+        "storage_gb": item.get("storage_gb", 256),
+        "storage_type": item.get("storage_type", "SSD"),
+        "gpu": item.get("gpu", "Integrated"),
+        "display_size": item.get("display_size", 15.6),
+        "price_pkr": item.get("price_pkr", 0),
+        "battery_hours": item.get("battery_hours"),
+        "weight_kg": item.get("weight_kg"),
+        "ideal_for": item.get("ideal_for", ["General Use"]),
+        "source_url": item.get("product_url")
+    }
+
+def upsert_laptops(db: Session, rows: List[Dict[str, Any]], on_conflict: bool = True) -> Tuple[int, int]:
+    """
+    Insert new laptops and refresh existing ones, keyed on (brand, model)
+    
+    Existing rows are resolved with one IN query. New rows use a bulk
+    INSERT ... ON CONFLICT DO UPDATE so concurrent writers cannot create
+    duplicates; existing rows get an executemany UPDATE by id. New
+    laptops get their laptop_categories rows written alongside, and the
+    catalogue version is bumped in the same transaction.
+    
+    Args:
+        db: Database session; the caller commits
+        rows: Column dicts, at most one per (brand, model)
+        on_conflict: Use ON CONFLICT (needs the unique brand/model index)
+    
+    Returns:
+        Tuple of (inserted, updated)
+    """
+    if not rows:
+        return 0, 0
+    
+    table = Laptop.__table__
+    keys = [(row["brand"], row["model"]) for row in rows]
+    existing = {
+        (brand, model): laptop_id
+        for laptop_id, brand, model in db.execute(
+            select(table.c.id, table.c.brand, table.c.model).where(
+                tuple_(table.c.brand, table.c.model).in_(keys)
+            )
+        )
+    }
+    
+    new_rows = [row for row in rows if (row["brand"], row["model"]) not in existing]
+    updates = [
+        dict(
+            {column: row[column] for column in SCRAPED_UPDATE_COLUMNS},
+            laptop_id=existing[(row["brand"], row["model"])]
+        )
+        for row in rows if (row["brand"], row["model"]) in existing
+    ]
+    
+    if new_rows:
+        statement = insert(table)
+        if on_conflict:
+            dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+            statement = dialect_insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=["brand", "model"],
+                set_={column: statement.excluded[column] for column in SCRAPED_UPDATE_COLUMNS}
+            )
+        db.execute(statement, new_rows)
+        new_keys = [(row["brand"], row["model"]) for row in new_rows]
+        new_ids = {
+            (brand, model): laptop_id
+            for laptop_id, brand, model in db.execute(
+                select(table.c.id, table.c.brand, table.c.model).where(
+                    tuple_(table.c.brand, table.c.model).in_(new_keys)
+                )
+            )
+        }
+        replace_laptop_categories(db, {
+            new_ids[(row["brand"], row["model"])]: row["ideal_for"]
+            for row in new_rows if (row["brand"], row["model"]) in new_ids
+        })
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("laptop_id"))
+            .values({column: bindparam(column) for column in SCRAPED_UPDATE_COLUMNS}),
+            updates
+        )
+    
+    bump_catalogue_version(db)
+    return len(new_rows), len(updates)
+
+def seed_from_jsonl(path: str, batch_size: int = 200) -> Tuple[int, int]:
+    """
+    Load scraped laptops from a JSON Lines export in constant memory
+    
+    Args:
+        path: Export file, directory or base path (see core.jsonl.part_files)
+        batch_size: Laptops per transaction
+    
+    Returns:
+        Tuple of (inserted, updated)
+    """
+    init_db()
+    db = SessionLocal()
+    inserted = updated = 0
+    
+    def write(batch: Dict[Tuple[str, str], Dict[str, Any]]):
+        nonlocal inserted, updated
+        added, refreshed = upsert_laptops(db, list(batch.values()))
+        db.commit()
+        inserted += added
+        updated += refreshed
+    
+    try:
+        batch: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for item in read_jsonl(path):
+            row = laptop_from_scraped(item)
+            if row is None:
+                continue
+            batch[(row["brand"], row["model"])] = row
+            if len(batch) >= batch_size:
+                write(batch)
+                batch = {}
+        write(batch)
+        print(f"Loaded scraped laptops: {inserted} added, {updated} updated")
+    except Exception as e:
+        print(f"Error seeding from {path}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+    
+    return inserted, updated
+
 def seed_database():
     """Initialize database with sample laptop data"""
     # Create tables
@@ -277,6 +427,7 @@ def seed_database():
             laptop = Laptop(**laptop_data)
             db.add(laptop)
         
+        bump_catalogue_version(db)
         db.commit()
         print(f"Successfully seeded database with {len(laptops_data)} laptops!")
         
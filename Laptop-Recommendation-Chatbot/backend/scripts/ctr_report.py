@@ -0,0 +1,107 @@
+"""
+Click-through report from the recommendation event log
+Joins clicks to impressions and prints CTR per laptop, rank and query cluster (see services.event_logger)
+"""
+import sys
+import os
+import argparse
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.jsonl import read_jsonl
+
+DIMENSIONS = ("laptop_id", "rank", "cluster")
+
+def ctr_table(
+    events: Iterable[Dict[str, Any]],
+    by: Sequence[str] = ("laptop_id",),
+    since: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate impressions and clicks into CTR rows
+    
+    A click is credited to the impression it names, or else to the latest
+    earlier impression of the same laptop in the session. Repeat clicks on
+    one impression count once.
+    
+    Args:
+        events: Impression and click events, in log order
+        by: Dimensions to group on (any of DIMENSIONS)
+        since: Only count impressions at or after this ISO timestamp
+    
+    Returns:
+        Rows with the dimension values, impressions, clicks and ctr, most shown first
+    """
+    impressions: Dict[str, Dict[str, Any]] = {}
+    latest: Dict[Tuple[str, Any], str] = {}
+    clicked = set()
+    
+    for event in events:
+        if event.get("type") == "impression":
+            if since and event["timestamp"] < since:
+                continue
+            impressions[event["impression_id"]] = event
+            latest[(event["session_id"], event["laptop_id"])] = event["impression_id"]
+        elif event.get("type") == "click":
+            impression_id = event.get("impression_id")
+            if impression_id not in impressions:
+                impression_id = latest.get((event["session_id"], event["laptop_id"]))
+            if impression_id is not None:
+                clicked.add(impression_id)
+    
+    groups: Dict[Tuple, List[int]] = {}
+    for impression_id, event in impressions.items():
+        counts = groups.setdefault(tuple(event[dimension] for dimension in by), [0, 0])
+        counts[0] += 1
+        counts[1] += impression_id in clicked
+    
+    rows = [
+        {**dict(zip(by, key)), "impressions": shown, "clicks": clicks, "ctr": clicks / shown}
+        for key, (shown, clicks) in groups.items()
+    ]
+    rows.sort(key=lambda row: (-row["impressions"], [str(row[dimension]) for dimension in by]))
+    return rows
+
+def print_table(rows: List[Dict[str, Any]], by: Sequence[str]):
+    header = [*by, "impressions", "clicks", "ctr"]
+    lines = [
+        [*(str(row[dimension]) for dimension in by), str(row["impressions"]), str(row["clicks"]), f"{row['ctr']:.2%}"]
+        for row in rows
+    ]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *lines)]
+    for line in [header, *lines]:
+        print("  ".join(cell.ljust(width) for cell, width in zip(line, widths)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Click-through rates from the recommendation event log")
+    parser.add_argument("log", nargs="?", default="./events/recommendations.jsonl",
+                        help="Event log (file, directory or EVENT_LOG_PATH base path)")
+    parser.add_argument("--by", default="laptop_id",
+                        help=f"Comma-separated dimensions from {', '.join(DIMENSIONS)}, e.g. cluster,rank")
+    parser.add_argument("--since", help="Only impressions from this ISO date/time on, e.g. 2025-01-01")
+    parser.add_argument("--min-impressions", type=int, default=1, help="Hide rows shown fewer times")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+    
+    by = [dimension.strip() for dimension in args.by.split(",") if dimension.strip()]
+    unknown = [dimension for dimension in by if dimension not in DIMENSIONS]
+    if unknown or not by:
+        print(f"Error: --by takes {', '.join(DIMENSIONS)}")
+        sys.exit(1)
+    
+    try:
+        rows = ctr_table(read_jsonl(args.log), by, args.since)
+    except Exception as e:
+        print(f"Error reading event log: {e}")
+        sys.exit(1)
+    
+    rows = [row for row in rows if row["impressions"] >= args.min_impressions]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    elif rows:
+        print_table(rows, by)
+    else:
+        print("No impressions in the event log")
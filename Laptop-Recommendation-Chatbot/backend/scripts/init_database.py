@@ -4,14 +4,22 @@ Run this after setting up your environment
 """
 import sys
 import os
+import argparse
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from models.seed_data import seed_database
+from models.seed_data import seed_database, seed_from_jsonl
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create tables and load laptop data")
+    parser.add_argument("--jsonl", help="Load a scraper JSON Lines export instead of the sample laptops")
+    args = parser.parse_args()
+    
     print("Initializing database...")
-    seed_database()
+    if args.jsonl:
+        seed_from_jsonl(args.jsonl)
+    else:
+        seed_database()
     print("\nDatabase initialization complete!")
     print("\nYou can now start the FastAPI server with: python main.py")
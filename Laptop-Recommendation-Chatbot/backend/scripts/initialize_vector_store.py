@@ -4,63 +4,70 @@ Run this after seeding the database
 """
 import sys
 import os
+import argparse
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.database import SessionLocal, Laptop
+from models.seed_data import seed_from_jsonl
 from services.document_processor import DocumentProcessor
 from services.vector_store_service import VectorStoreService
 
-def initialize_vector_store():
-    """Load laptops from database and create vector embeddings"""
+# Laptops embedded per batch; keeps memory flat for large catalogues
+BATCH_SIZE = 500
+
+def laptop_to_dict(laptop: Laptop) -> dict:
+    return {
+        "id": laptop.id,
+        "brand": laptop.brand,
+        "model": laptop.model,
+        "cpu": laptop.cpu,
+        "ram_gb": laptop.ram_gb,
+        "storage_gb": laptop.storage_gb,
+        "storage_type": laptop.storage_type,
+        "gpu": laptop.gpu,
+        "display_size": laptop.display_size,
+        "price_pkr": laptop.price_pkr,
+        "battery_hours": laptop.battery_hours,
+        "weight_kg": laptop.weight_kg,
+        "ideal_for": laptop.ideal_for,
+        "source_url": laptop.source_url
+    }
+
+def initialize_vector_store(jsonl_path: str = None):
+    """
+    Load laptops from database and create vector embeddings
+    
+    Args:
+        jsonl_path: Scraper JSON Lines export to load into the database first
+    """
     
     print("=" * 60)
     print("Initializing Vector Store for RAG Pipeline")
     print("=" * 60)
     
+    if jsonl_path:
+        print(f"\nLoading scraped laptops from {jsonl_path}...")
+        seed_from_jsonl(jsonl_path)
+    
     # Get database session
     db = SessionLocal()
     
     try:
-        # Fetch all laptops from database
-        print("\n1. Fetching laptops from database...")
-        laptops = db.query(Laptop).all()
+        # Count laptops in database
+        print("\n1. Counting laptops in database...")
+        laptop_count = db.query(Laptop).count()
         
-        if not laptops:
+        if not laptop_count:
             print("❌ No laptops found in database!")
             print("Please run: python scripts/init_database.py first")
             return
         
-        print(f"✓ Found {len(laptops)} laptops")
-        
-        # Convert to dictionaries
-        print("\n2. Processing laptop documents...")
-        laptop_dicts = []
-        for laptop in laptops:
-            laptop_dicts.append({
-                "id": laptop.id,
-                "brand": laptop.brand,
-                "model": laptop.model,
-                "cpu": laptop.cpu,
-                "ram_gb": laptop.ram_gb,
-                "storage_gb": laptop.storage_gb,
-                "storage_type": laptop.storage_type,
-                "gpu": laptop.gpu,
-                "display_size": laptop.display_size,
-                "price_pkr": laptop.price_pkr,
-                "battery_hours": laptop.battery_hours,
-                "weight_kg": laptop.weight_kg,
-                "ideal_for": laptop.ideal_for,
-                "source_url": laptop.source_url
-            })
-        
-        # Create documents with expert advice
-        documents = DocumentProcessor.batch_create_documents(laptop_dicts)
-        print(f"✓ Created {len(documents)} enriched documents")
+        print(f"✓ Found {laptop_count} laptops")
         
         # Initialize vector store
-        print("\n3. Initializing ChromaDB vector store...")
+        print("\n2. Initializing vector store...")
         vector_store = VectorStoreService()
         
         # Check if collection already has documents
@@ -75,11 +82,18 @@ def initialize_vector_store():
                 print("Keeping existing collection")
                 return
         
-        # Add documents to vector store
-        print("\n4. Generating embeddings and adding to vector store...")
+        # Stream laptops in batches, creating documents with expert advice
+        print("\n3. Generating embeddings and adding to vector store...")
         print("(This may take a minute...)")
         
-        count = vector_store.add_documents(documents)
+        # sync_documents embeds and writes batch by batch but saves the index
+        # (and bumps its version) once at the end
+        documents = (
+            DocumentProcessor.create_laptop_document(laptop_to_dict(laptop))
+            for laptop in db.query(Laptop).order_by(Laptop.id).yield_per(BATCH_SIZE)
+        )
+        counts = vector_store.sync_documents(documents, delete_missing=False, batch_size=BATCH_SIZE)
+        count = counts["added"] + counts["reembedded"] + counts["metadata_updated"]
         
         print(f"\n✓ Successfully added {count} documents to vector store")
         
@@ -89,7 +103,7 @@ def initialize_vector_store():
         print("=" * 60)
         
         stats = vector_store.get_collection_stats()
-        print(f"Collection: {stats.get('collection_name')}")
+        print(f"Collection: {stats.get('collection_name')} ({stats.get('backend')} backend)")
         print(f"Documents: {stats.get('document_count')}")
         
         cache_stats = stats.get('embedding_cache', {})
@@ -136,4 +150,7 @@ def initialize_vector_store():
         db.close()
 
 if __name__ == "__main__":
-    initialize_vector_store()
+    parser = argparse.ArgumentParser(description="Embed laptops from the database into the vector store")
+    parser.add_argument("--jsonl", help="Scraper JSON Lines export (file, directory or base path) to load first")
+    args = parser.parse_args()
+    initialize_vector_store(args.jsonl)
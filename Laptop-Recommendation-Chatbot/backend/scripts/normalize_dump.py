@@ -0,0 +1,58 @@
+"""
+Re-run spec normalization over a historical crawl dump
+Reads a JSON Lines export in chunks and writes cleaned records with current rules (needs pandas)
+"""
+import sys
+import os
+import argparse
+import json
+from itertools import islice
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.jsonl import JsonLinesWriter, read_jsonl
+from services.spec_normalizer import normalize_frame
+
+def normalize_dump(input_path: str, output_path: str, chunk_size: int = 10000, compress: bool = False) -> int:
+    """
+    Normalize a JSON Lines export chunk by chunk
+    
+    Args:
+        input_path: Export file, directory or writer base path
+        output_path: Base path for the cleaned parts
+        chunk_size: Records normalized per DataFrame
+        compress: Write gzip parts
+    
+    Returns:
+        Number of records written
+    """
+    import pandas as pd
+    
+    records = read_jsonl(input_path)
+    with JsonLinesWriter(output_path, compress=compress, flush_every=chunk_size) as writer:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            frame = normalize_frame(pd.DataFrame(chunk))
+            # to_json turns NumPy scalars and missing values into plain JSON
+            for record in json.loads(frame.to_json(orient="records", force_ascii=False)):
+                writer.write(record)
+        return writer.count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run spec normalization over a crawl dump")
+    parser.add_argument("input", help="JSON Lines export (file, directory or base path)")
+    parser.add_argument("output", help="Base path for the cleaned export, e.g. ../data/normalized/laptops.jsonl")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Records normalized at once")
+    parser.add_argument("--compress", action="store_true", help="Write gzip parts")
+    args = parser.parse_args()
+    
+    try:
+        count = normalize_dump(args.input, args.output, args.chunk_size, args.compress)
+    except Exception as e:
+        print(f"Error normalizing dump: {e}")
+        sys.exit(1)
+    
+    print(f"Normalized {count} records into {args.output}")
@@ -0,0 +1,32 @@
+"""
+Rebuild the laptop_popularity rollup from the recommendations table
+Run once on databases from before the rollup, or after changing POPULARITY_HALF_LIFE_DAYS or POPULARITY_CLICK_WEIGHT
+"""
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import SessionLocal, init_db
+from services.popularity import rebuild_popularity
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild laptop popularity counters and scores")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Recommendation rows read at once")
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        count = rebuild_popularity(db, batch_size=args.batch_size)
+        db.commit()
+    except Exception as e:
+        print(f"Error rebuilding popularity: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+    
+    print(f"Rebuilt popularity for {count} laptops")
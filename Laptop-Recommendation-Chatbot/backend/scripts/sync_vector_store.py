@@ -0,0 +1,80 @@
+"""
+Incrementally sync the vector store with the laptops table
+Re-embeds only new or changed documents; safe to run from cron
+"""
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import SessionLocal, Laptop
+from models.seed_data import seed_from_jsonl
+from services.document_processor import DocumentProcessor
+from services.vector_store_service import VectorStoreService
+from scripts.initialize_vector_store import laptop_to_dict
+
+def iter_documents(db, batch_size: int):
+    """Yield a document per laptop without loading the table at once"""
+    for laptop in db.query(Laptop).order_by(Laptop.id).yield_per(batch_size):
+        yield DocumentProcessor.create_laptop_document(laptop_to_dict(laptop))
+
+def sync_vector_store(
+    jsonl_path: str = None,
+    delete_missing: bool = True,
+    batch_size: int = 100,
+    dry_run: bool = False
+) -> dict:
+    """
+    Diff laptop documents against the vector store and apply the changes
+    
+    Args:
+        jsonl_path: Scraper JSON Lines export to load into the database first
+        delete_missing: Remove documents for laptops no longer in the database
+        batch_size: Documents diffed and embedded at once
+        dry_run: Report what would change without writing
+        
+    Returns:
+        Change counts from VectorStoreService.sync_documents
+    """
+    if jsonl_path:
+        seed_from_jsonl(jsonl_path)
+    
+    db = SessionLocal()
+    try:
+        vector_store = VectorStoreService()
+        return vector_store.sync_documents(
+            iter_documents(db, batch_size),
+            delete_missing=delete_missing,
+            batch_size=batch_size,
+            dry_run=dry_run
+        )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally sync the vector store with the laptops table")
+    parser.add_argument("--jsonl", help="Scraper JSON Lines export to load into the database first")
+    parser.add_argument("--keep-missing", action="store_true", help="Do not delete documents for removed laptops")
+    parser.add_argument("--batch-size", type=int, default=100, help="Documents diffed and embedded at once")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+    
+    try:
+        counts = sync_vector_store(
+            jsonl_path=args.jsonl,
+            delete_missing=not args.keep_missing,
+            batch_size=args.batch_size,
+            dry_run=args.dry_run
+        )
+    except Exception as e:
+        print(f"Error syncing vector store: {e}")
+        sys.exit(1)
+    
+    prefix = "Would apply" if args.dry_run else "Applied"
+    print(
+        f"{prefix}: {counts['added']} added, {counts['reembedded']} re-embedded, "
+        f"{counts['metadata_updated']} metadata-only, {counts['deleted']} deleted, "
+        f"{counts['unchanged']} unchanged"
+    )
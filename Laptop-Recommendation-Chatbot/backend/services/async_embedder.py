@@ -0,0 +1,182 @@
+"""
+Concurrent embedding generation on the async OpenAI client
+Batches are sized by token count and throttled to a tokens-per-minute budget
+"""
+from typing import Callable, List, Optional
+import asyncio
+import random
+import time
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from core.config import settings
+from core.concurrency import run_blocking
+
+class TokenBucket:
+    """Tokens-per-minute limiter shared by all in-flight requests"""
+    
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, tokens: int):
+        """Wait until the budget allows sending this many tokens"""
+        tokens = min(float(tokens), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+class AsyncBatchEmbedder:
+    """Embed many texts with bounded concurrency, retries and input-order results"""
+    
+    RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+    
+    def __init__(
+        self,
+        model: str = "text-embedding-3-small",
+        concurrency: int = settings.EMBEDDING_CONCURRENCY,
+        tokens_per_minute: int = settings.EMBEDDING_TPM_LIMIT,
+        max_batch_tokens: int = settings.EMBEDDING_BATCH_TOKENS,
+        max_batch_items: int = 2048,
+        max_retries: int = 6,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        self.model = model
+        self.concurrency = concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Cheap token estimate (~4 characters per token for English text)"""
+        return len(text) // 4 + 1
+    
+    def split_batches(self, texts: List[str], max_items: Optional[int] = None) -> List[List[int]]:
+        """
+        Group text positions into request batches under the token and item caps
+        
+        Args:
+            texts: Texts to embed
+            max_items: Optional tighter cap on texts per request
+        
+        Returns:
+            List of batches, each a list of indexes into texts
+        """
+        max_items = min(max_items or self.max_batch_items, self.max_batch_items)
+        batches = []
+        current: List[int] = []
+        current_tokens = 0
+        
+        for i, text in enumerate(texts):
+            tokens = self.estimate_tokens(text)
+            if current and (current_tokens + tokens > self.max_batch_tokens or len(current) >= max_items):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+        
+        if current:
+            batches.append(current)
+        return batches
+    
+    async def embed(
+        self,
+        texts: List[str],
+        max_items: Optional[int] = None,
+        on_batch: Optional[Callable[[List[int], List[List[float]]], None]] = None
+    ) -> List[List[float]]:
+        """
+        Embed texts concurrently
+        
+        If a batch fails for good, the other batches still run to completion
+        before its error is raised, so on_batch has seen every success.
+        
+        Args:
+            texts: Texts to embed
+            max_items: Optional cap on texts per request
+            on_batch: Called on the blocking pool with (positions in texts,
+                embeddings) as each batch completes, e.g. to cache it
+        
+        Returns:
+            Embedding vectors in the same order as texts
+        """
+        if not texts:
+            return []
+        
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        bucket = TokenBucket(self.tokens_per_minute)
+        
+        # Retries are handled here so Retry-After and the token budget are respected
+        client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            max_retries=0
+        )
+        
+        async def run(batch: List[int]):
+            async with semaphore:
+                embeddings = await self._embed_batch(client, bucket, [texts[i] for i in batch])
+            for i, embedding in zip(batch, embeddings):
+                results[i] = embedding
+            if on_batch is not None:
+                await run_blocking(on_batch, batch, embeddings)
+        
+        try:
+            outcomes = await asyncio.gather(
+                *(run(batch) for batch in self.split_batches(texts, max_items)),
+                return_exceptions=True
+            )
+        finally:
+            await client.close()
+        
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return results
+    
+    async def _embed_batch(self, client: AsyncOpenAI, bucket: TokenBucket, batch: List[str]) -> List[List[float]]:
+        """Send one request, retrying transient failures with backoff"""
+        tokens = sum(self.estimate_tokens(text) for text in batch)
+        
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire(tokens)
+            try:
+                response = await client.embeddings.create(
+                    model=self.model,
+                    input=batch,
+                    encoding_format="float"
+                )
+                return [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
+            except self.RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    print(f"Error generating batch embeddings: {e}")
+                    raise
+                await asyncio.sleep(self._retry_delay(e, attempt))
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Honour Retry-After when the server sends it, else exponential backoff with jitter"""
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay / 2 + random.uniform(0, delay / 2)
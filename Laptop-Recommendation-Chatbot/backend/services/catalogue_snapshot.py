@@ -0,0 +1,260 @@
+"""
+Columnar in-memory snapshot of the laptop catalogue
+Scores, filters and ranks laptops with vector operations instead of per-row Python
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import threading
+import numpy as np
+from sqlalchemy.orm import Session
+from models.database import Laptop, get_catalogue_version
+
+# Use cases from requirement extraction -> ideal_for categories that satisfy them
+USE_CASE_MAPPING = {
+    "programming": ["Programming", "CS Student", "Software Development"],
+    "gaming": ["Gaming"],
+    "studies": ["FSC Student", "CS Student", "Office Work"],
+    "engineering": ["Engineering"],
+    "data_science": ["Data Science", "Machine Learning"],
+    "video_editing": ["Video Editing", "Content Creation"],
+    "graphic_design": ["Graphic Design"],
+    "office_work": ["Office Work", "Business"]
+}
+
+class CatalogueSnapshot:
+    """Immutable column arrays for a set of laptops"""
+    
+    NUMERIC_COLUMNS = ("price_pkr", "ram_gb", "storage_gb", "display_size", "battery_hours", "weight_kg")
+    
+    def __init__(self, laptops: Sequence[Any], version: int = 0):
+        """
+        Args:
+            laptops: Laptop rows (or any objects with the same attributes)
+            version: Catalogue version the rows were read at
+        """
+        self.version = version
+        self.ids = np.asarray([laptop.id for laptop in laptops], dtype=np.int64)
+        self.row_of = {int(laptop_id): row for row, laptop_id in enumerate(self.ids)}
+        
+        # Missing values become NaN, which fails every comparison
+        self.columns: Dict[str, np.ndarray] = {
+            column: np.asarray(
+                [getattr(laptop, column, None) if getattr(laptop, column, None) is not None else np.nan
+                 for laptop in laptops],
+                dtype=np.float64
+            )
+            for column in self.NUMERIC_COLUMNS
+        }
+        
+        self.brands, self.brand_codes = self._encode([laptop.brand for laptop in laptops])
+        self.storage_types, self.storage_type_codes = self._encode([laptop.storage_type for laptop in laptops])
+        
+        # One bool column per ideal_for category
+        self.categories = sorted({c for laptop in laptops for c in (laptop.ideal_for or [])})
+        self.category_index = {category: col for col, category in enumerate(self.categories)}
+        self.ideal_for = np.zeros((len(self.ids), len(self.categories)), dtype=bool)
+        for row, laptop in enumerate(laptops):
+            for category in laptop.ideal_for or []:
+                self.ideal_for[row, self.category_index[category]] = True
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    @staticmethod
+    def _encode(values: List[Optional[str]]) -> Tuple[List[str], np.ndarray]:
+        """Integer-code a string column; None becomes -1"""
+        vocabulary = sorted({v for v in values if v is not None})
+        code_of = {value: code for code, value in enumerate(vocabulary)}
+        return vocabulary, np.asarray([code_of.get(v, -1) for v in values], dtype=np.int32)
+    
+    def covers(self, laptop_ids: Sequence[int]) -> bool:
+        """True if every laptop ID has a row in this snapshot"""
+        return all(int(laptop_id) in self.row_of for laptop_id in laptop_ids)
+    
+    def rows_for(self, laptop_ids: Sequence[int]) -> np.ndarray:
+        """Row indices for laptop IDs (IDs must be covered)"""
+        return np.asarray([self.row_of[int(laptop_id)] for laptop_id in laptop_ids], dtype=np.int64)
+    
+    def requirement_scores(
+        self,
+        requirements: Dict[str, Any],
+        rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        How well each laptop matches the requirements (0-1)
+        
+        Use case match weighs 0.4; brand, RAM and storage preferences 0.2
+        each. Scores are normalized by the weight of the requirements
+        actually given, and are a neutral 0.5 when none are.
+        
+        Args:
+            requirements: Extracted user requirements
+            rows: Rows to score (default: the whole catalogue)
+        
+        Returns:
+            Array of scores aligned with rows
+        """
+        if rows is None:
+            rows = np.arange(len(self.ids))
+        
+        score = np.zeros(len(rows), dtype=np.float64)
+        total_weight = 0.0
+        
+        use_cases = requirements.get('use_case')
+        if use_cases:
+            if isinstance(use_cases, str):
+                use_cases = [use_cases]
+            
+            ideal_for = self.ideal_for[rows]
+            match_count = np.zeros(len(rows), dtype=np.float64)
+            for use_case in use_cases:
+                columns = [
+                    self.category_index[category]
+                    for category in USE_CASE_MAPPING.get(use_case, [])
+                    if category in self.category_index
+                ]
+                if columns:
+                    match_count += ideal_for[:, columns].any(axis=1)
+            
+            score += match_count / len(use_cases) * 0.4
+            total_weight += 0.4
+        
+        brand = requirements.get('brand_preference')
+        if brand:
+            code = self.brands.index(brand) if brand in self.brands else -2
+            score += np.where(self.brand_codes[rows] == code, 0.2, 0.0)
+            total_weight += 0.2
+        
+        ram_preference = requirements.get('ram_preference')
+        if ram_preference:
+            ram = self.columns["ram_gb"][rows]
+            score += np.select(
+                [ram >= ram_preference, ram >= ram_preference * 0.75],
+                [0.2, 0.1],
+                default=0.0
+            )
+            total_weight += 0.2
+        
+        storage_preference = requirements.get('storage_preference')
+        if storage_preference:
+            storage_type = storage_preference.get('type')
+            if storage_type:
+                code = self.storage_types.index(storage_type) if storage_type in self.storage_types else -2
+                score += np.where(self.storage_type_codes[rows] == code, 0.1, 0.0)
+            
+            size_gb = storage_preference.get('size_gb')
+            if size_gb:
+                score += np.where(self.columns["storage_gb"][rows] >= size_gb, 0.1, 0.0)
+            
+            total_weight += 0.2
+        
+        if total_weight > 0:
+            return score / total_weight
+        
+        return np.full(len(rows), 0.5)
+    
+    def budget_mask(
+        self,
+        budget: Optional[Dict[str, Any]],
+        rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Rows whose price is within budget ({"min", "max"}; missing bounds are open)"""
+        price = self.columns["price_pkr"] if rows is None else self.columns["price_pkr"][rows]
+        mask = np.ones(len(price), dtype=bool)
+        
+        if budget:
+            if budget.get('min'):
+                mask &= price >= budget['min']
+            if budget.get('max'):
+                mask &= price <= budget['max']
+        
+        return mask
+    
+    def rank(
+        self,
+        laptop_ids: Sequence[int],
+        similarity_scores: Dict[int, float],
+        requirements: Dict[str, Any],
+        priors: Optional[Dict[int, float]] = None,
+        prior_weight: float = 0.0
+    ) -> List[Tuple[int, float, float]]:
+        """
+        Rank candidate laptops by 0.6 * similarity + 0.4 * requirement score
+        
+        Candidates outside the requirements' budget are dropped. With
+        priors, prior_weight of the combined score comes from them instead.
+        
+        Args:
+            laptop_ids: Candidate laptop IDs (must be covered)
+            similarity_scores: Vector search similarity by laptop ID
+            requirements: Extracted user requirements
+            priors: Optional 0-1 prior by laptop ID (e.g. popularity); missing IDs get 0
+            prior_weight: Share of the combined score taken by the prior
+        
+        Returns:
+            List of (laptop_id, similarity_score, combined_score), best first
+        """
+        if not len(laptop_ids):
+            return []
+        
+        rows = self.rows_for(laptop_ids)
+        similarity = np.asarray(
+            [similarity_scores.get(int(laptop_id), 0.0) for laptop_id in laptop_ids],
+            dtype=np.float64
+        )
+        combined = similarity * 0.6 + self.requirement_scores(requirements, rows) * 0.4
+        if priors and prior_weight:
+            prior = np.asarray([priors.get(int(laptop_id), 0.0) for laptop_id in laptop_ids], dtype=np.float64)
+            combined = combined * (1 - prior_weight) + prior * prior_weight
+        
+        keep = np.flatnonzero(self.budget_mask(requirements.get('budget'), rows))
+        order = keep[np.argsort(-combined[keep], kind="stable")]
+        
+        return [
+            (int(self.ids[rows[i]]), float(similarity[i]), float(combined[i]))
+            for i in order
+        ]
+
+class CatalogueSnapshotCache:
+    """
+    Holds the snapshot of the whole catalogue and rebuilds it when the catalogue changes
+    
+    Staleness is checked against the persisted catalogue version, which
+    every laptop write bumps (API, scraper and JSONL upserts, seeding), so
+    writes made by other workers or processes are picked up too.
+    """
+    
+    def __init__(self):
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._lock = threading.Lock()
+    
+    def current(self) -> Optional[CatalogueSnapshot]:
+        """The last built snapshot (None before the first build)"""
+        return self._snapshot
+    
+    def get(self, db: Session) -> CatalogueSnapshot:
+        """Return the snapshot, rebuilding it from the database if the catalogue version moved"""
+        # Read the version before the rows: a write in between leaves the
+        # snapshot labelled with the older version, so it is rebuilt next time
+        version, _ = get_catalogue_version(db)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        
+        rows = db.query(
+            Laptop.id,
+            Laptop.brand,
+            Laptop.storage_type,
+            Laptop.ideal_for,
+            *[getattr(Laptop, column) for column in CatalogueSnapshot.NUMERIC_COLUMNS]
+        ).all()
+        snapshot = CatalogueSnapshot(rows, version=version)
+        
+        with self._lock:
+            # Keep a newer snapshot built concurrently by another request
+            if self._snapshot is None or self._snapshot.version <= version:
+                self._snapshot = snapshot
+        
+        return snapshot
+
+# Shared by the recommendation engine
+catalogue_snapshots = CatalogueSnapshotCache()
@@ -4,20 +4,13 @@ Handles intent detection, state management, and response generation
 """
 from typing import Dict, List, Optional, Tuple
 from enum import Enum
-import re
-from datetime import datetime
 from sqlalchemy.orm import Session
-from models.database import UserSession
+from models.schemas import LaptopSearchParams
 from services.laptop_service import LaptopService
-
-class Intent(Enum):
-    GREETING = "greeting"
-    BUDGET_QUERY = "budget_query"
-    USE_CASE_QUERY = "use_case_query"
-    COMPARISON_REQUEST = "comparison_request"
-    SPECIFIC_LAPTOP = "specific_laptop_question"
-    PURCHASE_HELP = "purchase_help"
-    UNKNOWN = "unknown"
+from services.session_store import SessionState, SessionStore, session_store
+from services.event_logger import RecommendationEventLogger, event_logger, query_cluster
+from services import intent_detector
+from services.intent_detector import Intent, MessageAnalysis
 
 class ConversationStep(Enum):
     GREETING = "greeting"
@@ -64,132 +57,45 @@ class UserProfile:
         return profile
 
 class ConversationFlowManager:
-    """Manages conversation flow and generates contextual responses"""
+    """
+    Manages conversation flow and generates contextual responses
     
-    def __init__(self, db: Session):
-        self.db = db
+    Holds no per-request state, so one instance serves every request; the
+    database session is passed to each call. Session state comes from the
+    write-behind session store and is loaded once per message.
+    """
+    
+    def __init__(
+        self,
+        sessions: Optional[SessionStore] = None,
+        events: Optional[RecommendationEventLogger] = None
+    ):
         self.laptop_service = LaptopService()
-        
-        # Intent detection patterns
-        self.intent_patterns = {
-            Intent.GREETING: [
-                r'\b(hi|hello|hey|salam|assalam|greetings)\b',
-                r'\b(good morning|good evening)\b'
-            ],
-            Intent.BUDGET_QUERY: [
-                r'\b(\d+k?)\s*(to|se|tak)\s*(\d+k?)\b',
-                r'\bbudget\b.*\b(\d+)\b',
-                r'\b(\d{5,6})\s*(rupees|pkr|rs)\b',
-                r'\b(cheap|affordable|budget|economical)\b'
-            ],
-            Intent.USE_CASE_QUERY: [
-                r'\b(programming|coding|development|software)\b',
-                r'\b(fsc|pre-engineering|pre-medical|ics)\b',
-                r'\b(gaming|games|pubg|gta)\b',
-                r'\b(video editing|editing|premiere|photoshop)\b',
-                r'\b(office work|ms office|excel|word)\b',
-                r'\b(student|study|university|college)\b'
-            ],
-            Intent.COMPARISON_REQUEST: [
-                r'\b(compare|comparison|vs|versus|difference)\b',
-                r'\b(which is better|better than)\b',
-                r'\b(hp vs dell|lenovo vs asus)\b'
-            ],
-            Intent.SPECIFIC_LAPTOP: [
-                r'\b(hp|dell|lenovo|asus|acer|msi)\s+\w+',
-                r'\b(i3|i5|i7|ryzen)\b',
-                r'\b(inspiron|pavilion|ideapad|vivobook)\b'
-            ],
-            Intent.PURCHASE_HELP: [
-                r'\b(where to buy|kahan se|purchase|order)\b',
-                r'\b(czone|paklap|daraz|telemart)\b',
-                r'\b(reliable|trusted|authentic)\b',
-                r'\b(warranty|guarantee)\b'
-            ]
-        }
+        self.sessions = sessions or session_store
+        self.events = events or event_logger
     
     def detect_intent(self, message: str) -> Intent:
         """Detect user intent from message"""
-        message_lower = message.lower()
-        
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    return intent
-        
-        return Intent.UNKNOWN
+        return intent_detector.detect_intent(message.lower())
     
     def extract_budget(self, message: str) -> Tuple[Optional[int], Optional[int]]:
         """Extract budget range from message"""
-        message_lower = message.lower()
-        
-        # Pattern: "80k to 120k" or "80000 to 120000"
-        range_match = re.search(r'(\d+)k?\s*(to|se|tak|-)\s*(\d+)k?', message_lower)
-        if range_match:
-            min_val = int(range_match.group(1))
-            max_val = int(range_match.group(3))
-            # Convert k to thousands
-            if min_val < 1000:
-                min_val *= 1000
-            if max_val < 1000:
-                max_val *= 1000
-            return min_val, max_val
-        
-        # Pattern: single budget "around 100k" or "100000"
-        single_match = re.search(r'(\d+)k?\s*(rupees|pkr|rs)?', message_lower)
-        if single_match:
-            budget = int(single_match.group(1))
-            if budget < 1000:
-                budget *= 1000
-            # Create range ±20%
-            return int(budget * 0.8), int(budget * 1.2)
-        
-        return None, None
+        return intent_detector.extract_budget(message.lower())
     
     def extract_use_cases(self, message: str) -> List[str]:
         """Extract use cases from message"""
-        message_lower = message.lower()
-        use_cases = []
-        
-        use_case_keywords = {
-            "Programming": ["programming", "coding", "development", "software", "cs", "computer science"],
-            "FSC Student": ["fsc", "pre-engineering", "pre-medical", "intermediate"],
-            "Gaming": ["gaming", "games", "pubg", "gta", "valorant"],
-            "Video Editing": ["video editing", "editing", "premiere", "photoshop", "content creation"],
-            "Office Work": ["office", "ms office", "excel", "word", "business"],
-            "Engineering": ["engineering", "autocad", "solidworks", "matlab"],
-            "Graphic Design": ["graphic design", "design", "illustrator", "photoshop"]
-        }
-        
-        for use_case, keywords in use_case_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                use_cases.append(use_case)
-        
-        return use_cases
+        return intent_detector.extract_entities(message.lower())["use_case"]
     
     def extract_brands(self, message: str) -> List[str]:
         """Extract brand preferences"""
-        message_lower = message.lower()
-        brands = []
-        
-        brand_list = ["HP", "Dell", "Lenovo", "ASUS", "Acer", "MSI", "Apple"]
-        for brand in brand_list:
-            if brand.lower() in message_lower:
-                brands.append(brand)
-        
-        return brands
+        return intent_detector.extract_entities(message.lower())["brand"]
     
-    def get_current_step(self, session_id: str) -> ConversationStep:
+    def get_current_step(self, state: SessionState) -> ConversationStep:
         """Get current conversation step from session"""
-        session = self.db.query(UserSession).filter(
-            UserSession.session_id == session_id
-        ).first()
-        
-        if not session or not session.preferences:
+        prefs = state.preferences
+        if not prefs:
             return ConversationStep.GREETING
         
-        prefs = session.preferences
-        
         # Determine step based on collected info
         if not prefs.get("greeted"):
             return ConversationStep.GREETING
@@ -202,71 +108,45 @@ class ConversationFlowManager:
         else:
             return ConversationStep.RECOMMENDATION
     
-    def update_profile(self, session_id: str, message: str) -> UserProfile:
+    def update_profile(
+        self,
+        state: SessionState,
+        message: str,
+        analysis: Optional[MessageAnalysis] = None
+    ) -> UserProfile:
         """Update user profile based on message"""
-        session = self.db.query(UserSession).filter(
-            UserSession.session_id == session_id
-        ).first()
-        
-        if not session:
-            session = UserSession(
-                session_id=session_id,
-                conversation_history=[],
-                preferences={}
-            )
-            self.db.add(session)
+        if analysis is None:
+            analysis = intent_detector.analyze(message)
         
         # Load existing profile
-        profile = UserProfile.from_dict(session.preferences)
+        profile = UserProfile.from_dict(state.preferences)
         
-        # Extract information
-        budget_min, budget_max = self.extract_budget(message)
-        if budget_min:
-            profile.budget_min = budget_min
-            profile.budget_max = budget_max
+        # Apply what the message told us
+        if analysis.budget_min:
+            profile.budget_min = analysis.budget_min
+            profile.budget_max = analysis.budget_max
         
-        use_cases = self.extract_use_cases(message)
-        if use_cases:
-            profile.use_case.extend([uc for uc in use_cases if uc not in profile.use_case])
+        profile.use_case.extend([uc for uc in analysis.use_cases if uc not in profile.use_case])
+        profile.brand_pref.extend([b for b in analysis.brands if b not in profile.brand_pref])
         
-        brands = self.extract_brands(message)
-        if brands:
-            profile.brand_pref.extend([b for b in brands if b not in profile.brand_pref])
-        
-        # Detect student type
-        message_lower = message.lower()
-        if "fsc" in message_lower or "intermediate" in message_lower:
-            profile.student_type = "FSC"
-        elif "university" in message_lower or "uni" in message_lower:
-            profile.student_type = "Uni"
-        
-        # Detect major
-        if any(word in message_lower for word in ["cs", "computer science", "software"]):
-            profile.major = "CS"
-        elif "engineering" in message_lower:
-            profile.major = "Engineering"
-        elif "medical" in message_lower or "mbbs" in message_lower:
-            profile.major = "Medical"
-        
-        # Save profile
-        session.preferences = profile.to_dict()
-        self.db.commit()
+        if analysis.student_type:
+            profile.student_type = analysis.student_type
+        
+        if analysis.major:
+            profile.major = analysis.major
+        
+        # Save profile, keeping flow flags such as "greeted"
+        self.sessions.update_preferences(state, profile.to_dict())
         
         return profile
     
-    def handle_greeting(self, session_id: str) -> str:
+    def handle_greeting(self, state: SessionState) -> str:
         """Handle greeting intent"""
-        session = self.db.query(UserSession).filter(
-            UserSession.session_id == session_id
-        ).first()
-        
-        if session and session.preferences.get("greeted"):
+        if state.preferences.get("greeted"):
             return "Welcome back! How can I help you find the perfect laptop today?"
         
         # Mark as greeted
-        if session:
-            session.preferences["greeted"] = True
-            self.db.commit()
+        self.sessions.update_preferences(state, {"greeted": True})
         
         return """السلام علیکم! Welcome to Pakistan's smartest laptop recommendation assistant! 🎓💻
 
@@ -394,13 +274,8 @@ Note: Most laptops under 120k have integrated graphics (light gaming only).""")
             response += "\n\nWhat's your budget range in PKR?"
             return response
     
-    def handle_comparison_request(self, session_id: str, message: str) -> str:
-        """Handle laptop comparison requests"""
-        message_lower = message.lower()
-        
-        # Extract laptop models or brands
-        brands = self.extract_brands(message)
-        
+    def handle_comparison_request(self, session_id: str, brands: List[str]) -> str:
+        """Handle laptop comparison requests for the brands in the message"""
         if len(brands) >= 2:
             return f"""Great question! Let me compare {brands[0]} vs {brands[1]} for Pakistani market:
 
@@ -426,14 +301,12 @@ Tell me:
 
 I'll give you a detailed comparison with Pakistani market context!"""
     
-    def handle_specific_laptop(self, session_id: str, message: str) -> str:
-        """Handle questions about specific laptops"""
+    def handle_specific_laptop(self, db: Session, session_id: str, brands: List[str]) -> str:
+        """Handle questions about specific laptops by the brands in the message"""
         # Try to find laptop in database
-        brands = self.extract_brands(message)
-        
         if brands:
             laptops = self.laptop_service.search_laptops(
-                self.db,
+                db,
                 LaptopSearchParams(brand=brands[0])
             )
             
@@ -513,20 +386,24 @@ I can tell you if it's worth the price in Pakistani market!"""
 
 Need help with a specific laptop purchase?"""
     
-    def generate_response(self, session_id: str, message: str) -> Tuple[str, Optional[List]]:
+    def generate_response(self, db: Session, session_id: str, message: str) -> Tuple[str, Optional[List]]:
         """Main method to generate contextual response"""
-        # Update profile
-        profile = self.update_profile(session_id, message)
+        # Read intent and entities in one pass
+        analysis = intent_detector.analyze(message)
+        intent = analysis.intent
+        
+        # Load the session once; everything below works on this state
+        state = self.sessions.get(db, session_id)
         
-        # Detect intent
-        intent = self.detect_intent(message)
+        # Update profile
+        profile = self.update_profile(state, message, analysis)
         
         # Get current step
-        current_step = self.get_current_step(session_id)
+        current_step = self.get_current_step(state)
         
         # Handle based on intent
         if intent == Intent.GREETING:
-            response = self.handle_greeting(session_id)
+            response = self.handle_greeting(state)
             recommendations = None
         
         elif intent == Intent.BUDGET_QUERY:
@@ -538,11 +415,11 @@ Need help with a specific laptop purchase?"""
             recommendations = None
         
         elif intent == Intent.COMPARISON_REQUEST:
-            response = self.handle_comparison_request(session_id, message)
+            response = self.handle_comparison_request(session_id, analysis.brands)
             recommendations = None
         
         elif intent == Intent.SPECIFIC_LAPTOP:
-            response = self.handle_specific_laptop(session_id, message)
+            response = self.handle_specific_laptop(db, session_id, analysis.brands)
             recommendations = None
         
         elif intent == Intent.PURCHASE_HELP:
@@ -552,7 +429,7 @@ Need help with a specific laptop purchase?"""
         else:
             # Default flow based on current step
             if current_step == ConversationStep.GREETING:
-                response = self.handle_greeting(session_id)
+                response = self.handle_greeting(state)
                 recommendations = None
             
             elif current_step == ConversationStep.NEEDS_ANALYSIS:
@@ -566,17 +443,17 @@ Need help with a specific laptop purchase?"""
             elif current_step == ConversationStep.RECOMMENDATION:
                 # Generate recommendations
                 if profile.budget_max and profile.use_case:
-                    laptops = self.get_recommendations(profile)
+                    laptops = self.get_recommendations(db, profile)
                     response = self.format_recommendations(profile, laptops)
-                    recommendations = [self.laptop_to_dict(l) for l in laptops[:3]]
+                    # Impressions are queued, not written, on the request path
+                    recommendations = self.events.log_impressions(
+                        session_id,
+                        [self.laptop_to_dict(l) for l in laptops[:3]],
+                        query_cluster(profile.use_case, profile.budget_max)
+                    )
                     
                     # Mark recommendations shown
-                    session = self.db.query(UserSession).filter(
-                        UserSession.session_id == session_id
-                    ).first()
-                    if session:
-                        session.preferences["recommendations_shown"] = True
-                        self.db.commit()
+                    self.sessions.update_preferences(state, {"recommendations_shown": True})
                 else:
                     response = "I need a bit more information. What's your budget and what will you use the laptop for?"
                     recommendations = None
@@ -585,29 +462,15 @@ Need help with a specific laptop purchase?"""
                 response = "I'm here to help! Ask me about laptops, budgets, or where to buy in Pakistan."
                 recommendations = None
         
-        # Add message to conversation history
-        session = self.db.query(UserSession).filter(
-            UserSession.session_id == session_id
-        ).first()
-        if session:
-            session.conversation_history.append({
-                "role": "user",
-                "content": message,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            session.conversation_history.append({
-                "role": "assistant",
-                "content": response,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            self.db.commit()
+        # Add message to conversation history; written by the next flush
+        state.add_turn("user", message)
+        state.add_turn("assistant", response)
+        self.sessions.save(state)
         
         return response, recommendations
     
-    def get_recommendations(self, profile: UserProfile) -> List:
+    def get_recommendations(self, db: Session, profile: UserProfile) -> List:
         """Get laptop recommendations based on profile"""
-        from models.schemas import LaptopSearchParams
-        
         # Build search params
         params = LaptopSearchParams(
             min_price=profile.budget_min,
@@ -616,10 +479,8 @@ Need help with a specific laptop purchase?"""
             ideal_for=profile.use_case[0] if profile.use_case else None
         )
         
-        laptops = self.laptop_service.search_laptops(self.db, params)
-        
-        # Sort by relevance
-        return sorted(laptops, key=lambda x: x.price_pkr)[:5]
+        # Cheapest five matches, sorted and limited in SQL
+        return self.laptop_service.search_laptops(db, params, limit=5)
     
     def format_recommendations(self, profile: UserProfile, laptops: List) -> str:
         """Format laptop recommendations"""
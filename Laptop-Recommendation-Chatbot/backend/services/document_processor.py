@@ -4,7 +4,9 @@ Combines specs with expert advice for better RAG retrieval
 """
 from typing import List, Dict, Any
 from dataclasses import dataclass
+import hashlib
 import json
+from services.spec_normalizer import cpu_tier, gpu_tier
 
 @dataclass
 class LaptopDocument:
@@ -13,6 +15,32 @@ class LaptopDocument:
     content: str
     metadata: Dict[str, Any]
     
+    # Metadata keys holding the hashes below once stored in the vector index
+    HASH_FIELDS = ("content_hash", "metadata_hash")
+    
+    @property
+    def content_hash(self) -> str:
+        """Fingerprint of the embedded text; a change needs a new embedding"""
+        return hashlib.sha256(self.content.encode("utf-8")).hexdigest()[:32]
+    
+    @property
+    def metadata_hash(self) -> str:
+        """Fingerprint of the filterable metadata, excluding stored hashes"""
+        payload = json.dumps(
+            {k: v for k, v in self.metadata.items() if k not in self.HASH_FIELDS and v is not None},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+    
+    def stored_metadata(self) -> Dict[str, Any]:
+        """Metadata as written to the vector index, with both hashes"""
+        return {
+            **self.metadata,
+            "content_hash": self.content_hash,
+            "metadata_hash": self.metadata_hash
+        }
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             "laptop_id": self.laptop_id,
@@ -23,6 +51,21 @@ class LaptopDocument:
 class DocumentProcessor:
     """Process laptop data into searchable documents"""
     
+    CPU_TIER_DESCRIPTIONS = {
+        "entry": "Good for basic tasks and light multitasking",
+        "mainstream": "Excellent for programming, multitasking, and productivity",
+        "performance": "Powerful for demanding applications and heavy workloads",
+        "flagship": "Top-tier performance for professional work",
+        "standard": "Reliable performance"
+    }
+    
+    GPU_TIER_DESCRIPTIONS = {
+        "gaming": "Dedicated graphics for gaming and creative work",
+        "dedicated": "Dedicated graphics for gaming and creative work",
+        "dedicated_amd": "Dedicated AMD graphics",
+        "integrated": "Integrated graphics for everyday use"
+    }
+    
     # Expert advice templates for different use cases
     EXPERT_ADVICE = {
         "FSC Student": "Ideal for FSC students who need reliable performance for document work, online classes, and basic computing. Focus on battery life and portability.",
@@ -121,7 +164,9 @@ class DocumentProcessor:
             "price_pkr": price_pkr,
             "price_category": price_category,
             "ram_gb": ram_gb,
+            "storage_gb": storage_gb,
             "storage_type": storage_type,
+            "display_size": display_size,
             "ideal_for": ideal_for,
             "cpu_category": cpu_category,
             "gpu_category": gpu_category
@@ -148,16 +193,7 @@ class DocumentProcessor:
     @staticmethod
     def _categorize_cpu(cpu: str) -> str:
         """Categorize CPU performance"""
-        cpu_lower = cpu.lower()
-        if "i3" in cpu_lower or "ryzen 3" in cpu_lower:
-            return "Good for basic tasks and light multitasking"
-        elif "i5" in cpu_lower or "ryzen 5" in cpu_lower:
-            return "Excellent for programming, multitasking, and productivity"
-        elif "i7" in cpu_lower or "ryzen 7" in cpu_lower:
-            return "Powerful for demanding applications and heavy workloads"
-        elif "i9" in cpu_lower or "ryzen 9" in cpu_lower:
-            return "Top-tier performance for professional work"
-        return "Reliable performance"
+        return DocumentProcessor.CPU_TIER_DESCRIPTIONS[cpu_tier(cpu)]
     
     @staticmethod
     def _categorize_ram(ram_gb: int) -> str:
@@ -174,13 +210,7 @@ class DocumentProcessor:
     @staticmethod
     def _categorize_gpu(gpu: str) -> str:
         """Categorize GPU type"""
-        gpu_lower = gpu.lower()
-        if "nvidia" in gpu_lower or "geforce" in gpu_lower or "rtx" in gpu_lower or "gtx" in gpu_lower:
-            return "Dedicated graphics for gaming and creative work"
-        elif "amd radeon" in gpu_lower and "graphics" not in gpu_lower:
-            return "Dedicated AMD graphics"
-        else:
-            return "Integrated graphics for everyday use"
+        return DocumentProcessor.GPU_TIER_DESCRIPTIONS[gpu_tier(gpu)]
     
     @staticmethod
     def _categorize_battery(hours: float) -> str:
@@ -222,7 +252,7 @@ class DocumentProcessor:
         if storage_type == "SSD":
             props.append("Fast SSD storage for quick boot and app loading")
         
-        if "i7" in cpu or "Ryzen 7" in cpu:
+        if cpu_tier(cpu) == "performance":
             props.append("Powerful processor for demanding tasks")
         
         if "Programming" in ideal_for or "CS Student" in ideal_for:
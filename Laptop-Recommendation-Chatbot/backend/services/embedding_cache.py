@@ -0,0 +1,213 @@
+"""
+Single-file embedding cache backed by a memory-mapped float32 matrix
+All vectors live in one append-only file, keyed by a compact hash index
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+from pathlib import Path
+import hashlib
+import json
+import threading
+import numpy as np
+
+class MmapEmbeddingCache:
+    """
+    Append-only float32 embedding store with bulk lookup
+    
+    Safe to share between threads: appends, clears and row lookups hold
+    one lock, so concurrent stores never hand out the same row number.
+    """
+    
+    VECTORS_FILE = "vectors.f32"
+    KEYS_FILE = "keys.bin"
+    META_FILE = "meta.json"
+    KEY_BYTES = 16  # md5 digest
+    
+    def __init__(self, cache_dir: str = "./embeddings_cache"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.cache_dir / self.VECTORS_FILE
+        self.keys_path = self.cache_dir / self.KEYS_FILE
+        self.meta_path = self.cache_dir / self.META_FILE
+        
+        self.dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._rows = 0
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load()
+    
+    @staticmethod
+    def key_for(text: str) -> bytes:
+        """Hash text into a fixed-size cache key"""
+        return hashlib.md5(text.encode()).digest()
+    
+    def __len__(self) -> int:
+        return self._rows
+    
+    def __contains__(self, text: str) -> bool:
+        return self.key_for(text) in self._index
+    
+    def _load(self):
+        """Rebuild the hash->row index from disk"""
+        if not self.meta_path.exists():
+            return
+        
+        try:
+            with open(self.meta_path, 'r') as f:
+                self.dim = int(json.load(f)["dim"])
+        except Exception as e:
+            print(f"Could not read embedding cache metadata: {e}")
+            return
+        
+        raw_keys = self.keys_path.read_bytes() if self.keys_path.exists() else b""
+        key_rows = len(raw_keys) // self.KEY_BYTES
+        row_bytes = self.dim * 4
+        vector_rows = (
+            self.vectors_path.stat().st_size // row_bytes
+            if self.vectors_path.exists() else 0
+        )
+        
+        # A crash between the two appends can leave one file longer than
+        # the other; only rows present in both are valid.
+        rows = min(key_rows, vector_rows)
+        if key_rows != rows:
+            self._truncate(self.keys_path, rows * self.KEY_BYTES)
+        if self.vectors_path.exists() and self.vectors_path.stat().st_size != rows * row_bytes:
+            self._truncate(self.vectors_path, rows * row_bytes)
+        
+        kb = self.KEY_BYTES
+        self._index = {raw_keys[i * kb:(i + 1) * kb]: i for i in range(rows)}
+        self._rows = rows
+    
+    @staticmethod
+    def _truncate(path: Path, size: int):
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+    
+    def _get_matrix(self) -> np.ndarray:
+        """Memory-map the vector file, remapping after appends"""
+        if self._matrix is None or self._matrix.shape[0] != self._rows:
+            self._matrix = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode='r',
+                shape=(self._rows, self.dim)
+            )
+        return self._matrix
+    
+    def lookup(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Look up a whole batch of texts in one read
+        
+        Args:
+            texts: Texts to look up
+        
+        Returns:
+            Tuple of (matrix of shape (len(texts), dim), boolean hit mask).
+            Rows for misses are zero.
+        """
+        keys = [self.key_for(t) for t in texts]
+        with self._lock:
+            rows = np.fromiter(
+                (self._index.get(key, -1) for key in keys),
+                dtype=np.int64,
+                count=len(texts)
+            )
+            hits = rows >= 0
+            out = np.zeros((len(texts), self.dim or 0), dtype=np.float32)
+            
+            if hits.any():
+                out[hits] = self._get_matrix()[rows[hits]]
+        
+        return out, hits
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached vector for a single text"""
+        key = self.key_for(text)
+        with self._lock:
+            row = self._index.get(key)
+            if row is None:
+                return None
+            return np.array(self._get_matrix()[row])
+    
+    def store(self, texts: Sequence[str], vectors) -> int:
+        """
+        Append vectors for texts not already cached
+        
+        Args:
+            texts: Texts the vectors were generated from
+            vectors: Matching embeddings, shape (len(texts), dim)
+        
+        Returns:
+            Number of rows appended
+        """
+        return self.store_keys([self.key_for(t) for t in texts], vectors)
+    
+    def store_keys(self, keys: Sequence[bytes], vectors) -> int:
+        """Append vectors under precomputed cache keys"""
+        if len(keys) == 0:
+            return 0
+        
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(keys):
+            raise ValueError("vectors must have one row per key")
+        
+        with self._lock:
+            return self._append(keys, matrix)
+    
+    def _append(self, keys: Sequence[bytes], matrix: np.ndarray) -> int:
+        """Write new rows to disk and index them; the caller holds the lock"""
+        if self.dim is None:
+            self.dim = int(matrix.shape[1])
+            with open(self.meta_path, 'w') as f:
+                json.dump({"dim": self.dim, "dtype": "float32"}, f)
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding dimension {matrix.shape[1]} does not match cache dimension {self.dim}"
+            )
+        
+        # Skip keys already on disk and duplicates within the batch
+        new_keys: List[bytes] = []
+        new_rows: List[int] = []
+        seen = set()
+        for i, key in enumerate(keys):
+            if key in self._index or key in seen:
+                continue
+            seen.add(key)
+            new_keys.append(key)
+            new_rows.append(i)
+        
+        if not new_keys:
+            return 0
+        
+        # Vectors first, keys second: a key on disk always has its vector
+        with open(self.vectors_path, 'ab') as f:
+            f.write(np.ascontiguousarray(matrix[new_rows]).tobytes())
+        with open(self.keys_path, 'ab') as f:
+            f.write(b"".join(new_keys))
+        
+        for offset, key in enumerate(new_keys):
+            self._index[key] = self._rows + offset
+        self._rows += len(new_keys)
+        self._matrix = None
+        
+        return len(new_keys)
+    
+    def clear(self):
+        """Remove all cached vectors"""
+        with self._lock:
+            self._matrix = None
+            for path in (self.vectors_path, self.keys_path, self.meta_path):
+                if path.exists():
+                    path.unlink()
+            self.dim = None
+            self._index = {}
+            self._rows = 0
+    
+    def size_bytes(self) -> int:
+        """Total on-disk size of the cache"""
+        return sum(
+            path.stat().st_size
+            for path in (self.vectors_path, self.keys_path, self.meta_path)
+            if path.exists()
+        )
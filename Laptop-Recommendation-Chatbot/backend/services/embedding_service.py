@@ -3,11 +3,14 @@ Embedding service using OpenAI text-embedding-3-small
 Includes caching for performance optimization
 """
 from typing import List, Dict, Optional
-import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import json
-import os
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from core.config import settings
+from core.concurrency import run_blocking
+from services.embedding_cache import MmapEmbeddingCache
+from services.async_embedder import AsyncBatchEmbedder
 import pickle
 from pathlib import Path
 
@@ -15,64 +18,51 @@ class EmbeddingService:
     """Generate and cache embeddings using OpenAI"""
     
     def __init__(self, cache_dir: str = "./embeddings_cache"):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None
+        )
         self.model = "text-embedding-3-small"
+        self.batch_embedder = AsyncBatchEmbedder(model=self.model)
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
-        self._cache = {}
-        self._load_cache()
+        self.cache = MmapEmbeddingCache(cache_dir)
+        self._migrate_legacy_cache()
+        if len(self.cache):
+            print(f"Loaded {len(self.cache)} cached embeddings")
     
-    def _get_cache_key(self, text: str) -> str:
-        """Generate cache key from text"""
-        return hashlib.md5(text.encode()).hexdigest()
-    
-    def _get_cache_path(self, cache_key: str) -> Path:
-        """Get file path for cached embedding"""
-        return self.cache_dir / f"{cache_key}.pkl"
-    
-    def _load_cache(self):
-        """Load existing cache from disk"""
-        try:
-            cache_index = self.cache_dir / "cache_index.json"
-            if cache_index.exists():
-                with open(cache_index, 'r') as f:
-                    self._cache = json.load(f)
-                print(f"Loaded {len(self._cache)} cached embeddings")
-        except Exception as e:
-            print(f"Could not load cache: {e}")
-            self._cache = {}
-    
-    def _save_cache_index(self):
-        """Save cache index to disk"""
+    def _migrate_legacy_cache(self):
+        """Move per-text pickles from the old cache layout into the matrix file"""
+        cache_index = self.cache_dir / "cache_index.json"
+        if not cache_index.exists():
+            return
+        
         try:
-            cache_index = self.cache_dir / "cache_index.json"
-            with open(cache_index, 'w') as f:
-                json.dump(self._cache, f)
-        except Exception as e:
-            print(f"Could not save cache index: {e}")
-    
-    def _get_from_cache(self, cache_key: str) -> Optional[List[float]]:
-        """Retrieve embedding from cache"""
-        if cache_key in self._cache:
-            cache_path = self._get_cache_path(cache_key)
-            if cache_path.exists():
-                try:
+            with open(cache_index, 'r') as f:
+                legacy_keys = list(json.load(f).keys())
+            
+            keys = []
+            vectors = []
+            for cache_key in legacy_keys:
+                cache_path = self.cache_dir / f"{cache_key}.pkl"
+                if cache_path.exists():
                     with open(cache_path, 'rb') as f:
-                        return pickle.load(f)
-                except Exception as e:
-                    print(f"Error loading cached embedding: {e}")
-        return None
-    
-    def _save_to_cache(self, cache_key: str, embedding: List[float]):
-        """Save embedding to cache"""
-        try:
-            cache_path = self._get_cache_path(cache_key)
-            with open(cache_path, 'wb') as f:
-                pickle.dump(embedding, f)
-            self._cache[cache_key] = True
-            self._save_cache_index()
+                        vectors.append(pickle.load(f))
+                    keys.append(bytes.fromhex(cache_key))
+            
+            if keys:
+                self.cache.store_keys(keys, vectors)
+            
+            for file in self.cache_dir.glob("*.pkl"):
+                file.unlink()
+            cache_index.unlink()
+            print(f"Migrated {len(keys)} legacy cached embeddings")
         except Exception as e:
-            print(f"Error saving to cache: {e}")
+            print(f"Could not migrate legacy cache: {e}")
     
     def generate_embedding(self, text: str) -> List[float]:
         """
@@ -85,11 +75,10 @@ class EmbeddingService:
             List of floats representing the embedding vector
         """
         # Check cache first
-        cache_key = self._get_cache_key(text)
-        cached_embedding = self._get_from_cache(cache_key)
+        cached_embedding = self.cache.get(text)
         
         if cached_embedding is not None:
-            return cached_embedding
+            return cached_embedding.tolist()
         
         # Generate new embedding
         try:
@@ -101,7 +90,30 @@ class EmbeddingService:
             embedding = response.data[0].embedding
             
             # Cache the result
-            self._save_to_cache(cache_key, embedding)
+            self.cache.store([text], [embedding])
+            
+            return embedding
+            
+        except Exception as e:
+            print(f"Error generating embedding: {e}")
+            raise
+    
+    async def agenerate_embedding(self, text: str) -> List[float]:
+        """Async version of generate_embedding; cache file I/O runs on the blocking pool"""
+        cached_embedding = await run_blocking(self.cache.get, text)
+        
+        if cached_embedding is not None:
+            return cached_embedding.tolist()
+        
+        try:
+            response = await self.async_client.embeddings.create(
+                model=self.model,
+                input=text,
+                encoding_format="float"
+            )
+            embedding = response.data[0].embedding
+            
+            await run_blocking(self.cache.store, [text], [embedding])
             
             return embedding
             
@@ -112,80 +124,69 @@ class EmbeddingService:
     def generate_embeddings_batch(
         self,
         texts: List[str],
-        batch_size: int = 100
+        batch_size: Optional[int] = None
     ) -> List[List[float]]:
         """
-        Generate embeddings for multiple texts with batching
+        Generate embeddings for multiple texts with concurrent batching
         
         Args:
             texts: List of texts to embed
-            batch_size: Number of texts to process at once
+            batch_size: Optional cap on texts per request; batches are
+                otherwise sized by token count
             
         Returns:
             List of embedding vectors
         """
-        embeddings = []
+        coro = self.agenerate_embeddings_batch(texts, batch_size)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            
-            # Check cache for each text
-            batch_embeddings = []
-            texts_to_generate = []
-            indices_to_generate = []
-            
-            for idx, text in enumerate(batch):
-                cache_key = self._get_cache_key(text)
-                cached = self._get_from_cache(cache_key)
-                
-                if cached is not None:
-                    batch_embeddings.append((idx, cached))
-                else:
-                    texts_to_generate.append(text)
-                    indices_to_generate.append(idx)
-            
-            # Generate embeddings for uncached texts
-            if texts_to_generate:
-                try:
-                    response = self.client.embeddings.create(
-                        model=self.model,
-                        input=texts_to_generate,
-                        encoding_format="float"
-                    )
-                    
-                    for idx, text, data in zip(
-                        indices_to_generate,
-                        texts_to_generate,
-                        response.data
-                    ):
-                        embedding = data.embedding
-                        batch_embeddings.append((idx, embedding))
-                        
-                        # Cache the result
-                        cache_key = self._get_cache_key(text)
-                        self._save_to_cache(cache_key, embedding)
-                        
-                except Exception as e:
-                    print(f"Error generating batch embeddings: {e}")
-                    raise
+        # Called from inside an event loop: run on a separate one
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, coro).result()
+    
+    async def agenerate_embeddings_batch(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None
+    ) -> List[List[float]]:
+        """Async version of generate_embeddings_batch"""
+        if not texts:
+            return []
+        
+        # One bulk lookup for the whole input
+        cached, hits = await run_blocking(self.cache.lookup, texts)
+        embeddings: List[Optional[List[float]]] = [
+            cached[i].tolist() if hit else None
+            for i, hit in enumerate(hits)
+        ]
+        
+        # Group uncached positions by text so repeats are embedded once
+        missing: Dict[str, List[int]] = {}
+        for i, hit in enumerate(hits):
+            if not hit:
+                missing.setdefault(texts[i], []).append(i)
+        missing_texts = list(missing)
+        
+        if missing_texts:
+            # Cache each batch as it lands, so a later failure keeps the paid-for
+            # ones; the embedder calls this on the blocking pool
+            def store_batch(positions: List[int], vectors: List[List[float]]):
+                self.cache.store([missing_texts[i] for i in positions], vectors)
             
-            # Sort by original index and extract embeddings
-            batch_embeddings.sort(key=lambda x: x[0])
-            embeddings.extend([emb for _, emb in batch_embeddings])
+            generated = await self.batch_embedder.embed(missing_texts, max_items=batch_size, on_batch=store_batch)
+            for text, embedding in zip(missing_texts, generated):
+                for idx in missing[text]:
+                    embeddings[idx] = embedding
         
         return embeddings
     
     def clear_cache(self):
         """Clear all cached embeddings"""
         try:
-            for file in self.cache_dir.glob("*.pkl"):
-                file.unlink()
-            
-            cache_index = self.cache_dir / "cache_index.json"
-            if cache_index.exists():
-                cache_index.unlink()
-            
-            self._cache = {}
+            self.cache.clear()
             print("Cache cleared successfully")
         except Exception as e:
             print(f"Error clearing cache: {e}")
@@ -193,8 +194,6 @@ class EmbeddingService:
     def get_cache_stats(self) -> Dict[str, int]:
         """Get cache statistics"""
         return {
-            "cached_embeddings": len(self._cache),
-            "cache_size_mb": sum(
-                f.stat().st_size for f in self.cache_dir.glob("*.pkl")
-            ) / (1024 * 1024)
+            "cached_embeddings": len(self.cache),
+            "cache_size_mb": self.cache.size_bytes() / (1024 * 1024)
         }
@@ -0,0 +1,380 @@
+"""
+Write-behind logging of recommendation impressions and clicks
+Events are queued in memory and written in batches by a background thread: recommendations rows, popularity counters and a JSON Lines event stream
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from collections import Counter
+from datetime import datetime
+import threading
+import uuid
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from core.config import settings
+from core.jsonl import JsonLinesWriter
+from models.database import SessionLocal, Recommendation
+from services.popularity import record_events
+from services.session_store import session_store
+
+def query_cluster(use_cases: Union[str, Iterable[str], None], budget_max: Optional[int] = None) -> str:
+    """
+    Coarse bucket for a recommendation request, used to group CTR
+    
+    The primary use case plus a 50k PKR budget band, e.g.
+    "programming:100k-150k" or "general:any".
+    """
+    if isinstance(use_cases, str):
+        use_cases = [use_cases]
+    use_case = next(iter(use_cases or []), None) or "general"
+    use_case = use_case.strip().lower().replace(" ", "_")
+    if not budget_max:
+        return f"{use_case}:any"
+    band = int(budget_max) // 50000 * 50
+    return f"{use_case}:{band}k-{band + 50}k"
+
+class RecommendationEventLogger:
+    """
+    Queue of impression and click events with batched persistence
+    
+    log_impressions() and log_click() only append to a list, so logging
+    adds no database work to a request. A background thread flushes the
+    queue every flush_interval seconds (sooner once flush_batch events are
+    waiting) in one transaction: recommendations rows for impressions,
+    clicked flags for clicks, and laptop_popularity increments. The same
+    events are then appended to a JSON Lines log for offline CTR analysis
+    (scripts/ctr_report.py).
+    
+    If the batch transaction fails, each session's events are retried in a
+    transaction of their own, so one bad event cannot hold back the rest.
+    Sessions that still fail are queued for the next flush; after
+    max_attempts failed flushes their events go to the dead-letter log.
+    Past max_queue events the oldest are dropped. Log parts rotate every
+    max_log_bytes and are created exclusively, so workers sharing a log
+    path each write parts of their own.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        log_path: Optional[str] = None,
+        max_log_bytes: int = 0,
+        flush_interval: float = 5.0,
+        flush_batch: int = 256,
+        max_queue: int = 100000,
+        max_attempts: int = 3,
+        dead_letter_path: Optional[str] = None,
+        before_flush: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Args:
+            session_factory: Creates database sessions for flushing
+            log_path: Base path of the JSON Lines event log (None = database only)
+            max_log_bytes: Bytes per event log part before rotating (0 = never)
+            flush_interval: Seconds between background flushes
+            flush_batch: Queued events that trigger an early flush
+            max_queue: Events kept while the database is unavailable
+            max_attempts: Failed flushes before a session's events are dead-lettered
+            dead_letter_path: Base path of the JSON Lines log for events that
+                could not be written (None = drop them)
+            before_flush: Called before each flush, e.g. to write the session
+                rows that recommendations reference
+        """
+        self.session_factory = session_factory
+        self.log_path = log_path
+        self.max_log_bytes = max_log_bytes
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self.before_flush = before_flush
+        
+        self._queue: List[Dict[str, Any]] = []
+        self._attempts: Dict[str, int] = {}
+        self._writer: Optional[JsonLinesWriter] = None
+        self._dead_letter_writer: Optional[JsonLinesWriter] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self.flushes = 0
+    
+    def log_impressions(
+        self,
+        session_id: str,
+        cards: List[Dict[str, Any]],
+        cluster: str = "general:any"
+    ) -> List[Dict[str, Any]]:
+        """
+        Queue one impression per recommended laptop, ranked in list order
+        
+        Args:
+            session_id: Session the cards were shown in
+            cards: Laptop dicts with an "id" key
+            cluster: query_cluster() of the request
+        
+        Returns:
+            Copies of the cards with an "impression_id" for click reporting
+        """
+        timestamp = datetime.utcnow().isoformat()
+        tagged = []
+        events = []
+        for rank, card in enumerate(cards, 1):
+            impression_id = uuid.uuid4().hex
+            tagged.append({**card, "impression_id": impression_id})
+            events.append({
+                "type": "impression",
+                "impression_id": impression_id,
+                "session_id": session_id,
+                "laptop_id": card["id"],
+                "rank": rank,
+                "cluster": cluster,
+                "timestamp": timestamp
+            })
+        self._enqueue(events)
+        return tagged
+    
+    def log_click(self, session_id: str, laptop_id: int, impression_id: Optional[str] = None):
+        """Queue a click on a recommended laptop"""
+        self._enqueue([{
+            "type": "click",
+            "impression_id": impression_id,
+            "session_id": session_id,
+            "laptop_id": laptop_id,
+            "timestamp": datetime.utcnow().isoformat()
+        }])
+    
+    def _enqueue(self, events: List[Dict[str, Any]]):
+        if not events:
+            return
+        with self._lock:
+            self._queue.extend(events)
+            self.logged += len(events)
+            overflow = len(self._queue) - self.max_queue
+            if overflow > 0:
+                del self._queue[:overflow]
+                self.dropped += overflow
+            if len(self._queue) >= self.flush_batch:
+                self._wake.set()
+        self._ensure_flusher()
+    
+    def flush(self) -> int:
+        """
+        Write queued events in one transaction, falling back to one per session
+        
+        Returns:
+            Number of events written
+        """
+        with self._flush_lock:
+            if self.before_flush is not None:
+                try:
+                    self.before_flush()
+                except Exception as e:
+                    print(f"Error in recommendation event pre-flush: {e}")
+            
+            with self._lock:
+                batch, self._queue = self._queue, []
+            
+            if not batch:
+                return 0
+            
+            error = self._commit(batch)
+            if error is None:
+                written = batch
+            else:
+                print(f"Error flushing recommendation events: {error}")
+                written = self._flush_by_session(batch)
+            
+            if not written:
+                return 0
+            self._append_log(written)
+            self.written += len(written)
+            self.flushes += 1
+            return len(written)
+    
+    def _commit(self, events: List[Dict[str, Any]]) -> Optional[Exception]:
+        """Write events in one transaction; the error if it was rolled back"""
+        db = self.session_factory()
+        try:
+            self._write(db, events)
+            db.commit()
+            return None
+        except Exception as e:
+            db.rollback()
+            return e
+        finally:
+            db.close()
+    
+    def _flush_by_session(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Retry a failed batch one session at a time
+        
+        Returns:
+            Events that were written, in queue order
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for event in batch:
+            groups.setdefault(event["session_id"], []).append(event)
+        
+        written = set()
+        failed: List[Tuple[str, List[Dict[str, Any]], Exception]] = []
+        for session_id, events in groups.items():
+            error = self._commit(events)
+            if error is None:
+                written.update(id(event) for event in events)
+                self._attempts.pop(session_id, None)
+            else:
+                failed.append((session_id, events, error))
+        
+        retry = set()
+        for session_id, events, error in failed:
+            attempts = self._attempts.get(session_id, 0) + 1
+            if attempts < self.max_attempts:
+                self._attempts[session_id] = attempts
+                retry.update(id(event) for event in events)
+            else:
+                self._attempts.pop(session_id, None)
+                print(f"Dead-lettering {len(events)} recommendation events for session {session_id}: {error}")
+                self._dead_letter(events, error)
+        
+        if retry:
+            self._requeue([event for event in batch if id(event) in retry])
+        return [event for event in batch if id(event) in written]
+    
+    def _write(self, db: Session, batch: List[Dict[str, Any]]):
+        impressions = [event for event in batch if event["type"] == "impression"]
+        if impressions:
+            db.execute(insert(Recommendation), [
+                {
+                    "session_id": event["session_id"],
+                    "laptop_id": event["laptop_id"],
+                    "rank": event["rank"],
+                    "impression_id": event["impression_id"],
+                    "clicked": False,
+                    "created_at": datetime.fromisoformat(event["timestamp"])
+                }
+                for event in impressions
+            ])
+        
+        clicks: Counter = Counter()
+        table = Recommendation.__table__
+        for event in batch:
+            if event["type"] != "click":
+                continue
+            if event["impression_id"]:
+                target = table.c.impression_id == event["impression_id"]
+            else:
+                # Clients that do not send impression_id: the latest unclicked
+                # recommendation of this laptop in the session
+                target = table.c.id == select(table.c.id).where(
+                    table.c.session_id == event["session_id"],
+                    table.c.laptop_id == event["laptop_id"],
+                    table.c.clicked.is_(False)
+                ).order_by(table.c.id.desc()).limit(1).scalar_subquery()
+            result = db.execute(
+                update(table).where(
+                    target,
+                    table.c.laptop_id == event["laptop_id"],
+                    table.c.clicked.is_(False)
+                ).values(clicked=True)
+            )
+            if result.rowcount:
+                clicks[event["laptop_id"]] += 1
+        
+        shown = Counter(event["laptop_id"] for event in impressions)
+        now = datetime.utcnow()
+        for laptop_id in sorted(set(shown) | set(clicks)):
+            record_events(db, laptop_id, recommendations=shown[laptop_id], clicks=clicks[laptop_id], at=now)
+    
+    def _append_log(self, batch: List[Dict[str, Any]]):
+        if not self.log_path:
+            return
+        try:
+            if self._writer is None:
+                self._writer = JsonLinesWriter(
+                    self.log_path, max_bytes=self.max_log_bytes, flush_every=self.flush_batch
+                )
+            for event in batch:
+                self._writer.write(event)
+            self._writer.flush()
+        except Exception as e:
+            print(f"Error writing recommendation event log: {e}")
+    
+    def _dead_letter(self, events: List[Dict[str, Any]], error: Exception):
+        self.dead_lettered += len(events)
+        if not self.dead_letter_path:
+            return
+        try:
+            if self._dead_letter_writer is None:
+                self._dead_letter_writer = JsonLinesWriter(self.dead_letter_path, max_bytes=self.max_log_bytes)
+            for event in events:
+                self._dead_letter_writer.write({**event, "error": str(error)})
+            self._dead_letter_writer.flush()
+        except Exception as e:
+            print(f"Error writing recommendation dead-letter log: {e}")
+    
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Put a failed flush's events back in front of anything newer"""
+        with self._lock:
+            self._queue = batch + self._queue
+            overflow = len(self._queue) - self.max_queue
+            if overflow > 0:
+                del self._queue[:overflow]
+                self.dropped += overflow
+    
+    def _ensure_flusher(self):
+        if self._thread is not None or self._stop.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="event-flush", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+    
+    def close(self):
+        """Stop the background flusher, write everything still queued and close the log"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        for writer in (self._writer, self._dead_letter_writer):
+            if writer is not None:
+                writer.close()
+        self._writer = None
+        self._dead_letter_writer = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get logger statistics"""
+        return {
+            "queued": len(self._queue),
+            "logged": self.logged,
+            "written": self.written,
+            "dropped": self.dropped,
+            "dead_lettered": self.dead_lettered,
+            "flushes": self.flushes
+        }
+
+# Shared by the chat flows and the click route
+event_logger = RecommendationEventLogger(
+    log_path=settings.EVENT_LOG_PATH or None,
+    max_log_bytes=settings.EVENT_LOG_MAX_BYTES,
+    flush_interval=settings.EVENT_FLUSH_INTERVAL,
+    flush_batch=settings.EVENT_FLUSH_BATCH,
+    max_queue=settings.EVENT_QUEUE_MAX,
+    max_attempts=settings.EVENT_MAX_ATTEMPTS,
+    dead_letter_path=settings.EVENT_DEAD_LETTER_PATH or None,
+    # Recommendations reference user_sessions; write queued sessions first
+    before_flush=session_store.flush
+)
@@ -0,0 +1,195 @@
+"""
+Compiled intent and entity detection for chat messages
+Patterns are built once at import; analyze() reads a message in a single call
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+from enum import Enum
+import re
+
+class Intent(Enum):
+    GREETING = "greeting"
+    BUDGET_QUERY = "budget_query"
+    USE_CASE_QUERY = "use_case_query"
+    COMPARISON_REQUEST = "comparison_request"
+    SPECIFIC_LAPTOP = "specific_laptop_question"
+    PURCHASE_HELP = "purchase_help"
+    UNKNOWN = "unknown"
+
+# Checked in this order; the first family with any match wins
+INTENT_PATTERNS = {
+    Intent.GREETING: [
+        r'\b(hi|hello|hey|salam|assalam|greetings)\b',
+        r'\b(good morning|good evening)\b'
+    ],
+    Intent.BUDGET_QUERY: [
+        r'\b(\d+k?)\s*(to|se|tak)\s*(\d+k?)\b',
+        r'\bbudget\b.*\b(\d+)\b',
+        r'\b(\d{5,6})\s*(rupees|pkr|rs)\b',
+        r'\b(cheap|affordable|budget|economical)\b'
+    ],
+    Intent.USE_CASE_QUERY: [
+        r'\b(programming|coding|development|software)\b',
+        r'\b(fsc|pre-engineering|pre-medical|ics)\b',
+        r'\b(gaming|games|pubg|gta)\b',
+        r'\b(video editing|editing|premiere|photoshop)\b',
+        r'\b(office work|ms office|excel|word)\b',
+        r'\b(student|study|university|college)\b'
+    ],
+    Intent.COMPARISON_REQUEST: [
+        r'\b(compare|comparison|vs|versus|difference)\b',
+        r'\b(which is better|better than)\b',
+        r'\b(hp vs dell|lenovo vs asus)\b'
+    ],
+    Intent.SPECIFIC_LAPTOP: [
+        r'\b(hp|dell|lenovo|asus|acer|msi)\s+\w+',
+        r'\b(i3|i5|i7|ryzen)\b',
+        r'\b(inspiron|pavilion|ideapad|vivobook)\b'
+    ],
+    Intent.PURCHASE_HELP: [
+        r'\b(where to buy|kahan se|purchase|order)\b',
+        r'\b(czone|paklap|daraz|telemart)\b',
+        r'\b(reliable|trusted|authentic)\b',
+        r'\b(warranty|guarantee)\b'
+    ]
+}
+
+USE_CASE_KEYWORDS = {
+    "Programming": ["programming", "coding", "development", "software", "cs", "computer science"],
+    "FSC Student": ["fsc", "pre-engineering", "pre-medical", "intermediate"],
+    "Gaming": ["gaming", "games", "pubg", "gta", "valorant"],
+    "Video Editing": ["video editing", "editing", "premiere", "photoshop", "content creation"],
+    "Office Work": ["office", "ms office", "excel", "word", "business"],
+    "Engineering": ["engineering", "autocad", "solidworks", "matlab"],
+    "Graphic Design": ["graphic design", "design", "illustrator", "photoshop"]
+}
+
+BRANDS = ["HP", "Dell", "Lenovo", "ASUS", "Acer", "MSI", "Apple"]
+
+# Earlier entries take precedence
+STUDENT_TYPE_KEYWORDS = {
+    "FSC": ["fsc", "intermediate"],
+    "Uni": ["university", "uni"]
+}
+
+MAJOR_KEYWORDS = {
+    "CS": ["cs", "computer science", "software"],
+    "Engineering": ["engineering"],
+    "Medical": ["medical", "mbbs"]
+}
+
+BUDGET_RANGE_PATTERN = re.compile(r'(\d+)k?\s*(to|se|tak|-)\s*(\d+)k?')
+BUDGET_SINGLE_PATTERN = re.compile(r'(\d+)k?\s*(rupees|pkr|rs)?')
+
+class KeywordMatcher:
+    """
+    Substring search for many keywords in one regex pass
+    
+    A zero-width lookahead tries the keywords longest first at every
+    position, so each position reports its longest keyword. Labels of
+    keywords that are prefixes of it are folded in, which makes the result
+    the same as testing every keyword with `in`.
+    """
+    
+    def __init__(self, keywords: Dict[str, Sequence[str]]):
+        """
+        Args:
+            keywords: Label -> keywords (lowercase); labels are returned in this order
+        """
+        self.labels = list(keywords)
+        
+        labels_of: Dict[str, set] = {}
+        for label, words in keywords.items():
+            for word in words:
+                labels_of.setdefault(word, set()).add(label)
+        
+        self._labels_of = {
+            word: set().union(*(labels_of[prefix] for prefix in labels_of if word.startswith(prefix)))
+            for word in labels_of
+        }
+        
+        alternation = "|".join(re.escape(word) for word in sorted(labels_of, key=len, reverse=True))
+        self._pattern = re.compile(f"(?=({alternation}))")
+    
+    def find(self, text: str) -> List[str]:
+        """Labels with at least one keyword in text"""
+        found = set()
+        for match in self._pattern.finditer(text):
+            found |= self._labels_of[match.group(1)]
+        return [label for label in self.labels if label in found]
+
+INTENT_REGEXES: List[Tuple[Intent, "re.Pattern"]] = [
+    (intent, re.compile("|".join(f"(?:{pattern})" for pattern in patterns)))
+    for intent, patterns in INTENT_PATTERNS.items()
+]
+
+# Every keyword family in one matcher, labelled (family, label)
+ENTITY_MATCHER = KeywordMatcher({
+    **{("use_case", label): words for label, words in USE_CASE_KEYWORDS.items()},
+    **{("brand", brand): [brand.lower()] for brand in BRANDS},
+    **{("student_type", label): words for label, words in STUDENT_TYPE_KEYWORDS.items()},
+    **{("major", label): words for label, words in MAJOR_KEYWORDS.items()}
+})
+
+@dataclass
+class MessageAnalysis:
+    """Everything the conversation flow reads from one user message"""
+    intent: Intent
+    budget_min: Optional[int] = None
+    budget_max: Optional[int] = None
+    use_cases: List[str] = field(default_factory=list)
+    brands: List[str] = field(default_factory=list)
+    student_type: Optional[str] = None
+    major: Optional[str] = None
+
+def detect_intent(message_lower: str) -> Intent:
+    """First intent family with a matching pattern"""
+    for intent, regex in INTENT_REGEXES:
+        if regex.search(message_lower):
+            return intent
+    return Intent.UNKNOWN
+
+def extract_budget(message_lower: str) -> Tuple[Optional[int], Optional[int]]:
+    """Budget range from "80k to 120k", or ±20% around a single amount"""
+    range_match = BUDGET_RANGE_PATTERN.search(message_lower)
+    if range_match:
+        min_val = int(range_match.group(1))
+        max_val = int(range_match.group(3))
+        # Convert k to thousands
+        if min_val < 1000:
+            min_val *= 1000
+        if max_val < 1000:
+            max_val *= 1000
+        return min_val, max_val
+    
+    single_match = BUDGET_SINGLE_PATTERN.search(message_lower)
+    if single_match:
+        budget = int(single_match.group(1))
+        if budget < 1000:
+            budget *= 1000
+        return int(budget * 0.8), int(budget * 1.2)
+    
+    return None, None
+
+def extract_entities(message_lower: str) -> Dict[str, List[str]]:
+    """Keyword labels found in the message, by family, in declaration order"""
+    entities: Dict[str, List[str]] = {"use_case": [], "brand": [], "student_type": [], "major": []}
+    for family, label in ENTITY_MATCHER.find(message_lower):
+        entities[family].append(label)
+    return entities
+
+def analyze(message: str) -> MessageAnalysis:
+    """Detect intent and extract budget, use cases, brands, student type and major"""
+    message_lower = message.lower()
+    budget_min, budget_max = extract_budget(message_lower)
+    entities = extract_entities(message_lower)
+    
+    return MessageAnalysis(
+        intent=detect_intent(message_lower),
+        budget_min=budget_min,
+        budget_max=budget_max,
+        use_cases=entities["use_case"],
+        brands=entities["brand"],
+        student_type=entities["student_type"][0] if entities["student_type"] else None,
+        major=entities["major"][0] if entities["major"] else None
+    )
@@ -1,8 +1,15 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from models.database import Laptop, UserSession, Recommendation
-from models.schemas import LaptopCreate, LaptopUpdate, LaptopSearchParams
-from typing import List, Optional
+from sqlalchemy import and_, or_, select
+from models.database import (
+    Laptop, LaptopCategory, LaptopPopularity, UserSession, ConversationTurn, Recommendation,
+    bump_catalogue_version
+)
+from models.schemas import LaptopCreate, LaptopUpdate, LaptopSearchParams, LaptopResponse
+from services.popularity import record_events, top_laptops
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Columns a catalogue client may select with ?fields=
+CATALOGUE_FIELDS = tuple(LaptopResponse.model_fields)
 
 class LaptopService:
     """Service layer for laptop operations"""
@@ -12,6 +19,7 @@ class LaptopService:
         """Create a new laptop entry"""
         db_laptop = Laptop(**laptop.dict())
         db.add(db_laptop)
+        bump_catalogue_version(db)
         db.commit()
         db.refresh(db_laptop)
         return db_laptop
@@ -27,29 +35,91 @@ class LaptopService:
         return db.query(Laptop).offset(skip).limit(limit).all()
     
     @staticmethod
-    def search_laptops(db: Session, params: LaptopSearchParams) -> List[Laptop]:
-        """Search laptops with filters"""
-        query = db.query(Laptop)
+    def page_laptops(
+        db: Session,
+        filters: Sequence[Any] = (),
+        limit: int = 100,
+        cursor: Optional[Tuple[int, int]] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """
+        One page of laptops in (price_pkr, id) order
+        
+        Pages continue after the cursor instead of skipping rows with OFFSET,
+        so every page costs the same. Only the requested columns are read.
+        
+        Args:
+            db: Database session
+            filters: SQLAlchemy filter expressions
+            limit: Page size
+            cursor: (price_pkr, id) of the last laptop on the previous page
+            fields: Columns to return (id is always included); None = all
+            
+        Returns:
+            Tuple of (rows as dicts, cursor for the next page or None)
+        """
+        names = list(fields or CATALOGUE_FIELDS)
+        if "id" not in names:
+            names.insert(0, "id")
+        columns = [getattr(Laptop, name) for name in names]
+        # The cursor needs the price even when the client did not ask for it
+        if "price_pkr" not in names:
+            columns.append(Laptop.price_pkr)
+        
+        query = db.query(*columns).filter(*filters)
+        if cursor is not None:
+            price, laptop_id = cursor
+            query = query.filter(or_(
+                Laptop.price_pkr > price,
+                and_(Laptop.price_pkr == price, Laptop.id > laptop_id)
+            ))
+        
+        rows = query.order_by(Laptop.price_pkr, Laptop.id).limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1].price_pkr, rows[-1].id)
+        
+        return [{name: getattr(row, name) for name in names} for row in rows], next_cursor
+    
+    @staticmethod
+    def in_category(category: str) -> Any:
+        """Filter for laptops tagged with an ideal_for category, answered from the laptop_categories index"""
+        return Laptop.id.in_(
+            select(LaptopCategory.laptop_id).where(LaptopCategory.category == category)
+        )
+    
+    @staticmethod
+    def search_filters(params: LaptopSearchParams) -> List[Any]:
+        """Filter expressions for search parameters"""
+        filters = []
         
         if params.brand:
-            query = query.filter(Laptop.brand.ilike(f"%{params.brand}%"))
+            filters.append(Laptop.brand.ilike(f"%{params.brand}%"))
         
         if params.min_price is not None:
-            query = query.filter(Laptop.price_pkr >= params.min_price)
+            filters.append(Laptop.price_pkr >= params.min_price)
         
         if params.max_price is not None:
-            query = query.filter(Laptop.price_pkr <= params.max_price)
+            filters.append(Laptop.price_pkr <= params.max_price)
         
         if params.min_ram is not None:
-            query = query.filter(Laptop.ram_gb >= params.min_ram)
+            filters.append(Laptop.ram_gb >= params.min_ram)
         
         if params.storage_type:
-            query = query.filter(Laptop.storage_type == params.storage_type)
+            filters.append(Laptop.storage_type == params.storage_type)
         
         if params.ideal_for:
-            # Search in JSON array
-            query = query.filter(Laptop.ideal_for.contains([params.ideal_for]))
+            filters.append(LaptopService.in_category(params.ideal_for))
         
+        return filters
+    
+    @staticmethod
+    def search_laptops(db: Session, params: LaptopSearchParams, limit: Optional[int] = None) -> List[Laptop]:
+        """Search laptops with filters; with a limit, returns the cheapest matches"""
+        query = db.query(Laptop).filter(*LaptopService.search_filters(params))
+        if limit is not None:
+            query = query.order_by(Laptop.price_pkr, Laptop.id).limit(limit)
         return query.all()
     
     @staticmethod
@@ -63,6 +133,7 @@ class LaptopService:
         for field, value in update_data.items():
             setattr(db_laptop, field, value)
         
+        bump_catalogue_version(db)
         db.commit()
         db.refresh(db_laptop)
         return db_laptop
@@ -75,25 +146,38 @@ class LaptopService:
             return False
         
         db.delete(db_laptop)
+        bump_catalogue_version(db)
         db.commit()
         return True
     
+    @staticmethod
+    def budget_filters(min_price: int, max_price: int) -> List[Any]:
+        """Filter expressions for a budget range"""
+        return [Laptop.price_pkr >= min_price, Laptop.price_pkr <= max_price]
+    
     @staticmethod
     def get_laptops_by_budget(db: Session, min_price: int, max_price: int) -> List[Laptop]:
         """Get laptops within budget range"""
         return db.query(Laptop).filter(
-            and_(Laptop.price_pkr >= min_price, Laptop.price_pkr <= max_price)
+            *LaptopService.budget_filters(min_price, max_price)
         ).order_by(Laptop.price_pkr).all()
     
     @staticmethod
-    def get_laptops_for_category(db: Session, category: str, max_price: Optional[int] = None) -> List[Laptop]:
-        """Get laptops suitable for a specific category"""
-        query = db.query(Laptop).filter(Laptop.ideal_for.contains([category]))
+    def category_filters(category: str, max_price: Optional[int] = None) -> List[Any]:
+        """Filter expressions for a category and optional price cap"""
+        filters = [LaptopService.in_category(category)]
         
         if max_price:
-            query = query.filter(Laptop.price_pkr <= max_price)
+            filters.append(Laptop.price_pkr <= max_price)
         
-        return query.order_by(Laptop.price_pkr).all()
+        return filters
+    
+    @staticmethod
+    def get_laptops_for_category(db: Session, category: str, max_price: Optional[int] = None) -> List[Laptop]:
+        """Get laptops suitable for a specific category"""
+        return db.query(Laptop).filter(
+            *LaptopService.category_filters(category, max_price)
+        ).order_by(Laptop.price_pkr).all()
 
 class SessionService:
     """Service layer for user session operations"""
@@ -126,11 +210,14 @@ class SessionService:
     
     @staticmethod
     def update_conversation(db: Session, session_id: str, message: dict) -> UserSession:
-        """Add message to conversation history"""
+        """Append a message to the session's conversation turns"""
         session = SessionService.get_or_create_session(db, session_id)
-        session.conversation_history.append(message)
+        db.add(ConversationTurn(
+            session_id=session_id,
+            role=message["role"],
+            content=message["content"]
+        ))
         db.commit()
-        db.refresh(session)
         return session
     
     @staticmethod
@@ -153,7 +240,7 @@ class RecommendationService:
         rank: int,
         reason: Optional[str] = None
     ) -> Recommendation:
-        """Create a new recommendation"""
+        """Create a new recommendation and count it towards the laptop's popularity"""
         db_recommendation = Recommendation(
             session_id=session_id,
             laptop_id=laptop_id,
@@ -162,16 +249,18 @@ class RecommendationService:
             clicked=False
         )
         db.add(db_recommendation)
+        record_events(db, laptop_id, recommendations=1)
         db.commit()
         db.refresh(db_recommendation)
         return db_recommendation
     
     @staticmethod
     def mark_clicked(db: Session, recommendation_id: int) -> Optional[Recommendation]:
-        """Mark recommendation as clicked"""
+        """Mark recommendation as clicked; only the first click counts towards popularity"""
         recommendation = db.query(Recommendation).filter(Recommendation.id == recommendation_id).first()
-        if recommendation:
+        if recommendation and not recommendation.clicked:
             recommendation.clicked = True
+            record_events(db, recommendation.laptop_id, clicks=1)
             db.commit()
             db.refresh(recommendation)
         return recommendation
@@ -184,19 +273,6 @@ class RecommendationService:
         ).order_by(Recommendation.created_at.desc()).all()
     
     @staticmethod
-    def get_popular_laptops(db: Session, limit: int = 10) -> List[tuple]:
-        """Get most recommended laptops"""
-        from sqlalchemy import func
-        
-        results = db.query(
-            Laptop,
-            func.count(Recommendation.id).label('recommendation_count')
-        ).join(
-            Recommendation, Laptop.id == Recommendation.laptop_id
-        ).group_by(
-            Laptop.id
-        ).order_by(
-            func.count(Recommendation.id).desc()
-        ).limit(limit).all()
-        
-        return results
+    def get_popular_laptops(db: Session, limit: int = 10) -> List[Tuple[Laptop, LaptopPopularity]]:
+        """Get the most popular laptops by time-decayed recommendations and clicks"""
+        return top_laptops(db, limit)
@@ -0,0 +1,298 @@
+"""
+In-process BM25 index over laptop document text
+Catches exact model and part strings that embeddings blur together
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import math
+import re
+import threading
+import numpy as np
+from services.numpy_vector_index import NumpyVectorIndex
+
+# Alphanumeric runs, keeping joined identifiers like "i5-1235u" or "x1504" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+PART_SPLIT = re.compile(r"[-.]")
+# Specs like "16gb", "144hz" or "15.6inch": a number and a unit, not a model ID
+SPEC_TOKEN = re.compile(r"\d+(?:\.\d+)?(?:gb|tb|mb|hz|ghz|mhz|kg|mah|wh|w|inch|in)")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase tokens; joined identifiers also yield their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "-" in token or "." in token:
+            tokens.extend(part for part in PART_SPLIT.split(token) if part)
+    return tokens
+
+def is_model_token(token: str) -> bool:
+    """Tokens like "x1504" or "i5-1235u" that identify a model or part"""
+    return (
+        len(token) >= 4
+        and any(c.isdigit() for c in token)
+        and any(c.isalpha() for c in token)
+        and not SPEC_TOKEN.fullmatch(token)
+    )
+
+class LexicalIndex:
+    """BM25 over per-term postings arrays, updated incrementally"""
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        
+        self._doc_terms: Dict[int, Dict[str, int]] = {}
+        self._doc_len: Dict[int, int] = {}
+        self._contents: Dict[int, str] = {}
+        self._metadatas: Dict[int, Dict[str, Any]] = {}
+        self._total_len = 0
+        
+        # term -> {laptop_id: term frequency}; compacted into arrays on demand
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+    
+    def upsert(
+        self,
+        ids: Sequence[int],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ):
+        """Index documents, replacing any existing ones with the same ID"""
+        with self._lock:
+            for laptop_id, content, metadata in zip(ids, documents, metadatas):
+                self._add(int(laptop_id), content, metadata)
+    
+    def _add(self, laptop_id: int, content: str, metadata: Dict[str, Any]):
+        self._remove(laptop_id)
+        
+        counts: Dict[str, int] = {}
+        tokens = tokenize(content)
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        
+        self._doc_terms[laptop_id] = counts
+        self._doc_len[laptop_id] = len(tokens)
+        self._contents[laptop_id] = content
+        self._metadatas[laptop_id] = metadata
+        self._total_len += len(tokens)
+        
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[laptop_id] = tf
+            self._dirty.add(term)
+    
+    def delete(self, ids: Sequence[int]):
+        """Remove documents by laptop ID"""
+        with self._lock:
+            for laptop_id in ids:
+                self._remove(int(laptop_id))
+    
+    def reset(self):
+        """Drop every document"""
+        with self._lock:
+            for laptop_id in list(self._doc_terms):
+                self._remove(laptop_id)
+    
+    def _remove(self, laptop_id: int):
+        counts = self._doc_terms.pop(laptop_id, None)
+        if counts is None:
+            return
+        
+        self._total_len -= self._doc_len.pop(laptop_id)
+        self._contents.pop(laptop_id, None)
+        self._metadatas.pop(laptop_id, None)
+        
+        for term in counts:
+            posting = self._postings[term]
+            posting.pop(laptop_id, None)
+            if not posting:
+                del self._postings[term]
+                self._arrays.pop(term, None)
+            self._dirty.add(term)
+    
+    def _term_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """(laptop ids, term frequencies, doc lengths) for a term"""
+        if term in self._dirty:
+            self._dirty.discard(term)
+            posting = self._postings.get(term)
+            if posting:
+                ids = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+                self._arrays[term] = (
+                    ids,
+                    np.fromiter(posting.values(), dtype=np.float32, count=len(posting)),
+                    np.fromiter((self._doc_len[i] for i in ids.tolist()), dtype=np.float32, count=len(posting))
+                )
+            else:
+                self._arrays.pop(term, None)
+        return self._arrays.get(term)
+    
+    def _scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 score for every document matching at least one query term
+        
+        Returns:
+            Tuple of (laptop ids, scores), unsorted
+        """
+        n_docs = len(self._doc_terms)
+        if n_docs == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        avg_len = self._total_len / n_docs
+        all_ids = []
+        all_scores = []
+        
+        for term in set(tokenize(query)):
+            arrays = self._term_arrays(term)
+            if arrays is None:
+                continue
+            ids, tf, doc_len = arrays
+            df = len(ids)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * doc_len / avg_len)
+            all_ids.append(ids)
+            all_scores.append(idf * tf * (self.k1 + 1) / norm)
+        
+        if not all_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        unique_ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        return unique_ids, np.bincount(inverse, weights=np.concatenate(all_scores))
+    
+    def search(
+        self,
+        query: str,
+        n_results: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Rank documents by BM25
+        
+        Args:
+            query: Search query text
+            n_results: Number of results to return
+            filters: Optional metadata filters, same keys as the vector store
+        
+        Returns:
+            Tuple of (results, decisive). Results have laptop_id, content,
+            metadata and bm25_score but no similarity_score: BM25 scores are
+            not on the cosine scale, so only their rank is used, through
+            reciprocal_rank_fusion. decisive is True when the query names a
+            model/part string that exactly one document contains.
+        """
+        with self._lock:
+            ids, scores = self._scores(query)
+            if filters and len(ids):
+                keep = np.fromiter(
+                    (self.matches(self._metadatas[i], filters) for i in ids.tolist()),
+                    dtype=bool,
+                    count=len(ids)
+                )
+                ids, scores = ids[keep], scores[keep]
+            
+            if len(ids) == 0:
+                return [], False
+            
+            order = np.argsort(-scores, kind="stable")[:n_results]
+            results = [
+                {
+                    "laptop_id": int(ids[i]),
+                    "content": self._contents[int(ids[i])],
+                    "metadata": self._metadatas[int(ids[i])],
+                    "bm25_score": float(scores[i])
+                }
+                for i in order
+            ]
+            
+            return results, self._is_decisive(query, ids)
+    
+    def _is_decisive(self, query: str, candidate_ids: np.ndarray) -> bool:
+        """True when exactly one candidate contains every model token in the query"""
+        model_tokens = [t for t in set(tokenize(query)) if is_model_token(t)]
+        if not model_tokens:
+            return False
+        
+        matching = None
+        for token in model_tokens:
+            posting = self._postings.get(token, {})
+            docs = {i for i in candidate_ids.tolist() if i in posting}
+            matching = docs if matching is None else matching & docs
+            if not matching:
+                return False
+        
+        return len(matching) == 1
+    
+    @staticmethod
+    def matches(metadata: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        """Evaluate vector store filters against one document's metadata"""
+        for column in NumpyVectorIndex.CATEGORICAL_COLUMNS:
+            if filters.get(column) is not None and metadata.get(column) != filters[column]:
+                return False
+        
+        for column, (min_key, max_key) in NumpyVectorIndex.RANGE_FILTERS.items():
+            value = metadata.get(column)
+            if filters.get(min_key) is not None and (value is None or value < filters[min_key]):
+                return False
+            if filters.get(max_key) is not None and (value is None or value > filters[max_key]):
+                return False
+        
+        for column in NumpyVectorIndex.SET_COLUMNS:
+            wanted = filters.get(column)
+            if wanted:
+                if isinstance(wanted, str):
+                    wanted = [wanted]
+                if not set(wanted) & set(metadata.get(column) or []):
+                    return False
+        
+        return True
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[List[Dict[str, Any]]],
+    n_results: int,
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked result lists by summing weight / (k + rank)
+    
+    Each result's similarity_score is replaced by its fusion score divided
+    by the highest possible one, sum(weights) / (k + 1), so a result ranked
+    first everywhere scores 1.0. Cosine similarities and BM25 scores are
+    not on one scale, so neither list's own score is kept for ranking. Pass
+    an empty list for a ranking that was skipped, so scores stay on the
+    same scale.
+    
+    Args:
+        rankings: Result lists, best first
+        n_results: Number of fused results to return
+        k: Rank offset; larger values flatten the gap between ranks
+        weights: Weight of each ranking (default: 1.0 each)
+    """
+    if weights is None:
+        weights = [1.0] * len(rankings)
+    
+    fused: Dict[int, float] = {}
+    entries: Dict[int, Dict[str, Any]] = {}
+    
+    for ranking, weight in zip(rankings, weights):
+        for rank, result in enumerate(ranking, 1):
+            laptop_id = result["laptop_id"]
+            fused[laptop_id] = fused.get(laptop_id, 0.0) + weight / (k + rank)
+            entries.setdefault(laptop_id, result)
+    
+    ordered = sorted(fused, key=lambda laptop_id: fused[laptop_id], reverse=True)[:n_results]
+    if not ordered:
+        return []
+    
+    best_possible = sum(weights) / (k + 1)
+    return [
+        {
+            **entries[laptop_id],
+            "similarity_score": fused[laptop_id] / best_possible,
+            "distance": 1 - fused[laptop_id] / best_possible,
+            "fusion_score": fused[laptop_id]
+        }
+        for laptop_id in ordered
+    ]
@@ -0,0 +1,406 @@
+"""
+In-process NumPy vector index for laptop documents
+Brute-force cosine search with optional IVF partitioning, persisted to one .npz
+"""
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from pathlib import Path
+import json
+import os
+import numpy as np
+
+class NumpyVectorIndex:
+    """Normalized embedding matrix plus metadata columns held in NumPy arrays"""
+    
+    # Metadata fields kept as typed columns for filtering
+    CATEGORICAL_COLUMNS = ("brand", "storage_type")
+    
+    # Numeric columns and their (min, max) filter keys
+    RANGE_FILTERS = {
+        "price_pkr": ("min_price", "max_price"),
+        "ram_gb": ("min_ram", "max_ram"),
+        "storage_gb": ("min_storage", "max_storage"),
+        "display_size": ("min_display", "max_display")
+    }
+    
+    # List-valued columns stored as one bitmap per category
+    SET_COLUMNS = ("ideal_for",)
+    
+    # Eligible-row fraction above which filtered queries mask instead of gather
+    GATHER_THRESHOLD = 0.25
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        n_lists: int = 0,
+        n_probe: int = 4,
+        min_rows_for_ivf: int = 2000
+    ):
+        """
+        Args:
+            path: .npz file to load from and persist to (None keeps it in memory)
+            n_lists: Number of IVF partitions (0 disables IVF)
+            n_probe: Partitions scanned per query when IVF is active
+            min_rows_for_ivf: Catalogue size below which brute force is used
+        """
+        self.path = Path(path) if path else None
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_rows_for_ivf = min_rows_for_ivf
+        
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors: Optional[np.ndarray] = None
+        self.contents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.columns: Dict[str, np.ndarray] = {}
+        self.category_codes: Dict[str, Dict[str, int]] = {}
+        self._row_of: Dict[int, int] = {}
+        
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+        
+        # Catalogue generation, bumped on bulk (re)indexing and persisted
+        self.version = 0
+        
+        # (inode, mtime, size) of the file as last loaded or saved here
+        self._file_stamp: Optional[Tuple[int, int, int]] = None
+        
+        if self.path and self.path.exists():
+            self.load()
+    
+    def upsert(
+        self,
+        ids: Sequence[int],
+        embeddings: Sequence[Sequence[float]],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]]
+    ):
+        """Insert new rows or replace existing rows by laptop ID"""
+        if len(ids) == 0:
+            return
+        
+        matrix = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        if self.vectors is None:
+            self.vectors = np.zeros((0, matrix.shape[1]), dtype=np.float32)
+        
+        new_rows = []
+        for i, laptop_id in enumerate(ids):
+            laptop_id = int(laptop_id)
+            row = self._row_of.get(laptop_id)
+            if row is None:
+                new_rows.append(i)
+                continue
+            
+            self.vectors[row] = matrix[i]
+            self.contents[row] = documents[i]
+            self.metadatas[row] = dict(metadatas[i])
+            if self.centroids is not None:
+                self.assignments[row] = self._nearest_list(matrix[i:i + 1])[0]
+        
+        if new_rows:
+            start = len(self.ids)
+            self.ids = np.concatenate([self.ids, np.asarray([int(ids[i]) for i in new_rows], dtype=np.int64)])
+            self.vectors = np.vstack([self.vectors, matrix[new_rows]])
+            self.contents.extend(documents[i] for i in new_rows)
+            self.metadatas.extend(dict(metadatas[i]) for i in new_rows)
+            for offset, i in enumerate(new_rows):
+                self._row_of[int(ids[i])] = start + offset
+            if self.centroids is not None:
+                self.assignments = np.concatenate([
+                    self.assignments,
+                    self._nearest_list(matrix[new_rows])
+                ])
+        
+        self._build_columns()
+        self._maybe_train_ivf()
+    
+    def delete(self, ids: Sequence[int]):
+        """Remove rows by laptop ID"""
+        rows = [self._row_of[int(i)] for i in ids if int(i) in self._row_of]
+        if not rows:
+            return
+        
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        
+        self.ids = self.ids[keep]
+        self.vectors = self.vectors[keep]
+        self.contents = [c for c, k in zip(self.contents, keep) if k]
+        self.metadatas = [m for m, k in zip(self.metadatas, keep) if k]
+        if self.centroids is not None:
+            self.assignments = self.assignments[keep]
+        
+        self._row_of = {int(laptop_id): row for row, laptop_id in enumerate(self.ids)}
+        self._build_columns()
+    
+    def update_metadata(self, ids: Sequence[int], metadatas: Sequence[Dict[str, Any]]):
+        """Replace metadata of existing rows, keeping their vectors and text"""
+        for laptop_id, metadata in zip(ids, metadatas):
+            row = self._row_of.get(int(laptop_id))
+            if row is not None:
+                self.metadatas[row] = dict(metadata)
+        self._build_columns()
+    
+    def reset(self):
+        """Drop every row and the IVF partitions"""
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.vectors = None
+        self.contents = []
+        self.metadatas = []
+        self.columns = {}
+        self.category_codes = {}
+        self._row_of = {}
+        self.centroids = None
+        self.assignments = np.zeros(0, dtype=np.int32)
+    
+    def count(self) -> int:
+        return len(self.ids)
+    
+    def documents(self) -> Tuple[List[int], List[str], List[Dict[str, Any]]]:
+        """All stored (ids, contents, metadatas)"""
+        return self.ids.tolist(), list(self.contents), list(self.metadatas)
+    
+    def bump_version(self) -> int:
+        """Start a new catalogue generation"""
+        self.version += 1
+        return self.version
+    
+    def changed_on_disk(self) -> bool:
+        """True if another process rewrote the .npz since this index loaded or saved it"""
+        if self.path is None or not self.path.exists():
+            return False
+        return self._stat(self.path) != self._file_stamp
+    
+    def get(self, laptop_id: int) -> Optional[Dict[str, Any]]:
+        """Get stored document by laptop ID"""
+        row = self._row_of.get(int(laptop_id))
+        if row is None:
+            return None
+        return {
+            "laptop_id": int(laptop_id),
+            "content": self.contents[row],
+            "metadata": self.metadatas[row]
+        }
+    
+    def query(
+        self,
+        embedding: Sequence[float],
+        n_results: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Top-k cosine search with a single matrix-vector product
+        
+        Args:
+            embedding: Query embedding
+            n_results: Number of results to return
+            filters: Optional metadata filters (same keys as VectorStoreService.search)
+        
+        Returns:
+            Results in the same shape as the ChromaDB backend
+        """
+        if not len(self.ids) or n_results <= 0:
+            return []
+        
+        query = self._normalize(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+        
+        mask = self.filter_mask(filters) if filters else None
+        if mask is not None:
+            # Score only eligible rows; IVF probing could miss them.
+            # For loose filters one full product beats gathering rows.
+            if mask.mean() > self.GATHER_THRESHOLD:
+                scores = np.where(mask, self.vectors @ query, -np.inf)
+                rows = self._top_k(scores, min(n_results, int(mask.sum())))
+                return self._format(rows, scores[rows])
+            candidates = np.flatnonzero(mask)
+        else:
+            candidates = self._candidate_rows(query)
+        
+        if candidates is None:
+            scores = self.vectors @ query
+            rows = self._top_k(scores, n_results)
+            return self._format(rows, scores[rows])
+        
+        if not len(candidates):
+            return []
+        
+        scores = self.vectors[candidates] @ query
+        top = self._top_k(scores, n_results)
+        return self._format(candidates[top], scores[top])
+    
+    def filter_mask(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Boolean row mask for metadata filters
+        
+        Supports equality on brand/storage_type, min_/max_ bounds on the
+        numeric columns and any-of membership on ideal_for. Rows missing
+        a filtered value never match.
+        """
+        masks = []
+        
+        for column in self.CATEGORICAL_COLUMNS:
+            if filters.get(column) is not None:
+                masks.append(self.columns[column] == filters[column])
+        
+        for column, (min_key, max_key) in self.RANGE_FILTERS.items():
+            if filters.get(min_key) is not None:
+                masks.append(self.columns[column] >= filters[min_key])
+            if filters.get(max_key) is not None:
+                masks.append(self.columns[column] <= filters[max_key])
+        
+        for column in self.SET_COLUMNS:
+            wanted = filters.get(column)
+            if not wanted:
+                continue
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            known = self.category_codes.get(column, {})
+            codes = [known[c] for c in wanted if c in known]
+            masks.append(self.columns[column][:, codes].any(axis=1))
+        
+        if not masks:
+            return None
+        
+        return np.logical_and.reduce(masks)
+    
+    def save(self, path: Optional[str] = None):
+        """Persist the index to a single .npz file"""
+        target = Path(path) if path else self.path
+        if target is None:
+            return
+        
+        dim = self.vectors.shape[1] if self.vectors is not None else 0
+        arrays = {
+            "ids": self.ids,
+            "vectors": self.vectors if self.vectors is not None else np.zeros((0, dim), dtype=np.float32),
+            "contents": np.asarray(self.contents, dtype=str),
+            "metadatas": np.asarray([json.dumps(m) for m in self.metadatas], dtype=str),
+            "assignments": self.assignments,
+            "version": np.asarray(self.version, dtype=np.int64),
+        }
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+        
+        # Write to a temp file and rename so readers never see a partial index
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, target)
+        if target == self.path:
+            self._file_stamp = self._stat(target)
+    
+    def load(self, path: Optional[str] = None):
+        """Load the index from a .npz file"""
+        source = Path(path) if path else self.path
+        stamp = self._stat(source)
+        
+        with np.load(source, allow_pickle=False) as data:
+            self.ids = data["ids"].astype(np.int64)
+            self.vectors = data["vectors"].astype(np.float32) if len(data["ids"]) else None
+            self.contents = data["contents"].tolist()
+            self.metadatas = [json.loads(m) for m in data["metadatas"].tolist()]
+            self.assignments = data["assignments"].astype(np.int32)
+            self.centroids = data["centroids"] if "centroids" in data.files else None
+            self.version = int(data["version"]) if "version" in data.files else 0
+        
+        self._row_of = {int(laptop_id): row for row, laptop_id in enumerate(self.ids)}
+        self._build_columns()
+        if source == self.path:
+            self._file_stamp = stamp
+    
+    @staticmethod
+    def _stat(path: Path) -> Tuple[int, int, int]:
+        info = path.stat()
+        return info.st_ino, info.st_mtime_ns, info.st_size
+    
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
+    
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k highest scores, best first"""
+        k = min(k, len(scores))
+        if k == len(scores):
+            return np.argsort(-scores)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+    
+    def _format(self, rows: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        results = []
+        for row, score in zip(rows, scores):
+            similarity = float(score)
+            results.append({
+                "laptop_id": int(self.ids[row]),
+                "content": self.contents[row],
+                "metadata": self.metadatas[row],
+                "similarity_score": similarity,
+                "distance": 1 - similarity
+            })
+        return results
+    
+    def _build_columns(self):
+        """Rebuild typed metadata columns and category bitmaps used for filtering"""
+        self.columns = {
+            column: np.asarray([str(m.get(column) or "") for m in self.metadatas], dtype=str)
+            for column in self.CATEGORICAL_COLUMNS
+        }
+        
+        for column in self.RANGE_FILTERS:
+            self.columns[column] = np.asarray(
+                [m.get(column) if m.get(column) is not None else np.nan for m in self.metadatas],
+                dtype=np.float64
+            )
+        
+        for column in self.SET_COLUMNS:
+            values = [m.get(column) or [] for m in self.metadatas]
+            codes = {c: j for j, c in enumerate(sorted({c for v in values for c in v}))}
+            bitmap = np.zeros((len(values), len(codes)), dtype=bool)
+            for row, categories in enumerate(values):
+                bitmap[row, [codes[c] for c in categories]] = True
+            self.columns[column] = bitmap
+            self.category_codes[column] = codes
+    
+    def _ivf_active(self) -> bool:
+        return self.centroids is not None and len(self.ids) >= self.min_rows_for_ivf
+    
+    def _candidate_rows(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows in the probed IVF partitions, or None for a full scan"""
+        if not self._ivf_active():
+            return None
+        
+        probes = np.argsort(-(self.centroids @ query))[:self.n_probe]
+        return np.flatnonzero(np.isin(self.assignments, probes))
+    
+    def _nearest_list(self, matrix: np.ndarray) -> np.ndarray:
+        return np.argmax(matrix @ self.centroids.T, axis=1).astype(np.int32)
+    
+    def _maybe_train_ivf(self):
+        """Train IVF partitions once the catalogue is large enough"""
+        if self.n_lists <= 0 or self.centroids is not None:
+            return
+        if len(self.ids) < max(self.min_rows_for_ivf, self.n_lists):
+            return
+        self.train_ivf()
+    
+    def train_ivf(self, iterations: int = 10, seed: int = 0):
+        """Spherical k-means over the current vectors"""
+        n_lists = min(self.n_lists, len(self.ids))
+        if n_lists <= 0:
+            return
+        
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(len(self.ids), n_lists, replace=False)].copy()
+        
+        for _ in range(iterations):
+            assignments = np.argmax(self.vectors @ centroids.T, axis=1)
+            for list_id in range(n_lists):
+                members = self.vectors[assignments == list_id]
+                if len(members):
+                    centroids[list_id] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+        
+        self.centroids = centroids
+        self.assignments = self._nearest_list(self.vectors)
@@ -0,0 +1,81 @@
+"""
+Staged execution for the recommendation pipeline
+Records wall-clock time per stage and lets independent stages overlap
+"""
+from typing import Any, Awaitable, Callable, Dict, Union
+from concurrent.futures import Future
+from contextlib import contextmanager
+import asyncio
+import time
+from core.concurrency import start_blocking
+
+class PipelineRun:
+    """Per-request record of pipeline stages and their timings"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stage_timings_ms: Dict[str, float] = {}
+        # Stage name -> what became of it, e.g. speculative_retrieval -> used/discarded
+        self.outcomes: Dict[str, str] = {}
+    
+    @contextmanager
+    def stage(self, name: str):
+        """Time a synchronous stage"""
+        start = time.perf_counter()
+        yield
+        self._record(name, start)
+    
+    async def run(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Await a stage and record how long it took"""
+        start = time.perf_counter()
+        result = await awaitable
+        self._record(name, start)
+        return result
+    
+    def start(self, name: str, awaitable: Awaitable[Any]) -> "asyncio.Task":
+        """
+        Start a stage in the background
+        
+        The stage runs concurrently with whatever the caller does next; its
+        timing is recorded when it finishes. Failed or cancelled stages are
+        not recorded.
+        """
+        return asyncio.ensure_future(self.run(name, awaitable))
+    
+    def submit(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Start a blocking stage on a background thread
+        
+        The synchronous counterpart of start(); wait for it with result().
+        """
+        def timed():
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            self._record(name, start)
+            return result
+        return start_blocking(timed)
+    
+    def outcome(self, name: str, value: str):
+        """Record what became of a stage, e.g. whether a speculative result was used"""
+        self.outcomes[name] = value
+    
+    @staticmethod
+    def discard(task: Union["asyncio.Task", Future]):
+        """Cancel a background stage whose result is no longer needed"""
+        task.cancel()
+        # Mark any exception as retrieved so it is not reported at shutdown
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    
+    def mark(self, name: str):
+        """Record the time elapsed since the run started (e.g. first byte sent)"""
+        self.stage_timings_ms[name] = round((time.perf_counter() - self.started) * 1000, 2)
+    
+    def _record(self, name: str, start: float):
+        self.stage_timings_ms[name] = round((time.perf_counter() - start) * 1000, 2)
+    
+    def summary(self) -> Dict[str, float]:
+        """Stage timings plus the total elapsed time, in milliseconds"""
+        return {
+            **self.stage_timings_ms,
+            "total": round((time.perf_counter() - self.started) * 1000, 2)
+        }
@@ -0,0 +1,228 @@
+"""
+Incrementally maintained laptop popularity
+Counters and time-decayed scores updated per recommendation and click, instead of aggregating the recommendations table
+"""
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import threading
+import time
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from core.config import settings
+from models.database import Laptop, LaptopPopularity, PopularityState, Recommendation
+
+# Scores are stored as weight * 2^(age / half-life) relative to an epoch kept
+# in popularity_state. Every score decays at the same rate, so relative order
+# never changes and only the displayed value needs rescaling to "now".
+SCORE_EPOCH = datetime(2024, 1, 1)  # epoch of databases without a popularity_state row
+POPULARITY_STATE_ID = 1
+
+# Once an event is this many half-lives past the epoch, the epoch moves to it
+# and stored scores are rescaled, keeping 2^age far below float overflow (2^1024)
+REBASE_HALF_LIVES = 64
+
+def _half_lives(at: datetime, epoch: datetime, half_life_days: Optional[float] = None) -> float:
+    half_life_days = half_life_days or settings.POPULARITY_HALF_LIFE_DAYS
+    if not half_life_days > 0:
+        raise ValueError(f"POPULARITY_HALF_LIFE_DAYS must be positive, got {half_life_days}")
+    return (at - epoch).total_seconds() / (half_life_days * 86400)
+
+def event_score(
+    at: datetime,
+    weight: float = 1.0,
+    half_life_days: Optional[float] = None,
+    epoch: datetime = SCORE_EPOCH
+) -> float:
+    """Stored score contribution of one event at time at"""
+    return weight * 2.0 ** _half_lives(at, epoch, half_life_days)
+
+def decayed_score(
+    score: float,
+    now: Optional[datetime] = None,
+    half_life_days: Optional[float] = None,
+    epoch: datetime = SCORE_EPOCH
+) -> float:
+    """Stored score as its decayed value at now (1.0 = one impression just now)"""
+    # A negative power underflows to 0 instead of overflowing
+    return score * 2.0 ** -_half_lives(now or datetime.utcnow(), epoch, half_life_days)
+
+def get_score_epoch(db: Session) -> datetime:
+    """Epoch the stored scores are relative to"""
+    table = PopularityState.__table__
+    epoch = db.execute(select(table.c.score_epoch).where(table.c.id == POPULARITY_STATE_ID)).scalar()
+    return epoch or SCORE_EPOCH
+
+def _writable_epoch(db: Session, at: datetime) -> datetime:
+    """
+    Epoch to store a score for an event at time at, moving it forward first if needed
+    
+    The state row is locked for the caller's transaction (on databases with
+    row locks), so concurrent writers never mix epochs.
+    """
+    table = PopularityState.__table__
+    epoch = db.execute(
+        select(table.c.score_epoch).where(table.c.id == POPULARITY_STATE_ID).with_for_update()
+    ).scalar()
+    if epoch is None:
+        epoch = SCORE_EPOCH
+        db.execute(insert(table).values(id=POPULARITY_STATE_ID, score_epoch=epoch))
+    
+    if _half_lives(at, epoch) < REBASE_HALF_LIVES:
+        return epoch
+    
+    _set_epoch(db, at, rescale=2.0 ** -_half_lives(at, epoch))
+    return at
+
+def _set_epoch(db: Session, epoch: datetime, rescale: Optional[float] = None):
+    """Store a new epoch, scaling existing scores by rescale in the same transaction"""
+    if rescale is not None:
+        scores = LaptopPopularity.__table__
+        db.execute(update(scores).values(score=scores.c.score * rescale))
+    
+    table = PopularityState.__table__
+    result = db.execute(update(table).where(table.c.id == POPULARITY_STATE_ID).values(score_epoch=epoch))
+    if not result.rowcount:
+        db.execute(insert(table).values(id=POPULARITY_STATE_ID, score_epoch=epoch))
+
+def click_through_rate(popularity: LaptopPopularity) -> float:
+    """Clicks per recommendation shown"""
+    if not popularity.recommendation_count:
+        return 0.0
+    return popularity.click_count / popularity.recommendation_count
+
+def record_events(
+    db: Session,
+    laptop_id: int,
+    recommendations: int = 0,
+    clicks: int = 0,
+    at: Optional[datetime] = None
+):
+    """
+    Add recommendations and clicks to a laptop's counters
+    
+    Runs as one atomic increment (upsert) in the caller's transaction, so
+    concurrent writers never lose counts.
+    
+    Args:
+        db: Database session; the caller commits
+        laptop_id: Laptop shown or clicked
+        recommendations: Times it was recommended
+        clicks: Times a recommendation of it was clicked
+        at: Event time (default now, UTC)
+    """
+    at = at or datetime.utcnow()
+    epoch = _writable_epoch(db, at)
+    score = event_score(at, recommendations + clicks * settings.POPULARITY_CLICK_WEIGHT, epoch=epoch)
+    table = LaptopPopularity.__table__
+    increments = {
+        "recommendation_count": table.c.recommendation_count + recommendations,
+        "click_count": table.c.click_count + clicks,
+        "score": table.c.score + score,
+        "updated_at": at
+    }
+    
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table).values(
+            laptop_id=laptop_id,
+            recommendation_count=recommendations,
+            click_count=clicks,
+            score=score,
+            updated_at=at
+        )
+        db.execute(statement.on_conflict_do_update(index_elements=["laptop_id"], set_=increments))
+        return
+    
+    result = db.execute(update(table).where(table.c.laptop_id == laptop_id).values(increments))
+    if result.rowcount == 0:
+        db.execute(insert(table).values(
+            laptop_id=laptop_id,
+            recommendation_count=recommendations,
+            click_count=clicks,
+            score=score,
+            updated_at=at
+        ))
+
+def top_laptops(db: Session, limit: int = 10) -> List[Tuple[Laptop, LaptopPopularity]]:
+    """Highest-scoring laptops, read in score order from the index"""
+    return db.query(Laptop, LaptopPopularity).join(
+        LaptopPopularity, Laptop.id == LaptopPopularity.laptop_id
+    ).order_by(
+        LaptopPopularity.score.desc()
+    ).limit(limit).all()
+
+def rebuild_popularity(db: Session, batch_size: int = 5000) -> int:
+    """
+    Recompute every counter from the recommendations table
+    
+    For existing databases, and after changing the half-life or click
+    weight. Streams the table once. Scores are stored relative to now, the
+    new epoch; events many half-lives old contribute (almost) nothing.
+    
+    Returns:
+        Number of laptops with popularity rows
+    """
+    now = datetime.utcnow()
+    totals: Dict[int, List[float]] = {}
+    rows = db.execute(
+        select(Recommendation.laptop_id, Recommendation.created_at, Recommendation.clicked)
+    ).yield_per(batch_size)
+    for laptop_id, created_at, clicked in rows:
+        counts = totals.setdefault(laptop_id, [0, 0, 0.0])
+        counts[0] += 1
+        counts[1] += int(bool(clicked))
+        weight = 1 + (settings.POPULARITY_CLICK_WEIGHT if clicked else 0)
+        counts[2] += event_score(created_at or SCORE_EPOCH, weight, epoch=now)
+    
+    db.execute(delete(LaptopPopularity.__table__))
+    _set_epoch(db, now)
+    if totals:
+        db.execute(insert(LaptopPopularity.__table__), [
+            {
+                "laptop_id": laptop_id,
+                "recommendation_count": shown,
+                "click_count": clicked,
+                "score": score,
+                "updated_at": now
+            }
+            for laptop_id, (shown, clicked, score) in totals.items()
+        ])
+    return len(totals)
+
+class PopularityPriors:
+    """
+    Popularity of every laptop scaled to 0-1 (most popular = 1), for ranking
+    
+    Reloaded at most every POPULARITY_REFRESH_SECONDS; a slightly stale
+    prior is fine and keeps the query off the chat path.
+    """
+    
+    def __init__(self, refresh_seconds: Optional[float] = None):
+        self.refresh_seconds = settings.POPULARITY_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self._priors: Dict[int, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def current(self) -> Dict[int, float]:
+        """The last loaded priors (empty before the first load)"""
+        return self._priors
+    
+    def get(self, db: Session) -> Dict[int, float]:
+        """Return the priors, reloading them if they are older than the refresh interval"""
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_seconds:
+            return self._priors
+        
+        rows = db.execute(select(LaptopPopularity.laptop_id, LaptopPopularity.score)).all()
+        top = max((score for _, score in rows), default=0.0)
+        priors = {laptop_id: score / top for laptop_id, score in rows} if top > 0 else {}
+        
+        with self._lock:
+            self._priors = priors
+            self._loaded_at = time.monotonic()
+        return priors
+
+# Shared by the recommendation engine
+popularity_priors = PopularityPriors()
@@ -3,7 +3,7 @@ Query processor to extract user requirements from natural language
 """
 from typing import Dict, Optional, List, Any
 import re
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from core.config import settings
 import json
 
@@ -11,7 +11,14 @@ class QueryProcessor:
     """Extract structured information from user queries"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None
+        )
         
         # Keywords for different categories
         self.use_case_keywords = {
@@ -46,42 +53,54 @@ class QueryProcessor:
         Returns:
             Dictionary with extracted requirements
         """
-        query_lower = query.lower()
-        
-        # Extract budget
-        budget = self._extract_budget(query)
-        
-        # Extract use case
-        use_case = self._extract_use_case(query_lower)
+        requirements = self.extract_local_requirements(query)
         
-        # Extract brand preference
-        brand_preference = self._extract_brand(query_lower)
+        # Use GPT for more nuanced extraction if needed
+        if self.needs_gpt_extraction(requirements):
+            gpt_extracted = self.extract_with_gpt(query, conversation_history)
+            requirements = self.merge_gpt_requirements(requirements, gpt_extracted)
         
-        # Extract RAM preference
-        ram_preference = self._extract_ram(query_lower)
+        return requirements
+    
+    async def aextract_requirements(self, query: str, conversation_history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Async version of extract_requirements"""
+        requirements = self.extract_local_requirements(query)
         
-        # Extract storage preference
-        storage_preference = self._extract_storage(query_lower)
+        if self.needs_gpt_extraction(requirements):
+            gpt_extracted = await self.aextract_with_gpt(query, conversation_history)
+            requirements = self.merge_gpt_requirements(requirements, gpt_extracted)
         
-        # Use GPT for more nuanced extraction if needed
-        if not use_case or not budget:
-            gpt_extracted = self._extract_with_gpt(query, conversation_history)
-            
-            if not budget and gpt_extracted.get('budget'):
-                budget = gpt_extracted['budget']
-            
-            if not use_case and gpt_extracted.get('use_case'):
-                use_case = gpt_extracted['use_case']
+        return requirements
+    
+    def extract_local_requirements(self, query: str) -> Dict[str, Any]:
+        """Extract requirements with the keyword and regex rules only"""
+        query_lower = query.lower()
         
         return {
-            "budget": budget,
-            "use_case": use_case,
-            "brand_preference": brand_preference,
-            "ram_preference": ram_preference,
-            "storage_preference": storage_preference,
+            "budget": self._extract_budget(query),
+            "use_case": self._extract_use_case(query_lower),
+            "brand_preference": self._extract_brand(query_lower),
+            "ram_preference": self._extract_ram(query_lower),
+            "storage_preference": self._extract_storage(query_lower),
             "original_query": query
         }
     
+    def needs_gpt_extraction(self, requirements: Dict[str, Any]) -> bool:
+        """GPT fills in budget or use case when the rules found neither"""
+        return not requirements.get('use_case') or not requirements.get('budget')
+    
+    def merge_gpt_requirements(self, requirements: Dict[str, Any], gpt_extracted: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill missing budget and use case from GPT extraction"""
+        merged = dict(requirements)
+        
+        if not merged.get('budget') and gpt_extracted.get('budget'):
+            merged['budget'] = gpt_extracted['budget']
+        
+        if not merged.get('use_case') and gpt_extracted.get('use_case'):
+            merged['use_case'] = gpt_extracted['use_case']
+        
+        return merged
+    
     def _extract_budget(self, query: str) -> Optional[Dict[str, int]]:
         """Extract budget from query"""
         # Look for patterns like "100000", "1 lakh", "under 150000", "between 80000 and 120000"
@@ -184,52 +203,73 @@ class QueryProcessor:
         
         return storage if storage else None
     
-    def _extract_with_gpt(self, query: str, conversation_history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    def extract_with_gpt(self, query: str, conversation_history: Optional[List[Dict]] = None) -> Dict[str, Any]:
         """Use GPT to extract requirements when regex fails"""
         try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are a requirement extractor for a laptop recommendation system.
-Extract the following from user messages:
-1. Budget (in PKR) - return as {"min": X, "max": Y}
-2. Use case - one or more of: programming, gaming, studies, engineering, data_science, video_editing, graphic_design, office_work
-3. Brand preference - HP, Dell, Lenovo, ASUS, etc.
-
-Return ONLY a JSON object with these fields. If something is not mentioned, use null.
-Example: {"budget": {"min": 80000, "max": 120000}, "use_case": ["programming", "studies"], "brand_preference": "HP"}"""
-                }
-            ]
-            
-            # Add conversation history for context
-            if conversation_history:
-                for msg in conversation_history[-3:]:  # Last 3 messages
-                    messages.append(msg)
-            
-            messages.append({"role": "user", "content": query})
-            
             response = self.client.chat.completions.create(
                 model="gpt-4",
-                messages=messages,
+                messages=self._gpt_extraction_messages(query, conversation_history),
                 temperature=0.3,
                 max_tokens=200
             )
             
-            result = response.choices[0].message.content.strip()
+            return self._parse_gpt_json(response.choices[0].message.content)
             
-            # Try to parse JSON
-            if result.startswith('```json'):
-                result = result.split('```json')[1].split('```')[0].strip()
-            elif result.startswith('```'):
-                result = result.split('```')[1].split('```')[0].strip()
+        except Exception as e:
+            print(f"Error extracting with GPT: {e}")
+            return {}
+    
+    async def aextract_with_gpt(self, query: str, conversation_history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """Async version of extract_with_gpt"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                model="gpt-4",
+                messages=self._gpt_extraction_messages(query, conversation_history),
+                temperature=0.3,
+                max_tokens=200
+            )
             
-            extracted = json.loads(result)
-            return extracted
+            return self._parse_gpt_json(response.choices[0].message.content)
             
         except Exception as e:
             print(f"Error extracting with GPT: {e}")
             return {}
     
+    def _gpt_extraction_messages(self, query: str, conversation_history: Optional[List[Dict]] = None) -> List[Dict]:
+        """Prompt for GPT requirement extraction"""
+        messages = [
+            {
+                "role": "system",
+                "content": """You are a requirement extractor for a laptop recommendation system.
+Extract the following from user messages:
+1. Budget (in PKR) - return as {"min": X, "max": Y}
+2. Use case - one or more of: programming, gaming, studies, engineering, data_science, video_editing, graphic_design, office_work
+3. Brand preference - HP, Dell, Lenovo, ASUS, etc.
+
+Return ONLY a JSON object with these fields. If something is not mentioned, use null.
+Example: {"budget": {"min": 80000, "max": 120000}, "use_case": ["programming", "studies"], "brand_preference": "HP"}"""
+            }
+        ]
+        
+        # Add conversation history for context
+        if conversation_history:
+            for msg in conversation_history[-3:]:  # Last 3 messages
+                messages.append(msg)
+        
+        messages.append({"role": "user", "content": query})
+        return messages
+    
+    def _parse_gpt_json(self, result: str) -> Dict[str, Any]:
+        """Parse a JSON object from a GPT reply, tolerating code fences"""
+        result = result.strip()
+        
+        if result.startswith('```json'):
+            result = result.split('```json')[1].split('```')[0].strip()
+        elif result.startswith('```'):
+            result = result.split('```')[1].split('```')[0].strip()
+        
+        return json.loads(result)
+    
     def build_search_query(self, requirements: Dict[str, Any]) -> str:
         """
         Build optimized search query for vector store
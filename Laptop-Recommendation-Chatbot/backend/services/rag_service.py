@@ -1,12 +1,16 @@
 """
 Enhanced RAG service using the complete recommendation engine
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from sqlalchemy.orm import Session
 from services.recommendation_engine import RecommendationEngine
 from services.query_processor import QueryProcessor
-from openai import OpenAI
+from services.pipeline import PipelineRun
+from services.rag_sessions import create_rag_session_store
+from services.event_logger import event_logger, query_cluster
+from openai import AsyncOpenAI
 from core.config import settings
+from core.concurrency import run_blocking
 
 class RAGService:
     """Main service for RAG-based laptop recommendations"""
@@ -14,8 +18,22 @@ class RAGService:
     def __init__(self):
         self.recommendation_engine = RecommendationEngine()
         self.query_processor = QueryProcessor()
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.sessions = {}
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None
+        )
+        self.sessions = create_rag_session_store(
+            backend=settings.RAG_SESSION_BACKEND,
+            path=settings.RAG_SESSION_PATH,
+            max_entries=settings.RAG_SESSION_MAX,
+            ttl_seconds=settings.RAG_SESSION_TTL,
+            max_turns=settings.RAG_SESSION_MAX_TURNS,
+            summarize=settings.RAG_SESSION_SUMMARIZE
+        )
+    
+    def close(self):
+        """Write state kept in memory before the process exits"""
+        self.recommendation_engine.close()
     
     async def get_recommendation(
         self,
@@ -35,7 +53,8 @@ class RAGService:
             Tuple of (response_text, recommendations_list)
         """
         # Get or create conversation history
-        conversation_history = self._get_conversation_history(session_id)
+        session = await run_blocking(self.sessions.get, session_id)
+        conversation_history = session.messages
         
         # Add user message to history
         conversation_history.append({
@@ -48,7 +67,7 @@ class RAGService:
         
         if needs_recommendation:
             # Get recommendations using RAG engine
-            result = self.recommendation_engine.get_recommendations(
+            result = await self.recommendation_engine.aget_recommendations(
                 user_query=query,
                 db=db,
                 conversation_history=conversation_history,
@@ -69,39 +88,142 @@ class RAGService:
                     "role": "assistant",
                     "content": response_text
                 })
-                self.sessions[session_id] = conversation_history
+                await run_blocking(self.sessions.save, session)
                 
-                return response_text, result['recommendations']
+                return response_text, self._log_impressions(
+                    session_id, result['recommendations'], result.get('requirements_extracted', {})
+                )
             else:
                 # No results found
-                response_text = result.get('message', 'Sorry, I could not find suitable laptops.')
-                if result.get('suggestions'):
-                    response_text += "\n\n" + "\n".join(result['suggestions'])
+                response_text = self._no_results_text(result)
                 
                 conversation_history.append({
                     "role": "assistant",
                     "content": response_text
                 })
-                self.sessions[session_id] = conversation_history
+                await run_blocking(self.sessions.save, session)
                 
                 return response_text, []
         else:
             # Just conversational response
-            response_text = self._generate_chat_response(query, conversation_history)
+            response_text = await self._generate_chat_response(query, conversation_history, session.summary)
             
             conversation_history.append({
                 "role": "assistant",
                 "content": response_text
             })
-            self.sessions[session_id] = conversation_history
+            await run_blocking(self.sessions.save, session)
             
             return response_text, []
     
-    def _get_conversation_history(self, session_id: str) -> List[Dict]:
-        """Get or initialize conversation history"""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        return self.sessions[session_id]
+    async def stream_recommendation(
+        self,
+        query: str,
+        session_id: str,
+        db: Session
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a recommendation as events
+        
+        Emits "cards" with the structured laptops as soon as retrieval and
+        ranking finish, then "token" events with the generated explanation,
+        then "done" with the full response text and stage timings.
+        
+        Args:
+            query: User's message
+            session_id: Session identifier
+            db: Database session
+            
+        Yields:
+            Dictionaries with "event" and "data" keys
+        """
+        session = await run_blocking(self.sessions.get, session_id)
+        conversation_history = session.messages
+        conversation_history.append({
+            "role": "user",
+            "content": query
+        })
+        
+        run = PipelineRun()
+        
+        if self._needs_recommendation(query, conversation_history):
+            candidates = await self.recommendation_engine.aprepare_candidates(
+                query,
+                db,
+                conversation_history,
+                3,
+                run=run
+            )
+            
+            if candidates['success']:
+                run.mark("cards")
+                yield {
+                    "event": "cards",
+                    "data": {
+                        "recommendations": self._log_impressions(
+                            session_id,
+                            self.recommendation_engine.laptop_cards(candidates['top_laptops']),
+                            candidates['requirements']
+                        ),
+                        "requirements": candidates['requirements']
+                    }
+                }
+                
+                parts = []
+                with run.stage("generate"):
+                    async for text in self.recommendation_engine.astream_reasons(
+                        candidates['top_laptops'],
+                        candidates['requirements'],
+                        query,
+                        conversation_history
+                    ):
+                        if not parts:
+                            run.mark("first_token")
+                        parts.append(text)
+                        yield {"event": "token", "data": {"text": text}}
+                response_text = "".join(parts)
+            else:
+                response_text = self._no_results_text(candidates)
+                yield {"event": "token", "data": {"text": response_text}}
+        else:
+            response_text = await self._generate_chat_response(query, conversation_history, session.summary)
+            yield {"event": "token", "data": {"text": response_text}}
+        
+        conversation_history.append({
+            "role": "assistant",
+            "content": response_text
+        })
+        await run_blocking(self.sessions.save, session)
+        
+        yield {
+            "event": "done",
+            "data": {
+                "session_id": session_id,
+                "response": response_text,
+                "stage_timings_ms": run.summary()
+            }
+        }
+    
+    def _log_impressions(
+        self,
+        session_id: str,
+        recommendations: List[Dict[str, Any]],
+        requirements: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Queue impressions for the shown laptops and tag them with impression IDs"""
+        budget = requirements.get('budget') or {}
+        return event_logger.log_impressions(
+            session_id,
+            recommendations,
+            query_cluster(requirements.get('use_case'), budget.get('max'))
+        )
+    
+    def _no_results_text(self, result: Dict[str, Any]) -> str:
+        """Response text for a failed recommendation lookup"""
+        response_text = result.get('message', 'Sorry, I could not find suitable laptops.')
+        if result.get('suggestions'):
+            response_text += "\n\n" + "\n".join(result['suggestions'])
+        return response_text
     
     def _needs_recommendation(self, query: str, history: List[Dict]) -> bool:
         """Determine if user is asking for recommendations"""
@@ -170,10 +292,11 @@ class RAGService:
         
         return "".join(response_parts)
     
-    def _generate_chat_response(
+    async def _generate_chat_response(
         self,
         query: str,
-        conversation_history: List[Dict]
+        conversation_history: List[Dict],
+        summary: Optional[str] = None
     ) -> str:
         """Generate conversational response for non-recommendation queries"""
         
@@ -191,10 +314,17 @@ Be conversational and helpful. Guide them towards providing enough information f
                 }
             ]
             
+            # Earlier turns trimmed from the session
+            if summary:
+                messages.append({
+                    "role": "system",
+                    "content": f"Earlier in this conversation the user said: {summary}"
+                })
+            
             # Add conversation history
             messages.extend(conversation_history[-5:])  # Last 5 messages
             
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-4",
                 messages=messages,
                 temperature=0.8,
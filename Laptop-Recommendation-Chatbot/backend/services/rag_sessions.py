@@ -0,0 +1,320 @@
+"""
+Bounded conversation memory for the RAG chat flow
+Sessions expire when idle, keep a capped number of turns and can fold older turns into a summary
+"""
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+import json
+import sqlite3
+import threading
+import time
+
+class RAGSession:
+    """Messages and running summary of one conversation"""
+    
+    def __init__(
+        self,
+        session_id: str,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        summary: Optional[str] = None
+    ):
+        self.session_id = session_id
+        self.messages: List[Dict[str, Any]] = list(messages or [])
+        self.summary = summary
+    
+    def to_record(self) -> Dict[str, Any]:
+        return {"messages": self.messages, "summary": self.summary}
+
+class MemorySessionBackend:
+    """In-process LRU of session records"""
+    
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        # session_id -> (touched_at, record)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def load(self, session_id: str) -> Optional[tuple]:
+        """Return (touched_at, record) or None"""
+        # Reads don't reorder: every request that loads a session saves it,
+        # which keeps LRU order equal to touch order for purge()
+        return self._entries.get(session_id)
+    
+    def store(self, session_id: str, record: Dict[str, Any]) -> int:
+        """
+        Save a record
+        
+        Returns:
+            Number of sessions evicted to stay within max_entries
+        """
+        with self._lock:
+            self._entries[session_id] = (time.time(), record)
+            self._entries.move_to_end(session_id)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+    
+    def delete(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+    
+    def purge(self, idle_before: float) -> int:
+        """Drop sessions last touched before a timestamp"""
+        with self._lock:
+            expired = 0
+            while self._entries:
+                session_id, (touched_at, _) = next(iter(self._entries.items()))
+                if touched_at >= idle_before:
+                    break
+                del self._entries[session_id]
+                expired += 1
+            return expired
+    
+    def count(self) -> int:
+        return len(self._entries)
+
+class SQLiteSessionBackend:
+    """
+    Session records in a SQLite file, shared by every worker on the host
+    
+    The row count is kept in memory and only re-read from the table when it
+    passes max_entries, and on each purge() sweep, which picks up sessions
+    other workers added or removed.
+    """
+    
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._rows: Optional[int] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rag_sessions ("
+            "session_id TEXT PRIMARY KEY, record TEXT NOT NULL, touched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_rag_sessions_touched_at ON rag_sessions (touched_at)"
+        )
+        self._conn.commit()
+    
+    def load(self, session_id: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT touched_at, record FROM rag_sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+    
+    def store(self, session_id: str, record: Dict[str, Any]) -> int:
+        payload = json.dumps(record)
+        now = time.time()
+        with self._lock, self._conn:
+            # Most saves update a known session; only new ones change the count
+            updated = self._conn.execute(
+                "UPDATE rag_sessions SET record = ?, touched_at = ? WHERE session_id = ?",
+                (payload, now, session_id)
+            ).rowcount
+            if updated:
+                return 0
+            
+            # Another worker may have inserted the session since the UPDATE
+            self._conn.execute(
+                "INSERT INTO rag_sessions (session_id, record, touched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET record = excluded.record, touched_at = excluded.touched_at",
+                (session_id, payload, now)
+            )
+            if self._rows is None:
+                self._rows = self._count()
+            else:
+                self._rows += 1
+            if self._rows <= self.max_entries:
+                return 0
+            
+            self._rows = self._count()
+            overflow = self._rows - self.max_entries
+            if overflow <= 0:
+                return 0
+            self._conn.execute(
+                "DELETE FROM rag_sessions WHERE session_id IN "
+                "(SELECT session_id FROM rag_sessions ORDER BY touched_at LIMIT ?)",
+                (overflow,)
+            )
+            self._rows -= overflow
+            return overflow
+    
+    def delete(self, session_id: str):
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM rag_sessions WHERE session_id = ?", (session_id,)).rowcount
+            if self._rows is not None:
+                self._rows -= deleted
+    
+    def purge(self, idle_before: float) -> int:
+        with self._lock, self._conn:
+            expired = self._conn.execute(
+                "DELETE FROM rag_sessions WHERE touched_at < ?", (idle_before,)
+            ).rowcount
+            self._rows = self._count()
+            return expired
+    
+    def count(self) -> int:
+        with self._lock:
+            self._rows = self._count()
+            return self._rows
+    
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM rag_sessions").fetchone()[0]
+
+def extractive_summary(
+    previous: Optional[str],
+    dropped: List[Dict[str, Any]],
+    max_chars: int = 600
+) -> str:
+    """
+    Summarize dropped turns without a model call
+    
+    Keeps what the user asked for (budget, use case, brands usually live in
+    user messages), newest last, trimmed from the front to max_chars.
+    
+    Args:
+        previous: Summary of turns dropped earlier
+        dropped: Turns being removed from the session
+        max_chars: Maximum summary length
+    
+    Returns:
+        Updated summary
+    """
+    parts = [previous] if previous else []
+    parts.extend(msg["content"].strip() for msg in dropped if msg.get("role") == "user")
+    summary = " | ".join(part for part in parts if part)
+    return summary[-max_chars:]
+
+class RAGSessionStore:
+    """
+    Bounded session map for RAGService
+    
+    Sessions are evicted least recently used once max_entries is reached and
+    expire after ttl_seconds without a message. Each keeps at most max_turns
+    messages; older ones go to the summarizer (or are dropped without one).
+    """
+    
+    # Seconds between sweeps for idle sessions
+    PURGE_INTERVAL = 60
+    
+    def __init__(
+        self,
+        backend: Optional[Any] = None,
+        ttl_seconds: float = 3600,
+        max_turns: int = 20,
+        summarizer: Optional[Callable[[Optional[str], List[Dict[str, Any]]], str]] = None
+    ):
+        """
+        Args:
+            backend: MemorySessionBackend or SQLiteSessionBackend (default in-memory)
+            ttl_seconds: Idle time after which a session is forgotten
+            max_turns: Messages kept per session
+            summarizer: Called with (previous_summary, dropped_messages) when trimming
+        """
+        self.backend = backend or MemorySessionBackend()
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self.summarizer = summarizer
+        self._last_purge = time.time()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.summarized_turns = 0
+    
+    def get(self, session_id: str) -> RAGSession:
+        """Return the session, or a new empty one if unknown or expired"""
+        self._maybe_purge()
+        entry = self.backend.load(session_id)
+        
+        if entry is not None and entry[0] < time.time() - self.ttl_seconds:
+            self.backend.delete(session_id)
+            self.expirations += 1
+            entry = None
+        
+        if entry is None:
+            self.misses += 1
+            return RAGSession(session_id)
+        
+        self.hits += 1
+        record = entry[1]
+        return RAGSession(session_id, record.get("messages"), record.get("summary"))
+    
+    def save(self, session: RAGSession):
+        """Trim the session to max_turns and store it"""
+        overflow = len(session.messages) - self.max_turns
+        if overflow > 0:
+            dropped = session.messages[:overflow]
+            session.messages = session.messages[overflow:]
+            if self.summarizer is not None:
+                session.summary = self.summarizer(session.summary, dropped)
+                self.summarized_turns += len(dropped)
+        
+        self.evictions += self.backend.store(session.session_id, session.to_record())
+    
+    def delete(self, session_id: str):
+        self.backend.delete(session_id)
+    
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < self.PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        self.expirations += self.backend.purge(now - self.ttl_seconds)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "sessions": self.backend.count(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "summarized_turns": self.summarized_turns
+        }
+
+def create_rag_session_store(
+    backend: str = "memory",
+    path: str = "",
+    max_entries: int = 10000,
+    ttl_seconds: float = 3600,
+    max_turns: int = 20,
+    summarize: bool = True
+) -> RAGSessionStore:
+    """
+    Build a session store from settings values
+    
+    Args:
+        backend: "memory" or "sqlite"
+        path: SQLite file for the sqlite backend
+        max_entries: Sessions kept before LRU eviction
+        ttl_seconds: Idle expiry
+        max_turns: Messages kept per session
+        summarize: Fold trimmed turns into an extractive summary
+    """
+    if backend == "memory":
+        store_backend = MemorySessionBackend(max_entries)
+    elif backend == "sqlite":
+        store_backend = SQLiteSessionBackend(path or "./rag_sessions.db", max_entries)
+    else:
+        raise ValueError(f"Unknown RAG session backend: {backend}")
+    
+    return RAGSessionStore(
+        store_backend,
+        ttl_seconds=ttl_seconds,
+        max_turns=max_turns,
+        summarizer=extractive_summary if summarize else None
+    )
@@ -2,22 +2,58 @@
 Complete RAG-based recommendation engine
 Combines vector search, filtering, and GPT-4 generation
 """
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterator, AsyncIterator
 from sqlalchemy.orm import Session
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from core.config import settings
+from core.concurrency import run_blocking
 from services.vector_store_service import VectorStoreService
 from services.query_processor import QueryProcessor
+from services.response_cache import ResponseCache
+from services.pipeline import PipelineRun
+from services.catalogue_snapshot import CatalogueSnapshot, catalogue_snapshots
+from services.popularity import popularity_priors
 from models.database import Laptop
 import json
 
+ADVISOR_SYSTEM_PROMPT = """You are an expert laptop advisor for Pakistani students and professionals.
+Your task is to explain why each laptop is recommended based on the user's needs.
+
+For each laptop, provide:
+1. A personalized reason (2-3 sentences) explaining why it's suitable
+2. Key strengths specific to their use case
+3. Any considerations they should know
+
+Be conversational, helpful, and specific. Mention Pakistani context (prices in PKR, local availability).
+Focus on value for money and practical benefits."""
+
 class RecommendationEngine:
     """RAG-based laptop recommendation engine"""
     
     def __init__(self):
         self.vector_store = VectorStoreService()
         self.query_processor = QueryProcessor()
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None
+        )
+        self.async_client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None
+        )
+        
+        # Generated explanations, dropped when a cached laptop changes
+        self.response_cache = ResponseCache(
+            max_entries=settings.RESPONSE_CACHE_SIZE,
+            ttl_seconds=settings.RESPONSE_CACHE_TTL,
+            persist_path=settings.RESPONSE_CACHE_PATH or None,
+            save_interval=settings.RESPONSE_CACHE_SAVE_INTERVAL
+        )
+        self.vector_store.add_change_listener(self.response_cache.invalidate_laptop)
+    
+    def close(self):
+        """Write unsaved cached responses"""
+        self.response_cache.close()
     
     def get_recommendations(
         self,
@@ -36,63 +72,87 @@ class RecommendationEngine:
             n_results: Number of recommendations to return
             
         Returns:
-            Dictionary with recommendations and explanation
+            Dictionary with recommendations, explanation, per-stage
+            timings in stage_timings_ms and whether speculative retrieval
+            was used in stage_outcomes
         """
+        run = PipelineRun()
+        
         try:
-            # Step 1: Extract requirements from query
-            requirements = self.query_processor.extract_requirements(
+            # Steps 1-6: Requirements, retrieval and ranking
+            candidates = self.prepare_candidates(
                 user_query,
-                conversation_history
-            )
-            
-            # Step 2: Build optimized search query
-            search_query = self.query_processor.build_search_query(requirements)
-            
-            # Step 3: Retrieve similar laptops from vector store
-            vector_results = self.vector_store.search(
-                query=search_query,
-                n_results=10  # Get more for filtering
+                db,
+                conversation_history,
+                n_results,
+                run=run
             )
             
-            if not vector_results:
-                return self._handle_no_results(user_query, requirements)
+            if not candidates['success']:
+                return {**candidates, "stage_timings_ms": run.summary(), "stage_outcomes": run.outcomes}
             
-            # Step 4: Get full laptop details from database
-            laptop_ids = [result['laptop_id'] for result in vector_results]
-            laptops = db.query(Laptop).filter(Laptop.id.in_(laptop_ids)).all()
+            # Step 7: Generate personalized recommendations with GPT-4
+            with run.stage("generate"):
+                recommendations = self._generate_recommendations(
+                    candidates['top_laptops'],
+                    candidates['requirements'],
+                    user_query,
+                    conversation_history
+                )
             
-            # Create lookup for similarity scores
-            similarity_scores = {
-                result['laptop_id']: result['similarity_score']
-                for result in vector_results
+            return {
+                "success": True,
+                "recommendations": recommendations,
+                "requirements_extracted": candidates['requirements'],
+                "search_query_used": candidates['search_query'],
+                "stage_timings_ms": run.summary(),
+                "stage_outcomes": run.outcomes
             }
             
-            # Step 5: Filter by requirements
-            filtered_laptops = self._filter_laptops(
-                laptops,
-                requirements,
-                similarity_scores
+        except Exception as e:
+            print(f"Error in recommendation engine: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "recommendations": []
+            }
+    
+    async def aget_recommendations(
+        self,
+        user_query: str,
+        db: Session,
+        conversation_history: Optional[List[Dict]] = None,
+        n_results: int = 3
+    ) -> Dict[str, Any]:
+        """Async version of get_recommendations; ORM work runs on the blocking pool"""
+        run = PipelineRun()
+        
+        try:
+            candidates = await self.aprepare_candidates(
+                user_query,
+                db,
+                conversation_history,
+                n_results,
+                run=run
             )
             
-            if not filtered_laptops:
-                return self._handle_no_results(user_query, requirements)
+            if not candidates['success']:
+                return {**candidates, "stage_timings_ms": run.summary(), "stage_outcomes": run.outcomes}
             
-            # Step 6: Rank and select top N
-            top_laptops = filtered_laptops[:n_results]
-            
-            # Step 7: Generate personalized recommendations with GPT-4
-            recommendations = self._generate_recommendations(
-                top_laptops,
-                requirements,
+            recommendations = await run.run("generate", self._agenerate_recommendations(
+                candidates['top_laptops'],
+                candidates['requirements'],
                 user_query,
                 conversation_history
-            )
+            ))
             
             return {
                 "success": True,
                 "recommendations": recommendations,
-                "requirements_extracted": requirements,
-                "search_query_used": search_query
+                "requirements_extracted": candidates['requirements'],
+                "search_query_used": candidates['search_query'],
+                "stage_timings_ms": run.summary(),
+                "stage_outcomes": run.outcomes
             }
             
         except Exception as e:
@@ -103,117 +163,299 @@ class RecommendationEngine:
                 "recommendations": []
             }
     
-    def _filter_laptops(
+    def prepare_candidates(
         self,
-        laptops: List[Laptop],
-        requirements: Dict[str, Any],
-        similarity_scores: Dict[int, float]
-    ) -> List[Tuple[Laptop, float, float]]:
+        user_query: str,
+        db: Session,
+        conversation_history: Optional[List[Dict]] = None,
+        n_results: int = 3,
+        run: Optional[PipelineRun] = None
+    ) -> Dict[str, Any]:
         """
-        Filter and score laptops based on requirements
+        Extract requirements, retrieve and rank laptops, without the GPT-4 step
+        
+        When GPT has to fill in missing requirements, retrieval starts
+        speculatively on a background thread with the search query and
+        filters from the regex-only requirements. Its results are kept
+        unless GPT changes the search query or filters, in which case
+        retrieval runs again.
         
+        Args:
+            user_query: User's natural language query
+            db: Database session
+            conversation_history: Previous conversation for context
+            n_results: Number of laptops to keep
+            run: Optional PipelineRun that records stage timings
+            
         Returns:
-            List of (laptop, similarity_score, requirement_score) tuples
+            Dictionary with success, requirements, search_query and
+            top_laptops as (laptop, similarity_score, requirement_score)
+            tuples, or the no-results response
         """
-        scored_laptops = []
+        run = run or PipelineRun()
         
-        for laptop in laptops:
-            # Get similarity score
-            similarity = similarity_scores.get(laptop.id, 0.0)
-            
-            # Calculate requirement match score
-            req_score = self._calculate_requirement_score(laptop, requirements)
-            
-            # Budget filter (hard constraint)
-            if requirements.get('budget'):
-                budget = requirements['budget']
-                if budget.get('min') and laptop.price_pkr < budget['min']:
-                    continue
-                if budget.get('max') and laptop.price_pkr > budget['max']:
-                    continue
-            
-            # Combined score (weighted)
-            combined_score = (similarity * 0.6) + (req_score * 0.4)
+        # Step 1: Extract requirements from query
+        with run.stage("extract_rules"):
+            requirements = self.query_processor.extract_local_requirements(user_query)
+        
+        vector_results = None
+        
+        if self.query_processor.needs_gpt_extraction(requirements):
+            speculative_query = self.query_processor.build_search_query(requirements)
+            speculative_filters = self._build_search_filters(requirements)
+            speculative = run.submit(
+                "speculative_retrieval",
+                self.vector_store.search,
+                query=speculative_query,
+                n_results=10,
+                filters=speculative_filters,
+                lexical_query=user_query
+            )
             
-            scored_laptops.append((laptop, similarity, combined_score))
+            try:
+                with run.stage("extract_gpt"):
+                    gpt_extracted = self.query_processor.extract_with_gpt(user_query, conversation_history)
+            except BaseException:
+                run.discard(speculative)
+                raise
+            requirements = self.query_processor.merge_gpt_requirements(requirements, gpt_extracted)
+            speculative = self._reconcile_speculative(run, speculative, speculative_query, speculative_filters, requirements)
+            if speculative is not None:
+                vector_results = speculative.result()
         
-        # Sort by combined score
-        scored_laptops.sort(key=lambda x: x[2], reverse=True)
+        # Step 2: Build optimized search query
+        search_query = self.query_processor.build_search_query(requirements)
         
-        return scored_laptops
+        # Step 3: Retrieve similar laptops from vector store
+        # Hard constraints are applied inside the index before top-k
+        if vector_results is None:
+            with run.stage("retrieval"):
+                vector_results = self.vector_store.search(
+                    query=search_query,
+                    n_results=10,  # Candidates for re-ranking
+                    filters=self._build_search_filters(requirements),
+                    lexical_query=user_query
+                )
+        
+        if not vector_results:
+            return self._handle_no_results(user_query, requirements)
+        
+        # Step 4: Get full laptop details from database
+        with run.stage("fetch_laptops"):
+            laptops = self._fetch_laptops(db, vector_results)
+        
+        # Steps 5-6: Score by requirements, rank and select top N
+        with run.stage("rank"):
+            return self._rank_candidates(
+                user_query,
+                requirements,
+                search_query,
+                vector_results,
+                laptops,
+                n_results
+            )
     
-    def _calculate_requirement_score(
+    async def aprepare_candidates(
         self,
-        laptop: Laptop,
+        user_query: str,
+        db: Session,
+        conversation_history: Optional[List[Dict]] = None,
+        n_results: int = 3,
+        run: Optional[PipelineRun] = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of prepare_candidates, run as a staged pipeline
+        
+        When GPT has to fill in missing requirements, retrieval starts
+        speculatively with the search query and filters from the regex-only
+        requirements. Its results are kept unless GPT changes the search
+        query or filters, in which case retrieval runs again.
+        """
+        run = run or PipelineRun()
+        
+        with run.stage("extract_rules"):
+            requirements = self.query_processor.extract_local_requirements(user_query)
+        
+        vector_results = None
+        
+        if self.query_processor.needs_gpt_extraction(requirements):
+            speculative_query = self.query_processor.build_search_query(requirements)
+            speculative_filters = self._build_search_filters(requirements)
+            speculative = run.start("speculative_retrieval", self.vector_store.asearch(
+                query=speculative_query,
+                n_results=10,
+                filters=speculative_filters,
+                lexical_query=user_query
+            ))
+            
+            try:
+                gpt_extracted = await run.run("extract_gpt", self.query_processor.aextract_with_gpt(
+                    user_query,
+                    conversation_history
+                ))
+            except BaseException:
+                run.discard(speculative)
+                raise
+            requirements = self.query_processor.merge_gpt_requirements(requirements, gpt_extracted)
+            speculative = self._reconcile_speculative(run, speculative, speculative_query, speculative_filters, requirements)
+            if speculative is not None:
+                vector_results = await speculative
+        
+        search_query = self.query_processor.build_search_query(requirements)
+        
+        if vector_results is None:
+            vector_results = await run.run("retrieval", self.vector_store.asearch(
+                query=search_query,
+                n_results=10,
+                filters=self._build_search_filters(requirements),
+                lexical_query=user_query
+            ))
+        
+        if not vector_results:
+            return self._handle_no_results(user_query, requirements)
+        
+        laptops = await run.run(
+            "fetch_laptops",
+            run_blocking(self._fetch_laptops_released, db, vector_results)
+        )
+        
+        with run.stage("rank"):
+            return self._rank_candidates(
+                user_query,
+                requirements,
+                search_query,
+                vector_results,
+                laptops,
+                n_results
+            )
+    
+    def _reconcile_speculative(
+        self,
+        run: PipelineRun,
+        speculative: Any,
+        speculative_query: str,
+        speculative_filters: Optional[Dict[str, Any]],
         requirements: Dict[str, Any]
-    ) -> float:
-        """Calculate how well laptop matches requirements (0-1)"""
-        score = 0.0
-        total_weight = 0.0
-        
-        # Use case match (weight: 0.4)
-        if requirements.get('use_case'):
-            use_cases = requirements['use_case']
-            if isinstance(use_cases, str):
-                use_cases = [use_cases]
-            
-            # Map use cases to ideal_for categories
-            use_case_mapping = {
-                "programming": ["Programming", "CS Student", "Software Development"],
-                "gaming": ["Gaming"],
-                "studies": ["FSC Student", "CS Student", "Office Work"],
-                "engineering": ["Engineering"],
-                "data_science": ["Data Science", "Machine Learning"],
-                "video_editing": ["Video Editing", "Content Creation"],
-                "graphic_design": ["Graphic Design"],
-                "office_work": ["Office Work", "Business"]
-            }
-            
-            match_count = 0
-            for use_case in use_cases:
-                mapped_categories = use_case_mapping.get(use_case, [])
-                for category in mapped_categories:
-                    if category in laptop.ideal_for:
-                        match_count += 1
-                        break
-            
-            if use_cases:
-                score += (match_count / len(use_cases)) * 0.4
-            total_weight += 0.4
+    ) -> Any:
+        """
+        Keep speculative retrieval only if GPT changed neither the search query nor the filters
         
-        # Brand preference (weight: 0.2)
-        if requirements.get('brand_preference'):
-            if laptop.brand == requirements['brand_preference']:
-                score += 0.2
-            total_weight += 0.2
-        
-        # RAM preference (weight: 0.2)
-        if requirements.get('ram_preference'):
-            if laptop.ram_gb >= requirements['ram_preference']:
-                score += 0.2
-            elif laptop.ram_gb >= requirements['ram_preference'] * 0.75:
-                score += 0.1
-            total_weight += 0.2
-        
-        # Storage preference (weight: 0.2)
-        if requirements.get('storage_preference'):
-            storage_pref = requirements['storage_preference']
-            
-            if storage_pref.get('type'):
-                if laptop.storage_type == storage_pref['type']:
-                    score += 0.1
-            
-            if storage_pref.get('size_gb'):
-                if laptop.storage_gb >= storage_pref['size_gb']:
-                    score += 0.1
-            
-            total_weight += 0.2
+        Returns:
+            The speculative task or future to wait on, or None once it is discarded
+        """
+        if (self.query_processor.build_search_query(requirements) == speculative_query
+                and self._build_search_filters(requirements) == speculative_filters):
+            run.outcome("speculative_retrieval", "used")
+            return speculative
+        run.discard(speculative)
+        run.outcome("speculative_retrieval", "discarded")
+        return None
+    
+    def _fetch_laptops(self, db: Session, vector_results: List[Dict[str, Any]]) -> List[Laptop]:
+        """Load full laptop rows for vector search hits"""
+        laptop_ids = [result['laptop_id'] for result in vector_results]
+        laptops = db.query(Laptop).filter(Laptop.id.in_(laptop_ids)).all()
+        
+        # Rebuild the catalogue snapshot if the catalogue changed (and reload
+        # stale popularity priors) here, while we still hold a session
+        catalogue_snapshots.get(db)
+        if settings.POPULARITY_PRIOR_WEIGHT:
+            popularity_priors.get(db)
+        return laptops
+    
+    def _fetch_laptops_released(self, db: Session, vector_results: List[Dict[str, Any]]) -> List[Laptop]:
+        """
+        Fetch laptops and hand the pooled connection back straight away
+        
+        The rows are detached and the read transaction ended, so a chat
+        waiting on GPT-4 does not hold one of the pool's connections.
+        """
+        laptops = self._fetch_laptops(db, vector_results)
+        for laptop in laptops:
+            db.expunge(laptop)
+        db.rollback()
+        return laptops
+    
+    def _rank_candidates(
+        self,
+        user_query: str,
+        requirements: Dict[str, Any],
+        search_query: str,
+        vector_results: List[Dict[str, Any]],
+        laptops: List[Laptop],
+        n_results: int
+    ) -> Dict[str, Any]:
+        """Score retrieved laptops against requirements and keep the top N"""
+        # Create lookup for similarity scores
+        similarity_scores = {
+            result['laptop_id']: result['similarity_score']
+            for result in vector_results
+        }
+        
+        # Score by requirements
+        filtered_laptops = self._filter_laptops(
+            laptops,
+            requirements,
+            similarity_scores
+        )
+        
+        if not filtered_laptops:
+            return self._handle_no_results(user_query, requirements)
+        
+        # Rank and select top N
+        return {
+            "success": True,
+            "requirements": requirements,
+            "search_query": search_query,
+            "top_laptops": filtered_laptops[:n_results]
+        }
+    
+    def _build_search_filters(self, requirements: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Translate hard constraints into vector store filters"""
+        filters = {}
+        
+        if requirements.get('budget'):
+            budget = requirements['budget']
+            if budget.get('min'):
+                filters['min_price'] = budget['min']
+            if budget.get('max'):
+                filters['max_price'] = budget['max']
+        
+        return filters or None
+    
+    def _filter_laptops(
+        self,
+        laptops: List[Laptop],
+        requirements: Dict[str, Any],
+        similarity_scores: Dict[int, float]
+    ) -> List[Tuple[Laptop, float, float]]:
+        """
+        Score and rank laptops based on requirements
+        
+        Scoring runs over the catalogue snapshot's columns, refreshed by
+        _fetch_laptops when the catalogue version moves; laptops it does not
+        cover (e.g. added since) get a snapshot of their own.
         
-        # Normalize score
-        if total_weight > 0:
-            return score / total_weight
+        Returns:
+            List of (laptop, similarity_score, combined_score) tuples
+        """
+        laptop_by_id = {laptop.id: laptop for laptop in laptops}
         
-        return 0.5  # Default neutral score
+        snapshot = catalogue_snapshots.current()
+        if snapshot is None or not snapshot.covers(laptop_by_id):
+            snapshot = CatalogueSnapshot(laptops)
+        
+        return [
+            (laptop_by_id[laptop_id], similarity, combined_score)
+            for laptop_id, similarity, combined_score
+            in snapshot.rank(
+                list(laptop_by_id),
+                similarity_scores,
+                requirements,
+                priors=popularity_priors.current(),
+                prior_weight=settings.POPULARITY_PRIOR_WEIGHT
+            )
+        ]
     
     def _generate_recommendations(
         self,
@@ -222,40 +464,107 @@ class RecommendationEngine:
         user_query: str,
         conversation_history: Optional[List[Dict]] = None
     ) -> List[Dict[str, Any]]:
-        """Generate personalized recommendations with GPT-4"""
+        """Generate personalized recommendations with GPT-4, reusing cached answers"""
         
         # Prepare laptop data for GPT
-        laptops_data = []
-        for rank, (laptop, similarity, score) in enumerate(laptops, 1):
-            laptops_data.append({
-                "rank": rank,
-                "id": laptop.id,
-                "brand": laptop.brand,
-                "model": laptop.model,
-                "cpu": laptop.cpu,
-                "ram_gb": laptop.ram_gb,
-                "storage": f"{laptop.storage_gb}GB {laptop.storage_type}",
-                "gpu": laptop.gpu,
-                "display_size": laptop.display_size,
-                "price_pkr": laptop.price_pkr,
-                "battery_hours": laptop.battery_hours,
-                "weight_kg": laptop.weight_kg,
-                "ideal_for": laptop.ideal_for,
-                "similarity_score": round(similarity, 3)
-            })
+        laptops_data = self.laptop_cards(laptops)
         
-        # Build GPT prompt
-        system_prompt = """You are an expert laptop advisor for Pakistani students and professionals.
-Your task is to explain why each laptop is recommended based on the user's needs.
-
-For each laptop, provide:
-1. A personalized reason (2-3 sentences) explaining why it's suitable
-2. Key strengths specific to their use case
-3. Any considerations they should know
-
-Be conversational, helpful, and specific. Mention Pakistani context (prices in PKR, local availability).
-Focus on value for money and practical benefits."""
+        cache_key = self._response_cache_key(laptops, requirements)
+        cached = self._cached_recommendations(cache_key, laptops_data)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4",
+                messages=self._recommendation_messages(laptops_data, requirements, user_query, conversation_history),
+                temperature=0.7,
+                max_tokens=1500
+            )
+            
+            return self._store_recommendations(cache_key, response.choices[0].message.content, laptops_data)
+            
+        except Exception as e:
+            print(f"Error generating GPT recommendations: {e}")
+            return self._fallback_recommendations(laptops_data)
+    
+    async def _agenerate_recommendations(
+        self,
+        laptops: List[Tuple[Laptop, float, float]],
+        requirements: Dict[str, Any],
+        user_query: str,
+        conversation_history: Optional[List[Dict]] = None
+    ) -> List[Dict[str, Any]]:
+        """Async version of _generate_recommendations"""
+        
+        laptops_data = self.laptop_cards(laptops)
+        
+        cache_key = self._response_cache_key(laptops, requirements)
+        cached = self._cached_recommendations(cache_key, laptops_data)
+        if cached is not None:
+            return cached
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                model="gpt-4",
+                messages=self._recommendation_messages(laptops_data, requirements, user_query, conversation_history),
+                temperature=0.7,
+                max_tokens=1500
+            )
+            
+            return self._store_recommendations(cache_key, response.choices[0].message.content, laptops_data)
+            
+        except Exception as e:
+            print(f"Error generating GPT recommendations: {e}")
+            return self._fallback_recommendations(laptops_data)
+    
+    def _response_cache_key(
+        self,
+        laptops: List[Tuple[Laptop, float, float]],
+        requirements: Dict[str, Any]
+    ) -> str:
+        return ResponseCache.make_key(
+            requirements,
+            [laptop.id for laptop, _, _ in laptops],
+            self.vector_store.catalogue_version,
+            prices=[laptop.price_pkr for laptop, _, _ in laptops]
+        )
+    
+    def _cached_recommendations(
+        self,
+        cache_key: str,
+        laptops_data: List[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Cached reasons merged onto cards built from the rows just fetched
+        
+        Only the generated text is cached, so specs shown with a cached
+        answer are as current as the database.
+        """
+        reasons = self.response_cache.get(cache_key)
+        if reasons is None:
+            return None
         
+        card_by_id = {card['id']: card for card in laptops_data}
+        return [
+            {
+                **card_by_id[reason['laptop_id']],
+                "reason": reason['reason'],
+                "key_strengths": reason['key_strengths'],
+                "considerations": reason['considerations']
+            }
+            for reason in reasons
+            if reason['laptop_id'] in card_by_id
+        ]
+    
+    def _recommendation_messages(
+        self,
+        laptops_data: List[Dict[str, Any]],
+        requirements: Dict[str, Any],
+        user_query: str,
+        conversation_history: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """Build the GPT-4 prompt asking for JSON recommendations"""
         user_prompt = f"""User Query: {user_query}
 
 Extracted Requirements:
@@ -275,67 +584,217 @@ Please provide personalized recommendations for each laptop. Return a JSON array
   }}
 ]"""
         
-        try:
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            # Add conversation context
-            if conversation_history:
-                for msg in conversation_history[-3:]:
-                    messages.append(msg)
+        messages = [{"role": "system", "content": ADVISOR_SYSTEM_PROMPT}]
+        
+        # Add conversation context
+        if conversation_history:
+            for msg in conversation_history[-3:]:
+                messages.append(msg)
+        
+        messages.append({"role": "user", "content": user_prompt})
+        return messages
+    
+    def _store_recommendations(
+        self,
+        cache_key: str,
+        result: str,
+        laptops_data: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Parse the GPT-4 JSON reply, merge it with laptop data and cache the reasons"""
+        result = result.strip()
+        
+        # Parse JSON response
+        if result.startswith('```json'):
+            result = result.split('```json')[1].split('```')[0].strip()
+        elif result.startswith('```'):
+            result = result.split('```')[1].split('```')[0].strip()
+        
+        gpt_recommendations = json.loads(result)
+        
+        # Merge with laptop data
+        final_recommendations = []
+        for gpt_rec in gpt_recommendations:
+            laptop_id = gpt_rec['laptop_id']
+            
+            # Find matching laptop
+            laptop_data = next(
+                (l for l in laptops_data if l['id'] == laptop_id),
+                None
+            )
             
-            messages.append({"role": "user", "content": user_prompt})
+            if laptop_data:
+                final_recommendations.append({
+                    **laptop_data,
+                    "reason": gpt_rec.get('reason', ''),
+                    "key_strengths": gpt_rec.get('key_strengths', []),
+                    "considerations": gpt_rec.get('considerations', '')
+                })
+        
+        # Fallback answers are never cached
+        self.response_cache.set(
+            cache_key,
+            [
+                {
+                    "laptop_id": rec['id'],
+                    "reason": rec['reason'],
+                    "key_strengths": rec['key_strengths'],
+                    "considerations": rec['considerations']
+                }
+                for rec in final_recommendations
+            ],
+            [l['id'] for l in laptops_data]
+        )
+        
+        return final_recommendations
+    
+    def _fallback_recommendations(self, laptops_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Basic recommendations used when GPT-4 fails"""
+        return [
+            {
+                **laptop_data,
+                "reason": self._fallback_reason(laptop_data),
+                "key_strengths": laptop_data['ideal_for'],
+                "considerations": "Check local availability and warranty."
+            }
+            for laptop_data in laptops_data
+        ]
+    
+    def laptop_cards(self, laptops: List[Tuple[Laptop, float, float]]) -> List[Dict[str, Any]]:
+        """Structured laptop data shown to the user and passed to GPT"""
+        return [
+            {
+                "rank": rank,
+                "id": laptop.id,
+                "brand": laptop.brand,
+                "model": laptop.model,
+                "cpu": laptop.cpu,
+                "ram_gb": laptop.ram_gb,
+                "storage": f"{laptop.storage_gb}GB {laptop.storage_type}",
+                "gpu": laptop.gpu,
+                "display_size": laptop.display_size,
+                "price_pkr": laptop.price_pkr,
+                "battery_hours": laptop.battery_hours,
+                "weight_kg": laptop.weight_kg,
+                "ideal_for": laptop.ideal_for,
+                "similarity_score": round(similarity, 3)
+            }
+            for rank, (laptop, similarity, score) in enumerate(laptops, 1)
+        ]
+    
+    def stream_reasons(
+        self,
+        laptops: List[Tuple[Laptop, float, float]],
+        requirements: Dict[str, Any],
+        user_query: str,
+        conversation_history: Optional[List[Dict]] = None
+    ) -> Iterator[str]:
+        """
+        Stream the explanation for ranked laptops as plain text chunks
+        
+        Cached answers from _generate_recommendations are replayed instead
+        of calling GPT-4.
+        
+        Args:
+            laptops: Ranked (laptop, similarity_score, requirement_score) tuples
+            requirements: Extracted requirements
+            user_query: User's message
+            conversation_history: Previous conversation for context
             
-            response = self.client.chat.completions.create(
+        Yields:
+            Text chunks as they are generated
+        """
+        laptops_data = self.laptop_cards(laptops)
+        
+        cached = self._cached_recommendations(self._response_cache_key(laptops, requirements), laptops_data)
+        if cached is not None:
+            yield from self._reason_paragraphs(cached)
+            return
+        
+        try:
+            stream = self.client.chat.completions.create(
                 model="gpt-4",
-                messages=messages,
+                messages=self._reasons_messages(laptops_data, requirements, user_query, conversation_history),
                 temperature=0.7,
-                max_tokens=1500
+                max_tokens=1500,
+                stream=True
             )
             
-            result = response.choices[0].message.content.strip()
-            
-            # Parse JSON response
-            if result.startswith('```json'):
-                result = result.split('```json')[1].split('```')[0].strip()
-            elif result.startswith('```'):
-                result = result.split('```')[1].split('```')[0].strip()
-            
-            gpt_recommendations = json.loads(result)
-            
-            # Merge with laptop data
-            final_recommendations = []
-            for gpt_rec in gpt_recommendations:
-                laptop_id = gpt_rec['laptop_id']
-                
-                # Find matching laptop
-                laptop_data = next(
-                    (l for l in laptops_data if l['id'] == laptop_id),
-                    None
-                )
-                
-                if laptop_data:
-                    final_recommendations.append({
-                        **laptop_data,
-                        "reason": gpt_rec.get('reason', ''),
-                        "key_strengths": gpt_rec.get('key_strengths', []),
-                        "considerations": gpt_rec.get('considerations', '')
-                    })
-            
-            return final_recommendations
-            
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                    
         except Exception as e:
-            print(f"Error generating GPT recommendations: {e}")
+            print(f"Error streaming GPT recommendations: {e}")
+            yield from self._reason_paragraphs(self._fallback_recommendations(laptops_data))
+    
+    async def astream_reasons(
+        self,
+        laptops: List[Tuple[Laptop, float, float]],
+        requirements: Dict[str, Any],
+        user_query: str,
+        conversation_history: Optional[List[Dict]] = None
+    ) -> AsyncIterator[str]:
+        """Async version of stream_reasons"""
+        laptops_data = self.laptop_cards(laptops)
+        
+        cached = self._cached_recommendations(self._response_cache_key(laptops, requirements), laptops_data)
+        if cached is not None:
+            for paragraph in self._reason_paragraphs(cached):
+                yield paragraph
+            return
+        
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model="gpt-4",
+                messages=self._reasons_messages(laptops_data, requirements, user_query, conversation_history),
+                temperature=0.7,
+                max_tokens=1500,
+                stream=True
+            )
             
-            # Fallback: return basic recommendations
-            return [
-                {
-                    **laptop_data,
-                    "reason": f"This {laptop_data['brand']} {laptop_data['model']} matches your requirements with {laptop_data['ram_gb']}GB RAM and {laptop_data['storage']} at PKR {laptop_data['price_pkr']:,}.",
-                    "key_strengths": laptop_data['ideal_for'],
-                    "considerations": "Check local availability and warranty."
-                }
-                for laptop_data in laptops_data
-            ]
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                    
+        except Exception as e:
+            print(f"Error streaming GPT recommendations: {e}")
+            for paragraph in self._reason_paragraphs(self._fallback_recommendations(laptops_data)):
+                yield paragraph
+    
+    def _reasons_messages(
+        self,
+        laptops_data: List[Dict[str, Any]],
+        requirements: Dict[str, Any],
+        user_query: str,
+        conversation_history: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """Build the GPT-4 prompt asking for plain-text explanations"""
+        user_prompt = f"""User Query: {user_query}
+
+Extracted Requirements:
+{json.dumps(requirements, indent=2)}
+
+Top Recommended Laptops:
+{json.dumps(laptops_data, indent=2)}
+
+Write one short paragraph per laptop, in rank order. Start each paragraph with its rank and name (e.g. "1. HP Victus 15:"), then explain why it suits the user, its key strengths and any considerations. Plain text only, no JSON or markdown."""
+        
+        messages = [{"role": "system", "content": ADVISOR_SYSTEM_PROMPT}]
+        if conversation_history:
+            messages.extend(conversation_history[-3:])
+        messages.append({"role": "user", "content": user_prompt})
+        return messages
+    
+    @staticmethod
+    def _reason_paragraphs(recommendations: List[Dict[str, Any]]) -> Iterator[str]:
+        """Render finished recommendations in the streamed text format"""
+        for rec in recommendations:
+            yield f"{rec['rank']}. {rec['brand']} {rec['model']}: {rec.get('reason', '')}\n\n"
+    
+    @staticmethod
+    def _fallback_reason(laptop_data: Dict[str, Any]) -> str:
+        """Template explanation used when GPT-4 is unavailable"""
+        return f"This {laptop_data['brand']} {laptop_data['model']} matches your requirements with {laptop_data['ram_gb']}GB RAM and {laptop_data['storage']} at PKR {laptop_data['price_pkr']:,}."
     
     def _handle_no_results(
         self,
@@ -0,0 +1,263 @@
+"""
+Response cache for generated recommendations
+Keyed on normalized requirements, the ranked laptop IDs and prices, and the catalogue version
+"""
+from typing import Any, Dict, Iterable, Optional, Set
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+import time
+
+class ResponseCache:
+    """
+    TTL + LRU cache with per-laptop invalidation and optional JSON persistence
+    
+    With a persist_path, changes are written by a background thread at most
+    every save_interval seconds and on close(), so storing an answer never
+    rewrites the file on the request path.
+    """
+    
+    # Requirement fields that do not change the generated answer
+    IGNORED_FIELDS = ("original_query",)
+    
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600,
+        persist_path: Optional[str] = None,
+        save_interval: float = 30.0
+    ):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl_seconds: Lifetime of an entry
+            persist_path: JSON file to load from and save to (None keeps it in memory)
+            save_interval: Seconds between background saves of a changed cache
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.save_interval = save_interval
+        
+        # key -> {"expires_at", "laptop_ids", "value"}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_laptop: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        
+        # Set when entries changed since the last save
+        self._changed = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        if self.persist_path and self.persist_path.exists():
+            self.load()
+    
+    @classmethod
+    def make_key(
+        cls,
+        requirements: Dict[str, Any],
+        laptop_ids: Iterable[int],
+        catalogue_version: int = 0,
+        prices: Optional[Iterable[int]] = None
+    ) -> str:
+        """
+        Build a cache key from requirements, ranked IDs, prices and catalogue version
+        
+        Requirements are canonicalized so that field order, unordered list
+        values (e.g. use cases) and the raw query wording do not matter.
+        Prices are part of the key because generated reasons quote them, and
+        the scraper and laptop API change them without a reindex.
+        """
+        canonical = {
+            field: cls._canonicalize(value)
+            for field, value in requirements.items()
+            if field not in cls.IGNORED_FIELDS and value not in (None, [], {}, "")
+        }
+        payload = json.dumps(
+            [canonical, [int(i) for i in laptop_ids], catalogue_version, list(prices or [])],
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    @classmethod
+    def _canonicalize(cls, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: cls._canonicalize(v) for k, v in value.items() if v is not None}
+        if isinstance(value, (list, tuple)):
+            return sorted({json.dumps(cls._canonicalize(v), sort_keys=True) for v in value})
+        if isinstance(value, str):
+            return value.strip().lower()
+        return value
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Return a cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            if entry["expires_at"] <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["value"]
+    
+    def set(self, key: str, value: Any, laptop_ids: Iterable[int]):
+        """
+        Cache a value
+        
+        Args:
+            key: Key from make_key
+            value: JSON-serializable value
+            laptop_ids: Laptops the value depends on, for invalidation
+        """
+        laptop_ids = [int(i) for i in laptop_ids]
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            
+            self._entries[key] = {
+                "expires_at": time.time() + self.ttl_seconds,
+                "laptop_ids": laptop_ids,
+                "value": value
+            }
+            for laptop_id in laptop_ids:
+                self._by_laptop.setdefault(laptop_id, set()).add(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._changed = True
+        self._ensure_saver()
+    
+    def invalidate_laptop(self, laptop_id: Optional[int]) -> int:
+        """
+        Drop every entry that includes a laptop (None drops everything)
+        
+        Matches the VectorStoreService change listener signature.
+        
+        Returns:
+            Number of entries removed
+        """
+        if laptop_id is None:
+            return self.clear()
+        
+        with self._lock:
+            keys = list(self._by_laptop.get(int(laptop_id), ()))
+            for key in keys:
+                self._remove(key)
+            if keys:
+                self._changed = True
+            return len(keys)
+    
+    def clear(self) -> int:
+        """Drop every entry"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._by_laptop.clear()
+            if count:
+                self._changed = True
+            return count
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for laptop_id in entry["laptop_ids"]:
+            keys = self._by_laptop.get(laptop_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_laptop[laptop_id]
+    
+    def save(self, path: Optional[str] = None):
+        """Write unexpired entries to a JSON file"""
+        target = Path(path) if path else self.persist_path
+        if target is None:
+            return
+        
+        with self._save_lock:
+            now = time.time()
+            with self._lock:
+                entries = [
+                    [key, entry] for key, entry in self._entries.items()
+                    if entry["expires_at"] > now
+                ]
+                self._changed = False
+            
+            try:
+                tmp_path = target.with_name(target.name + ".tmp")
+                with open(tmp_path, 'w') as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, target)
+                self.saves += 1
+            except Exception as e:
+                print(f"Error saving response cache: {e}")
+                self._changed = True
+    
+    def _ensure_saver(self):
+        if self.persist_path is None or self._thread is not None or self._stop.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="response-cache-save", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(self.save_interval):
+            if self._changed:
+                self.save()
+    
+    def close(self):
+        """Stop the background saver and write any unsaved changes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._changed:
+            self.save()
+    
+    def load(self, path: Optional[str] = None):
+        """Load entries written by save, skipping expired ones"""
+        source = Path(path) if path else self.persist_path
+        
+        try:
+            with open(source, 'r') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"Could not load response cache: {e}")
+            return
+        
+        now = time.time()
+        with self._lock:
+            for key, entry in entries:
+                if entry["expires_at"] > now:
+                    self._entries[key] = entry
+                    for laptop_id in entry["laptop_ids"]:
+                        self._by_laptop.setdefault(laptop_id, set()).add(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "saves": self.saves,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
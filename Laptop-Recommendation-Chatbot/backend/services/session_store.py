@@ -0,0 +1,350 @@
+"""
+Write-behind session state for the conversation flow
+Hot sessions stay in an in-process LRU; changes are flushed to the database in batches
+"""
+from typing import Any, Callable, Deque, Dict, List, Optional
+from collections import OrderedDict, deque
+from datetime import datetime
+import threading
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+from core.config import settings
+from models.database import SessionLocal, UserSession, ConversationTurn
+
+class SessionState:
+    """In-memory view of one user session"""
+    
+    def __init__(
+        self,
+        session_id: str,
+        preferences: Optional[Dict[str, Any]] = None,
+        recent_turns: Optional[List[Dict[str, Any]]] = None,
+        created_at: Optional[datetime] = None,
+        persisted: bool = False,
+        max_turns: int = 20,
+        stored_turns: int = 0
+    ):
+        self.session_id = session_id
+        self.preferences: Dict[str, Any] = dict(preferences or {})
+        self.recent_turns: Deque[Dict[str, Any]] = deque(recent_turns or [], maxlen=max_turns)
+        self.created_at = created_at or datetime.utcnow()
+        
+        # Whether the user_sessions row exists, and turns not yet handed to the store
+        self.persisted = persisted
+        self.unsaved_turns: List[Dict[str, Any]] = []
+        
+        # Turns in conversation_turns that this state reflects; more in the
+        # table means another worker wrote to the session
+        self.stored_turns = stored_turns
+    
+    def add_turn(self, role: str, content: str):
+        """Append a message; it is written by the first flush after save()"""
+        turn = {
+            "role": role,
+            "content": content,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        self.recent_turns.append(turn)
+        self.unsaved_turns.append(turn)
+
+class SessionStore:
+    """
+    LRU of session states with batched, write-behind persistence
+    
+    A request loads its session once (a primary-key lookup plus the last
+    few turns), changes it in memory and calls save(). A background thread
+    then writes new sessions, preferences and turns in one transaction per
+    flush. Per-message database work does not grow with conversation
+    length.
+    
+    Each worker has its own LRU, so a cached session is checked against
+    its turn count in the table (one indexed COUNT) before it is reused,
+    and reloaded if another worker wrote turns since. A session with
+    changes not yet flushed is used as is; turns another worker has not
+    flushed yet are seen once it does, within flush_interval.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_sessions: int = 1024,
+        flush_interval: float = 2.0,
+        flush_batch: int = 64,
+        context_turns: int = 20
+    ):
+        """
+        Args:
+            session_factory: Creates database sessions for flushing
+            max_sessions: Sessions kept in memory before the least recently used is dropped
+            flush_interval: Seconds between background flushes
+            flush_batch: Pending turns that trigger an early flush
+            context_turns: Recent turns kept in memory per session
+        """
+        self.session_factory = session_factory
+        self.max_sessions = max_sessions
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.context_turns = context_turns
+        
+        self._states: "OrderedDict[str, SessionState]" = OrderedDict()
+        # Sessions with unwritten changes (kept even if evicted from the LRU)
+        # and their queued turns
+        self._dirty: Dict[str, SessionState] = {}
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._pending_turns = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+    
+    def get(self, db: Session, session_id: str) -> SessionState:
+        """Return the session's state, loading it on a cache miss or if another worker changed it"""
+        with self._lock:
+            state = self._states.get(session_id) or self._dirty.get(session_id)
+            dirty = session_id in self._dirty or (state is not None and bool(state.unsaved_turns))
+        
+        if state is not None and (dirty or self._count_turns(db, session_id) == state.stored_turns):
+            with self._lock:
+                self._states[session_id] = state
+                self._states.move_to_end(session_id)
+                self.hits += 1
+            return state
+        
+        with self._lock:
+            self.misses += 1
+        loaded = self._load(db, session_id)
+        
+        with self._lock:
+            # Another request may have loaded it meanwhile
+            current = self._states.get(session_id)
+            if current is None or current is state:
+                self._states[session_id] = loaded
+                current = loaded
+            self._states.move_to_end(session_id)
+            while len(self._states) > self.max_sessions:
+                self._states.popitem(last=False)
+        
+        self._ensure_flusher()
+        return current
+    
+    @staticmethod
+    def _count_turns(db: Session, session_id: str) -> int:
+        return db.query(func.count(ConversationTurn.id)).filter(
+            ConversationTurn.session_id == session_id
+        ).scalar()
+    
+    def _load(self, db: Session, session_id: str) -> SessionState:
+        row = db.query(UserSession).filter(UserSession.session_id == session_id).first()
+        if row is None:
+            return SessionState(session_id, max_turns=self.context_turns)
+        
+        stored_turns = self._count_turns(db, session_id)
+        turns = db.query(ConversationTurn).filter(
+            ConversationTurn.session_id == session_id
+        ).order_by(ConversationTurn.id.desc()).limit(self.context_turns).all()
+        
+        recent = [self._turn_to_dict(turn) for turn in reversed(turns)]
+        if not recent and row.conversation_history:
+            recent = list(row.conversation_history)[-self.context_turns:]
+        
+        return SessionState(
+            session_id,
+            preferences=row.preferences,
+            recent_turns=recent,
+            created_at=row.created_at,
+            persisted=True,
+            max_turns=self.context_turns,
+            stored_turns=stored_turns
+        )
+    
+    @staticmethod
+    def _turn_to_dict(turn: ConversationTurn) -> Dict[str, Any]:
+        return {
+            "role": turn.role,
+            "content": turn.content,
+            "timestamp": turn.created_at.isoformat() if turn.created_at else None
+        }
+    
+    def update_preferences(self, state: SessionState, changes: Dict[str, Any]):
+        """Change a session's preferences under the lock flush() copies them with"""
+        with self._lock:
+            state.preferences.update(changes)
+    
+    def save(self, state: SessionState):
+        """Queue a session's preferences and new turns for the next flush"""
+        with self._lock:
+            self._dirty[state.session_id] = state
+            turns, state.unsaved_turns = state.unsaved_turns, []
+            if turns:
+                self._pending.setdefault(state.session_id, []).extend(turns)
+                self._pending_turns += len(turns)
+            if self._pending_turns >= self.flush_batch:
+                self._wake.set()
+    
+    def flush(self) -> int:
+        """
+        Write queued changes in one transaction
+        
+        Returns:
+            Number of sessions written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = [
+                    (state, state.persisted, dict(state.preferences), self._pending.get(session_id, []))
+                    for session_id, state in self._dirty.items()
+                ]
+                self._dirty = {}
+                self._pending = {}
+                self._pending_turns = 0
+            
+            if not batch:
+                return 0
+            
+            db = self.session_factory()
+            try:
+                # Rows another code path created since we loaded the session
+                unpersisted = [state.session_id for state, persisted, _, _ in batch if not persisted]
+                existing = {
+                    session_id for (session_id,) in db.query(UserSession.session_id).filter(
+                        UserSession.session_id.in_(unpersisted)
+                    )
+                } if unpersisted else set()
+                batch = [
+                    (state, persisted or state.session_id in existing, preferences, pending)
+                    for state, persisted, preferences, pending in batch
+                ]
+                
+                new_sessions = [
+                    {
+                        "session_id": state.session_id,
+                        "preferences": preferences,
+                        "conversation_history": [],
+                        "created_at": state.created_at
+                    }
+                    for state, persisted, preferences, _ in batch if not persisted
+                ]
+                updated_sessions = [
+                    {"session_id": state.session_id, "preferences": preferences}
+                    for state, persisted, preferences, _ in batch if persisted
+                ]
+                turns = [
+                    {
+                        "session_id": state.session_id,
+                        "role": turn["role"],
+                        "content": turn["content"],
+                        "created_at": datetime.fromisoformat(turn["timestamp"])
+                    }
+                    for state, _, _, pending in batch
+                    for turn in pending
+                ]
+                
+                if new_sessions:
+                    db.execute(insert(UserSession), new_sessions)
+                if updated_sessions:
+                    db.execute(update(UserSession), updated_sessions)
+                if turns:
+                    db.execute(insert(ConversationTurn), turns)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"Error flushing sessions: {e}")
+                self._requeue(batch)
+                return 0
+            finally:
+                db.close()
+            
+            with self._lock:
+                for state, _, _, pending in batch:
+                    state.persisted = True
+                    state.stored_turns += len(pending)
+                self.flushes += 1
+            return len(batch)
+    
+    def _requeue(self, batch):
+        """Put a failed flush's changes back in front of anything newer"""
+        with self._lock:
+            for state, _, _, pending in batch:
+                self._dirty.setdefault(state.session_id, state)
+                self._pending[state.session_id] = pending + self._pending.get(state.session_id, [])
+                self._pending_turns += len(pending)
+    
+    def history(self, db: Session, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Full conversation history and preferences, including unflushed turns
+        
+        Returns:
+            Session dict, or None if the session does not exist
+        """
+        # Hold off flushes so a turn is not read both from memory and the table
+        with self._flush_lock:
+            with self._lock:
+                state = self._states.get(session_id) or self._dirty.get(session_id)
+                pending = list(self._pending.get(session_id, []))
+                preferences = dict(state.preferences) if state else None
+            
+            row = db.query(UserSession).filter(UserSession.session_id == session_id).first()
+            if row is None and state is None:
+                return None
+            
+            turns = db.query(ConversationTurn).filter(
+                ConversationTurn.session_id == session_id
+            ).order_by(ConversationTurn.id).all()
+        
+        history = [self._turn_to_dict(turn) for turn in turns]
+        if not history and row is not None and row.conversation_history:
+            history = list(row.conversation_history)
+        
+        return {
+            "session_id": session_id,
+            "conversation_history": history + pending,
+            "preferences": preferences if preferences is not None else row.preferences,
+            "created_at": row.created_at if row is not None else state.created_at
+        }
+    
+    def _ensure_flusher(self):
+        if self._thread is not None or self._stop.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="session-flush", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+    
+    def close(self):
+        """Stop the background flusher and write everything still queued"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        return {
+            "sessions": len(self._states),
+            "dirty_sessions": len(self._dirty),
+            "pending_turns": self._pending_turns,
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushes": self.flushes
+        }
+
+# Shared by the conversation flow and the session routes
+session_store = SessionStore(
+    max_sessions=settings.SESSION_CACHE_SIZE,
+    flush_interval=settings.SESSION_FLUSH_INTERVAL,
+    flush_batch=settings.SESSION_FLUSH_BATCH,
+    context_turns=settings.SESSION_CONTEXT_TURNS
+)
@@ -0,0 +1,298 @@
+"""
+Spec normalization shared by the scraper pipelines and document processing
+Patterns are compiled once; normalize_frame() applies the same rules to a whole DataFrame of listings
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import re
+
+RAM_PATTERN = re.compile(r'(\d+)\s*GB', re.IGNORECASE)
+STORAGE_PATTERN = re.compile(r'(\d+)\s*(GB|TB)', re.IGNORECASE)
+PRICE_PATTERN = re.compile(r'(\d+)')
+PRICE_UNAVAILABLE_PATTERN = re.compile(r'call|contact|inquiry', re.IGNORECASE)
+# Model number after the tier, e.g. i5-1235U (12th gen) or i7-8550U (8th gen)
+INTEL_MODEL_PATTERN = re.compile(r'i[3579]-(\d{4,5})')
+RYZEN_MODEL_PATTERN = re.compile(r'ryzen\s+[3579]\s+(\d)\d{3}', re.IGNORECASE)
+
+# Earlier brands take precedence when a name mentions several
+BRANDS = ["HP", "Dell", "Lenovo", "ASUS", "Acer", "MSI", "Apple"]
+BRAND_PATTERNS = tuple((brand, re.compile(re.escape(brand.lower()))) for brand in BRANDS)
+
+# Defaults when a raw spec is present but unreadable
+DEFAULT_RAM_GB = 8
+DEFAULT_STORAGE_GB = 256
+
+# Checked in order against the lowercased spec; the first match wins
+CPU_TIERS: Tuple[Tuple[str, "re.Pattern"], ...] = (
+    ("entry", re.compile(r'i3|ryzen 3')),
+    ("mainstream", re.compile(r'i5|ryzen 5')),
+    ("performance", re.compile(r'i7|ryzen 7')),
+    ("flagship", re.compile(r'i9|ryzen 9')),
+)
+DEFAULT_CPU_TIER = "standard"
+
+GPU_TIERS: Tuple[Tuple[str, "re.Pattern"], ...] = (
+    ("gaming", re.compile(r'rtx|gtx|radeon rx')),
+    ("dedicated", re.compile(r'nvidia|geforce|quadro|dedicated')),
+    # "AMD Radeon Graphics" is the integrated chip; named Radeon parts may be either
+    ("dedicated_amd", re.compile(r'amd radeon(?!.*graphics)')),
+)
+DEFAULT_GPU_TIER = "integrated"
+# GPU names that mean Gaming whatever the RAM, e.g. an NVIDIA RTX 3050 in a 4GB laptop
+ALWAYS_GAMING_GPU_PATTERN = re.compile(r'nvidia|dedicated')
+
+def _first_match(text: Optional[str], table, default: Optional[str]) -> Optional[str]:
+    text = (text or "").lower()
+    for label, pattern in table:
+        if pattern.search(text):
+            return label
+    return default
+
+def cpu_tier(cpu: Optional[str]) -> str:
+    """Performance tier of a CPU name (entry, mainstream, performance, flagship or standard)"""
+    return _first_match(cpu, CPU_TIERS, DEFAULT_CPU_TIER)
+
+def gpu_tier(gpu: Optional[str]) -> str:
+    """Graphics tier of a GPU name (gaming, dedicated, dedicated_amd or integrated)"""
+    return _first_match(gpu, GPU_TIERS, DEFAULT_GPU_TIER)
+
+def parse_ram(text: str) -> int:
+    """RAM in GB from text like "16GB DDR4" """
+    match = RAM_PATTERN.search(text)
+    return int(match.group(1)) if match else DEFAULT_RAM_GB
+
+def parse_storage(text: str) -> Tuple[int, str]:
+    """
+    Storage size and type from text like "1TB NVMe SSD"
+    
+    Returns:
+        Tuple of (size_gb, "SSD" or "HDD")
+    """
+    match = STORAGE_PATTERN.search(text)
+    if match:
+        size = int(match.group(1))
+        size_gb = size * 1024 if match.group(2).upper() == 'TB' else size
+    else:
+        size_gb = DEFAULT_STORAGE_GB
+    
+    # NVMe, M.2 and unlabelled drives are SSDs on modern laptops
+    storage_type = 'HDD' if 'HDD' in text.upper() and 'SSD' not in text.upper() else 'SSD'
+    return size_gb, storage_type
+
+def parse_price(text: str) -> Tuple[int, bool]:
+    """
+    Price in PKR from text like "Rs. 125,000"
+    
+    Returns:
+        Tuple of (price_pkr, price_available); "Call for price" gives (0, False)
+    """
+    if PRICE_UNAVAILABLE_PATTERN.search(text):
+        return 0, False
+    match = PRICE_PATTERN.search(text.replace(',', ''))
+    if match:
+        return int(match.group(1)), True
+    return 0, False
+
+def cpu_generation(cpu: str) -> Optional[str]:
+    """Generation label like "12th Gen Intel" or "Ryzen 5000 Series" """
+    intel_match = INTEL_MODEL_PATTERN.search(cpu)
+    if intel_match:
+        number = intel_match.group(1)
+        # 10th gen and later use two digits (i5-1035G1), earlier ones one (i5-8250U)
+        gen = int(number[:2]) if number.startswith('1') else int(number[0])
+        return f"{gen}th Gen Intel"
+    
+    ryzen_match = RYZEN_MODEL_PATTERN.search(cpu)
+    if ryzen_match:
+        return f"Ryzen {ryzen_match.group(1)}000 Series"
+    return None
+
+def detect_brand(name: str) -> Optional[str]:
+    """First known brand mentioned in a product name"""
+    return _first_match(name, BRAND_PATTERNS, None)
+
+def normalize_listing(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cleaned fields for one raw listing
+    
+    Only fields whose source is present are returned, so callers can merge
+    the result over the item without erasing values set elsewhere.
+    
+    Args:
+        item: Listing with ram_raw, storage_raw, price_raw, cpu, brand, full_name
+    
+    Returns:
+        Subset of ram_gb, storage_gb, storage_type, price_pkr,
+        price_available, cpu_generation and brand
+    """
+    cleaned: Dict[str, Any] = {}
+    
+    if item.get('ram_raw'):
+        cleaned['ram_gb'] = parse_ram(item['ram_raw'])
+    
+    if item.get('storage_raw'):
+        cleaned['storage_gb'], cleaned['storage_type'] = parse_storage(item['storage_raw'])
+    
+    if item.get('price_raw'):
+        cleaned['price_pkr'], cleaned['price_available'] = parse_price(item['price_raw'])
+    
+    if item.get('cpu'):
+        generation = cpu_generation(item['cpu'])
+        if generation:
+            cleaned['cpu_generation'] = generation
+    
+    if not item.get('brand') and item.get('full_name'):
+        brand = detect_brand(item['full_name'])
+        if brand:
+            cleaned['brand'] = brand
+    
+    return cleaned
+
+def detect_categories(
+    ram_gb: int,
+    storage_gb: int,
+    cpu_tier_name: str,
+    gpu_tier_name: str,
+    price_pkr: int,
+    gpu: Optional[str] = None
+) -> List[str]:
+    """
+    Use cases a laptop suits, from its specs and tiers
+    
+    Args:
+        ram_gb: RAM in GB
+        storage_gb: Storage in GB
+        cpu_tier_name: Result of cpu_tier()
+        gpu_tier_name: Result of gpu_tier()
+        price_pkr: Price in PKR
+        gpu: Raw GPU name; NVIDIA or "dedicated" GPUs count as Gaming
+            even when a gaming-tier part has less than 8GB of RAM
+    
+    Returns:
+        Category names, "General Use" if nothing else applies
+    """
+    categories = []
+    
+    if ram_gb >= 8 and cpu_tier_name in ("mainstream", "performance"):
+        categories.append('Programming')
+    
+    if gpu_tier_name == "gaming" and ram_gb >= 8:
+        categories.append('Gaming')
+    elif gpu_tier_name == "dedicated" or ALWAYS_GAMING_GPU_PATTERN.search((gpu or "").lower()):
+        categories.append('Gaming')
+    
+    if ram_gb >= 16 and cpu_tier_name == "performance":
+        categories.append('Video Editing')
+    
+    if ram_gb >= 8 and storage_gb >= 512:
+        categories.append('Engineering')
+    
+    if price_pkr < 90000 or cpu_tier_name == "entry":
+        categories.append('FSC Student')
+        categories.append('Office Work')
+    
+    if ram_gb >= 4 and storage_gb >= 256 and 'Office Work' not in categories:
+        categories.append('Office Work')
+    
+    if 'Programming' in categories:
+        categories.append('CS Student')
+    
+    return categories or ['General Use']
+
+def _text_column(frame, name: str):
+    import pandas as pd
+    
+    if name not in frame:
+        return pd.Series(pd.NA, index=frame.index, dtype="string")
+    column = frame[name].astype("string")
+    return column.mask(column == "")
+
+def _first_match_column(text, table, default: str):
+    import numpy as np
+    import pandas as pd
+    
+    lower = text.fillna("").str.lower()
+    conditions = [lower.str.contains(pattern).to_numpy(dtype=bool) for _, pattern in table]
+    return pd.Series(np.select(conditions, [label for label, _ in table], default), index=text.index)
+
+def normalize_frame(frame):
+    """
+    Apply normalize_listing and detect_categories to a DataFrame of listings
+    
+    Each pattern runs once per column through pandas string methods instead
+    of once per row, for re-processing large crawl dumps.
+    
+    Args:
+        frame: pandas DataFrame with the raw listing columns
+    
+    Returns:
+        Copy of frame with cleaned columns and ideal_for filled in
+    """
+    # Imported lazily so the API and the scraper don't need pandas
+    import pandas as pd
+    
+    out = frame.copy()
+    
+    ram_raw = _text_column(out, 'ram_raw')
+    has_ram = ram_raw.notna().to_numpy(dtype=bool)
+    ram = pd.to_numeric(ram_raw.str.extract(RAM_PATTERN)[0]).fillna(DEFAULT_RAM_GB)
+    if 'ram_gb' not in out:
+        out['ram_gb'] = pd.NA
+    out.loc[has_ram, 'ram_gb'] = ram[has_ram].astype(int)
+    
+    storage_raw = _text_column(out, 'storage_raw')
+    has_storage = storage_raw.notna().to_numpy(dtype=bool)
+    storage = storage_raw.str.extract(STORAGE_PATTERN)
+    storage_gb = pd.to_numeric(storage[0]) * storage[1].str.upper().map({'GB': 1, 'TB': 1024})
+    upper = storage_raw.str.upper()
+    hdd = upper.str.contains('HDD', regex=False) & ~upper.str.contains('SSD', regex=False)
+    for name in ('storage_gb', 'storage_type'):
+        if name not in out:
+            out[name] = pd.NA
+    out.loc[has_storage, 'storage_gb'] = storage_gb.fillna(DEFAULT_STORAGE_GB)[has_storage].astype(int)
+    out.loc[has_storage, 'storage_type'] = hdd.map({True: 'HDD', False: 'SSD'})[has_storage]
+    
+    price_raw = _text_column(out, 'price_raw')
+    has_price = price_raw.notna().to_numpy(dtype=bool)
+    unavailable = price_raw.str.contains(PRICE_UNAVAILABLE_PATTERN).fillna(False)
+    price = pd.to_numeric(price_raw.str.replace(',', '', regex=False).str.extract(PRICE_PATTERN)[0])
+    available = price.notna() & ~unavailable
+    for name in ('price_pkr', 'price_available'):
+        if name not in out:
+            out[name] = pd.NA
+    out.loc[has_price, 'price_pkr'] = price.where(available, 0)[has_price].astype(int)
+    out.loc[has_price, 'price_available'] = available[has_price].astype(bool)
+    
+    cpu = _text_column(out, 'cpu')
+    intel = cpu.str.extract(INTEL_MODEL_PATTERN)[0]
+    intel_gen = intel.str.slice(0, 2).where(intel.str.startswith('1'), intel.str.slice(0, 1))
+    ryzen_gen = cpu.str.extract(RYZEN_MODEL_PATTERN)[0]
+    generation = (intel_gen + "th Gen Intel").fillna(
+        "Ryzen " + ryzen_gen + "000 Series"
+    )
+    has_generation = generation.notna().to_numpy(dtype=bool)
+    if 'cpu_generation' not in out:
+        out['cpu_generation'] = pd.NA
+    out.loc[has_generation, 'cpu_generation'] = generation[has_generation]
+    
+    detected = _first_match_column(_text_column(out, 'full_name'), BRAND_PATTERNS, "")
+    needs_brand = (_text_column(out, 'brand').isna() & (detected != "")).to_numpy(dtype=bool)
+    if 'brand' not in out:
+        out['brand'] = pd.NA
+    out.loc[needs_brand, 'brand'] = detected[needs_brand]
+    
+    cpu_tiers = _first_match_column(cpu, CPU_TIERS, DEFAULT_CPU_TIER)
+    gpu = _text_column(out, 'gpu')
+    gpu_tiers = _first_match_column(gpu, GPU_TIERS, DEFAULT_GPU_TIER)
+    numbers = {}
+    for name in ('ram_gb', 'storage_gb', 'price_pkr'):
+        out[name] = pd.to_numeric(out[name], errors='coerce').astype('Int64')
+        numbers[name] = out[name].fillna(0)
+    out['ideal_for'] = [
+        detect_categories(ram_gb, storage_gb, cpu_name, gpu_name, price_pkr, gpu_raw)
+        for ram_gb, storage_gb, cpu_name, gpu_name, price_pkr, gpu_raw in zip(
+            numbers['ram_gb'], numbers['storage_gb'], cpu_tiers, gpu_tiers, numbers['price_pkr'],
+            gpu.fillna("")
+        )
+    ]
+    
+    return out
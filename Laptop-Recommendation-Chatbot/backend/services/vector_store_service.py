@@ -1,19 +1,36 @@
 """
-ChromaDB vector store service for similarity search
+Vector store service for similarity search
+Backed by ChromaDB or the in-process NumPy index (VECTOR_BACKEND setting)
 """
-from typing import List, Dict, Any, Optional, Tuple
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable
 from core.config import settings
+from core.concurrency import run_blocking
 from services.embedding_service import EmbeddingService
 from services.document_processor import LaptopDocument
+from services.numpy_vector_index import NumpyVectorIndex
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion
 import json
+import threading
+import time
 
-class VectorStoreService:
-    """Manage ChromaDB vector store for laptop documents"""
+class ChromaIndexBackend:
+    """ChromaDB collection behind the vector index interface"""
     
-    def __init__(self, collection_name: str = "laptop_recommendations"):
+    def __init__(self, collection_name: str, fresh: bool = False):
+        """
+        Args:
+            collection_name: Collection to open, created if missing
+            fresh: Drop chromadb's cached client for the directory first, so
+                writes made by another process are read from disk
+        """
+        # Imported lazily so workers on the NumPy backend don't need chromadb
+        import chromadb
+        from chromadb.api.client import SharedSystemClient
+        from chromadb.config import Settings
+        
+        if fresh:
+            SharedSystemClient.clear_system_cache()
+        
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
             path=settings.CHROMA_PERSIST_DIR,
@@ -24,7 +41,6 @@ class VectorStoreService:
         )
         
         self.collection_name = collection_name
-        self.embedding_service = EmbeddingService()
         
         # Get or create collection
         try:
@@ -37,6 +53,306 @@ class VectorStoreService:
             )
             print(f"Created new collection: {collection_name}")
     
+    def upsert(
+        self,
+        ids: List[int],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]]
+    ):
+        """Insert or replace documents"""
+        self.collection.upsert(
+            ids=[f"laptop_{laptop_id}" for laptop_id in ids],
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=[self._flatten_metadata(m) for m in metadatas]
+        )
+    
+    def query(
+        self,
+        embedding: List[float],
+        n_results: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Nearest-neighbour query with optional metadata filters"""
+        where_clause = self._build_where_clause(filters) if filters else None
+        
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where=where_clause,
+            include=["documents", "metadatas", "distances"]
+        )
+        
+        # Format results
+        formatted_results = []
+        if results and results['ids'] and len(results['ids'][0]) > 0:
+            for i in range(len(results['ids'][0])):
+                metadata = self._restore_metadata(results['metadatas'][0][i])
+                formatted_results.append({
+                    "laptop_id": metadata['laptop_id'],
+                    "content": results['documents'][0][i],
+                    "metadata": metadata,
+                    "similarity_score": 1 - results['distances'][0][i],  # Convert distance to similarity
+                    "distance": results['distances'][0][i]
+                })
+        
+        return formatted_results
+    
+    def _build_where_clause(self, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Build ChromaDB where clause from filters
+        
+        Numeric ranges become $gte/$lte conditions and ideal_for membership
+        matches the per-category flags written by _flatten_metadata
+        """
+        conditions = []
+        
+        # Brand filter
+        if 'brand' in filters:
+            conditions.append({'brand': filters['brand']})
+        
+        # Storage type filter
+        if 'storage_type' in filters:
+            conditions.append({'storage_type': filters['storage_type']})
+        
+        # Numeric range filters
+        for column, (min_key, max_key) in NumpyVectorIndex.RANGE_FILTERS.items():
+            if filters.get(min_key) is not None:
+                conditions.append({column: {"$gte": filters[min_key]}})
+            if filters.get(max_key) is not None:
+                conditions.append({column: {"$lte": filters[max_key]}})
+        
+        # Category membership (any of)
+        categories = filters.get('ideal_for')
+        if categories:
+            if isinstance(categories, str):
+                categories = [categories]
+            options = [{f"ideal_for:{c}": True} for c in categories]
+            conditions.append(options[0] if len(options) == 1 else {"$or": options})
+        
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+    
+    @staticmethod
+    def _flatten_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        ChromaDB only stores scalar metadata: join list values and add one
+        boolean flag per category so membership can be filtered
+        """
+        flat = {}
+        for key, value in metadata.items():
+            if value is None:
+                continue
+            if isinstance(value, list):
+                flat[key] = "|".join(value)
+                for item in value:
+                    flat[f"{key}:{item}"] = True
+            else:
+                flat[key] = value
+        return flat
+    
+    @staticmethod
+    def _restore_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Undo _flatten_metadata for list-valued columns"""
+        restored = {k: v for k, v in metadata.items() if ':' not in k}
+        for column in NumpyVectorIndex.SET_COLUMNS:
+            if isinstance(restored.get(column), str):
+                restored[column] = restored[column].split("|") if restored[column] else []
+        return restored
+    
+    def get(self, laptop_id: int) -> Optional[Dict[str, Any]]:
+        """Get document by laptop ID"""
+        result = self.collection.get(
+            ids=[f"laptop_{laptop_id}"],
+            include=["documents", "metadatas"]
+        )
+        
+        if result and result['ids']:
+            return {
+                "laptop_id": laptop_id,
+                "content": result['documents'][0],
+                "metadata": self._restore_metadata(result['metadatas'][0])
+            }
+        return None
+    
+    def documents(self) -> Tuple[List[int], List[str], List[Dict[str, Any]]]:
+        """All stored (ids, contents, metadatas)"""
+        result = self.collection.get(include=["documents", "metadatas"])
+        return (
+            [int(doc_id.split("_", 1)[1]) for doc_id in result['ids']],
+            result['documents'],
+            [self._restore_metadata(m) for m in result['metadatas']]
+        )
+    
+    def update_metadata(self, ids: List[int], metadatas: List[Dict[str, Any]]):
+        """Replace metadata of existing documents, keeping their embeddings"""
+        # Upsert with the stored embeddings: update() merges metadata and
+        # would leave stale per-category flags behind
+        result = self.collection.get(
+            ids=[f"laptop_{laptop_id}" for laptop_id in ids],
+            include=["embeddings", "documents"]
+        )
+        stored = {
+            doc_id: (embedding, document)
+            for doc_id, embedding, document in zip(result['ids'], result['embeddings'], result['documents'])
+        }
+        rows = [
+            (f"laptop_{laptop_id}", metadata)
+            for laptop_id, metadata in zip(ids, metadatas)
+            if f"laptop_{laptop_id}" in stored
+        ]
+        if not rows:
+            return
+        
+        self.collection.upsert(
+            ids=[doc_id for doc_id, _ in rows],
+            embeddings=[stored[doc_id][0] for doc_id, _ in rows],
+            documents=[stored[doc_id][1] for doc_id, _ in rows],
+            metadatas=[self._flatten_metadata(metadata) for _, metadata in rows]
+        )
+    
+    def delete(self, ids: List[int]):
+        """Delete documents by laptop ID"""
+        self.collection.delete(ids=[f"laptop_{laptop_id}" for laptop_id in ids])
+    
+    def count(self) -> int:
+        return self.collection.count()
+    
+    @property
+    def version(self) -> int:
+        """Catalogue generation, kept in the collection metadata"""
+        return int((self.collection.metadata or {}).get("catalogue_version", 0))
+    
+    def changed_on_disk(self) -> bool:
+        """True if another process started a new catalogue generation"""
+        stored = self.client.get_collection(name=self.collection_name).metadata or {}
+        return int(stored.get("catalogue_version", 0)) != self.version
+    
+    def bump_version(self) -> int:
+        """Start a new catalogue generation"""
+        version = self.version + 1
+        self.collection.modify(metadata={
+            **(self.collection.metadata or {}),
+            "catalogue_version": version
+        })
+        return version
+    
+    def reset(self):
+        """Delete and recreate collection, keeping the catalogue generation"""
+        version = self.version
+        self.client.delete_collection(name=self.collection_name)
+        self.collection = self.client.create_collection(
+            name=self.collection_name,
+            metadata={
+                "description": "Laptop recommendation embeddings",
+                "catalogue_version": version
+            }
+        )
+    
+    def save(self):
+        """ChromaDB persists on every write"""
+        pass
+
+class VectorStoreService:
+    """Manage the vector store for laptop documents"""
+    
+    def __init__(
+        self,
+        collection_name: str = "laptop_recommendations",
+        backend: Optional[str] = None
+    ):
+        self.collection_name = collection_name
+        self.backend_name = backend or settings.VECTOR_BACKEND
+        self.embedding_service = EmbeddingService()
+        self._change_listeners: List[Callable[[Optional[int]], None]] = []
+        
+        if self.backend_name not in ("numpy", "chroma"):
+            raise ValueError(f"Unknown vector backend: {self.backend_name}")
+        self.index = self._open_index()
+        
+        # Lexical side of hybrid search, rebuilt from the stored documents
+        self.lexical_index = self._build_lexical_index(self.index)
+        
+        self._reload_lock = threading.Lock()
+        self._next_reload_check = time.monotonic() + settings.INDEX_RELOAD_SECONDS
+    
+    def _open_index(self, fresh: bool = False):
+        if self.backend_name == "numpy":
+            index = NumpyVectorIndex(
+                path=settings.NUMPY_INDEX_PATH,
+                n_lists=settings.IVF_LISTS,
+                n_probe=settings.IVF_PROBES
+            )
+            print(f"Loaded NumPy vector index with {index.count()} documents")
+            return index
+        return ChromaIndexBackend(self.collection_name, fresh=fresh)
+    
+    @staticmethod
+    def _build_lexical_index(index) -> Optional[LexicalIndex]:
+        if not settings.HYBRID_SEARCH:
+            return None
+        
+        lexical_index = LexicalIndex()
+        try:
+            lexical_index.upsert(*index.documents())
+        except Exception as e:
+            print(f"Error building lexical index: {e}")
+        return lexical_index
+    
+    def _reload_due(self) -> bool:
+        return time.monotonic() >= self._next_reload_check
+    
+    def reload_if_changed(self) -> bool:
+        """
+        Pick up an index rewritten by another process, e.g. sync_vector_store.py
+        
+        Searches call this at most every INDEX_RELOAD_SECONDS. The index and
+        the lexical index are reopened and swapped in whole, and change
+        listeners are told the entire catalogue changed.
+        
+        Returns:
+            True if the index was reloaded
+        """
+        with self._reload_lock:
+            self._next_reload_check = time.monotonic() + settings.INDEX_RELOAD_SECONDS
+            try:
+                if not self.index.changed_on_disk():
+                    return False
+                index = self._open_index(fresh=True)
+                lexical_index = self._build_lexical_index(index)
+            except Exception as e:
+                print(f"Error reloading vector index: {e}")
+                return False
+            
+            self.index, self.lexical_index = index, lexical_index
+        
+        self._notify_change()
+        print(f"Reloaded vector index at catalogue version {self.catalogue_version}")
+        return True
+    
+    @property
+    def catalogue_version(self) -> int:
+        """Generation of the indexed catalogue; changes on bulk (re)indexing"""
+        return self.index.version
+    
+    def add_change_listener(self, listener: Callable[[Optional[int]], None]):
+        """
+        Register a callback for catalogue changes
+        
+        The listener receives the laptop ID for single-document updates and
+        deletes, or None when the whole catalogue changed.
+        """
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self, laptop_id: Optional[int] = None):
+        for listener in self._change_listeners:
+            try:
+                listener(laptop_id)
+            except Exception as e:
+                print(f"Error in vector store change listener: {e}")
+    
     def add_documents(
         self,
         documents: List[LaptopDocument],
@@ -55,46 +371,33 @@ class VectorStoreService:
         if not documents:
             return 0
         
-        # Prepare data for ChromaDB
+        # Prepare data for the index
         ids = []
         contents = []
         metadatas = []
         
         for doc in documents:
-            ids.append(f"laptop_{doc.laptop_id}")
+            ids.append(doc.laptop_id)
             contents.append(doc.content)
-            metadatas.append(doc.metadata)
+            metadatas.append(doc.stored_metadata())
         
         # Generate embeddings
         print(f"Generating embeddings for {len(documents)} documents...")
-        embeddings = self.embedding_service.generate_embeddings_batch(
-            contents,
-            batch_size=batch_size
-        )
+        embeddings = self.embedding_service.generate_embeddings_batch(contents)
         
-        # Add to ChromaDB in batches
+        # Add to the index in batches
         for i in range(0, len(documents), batch_size):
-            batch_ids = ids[i:i + batch_size]
-            batch_embeddings = embeddings[i:i + batch_size]
-            batch_contents = contents[i:i + batch_size]
-            batch_metadatas = metadatas[i:i + batch_size]
-            
-            try:
-                self.collection.add(
-                    ids=batch_ids,
-                    embeddings=batch_embeddings,
-                    documents=batch_contents,
-                    metadatas=batch_metadatas
-                )
-            except Exception as e:
-                print(f"Error adding batch: {e}")
-                # Try upserting instead
-                self.collection.upsert(
-                    ids=batch_ids,
-                    embeddings=batch_embeddings,
-                    documents=batch_contents,
-                    metadatas=batch_metadatas
-                )
+            self.index.upsert(
+                ids[i:i + batch_size],
+                embeddings[i:i + batch_size],
+                contents[i:i + batch_size],
+                metadatas[i:i + batch_size]
+            )
+        if self.lexical_index is not None:
+            self.lexical_index.upsert(ids, contents, metadatas)
+        self.index.bump_version()
+        self.index.save()
+        self._notify_change()
         
         print(f"Added {len(documents)} documents to vector store")
         return len(documents)
@@ -103,7 +406,8 @@ class VectorStoreService:
         self,
         query: str,
         n_results: int = 5,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        lexical_query: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for similar laptops using semantic search
@@ -111,45 +415,112 @@ class VectorStoreService:
         Args:
             query: Search query text
             n_results: Number of results to return
-            filters: Optional metadata filters
+            filters: Optional metadata filters, applied inside the index
+                before top-k: brand, storage_type, min_/max_price,
+                min_/max_ram, min_/max_storage, min_/max_display and
+                ideal_for (category or list of categories, any of)
+            lexical_query: Text for BM25 (default: query), e.g. the user's
+                own words, which keep model and part names
             
         Returns:
-            List of matching laptop documents with scores
+            List of matching laptop documents with scores. With hybrid
+            search on, dense and BM25 rankings are fused by reciprocal rank
+            and each result carries a fusion_score.
         """
+        if self._reload_due():
+            self.reload_if_changed()
+        
+        lexical_results, decisive = self._lexical_search(lexical_query or query, n_results, filters)
+        if decisive:
+            return self._fuse([], lexical_results, n_results)
+        
         # Generate query embedding
         query_embedding = self.embedding_service.generate_embedding(query)
         
-        # Build where clause for filtering
-        where_clause = None
-        if filters:
-            where_clause = self._build_where_clause(filters)
-        
-        # Search in ChromaDB
         try:
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where_clause,
-                include=["documents", "metadatas", "distances"]
-            )
-            
-            # Format results
-            formatted_results = []
-            if results and results['ids'] and len(results['ids'][0]) > 0:
-                for i in range(len(results['ids'][0])):
-                    formatted_results.append({
-                        "laptop_id": results['metadatas'][0][i]['laptop_id'],
-                        "content": results['documents'][0][i],
-                        "metadata": results['metadatas'][0][i],
-                        "similarity_score": 1 - results['distances'][0][i],  # Convert distance to similarity
-                        "distance": results['distances'][0][i]
-                    })
-            
-            return formatted_results
+            dense_results = self.index.query(query_embedding, n_results, filters)
+        except Exception as e:
+            print(f"Error searching vector store: {e}")
+            return []
+        
+        return self._fuse(dense_results, lexical_results, n_results)
+    
+    async def asearch(
+        self,
+        query: str,
+        n_results: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        lexical_query: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Async version of search
+        
+        Args:
+            query: Search query text
+            n_results: Number of results to return
+            filters: Optional metadata filters (see search)
+            query_embedding: Precomputed embedding of query, if available
+            lexical_query: Text for BM25 (see search)
             
+        Returns:
+            List of matching laptop documents with scores
+        """
+        if self._reload_due():
+            await run_blocking(self.reload_if_changed)
+        
+        lexical_results, decisive = await run_blocking(self._lexical_search, lexical_query or query, n_results, filters)
+        if decisive:
+            return self._fuse([], lexical_results, n_results)
+        
+        if query_embedding is None:
+            query_embedding = await self.embedding_service.agenerate_embedding(query)
+        
+        try:
+            dense_results = await run_blocking(self.index.query, query_embedding, n_results, filters)
         except Exception as e:
             print(f"Error searching vector store: {e}")
             return []
+        
+        return self._fuse(dense_results, lexical_results, n_results)
+    
+    def _lexical_search(
+        self,
+        query: str,
+        n_results: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        BM25 results and whether they make the dense search unnecessary
+        
+        An exact model/part string that only one laptop matches is decisive:
+        that laptop leads the results and the embedding call is skipped.
+        The results are still fused (with an empty dense ranking), so their
+        scores are rank-based like any other hybrid result.
+        """
+        if self.lexical_index is None:
+            return [], False
+        
+        try:
+            return self.lexical_index.search(query, n_results, filters)
+        except Exception as e:
+            print(f"Error searching lexical index: {e}")
+            return [], False
+    
+    def _fuse(
+        self,
+        dense_results: List[Dict[str, Any]],
+        lexical_results: List[Dict[str, Any]],
+        n_results: int
+    ) -> List[Dict[str, Any]]:
+        if self.lexical_index is None:
+            return dense_results
+        return reciprocal_rank_fusion(
+            [dense_results, lexical_results],
+            n_results,
+            k=settings.RRF_K,
+            weights=[1.0, settings.LEXICAL_WEIGHT]
+        )
     
     def search_with_budget_filter(
         self,
@@ -179,39 +550,10 @@ class VectorStoreService:
         
         return self.search(query, n_results, filters)
     
-    def _build_where_clause(self, filters: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Build ChromaDB where clause from filters
-        
-        Note: ChromaDB has limited filtering capabilities
-        We'll do additional filtering in the recommendation engine
-        """
-        where = {}
-        
-        # Brand filter
-        if 'brand' in filters:
-            where['brand'] = filters['brand']
-        
-        # Storage type filter
-        if 'storage_type' in filters:
-            where['storage_type'] = filters['storage_type']
-        
-        return where if where else None
-    
     def get_document_by_id(self, laptop_id: int) -> Optional[Dict[str, Any]]:
         """Get document by laptop ID"""
         try:
-            result = self.collection.get(
-                ids=[f"laptop_{laptop_id}"],
-                include=["documents", "metadatas"]
-            )
-            
-            if result and result['ids']:
-                return {
-                    "laptop_id": laptop_id,
-                    "content": result['documents'][0],
-                    "metadata": result['metadatas'][0]
-                }
+            return self.index.get(laptop_id)
         except Exception as e:
             print(f"Error getting document: {e}")
         
@@ -220,14 +562,19 @@ class VectorStoreService:
     def update_document(self, document: LaptopDocument):
         """Update existing document"""
         embedding = self.embedding_service.generate_embedding(document.content)
+        metadata = document.stored_metadata()
         
         try:
-            self.collection.upsert(
-                ids=[f"laptop_{document.laptop_id}"],
-                embeddings=[embedding],
-                documents=[document.content],
-                metadatas=[document.metadata]
+            self.index.upsert(
+                [document.laptop_id],
+                [embedding],
+                [document.content],
+                [metadata]
             )
+            if self.lexical_index is not None:
+                self.lexical_index.upsert([document.laptop_id], [document.content], [metadata])
+            self.index.save()
+            self._notify_change(document.laptop_id)
             print(f"Updated document for laptop {document.laptop_id}")
         except Exception as e:
             print(f"Error updating document: {e}")
@@ -235,18 +582,143 @@ class VectorStoreService:
     def delete_document(self, laptop_id: int):
         """Delete document by laptop ID"""
         try:
-            self.collection.delete(ids=[f"laptop_{laptop_id}"])
+            self.index.delete([laptop_id])
+            if self.lexical_index is not None:
+                self.lexical_index.delete([laptop_id])
+            self.index.save()
+            self._notify_change(laptop_id)
             print(f"Deleted document for laptop {laptop_id}")
         except Exception as e:
             print(f"Error deleting document: {e}")
     
+    def sync_documents(
+        self,
+        documents: Iterable[LaptopDocument],
+        delete_missing: bool = True,
+        batch_size: int = 100,
+        dry_run: bool = False
+    ) -> Dict[str, int]:
+        """
+        Bring the index in line with the current documents
+        
+        Documents are compared by content and metadata hash. Only new or
+        changed content is embedded; metadata-only changes are written in
+        place with the stored embedding. Documents are consumed in batches,
+        so a generator keeps memory flat.
+        
+        Args:
+            documents: Every current laptop document
+            delete_missing: Remove stored laptops that are not in documents
+            batch_size: Documents diffed and written at once
+            dry_run: Count changes without writing
+            
+        Returns:
+            Counts of added, reembedded, metadata_updated, deleted and unchanged documents
+        """
+        stored = self._stored_hashes()
+        counts = {"added": 0, "reembedded": 0, "metadata_updated": 0, "deleted": 0, "unchanged": 0}
+        seen = set()
+        
+        batch: List[LaptopDocument] = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                self._sync_batch(batch, stored, counts, dry_run)
+                seen.update(doc.laptop_id for doc in batch)
+                batch = []
+        if batch:
+            self._sync_batch(batch, stored, counts, dry_run)
+            seen.update(doc.laptop_id for doc in batch)
+        
+        if delete_missing:
+            vanished = [laptop_id for laptop_id in stored if laptop_id not in seen]
+            counts["deleted"] = len(vanished)
+            if vanished and not dry_run:
+                self.index.delete(vanished)
+                if self.lexical_index is not None:
+                    self.lexical_index.delete(vanished)
+        
+        changed = counts["added"] + counts["reembedded"] + counts["metadata_updated"] + counts["deleted"]
+        if changed and not dry_run:
+            self.index.bump_version()
+            self.index.save()
+            self._notify_change()
+        
+        return counts
+    
+    def _stored_hashes(self) -> Dict[int, Tuple[str, str]]:
+        """laptop_id -> (content_hash, metadata_hash) of what the index holds"""
+        hashes = {}
+        for laptop_id, content, metadata in zip(*self.index.documents()):
+            # Documents written before hashes were stored: compare content by
+            # recomputing its hash; the empty metadata hash makes the first
+            # sync write both hashes in place
+            if metadata.get("content_hash") and metadata.get("metadata_hash"):
+                hashes[laptop_id] = (metadata["content_hash"], metadata["metadata_hash"])
+            else:
+                stored = LaptopDocument(laptop_id, content, metadata)
+                hashes[laptop_id] = (stored.content_hash, "")
+        return hashes
+    
+    def _sync_batch(
+        self,
+        batch: List[LaptopDocument],
+        stored: Dict[int, Tuple[str, str]],
+        counts: Dict[str, int],
+        dry_run: bool
+    ):
+        to_embed: List[LaptopDocument] = []
+        metadata_only: List[LaptopDocument] = []
+        
+        for document in batch:
+            previous = stored.get(document.laptop_id)
+            if previous is None:
+                counts["added"] += 1
+                to_embed.append(document)
+            elif previous[0] != document.content_hash:
+                counts["reembedded"] += 1
+                to_embed.append(document)
+            elif previous[1] != document.metadata_hash:
+                counts["metadata_updated"] += 1
+                metadata_only.append(document)
+            else:
+                counts["unchanged"] += 1
+        
+        if dry_run:
+            return
+        
+        if to_embed:
+            contents = [doc.content for doc in to_embed]
+            self.index.upsert(
+                [doc.laptop_id for doc in to_embed],
+                self.embedding_service.generate_embeddings_batch(contents),
+                contents,
+                [doc.stored_metadata() for doc in to_embed]
+            )
+        if metadata_only:
+            self.index.update_metadata(
+                [doc.laptop_id for doc in metadata_only],
+                [doc.stored_metadata() for doc in metadata_only]
+            )
+        
+        changed = to_embed + metadata_only
+        if changed and self.lexical_index is not None:
+            self.lexical_index.upsert(
+                [doc.laptop_id for doc in changed],
+                [doc.content for doc in changed],
+                [doc.stored_metadata() for doc in changed]
+            )
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get collection statistics"""
         try:
-            count = self.collection.count()
+            count = self.index.count()
             return {
                 "collection_name": self.collection_name,
+                "backend": self.backend_name,
                 "document_count": count,
+                "catalogue_version": self.catalogue_version,
+                "hybrid_search": self.lexical_index is not None,
                 "embedding_cache": self.embedding_service.get_cache_stats()
             }
         except Exception as e:
@@ -256,11 +728,12 @@ class VectorStoreService:
     def reset_collection(self):
         """Delete and recreate collection"""
         try:
-            self.client.delete_collection(name=self.collection_name)
-            self.collection = self.client.create_collection(
-                name=self.collection_name,
-                metadata={"description": "Laptop recommendation embeddings"}
-            )
+            self.index.reset()
+            if self.lexical_index is not None:
+                self.lexical_index.reset()
+            self.index.bump_version()
+            self.index.save()
+            self._notify_change()
             print(f"Reset collection: {self.collection_name}")
         except Exception as e:
             print(f"Error resetting collection: {e}")
@@ -0,0 +1,25 @@
+"""
+Shared fixtures: a throwaway SQLite database per test
+"""
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from models.database import Base
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    """File-backed SQLite engine with every table created and foreign keys enforced"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    
+    @event.listens_for(engine, "connect")
+    def _enforce_foreign_keys(dbapi_connection, connection_record):
+        dbapi_connection.execute("PRAGMA foreign_keys = ON")
+    
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session_factory(sqlite_engine):
+    """Session factory bound to sqlite_engine"""
+    return sessionmaker(bind=sqlite_engine)
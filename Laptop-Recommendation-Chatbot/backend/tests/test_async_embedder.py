@@ -0,0 +1,130 @@
+"""
+Tests for the concurrent embedder against a local fake embeddings server
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from openai import BadRequestError
+from core.config import settings
+from services.async_embedder import AsyncBatchEmbedder
+from services.embedding_service import EmbeddingService
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    """OpenAI-compatible /embeddings endpoint that rate-limits every third request"""
+    
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeEmbeddingHandler)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.batch_sizes = []
+        self.reject = None  # requests with a text containing this get a 400
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+    
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        
+        if server.reject and any(server.reject in text for text in body["input"]):
+            payload = json.dumps({"error": {"message": "Invalid input", "type": "invalid_request_error"}}).encode()
+            self.send_response(400)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        
+        with server.lock:
+            server.requests += 1
+            throttle = server.requests % 3 == 0
+            if throttle:
+                server.rate_limited += 1
+            else:
+                server.in_flight += 1
+                server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                server.batch_sizes.append(len(body["input"]))
+        
+        if throttle:
+            payload = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode()
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            time.sleep(0.05)
+            # Return items in reverse to check results are re-ordered by index
+            data = [
+                {"object": "embedding", "index": i, "embedding": [float(len(text)), float(i)]}
+                for i, text in enumerate(body["input"])
+            ][::-1]
+            payload = json.dumps({
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1}
+            }).encode()
+            with server.lock:
+                server.in_flight -= 1
+            self.send_response(200)
+        
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """Run the fake server and point the OpenAI client at it"""
+    server = FakeEmbeddingServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_split_batches_by_token_count():
+    """Test batches respect the token budget and the item cap"""
+    embedder = AsyncBatchEmbedder(max_batch_tokens=10)
+    texts = ["a" * 16, "b" * 16, "c" * 36, "d"]  # 5, 5, 10 and 1 estimated tokens
+    
+    assert embedder.split_batches(texts) == [[0, 1], [2], [3]]
+    assert embedder.split_batches(["x"] * 5, max_items=2) == [[0, 1], [2, 3], [4]]
+
+def test_embed_concurrently_with_retries(fake_server):
+    """Test results come back in input order despite 429s and concurrent requests"""
+    embedder = AsyncBatchEmbedder(concurrency=4, max_batch_tokens=20, backoff_base=0.01)
+    texts = [f"laptop {i}" * (i % 3 + 1) for i in range(40)]
+    
+    embeddings = asyncio.run(embedder.embed(texts))
+    
+    assert [e[0] for e in embeddings] == [float(len(t)) for t in texts]
+    assert fake_server.rate_limited > 0
+    assert fake_server.max_in_flight > 1
+    assert sum(fake_server.batch_sizes) == len(texts)
+
+def test_failed_batch_keeps_finished_batches_cached(fake_server, tmp_path):
+    """Test batches embedded before a request fails for good are cached, not thrown away"""
+    service = EmbeddingService(cache_dir=str(tmp_path / "cache"))
+    service.batch_embedder.backoff_base = 0.01
+    texts = [f"laptop {i}" for i in range(6)] + ["poison"]
+    fake_server.reject = "poison"
+    
+    with pytest.raises(BadRequestError):
+        asyncio.run(service.agenerate_embeddings_batch(texts, batch_size=2))
+    
+    _, hits = service.cache.lookup(texts)
+    assert hits.tolist() == [True] * 6 + [False]
+    
+    # Retrying only sends what is still missing
+    fake_server.reject = None
+    fake_server.batch_sizes.clear()
+    asyncio.run(service.agenerate_embeddings_batch(texts, batch_size=2))
+    assert fake_server.batch_sizes == [1]
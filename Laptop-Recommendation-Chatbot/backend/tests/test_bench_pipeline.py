@@ -0,0 +1,59 @@
+"""
+Unit tests for the pipeline benchmark's metrics, report comparison and stub OpenAI server
+"""
+import json
+import pytest
+from openai import OpenAI
+from benchmarks.bench_pipeline import compare_reports, latency_summary, load_queries, ndcg_at_k, recall_at_k
+from benchmarks.stub_openai import StubOpenAIServer
+from models.seed_data import get_sample_laptops
+
+def test_ranking_metrics():
+    """Test recall counts relevant hits in the top k and nDCG rewards graded relevance near the top"""
+    relevant = {"A": 2, "B": 1, "C": 1}
+    
+    assert recall_at_k(["A", "X", "B", "C"], relevant, 2) == pytest.approx(1 / 3)
+    assert recall_at_k(["A", "X", "B", "C"], relevant, 4) == 1.0
+    assert ndcg_at_k(["A", "B", "C"], relevant, 3) == pytest.approx(1.0)
+    assert ndcg_at_k(["B", "A", "C"], relevant, 3) < ndcg_at_k(["A", "B", "X"], relevant, 3) < 1.0
+    assert ndcg_at_k(["X", "Y"], relevant, 2) == 0.0
+
+def test_latency_summary_and_comparison():
+    """Test percentiles interpolate between samples and reports diff metric by metric"""
+    summary = latency_summary([float(ms) for ms in range(1, 101)])
+    assert summary["p50"] == pytest.approx(50.5)
+    assert summary["p99"] == pytest.approx(99.01)
+    
+    baseline = {"quality": {"retrieval": {"ndcg@5": 0.5}}, "latency_ms": {"engine.total": {"p50": 10.0}}}
+    current = {"quality": {"retrieval": {"ndcg@5": 0.6}}, "latency_ms": {"engine.total": latency_summary([20.0])}}
+    rows = {(row["section"], row["metric"]): row for row in compare_reports(current, baseline)}
+    
+    assert rows[("retrieval", "ndcg@5")]["delta"] == pytest.approx(0.1)
+    assert rows[("engine.total", "p50")]["ratio"] == 2.0
+    assert ("engine.total", "p95") not in rows
+
+def test_labelled_queries_name_sample_laptops():
+    """Test every labelled laptop exists in the sample catalogue the benchmark seeds"""
+    names = {f"{laptop['brand']} {laptop['model']}" for laptop in get_sample_laptops()}
+    for entry in load_queries("benchmarks/eval_queries.json"):
+        assert set(entry["relevant"]) <= names, entry["id"]
+
+def test_stub_server_speaks_openai():
+    """Test the OpenAI client reads stub embeddings and extractor replies"""
+    server = StubOpenAIServer(dimensions=32).start()
+    try:
+        client = OpenAI(api_key="stub", base_url=server.base_url)
+        embeddings = client.embeddings.create(model="text-embedding-3-small", input=["laptop for coding", "gaming"])
+        reply = client.chat.completions.create(model="gpt-4", messages=[
+            {"role": "system", "content": "You are a requirement extractor for a laptop recommendation system."},
+            {"role": "user", "content": "Machine learning laptop, budget 150k to 200k"}
+        ])
+    finally:
+        server.stop()
+    
+    assert [len(item.embedding) for item in embeddings.data] == [32, 32]
+    assert sum(value * value for value in embeddings.data[0].embedding) == pytest.approx(1.0, rel=1e-5)
+    assert json.loads(reply.choices[0].message.content) == {
+        "budget": {"min": 150000, "max": 200000}, "use_case": ["data_science"], "brand_preference": None
+    }
+    assert server.requests == {"embeddings": 1, "chat": 1}
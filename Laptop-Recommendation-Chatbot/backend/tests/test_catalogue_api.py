@@ -0,0 +1,95 @@
+"""
+API tests for keyset pagination, field projection and ETags on the catalogue routes
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api.laptop_routes import laptop_router
+from models.database import Laptop, get_db, get_read_db
+from models.seed_data import upsert_laptops
+
+@pytest.fixture
+def client(session_factory):
+    """App with the laptop routes on a fresh database of five laptops"""
+    with session_factory.begin() as db:
+        # Two laptops share a price to exercise the id tie-break
+        for i, price in enumerate([150000, 90000, 120000, 90000, 200000]):
+            db.add(Laptop(
+                brand="HP", model=f"Model {i}", cpu="Intel Core i5", ram_gb=8, storage_gb=512,
+                storage_type="SSD", gpu="Intel UHD", display_size=15.6, price_pkr=price,
+                ideal_for=["Office Work"]
+            ))
+    
+    def override():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    app = FastAPI()
+    app.include_router(laptop_router, prefix="/api")
+    app.dependency_overrides[get_db] = override
+    app.dependency_overrides[get_read_db] = override
+    client = TestClient(app)
+    client.SessionLocal = session_factory
+    return client
+
+def test_keyset_pages_cover_catalogue_once(client):
+    """Test following X-Next-Cursor walks every laptop once, in price order"""
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "fields": "model,price_pkr"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/laptops/", params=params)
+        assert response.status_code == 200
+        seen.extend(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    
+    assert [row["price_pkr"] for row in seen] == [90000, 90000, 120000, 150000, 200000]
+    assert len({row["id"] for row in seen}) == 5
+    assert set(seen[0]) == {"id", "model", "price_pkr"}
+
+def test_projection_and_bad_input(client):
+    """Test unknown fields and malformed cursors are rejected"""
+    response = client.get("/api/laptops/budget/80000/130000", params={"fields": "brand"})
+    assert response.json() == [{"id": 2, "brand": "HP"}, {"id": 4, "brand": "HP"}, {"id": 3, "brand": "HP"}]
+    
+    assert client.get("/api/laptops/", params={"fields": "brand,password"}).status_code == 400
+    assert client.get("/api/laptops/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+def test_etag_revalidation(client):
+    """Test a matching If-None-Match gets 304 until the catalogue changes"""
+    first = client.get("/api/laptops/1")
+    etag = first.headers["etag"]
+    assert first.json()["model"] == "Model 0"
+    
+    cached = client.get("/api/laptops/1", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    
+    search = client.post("/api/laptops/search", json={"max_price": 100000}, headers={"If-None-Match": etag})
+    assert search.status_code == 200
+    assert len(search.json()) == 2
+    
+    client.put("/api/laptops/1", json={"price_pkr": 140000})
+    refreshed = client.get("/api/laptops/1", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert refreshed.json()["price_pkr"] == 140000
+
+def test_etag_changes_on_writes_from_other_processes(client):
+    """Test a bulk upsert outside the API (scraper, seed script, another worker) invalidates ETags"""
+    etag = client.get("/api/laptops/", params={"limit": 2}).headers["etag"]
+    
+    with client.SessionLocal.begin() as db:
+        upsert_laptops(db, [{"brand": "HP", "model": "Model 1", "price_pkr": 95000, "source_url": None}])
+    
+    refreshed = client.get("/api/laptops/", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers["etag"] != etag
+    assert [row["price_pkr"] for row in refreshed.json()] == [90000, 95000]
@@ -0,0 +1,99 @@
+"""
+Unit tests for the columnar catalogue snapshot
+"""
+from types import SimpleNamespace
+import pytest
+from models.database import Laptop, bump_catalogue_version
+from models.schemas import LaptopCreate
+from services import recommendation_engine
+from services.catalogue_snapshot import CatalogueSnapshot, CatalogueSnapshotCache
+from services.laptop_service import LaptopService
+from services.recommendation_engine import RecommendationEngine
+
+def make_laptop(laptop_id, **overrides):
+    fields = {
+        "id": laptop_id,
+        "brand": "HP",
+        "ram_gb": 16,
+        "storage_gb": 512,
+        "storage_type": "SSD",
+        "display_size": 15.6,
+        "price_pkr": 100000,
+        "battery_hours": None,
+        "weight_kg": 1.8,
+        "ideal_for": ["Programming"]
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+@pytest.fixture
+def snapshot():
+    return CatalogueSnapshot([
+        make_laptop(1),
+        make_laptop(2, brand="Dell", ram_gb=12, storage_type="HDD", ideal_for=["Gaming"]),
+        make_laptop(3, ram_gb=8, price_pkr=250000, ideal_for=["Office Work", "CS Student"])
+    ])
+
+def test_requirement_scores(snapshot):
+    """Test use case, brand, RAM and storage weights over the whole catalogue"""
+    requirements = {
+        "use_case": ["programming", "gaming"],
+        "brand_preference": "HP",
+        "ram_preference": 16,
+        "storage_preference": {"type": "SSD", "size_gb": 512}
+    }
+    
+    scores = snapshot.requirement_scores(requirements)
+    
+    # 1: one use case, brand, RAM, SSD + size; 2: one use case, RAM >= 75%, size;
+    # 3: CS Student counts for programming, brand, SSD + size
+    assert scores.tolist() == pytest.approx([0.8 / 1.0, 0.4 / 1.0, 0.6 / 1.0])
+    assert snapshot.requirement_scores({}).tolist() == [0.5, 0.5, 0.5]
+    assert snapshot.requirement_scores({"brand_preference": "Lenovo"}).tolist() == [0.0, 0.0, 0.0]
+
+def test_rank_applies_budget_and_weights(snapshot):
+    """Test ranking combines similarity and requirements and drops over-budget rows"""
+    requirements = {"use_case": ["gaming"], "budget": {"min": 0, "max": 200000}}
+    
+    ranked = snapshot.rank([1, 2, 3], {1: 0.9, 2: 0.8, 3: 1.0}, requirements)
+    
+    assert [laptop_id for laptop_id, _, _ in ranked] == [2, 1]
+    assert ranked[0] == (2, 0.8, pytest.approx(0.8 * 0.6 + 0.4))
+    assert ranked[1] == (1, 0.9, pytest.approx(0.9 * 0.6))
+
+def test_missing_values_never_match(snapshot):
+    """Test NaN columns fail range comparisons"""
+    assert not snapshot.budget_mask({"max": 10}).any()
+    assert (snapshot.columns["battery_hours"] >= 0).sum() == 0
+
+def test_engine_snapshot_follows_catalogue_version(session_factory, monkeypatch):
+    """Test the shared snapshot is reused until any writer bumps the catalogue version"""
+    snapshots = CatalogueSnapshotCache()
+    monkeypatch.setattr(recommendation_engine, "catalogue_snapshots", snapshots)
+    db = session_factory()
+    laptop = LaptopService.create_laptop(db, LaptopCreate(
+        brand="HP", model="Victus 15", cpu="Ryzen 5", ram_gb=16, storage_gb=512,
+        storage_type="SSD", gpu="RTX 3050", display_size=15.6, price_pkr=180000,
+        ideal_for=["Gaming"]
+    ))
+    recommender = RecommendationEngine.__new__(RecommendationEngine)
+    hits = [{"laptop_id": laptop.id, "similarity_score": 0.9}]
+    requirements = {"budget": {"min": 0, "max": 190000}}
+    
+    ranked = recommender._filter_laptops(recommender._fetch_laptops(db, hits), requirements, {laptop.id: 0.9})
+    assert [row.id for row, _, _ in ranked] == [laptop.id]
+    built = snapshots.current()
+    recommender._fetch_laptops(db, hits)
+    assert snapshots.current() is built
+    
+    # Another process raises the price, bumping the version as every laptop write does
+    writer = session_factory()
+    writer.query(Laptop).filter(Laptop.id == laptop.id).update({"price_pkr": 210000})
+    bump_catalogue_version(writer)
+    writer.commit()
+    writer.close()
+    db.expire_all()
+    
+    assert recommender._filter_laptops(recommender._fetch_laptops(db, hits), requirements, {laptop.id: 0.9}) == []
+    assert snapshots.current().version == built.version + 1
+    db.close()
@@ -0,0 +1,45 @@
+"""
+Unit tests for the tuned SQLite engine factory
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from core.db_engine import create_db_engine, is_sqlite_file
+
+def test_file_engine_applies_pragmas_and_pool(tmp_path):
+    """Test every pooled connection runs in WAL mode with the requested pool size"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'app.db'}", pool_size=3, max_overflow=1, cache_mb=16)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -16 * 1024
+    assert engine.pool.size() == 3
+    engine.dispose()
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    """Test the catalogue engine reads committed data but cannot write"""
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    writer = create_db_engine(url)
+    reader = create_db_engine(url, read_only=True)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE laptops (id INTEGER PRIMARY KEY, model TEXT)"))
+        conn.execute(text("INSERT INTO laptops (model) VALUES ('Pavilion 15')"))
+    
+    with reader.connect() as conn:
+        assert conn.execute(text("SELECT model FROM laptops")).scalar() == "Pavilion 15"
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO laptops (model) VALUES ('Inspiron 15')"))
+    writer.dispose()
+    reader.dispose()
+
+def test_memory_database_keeps_default_pool():
+    """Test in-memory URLs are not given file pragmas or a sized pool"""
+    assert not is_sqlite_file("sqlite://")
+    assert not is_sqlite_file("sqlite:///:memory:")
+    assert is_sqlite_file("sqlite:///./laptop_recommendations.db")
+    assert not is_sqlite_file("postgresql://user@localhost/laptops")
+    
+    engine = create_db_engine("sqlite://", pool_size=3)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
@@ -0,0 +1,101 @@
+"""
+Unit tests for the memory-mapped embedding cache
+"""
+import threading
+import pytest
+import numpy as np
+from services.embedding_cache import MmapEmbeddingCache
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create an empty cache in a temporary directory"""
+    return MmapEmbeddingCache(str(tmp_path / "cache"))
+
+def test_store_and_bulk_lookup(cache):
+    """Test bulk lookup returns vectors in input order with a hit mask"""
+    texts = ["hp laptop", "dell laptop", "lenovo laptop"]
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    
+    assert cache.store(texts, vectors) == 3
+    
+    matrix, hits = cache.lookup(["lenovo laptop", "asus laptop", "hp laptop"])
+    
+    assert hits.tolist() == [True, False, True]
+    assert matrix.dtype == np.float32
+    assert matrix[0].tolist() == vectors[2].tolist()
+    assert matrix[1].tolist() == [0, 0, 0, 0]
+    assert matrix[2].tolist() == vectors[0].tolist()
+
+def test_duplicates_are_not_appended(cache):
+    """Test texts already cached are skipped on store"""
+    cache.store(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+    appended = cache.store(["b", "c", "c"], [[9.0, 9.0], [5.0, 6.0], [7.0, 8.0]])
+    
+    assert appended == 1
+    assert len(cache) == 3
+    assert cache.get("b").tolist() == [3.0, 4.0]
+    assert cache.get("c").tolist() == [5.0, 6.0]
+
+def test_cache_persists_across_instances(tmp_path):
+    """Test the index is rebuilt from disk"""
+    path = str(tmp_path / "cache")
+    MmapEmbeddingCache(path).store(["query"], [[0.5, 0.25, 0.125]])
+    
+    reopened = MmapEmbeddingCache(path)
+    
+    assert len(reopened) == 1
+    assert reopened.dim == 3
+    assert reopened.get("query").tolist() == [0.5, 0.25, 0.125]
+    assert reopened.size_bytes() < 3 * 9 + 64
+
+def test_torn_append_is_truncated(tmp_path):
+    """Test a partial vector write left by a crash is discarded on load"""
+    path = tmp_path / "cache"
+    cache = MmapEmbeddingCache(str(path))
+    cache.store(["ok"], [[1.0, 2.0]])
+    
+    with open(path / MmapEmbeddingCache.VECTORS_FILE, 'ab') as f:
+        f.write(b"\x00\x00")
+    
+    reopened = MmapEmbeddingCache(str(path))
+    
+    assert len(reopened) == 1
+    assert reopened.get("ok").tolist() == [1.0, 2.0]
+    assert (path / MmapEmbeddingCache.VECTORS_FILE).stat().st_size == 8
+
+def test_dimension_mismatch_raises(cache):
+    """Test vectors of a different width are rejected"""
+    cache.store(["a"], [[1.0, 2.0]])
+    
+    with pytest.raises(ValueError):
+        cache.store(["b"], [[1.0, 2.0, 3.0]])
+
+def test_clear(cache):
+    """Test clearing removes all rows and files"""
+    cache.store(["a"], [[1.0]])
+    cache.clear()
+    
+    assert len(cache) == 0
+    assert cache.get("a") is None
+    assert cache.size_bytes() == 0
+
+def test_concurrent_stores_keep_rows_aligned(tmp_path):
+    """Test threads storing at once never give two keys the same row"""
+    cache = MmapEmbeddingCache(str(tmp_path / "cache"))
+    
+    def store(worker):
+        for i in range(50):
+            text = f"{worker}-{i}"
+            cache.store([text], [[float(worker), float(i)]])
+    
+    threads = [threading.Thread(target=store, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(cache) == 200
+    reloaded = MmapEmbeddingCache(str(tmp_path / "cache"))
+    for worker in range(4):
+        for i in range(50):
+            assert reloaded.get(f"{worker}-{i}").tolist() == [float(worker), float(i)]
@@ -0,0 +1,162 @@
+"""
+Unit tests for batched recommendation event logging and the CTR report
+"""
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from core.jsonl import read_jsonl
+from models.database import Base, Laptop, add_missing_columns, LaptopPopularity, Recommendation, UserSession
+from scripts.ctr_report import ctr_table
+from services.event_logger import RecommendationEventLogger, query_cluster
+from services.session_store import SessionStore
+
+@pytest.fixture
+def session_factory(session_factory):
+    """The shared session factory with a session and three laptops"""
+    with session_factory.begin() as db:
+        db.add(UserSession(session_id="s1", conversation_history=[], preferences={}))
+        for model in ("Victus", "Pavilion 15", "15s"):
+            db.add(Laptop(
+                brand="HP", model=model, cpu="Intel Core i5", ram_gb=8, storage_gb=512, storage_type="SSD",
+                gpu="Intel UHD", display_size=15.6, price_pkr=100000, ideal_for=["Office Work"]
+            ))
+    return session_factory
+
+def test_events_are_queued_then_written_in_one_flush(session_factory, tmp_path):
+    """Test logging does no database work until flush, which writes rows, clicks, popularity and the log"""
+    logger = RecommendationEventLogger(session_factory, log_path=str(tmp_path / "events.jsonl"), flush_interval=60)
+    cards = logger.log_impressions("s1", [{"id": 1}, {"id": 2}, {"id": 3}], query_cluster(["Programming"], 120000))
+    logger.log_click("s1", 2, cards[1]["impression_id"])
+    logger.log_click("s1", 3)
+    
+    db = session_factory()
+    assert db.query(Recommendation).count() == 0
+    assert logger.flush() == 5
+    assert [(r.laptop_id, r.rank, r.clicked) for r in db.query(Recommendation).order_by(Recommendation.id)] == [
+        (1, 1, False), (2, 2, True), (3, 3, True)
+    ]
+    assert {(p.laptop_id, p.recommendation_count, p.click_count) for p in db.query(LaptopPopularity)} == {
+        (1, 1, 0), (2, 1, 1), (3, 1, 1)
+    }
+    db.close()
+    logger.close()
+    
+    events = list(read_jsonl(tmp_path / "events.jsonl"))
+    assert [e["type"] for e in events] == ["impression"] * 3 + ["click"] * 2
+    assert events[0]["cluster"] == "programming:100k-150k"
+    assert logger.get_stats()["written"] == 5
+
+def test_failed_flush_keeps_events(tmp_path):
+    """Test events survive a database error and are written by the next flush"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'late.db'}")
+    logger = RecommendationEventLogger(sessionmaker(bind=engine), flush_interval=60)
+    logger.log_impressions("s1", [{"id": 1}])
+    
+    assert logger.flush() == 0
+    assert logger.get_stats()["queued"] == 1
+    
+    Base.metadata.create_all(bind=engine)
+    assert logger.flush() == 1
+    logger.close()
+    engine.dispose()
+
+def test_failing_session_is_retried_alone_then_dead_lettered(session_factory, tmp_path):
+    """Test a session whose events keep failing does not block others and ends up in the dead-letter log"""
+    logger = RecommendationEventLogger(
+        session_factory, flush_interval=60, max_attempts=2,
+        dead_letter_path=str(tmp_path / "dead.jsonl")
+    )
+    logger.log_impressions("s1", [{"id": 1}, {"id": 2}])
+    logger.log_impressions("unknown", [{"id": 3}])
+    
+    assert logger.flush() == 2
+    assert logger.get_stats()["queued"] == 1
+    
+    logger.log_click("s1", 2)
+    assert logger.flush() == 1
+    assert logger.get_stats()["queued"] == 0
+    logger.close()
+    
+    db = session_factory()
+    assert [(r.session_id, r.laptop_id, r.clicked) for r in db.query(Recommendation).order_by(Recommendation.id)] == [
+        ("s1", 1, False), ("s1", 2, True)
+    ]
+    db.close()
+    dead = list(read_jsonl(tmp_path / "dead.jsonl"))
+    assert [(e["session_id"], e["laptop_id"]) for e in dead] == [("unknown", 3)]
+    assert "FOREIGN KEY" in dead[0]["error"]
+    assert logger.get_stats()["dead_lettered"] == 1
+
+def test_queued_sessions_are_written_before_events(session_factory):
+    """Test the pre-flush hook writes a new session row before impressions reference it"""
+    store = SessionStore(session_factory, flush_interval=60)
+    logger = RecommendationEventLogger(session_factory, flush_interval=60, before_flush=store.flush)
+    db = session_factory()
+    state = store.get(db, "new-session")
+    state.add_turn("user", "Laptop for programming")
+    store.save(state)
+    
+    logger.log_impressions("new-session", [{"id": 1}])
+    
+    assert logger.flush() == 1
+    assert db.query(Recommendation).filter(Recommendation.session_id == "new-session").count() == 1
+    db.close()
+    logger.close()
+    store.close()
+
+def test_click_marks_the_reported_impression(session_factory):
+    """Test a click updates the impression it names, not the latest showing of that laptop"""
+    logger = RecommendationEventLogger(session_factory, flush_interval=60)
+    first = logger.log_impressions("s1", [{"id": 1}, {"id": 2}])
+    logger.log_impressions("s1", [{"id": 1}])
+    logger.log_click("s1", 1, first[0]["impression_id"])
+    logger.log_click("s1", 1, first[0]["impression_id"])
+    
+    assert logger.flush() == 5
+    db = session_factory()
+    assert [(r.impression_id == first[0]["impression_id"], r.clicked) for r in db.query(Recommendation).filter(
+        Recommendation.laptop_id == 1
+    ).order_by(Recommendation.id)] == [(True, True), (False, False)]
+    assert db.query(LaptopPopularity).filter(LaptopPopularity.laptop_id == 1).one().click_count == 1
+    db.close()
+    logger.close()
+
+def test_missing_columns_are_added_to_existing_tables(tmp_path):
+    """Test a recommendations table created before impression_id gains the column and its index"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE recommendations (id INTEGER PRIMARY KEY, session_id VARCHAR(100) NOT NULL, "
+            "laptop_id INTEGER NOT NULL, rank INTEGER NOT NULL, reason_generated TEXT, "
+            "clicked BOOLEAN, created_at DATETIME)"
+        )
+    
+    assert add_missing_columns(engine) == 1
+    assert add_missing_columns(engine) == 0
+    inspector = inspect(engine)
+    assert "impression_id" in {c["name"] for c in inspector.get_columns("recommendations")}
+    assert "ix_recommendations_impression_id" in {i["name"] for i in inspector.get_indexes("recommendations")}
+    engine.dispose()
+
+def test_ctr_table_groups_by_dimension():
+    """Test clicks join to impressions by ID or latest session impression, counted once"""
+    def impression(impression_id, laptop_id, rank, cluster="gaming:any"):
+        return {"type": "impression", "impression_id": impression_id, "session_id": "s1",
+                "laptop_id": laptop_id, "rank": rank, "cluster": cluster, "timestamp": "2025-01-01T10:00:00"}
+    
+    events = [
+        impression("a", 1, 1), impression("b", 2, 2), impression("c", 1, 1, "programming:any"),
+        {"type": "click", "impression_id": "a", "session_id": "s1", "laptop_id": 1},
+        {"type": "click", "impression_id": "a", "session_id": "s1", "laptop_id": 1},
+        {"type": "click", "impression_id": None, "session_id": "s1", "laptop_id": 2}
+    ]
+    
+    assert ctr_table(events, ["laptop_id"]) == [
+        {"laptop_id": 1, "impressions": 2, "clicks": 1, "ctr": 0.5},
+        {"laptop_id": 2, "impressions": 1, "clicks": 1, "ctr": 1.0}
+    ]
+    by_cluster_rank = ctr_table(events, ["cluster", "rank"])
+    assert [(r["cluster"], r["rank"], r["clicks"]) for r in by_cluster_rank] == [
+        ("gaming:any", 1, 1), ("gaming:any", 2, 1), ("programming:any", 1, 0)
+    ]
+    assert ctr_table(events, ["rank"], since="2025-02-01") == []
@@ -0,0 +1,62 @@
+"""
+Unit tests for compiled intent detection and the shared conversation manager
+"""
+import pytest
+from models.database import Laptop, UserSession
+from services.conversation_manager import ConversationFlowManager
+from services.intent_detector import Intent, KeywordMatcher, analyze
+from services.session_store import SessionStore
+
+def test_intent_priority():
+    """Test the first matching intent family wins, as with the per-pattern loop"""
+    assert analyze("Hi, I need a laptop for programming").intent == Intent.GREETING
+    assert analyze("budget 100k for programming").intent == Intent.BUDGET_QUERY
+    assert analyze("Compare HP vs Dell laptops").intent == Intent.COMPARISON_REQUEST
+    assert analyze("Tell me about the HP Pavilion").intent == Intent.SPECIFIC_LAPTOP
+    assert analyze("Where can I buy one?").intent == Intent.UNKNOWN
+
+def test_single_pass_entities():
+    """Test budget, use cases, brands, student type and major come back together"""
+    analysis = analyze("I'm an FSC pre-engineering student, HP or Lenovo, 80k to 120k")
+    
+    assert (analysis.budget_min, analysis.budget_max) == (80000, 120000)
+    # "pre-engineering" also contains "engineering"
+    assert analysis.use_cases == ["FSC Student", "Engineering"]
+    assert analysis.brands == ["HP", "Lenovo"]
+    assert analysis.student_type == "FSC"
+    assert analysis.major == "Engineering"
+
+def test_keyword_matcher_finds_overlapping_keywords():
+    """Test keywords hidden inside longer ones are still found"""
+    matcher = KeywordMatcher({"a": ["video editing"], "b": ["editing"], "c": ["vid"], "d": ["xyz"]})
+    
+    assert matcher.find("some video editing work") == ["a", "b", "c"]
+    assert matcher.find("nothing here") == []
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+def test_shared_manager_across_sessions(db, session_factory):
+    """Test one manager instance serves several sessions with a per-call db"""
+    db.add(Laptop(
+        brand="HP", model="Pavilion 15", cpu="Intel i5", ram_gb=8, storage_gb=512,
+        storage_type="SSD", gpu="Intel Iris Xe", display_size=15.6, price_pkr=120000,
+        ideal_for=["Programming"]
+    ))
+    db.commit()
+    store = SessionStore(session_factory)
+    manager = ConversationFlowManager(store)
+    
+    response, _ = manager.generate_response(db, "first", "Tell me about the HP Pavilion")
+    assert "**HP Pavilion 15** - PKR 120,000" in response
+    
+    manager.generate_response(db, "second", "I'm a CS student, budget 100k")
+    store.flush()
+    preferences = db.query(UserSession).filter(UserSession.session_id == "second").first().preferences
+    assert preferences["major"] == "CS"
+    assert preferences["budget_max"] == 120000
+    assert db.query(UserSession).filter(UserSession.session_id == "first").first().preferences["brand_pref"] == ["HP"]
+    store.close()
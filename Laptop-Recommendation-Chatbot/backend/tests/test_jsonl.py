@@ -0,0 +1,78 @@
+"""
+Unit tests for JSON Lines export and scraped laptop loading
+"""
+import gzip
+from core.jsonl import JsonLinesWriter, part_files, read_jsonl
+from models.database import Laptop
+from models.seed_data import laptop_from_scraped, upsert_laptops
+
+def test_writer_rotates_and_reader_streams_parts(tmp_path):
+    """Test parts roll over by size and read back in write order"""
+    base = tmp_path / "laptops.jsonl"
+    with JsonLinesWriter(base, max_bytes=60) as writer:
+        for i in range(5):
+            writer.write({"id": i, "name": f"laptop {i}"})
+    
+    assert len(writer.parts) > 1
+    assert [p.name for p in part_files(base)][0] == "laptops.00001.jsonl"
+    assert [record["id"] for record in read_jsonl(base)] == [0, 1, 2, 3, 4]
+    assert [record["id"] for record in read_jsonl(tmp_path, limit=2)] == [0, 1]
+
+def test_resumed_run_appends_new_parts(tmp_path):
+    """Test a second writer continues numbering instead of overwriting"""
+    base = tmp_path / "laptops.jsonl"
+    with JsonLinesWriter(base, compress=True) as writer:
+        writer.write({"id": 1})
+    with JsonLinesWriter(base, compress=True) as writer:
+        writer.write({"id": 2})
+    
+    assert [p.name for p in part_files(base)] == ["laptops.00001.jsonl.gz", "laptops.00002.jsonl.gz"]
+    assert [record["id"] for record in read_jsonl(base)] == [1, 2]
+
+def test_concurrent_writers_never_share_a_part(tmp_path):
+    """Test writers opened together on one base path (e.g. two workers) each get their own parts"""
+    base = tmp_path / "events.jsonl"
+    first = JsonLinesWriter(base, max_bytes=20)
+    second = JsonLinesWriter(base, max_bytes=20)
+    for i in range(3):
+        first.write({"worker": 1, "i": i})
+        second.write({"worker": 2, "i": i})
+    first.close()
+    second.close()
+    
+    assert not set(first.parts) & set(second.parts)
+    records = list(read_jsonl(base))
+    assert sorted((r["worker"], r["i"]) for r in records) == [(w, i) for w in (1, 2) for i in range(3)]
+
+def test_reader_survives_crashed_writer(tmp_path):
+    """Test flushed records are readable from files cut off mid-write"""
+    plain = tmp_path / "plain.00001.jsonl"
+    plain.write_text('{"id": 1}\n{"id": 2}\n{"id": ')
+    assert [record["id"] for record in read_jsonl(plain)] == [1, 2]
+    
+    writer = JsonLinesWriter(tmp_path / "gz" / "laptops.jsonl", compress=True)
+    writer.write({"id": 1})
+    writer.write({"id": 2})
+    # Simulate a crash: copy the file while it is still open
+    crashed = tmp_path / "crashed.jsonl.gz"
+    crashed.write_bytes(writer.parts[0].read_bytes())
+    writer.close()
+    assert [record["id"] for record in read_jsonl(crashed)] == [1, 2]
+    with gzip.open(writer.parts[0], "rt") as f:
+        assert len(f.readlines()) == 2
+
+def test_upsert_scraped_laptops(session_factory):
+    """Test scraped items insert once per brand/model and refresh price on rescrape"""
+    item = {"brand": "HP", "model": "Victus 15", "price_available": True, "price_pkr": 200000}
+    assert laptop_from_scraped({**item, "price_available": False}) is None
+    
+    with session_factory.begin() as db:
+        assert upsert_laptops(db, [laptop_from_scraped(item)]) == (1, 0)
+    with session_factory.begin() as db:
+        rescraped = laptop_from_scraped({**item, "price_pkr": 185000, "product_url": "https://example.com"})
+        assert upsert_laptops(db, [rescraped, laptop_from_scraped({**item, "model": "Omen"})]) == (1, 1)
+    
+    with session_factory() as db:
+        assert db.query(Laptop).count() == 2
+        victus = db.query(Laptop).filter(Laptop.model == "Victus 15").one()
+        assert (victus.price_pkr, victus.source_url) == (185000, "https://example.com")
@@ -0,0 +1,67 @@
+"""
+Unit tests for the laptop_categories index table
+"""
+import pytest
+from sqlalchemy import text
+from models.database import Laptop, LaptopCategory, backfill_laptop_categories
+from models.schemas import LaptopSearchParams, LaptopUpdate
+from models.seed_data import upsert_laptops
+from services.laptop_service import LaptopService
+
+def make_laptop(model, ideal_for, price=100000):
+    return dict(
+        brand="HP", model=model, cpu="Intel Core i5", ram_gb=8, storage_gb=512, storage_type="SSD",
+        gpu="Intel UHD", display_size=15.6, price_pkr=price, ideal_for=ideal_for
+    )
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
+
+def categories(db):
+    return sorted((row.laptop_id, row.category) for row in db.query(LaptopCategory))
+
+def test_orm_writes_keep_categories_in_sync(db):
+    """Test create, update and delete maintain the category rows"""
+    laptop = Laptop(**make_laptop("Victus", ["Gaming", "Programming", "Gaming"]))
+    db.add(laptop)
+    db.commit()
+    assert categories(db) == [(laptop.id, "Gaming"), (laptop.id, "Programming")]
+    
+    LaptopService.update_laptop(db, laptop.id, LaptopUpdate(ideal_for=["Programming", "CS Student"]))
+    assert categories(db) == [(laptop.id, "CS Student"), (laptop.id, "Programming")]
+    
+    LaptopService.delete_laptop(db, laptop.id)
+    assert categories(db) == []
+
+def test_upsert_and_backfill_write_categories(db):
+    """Test bulk-inserted and pre-existing laptops get category rows"""
+    assert upsert_laptops(db, [make_laptop("Pavilion 15", ["Office Work"])], on_conflict=False) == (1, 0)
+    db.commit()
+    assert [category for _, category in categories(db)] == ["Office Work"]
+    
+    # A laptop from before the table existed
+    db.execute(text("DELETE FROM laptop_categories"))
+    db.commit()
+    assert backfill_laptop_categories(db.get_bind()) == 1
+    assert backfill_laptop_categories(db.get_bind()) == 0
+    assert [category for _, category in categories(db)] == ["Office Work"]
+
+def test_category_queries_use_index(db):
+    """Test category and search filters match any listed category through the index"""
+    db.add_all([
+        Laptop(**make_laptop("Victus", ["Gaming", "Programming"], price=200000)),
+        Laptop(**make_laptop("Pavilion 15", ["Programming"], price=150000)),
+        Laptop(**make_laptop("15s", ["Office Work"], price=90000))
+    ])
+    db.commit()
+    
+    found = LaptopService.get_laptops_for_category(db, "Programming")
+    assert [l.model for l in found] == ["Pavilion 15", "Victus"]
+    assert LaptopService.search_laptops(db, LaptopSearchParams(ideal_for="Programming"), limit=1)[0].model == "Pavilion 15"
+    
+    query = db.query(Laptop).filter(*LaptopService.category_filters("Gaming"))
+    plan = db.execute(text(f"EXPLAIN QUERY PLAN {query.statement.compile(compile_kwargs={'literal_binds': True})}"))
+    assert "ix_laptop_categories_category_laptop_id" in " ".join(row[-1] for row in plan)
@@ -0,0 +1,131 @@
+"""
+Unit tests for the BM25 lexical index and hybrid search fusion
+"""
+import pytest
+from core.config import settings
+from services.lexical_index import LexicalIndex, is_model_token, reciprocal_rank_fusion, tokenize
+from services.vector_store_service import VectorStoreService
+
+DOCUMENTS = {
+    1: "Laptop: ASUS Vivobook 15 X1504\nProcessor: Intel Core i5-1235U",
+    2: "Laptop: ASUS Vivobook 15 X1502\nProcessor: Intel Core i7-1255U",
+    3: "Laptop: HP Victus 15\nProcessor: AMD Ryzen 5 5600H\nGraphics: RTX 3050",
+}
+
+def make_metadata(laptop_id, brand="ASUS", price=100000):
+    return {"laptop_id": laptop_id, "brand": brand, "price_pkr": price, "ideal_for": ["Programming"]}
+
+@pytest.fixture
+def index():
+    """Index with two near-identical Vivobooks and one HP"""
+    index = LexicalIndex()
+    index.upsert(
+        list(DOCUMENTS),
+        list(DOCUMENTS.values()),
+        [make_metadata(1), make_metadata(2, price=150000), make_metadata(3, brand="HP")]
+    )
+    return index
+
+def test_tokenize_keeps_model_strings():
+    """Test joined identifiers survive whole and as parts"""
+    tokens = tokenize("Core i5-1235U, 16GB")
+    
+    assert "i5-1235u" in tokens
+    assert "i5" in tokens and "1235u" in tokens
+    assert "16gb" in tokens
+
+def test_exact_model_is_decisive(index):
+    """Test a model string only one laptop has ranks it first and is decisive"""
+    results, decisive = index.search("asus x1504", n_results=3)
+    
+    assert decisive
+    assert results[0]["laptop_id"] == 1
+    assert "similarity_score" not in results[0]
+    
+    results, decisive = index.search("asus vivobook", n_results=3)
+    assert not decisive
+    assert {r["laptop_id"] for r in results} == {1, 2}
+
+def test_spec_tokens_are_not_model_ids(index):
+    """Test a number plus a unit never makes a query decisive"""
+    assert is_model_token("x1504") and is_model_token("i5-1235u")
+    assert not any(is_model_token(t) for t in ("16gb", "512gb", "144hz", "15.6inch", "65w", "1.8kg"))
+    
+    index.upsert([4], ["Laptop: Dell G15 32GB RAM"], [make_metadata(4, brand="Dell")])
+    results, decisive = index.search("gaming laptop with 32gb ram", n_results=3)
+    assert results[0]["laptop_id"] == 4
+    assert not decisive
+
+def test_filters_apply_to_lexical_hits(index):
+    """Test vector store filters also restrict lexical results"""
+    results, decisive = index.search("vivobook", n_results=3, filters={"max_price": 120000})
+    
+    assert [r["laptop_id"] for r in results] == [1]
+    
+    results, decisive = index.search("x1502", n_results=3, filters={"max_price": 120000})
+    assert results == [] and not decisive
+
+def test_incremental_update_and_delete(index):
+    """Test upserts replace postings and deletes drop them"""
+    index.search("x1504", n_results=3)
+    index.upsert([1], ["Laptop: ASUS Zenbook 14 UX3402"], [make_metadata(1)])
+    
+    assert index.search("x1504", n_results=3) == ([], False)
+    assert index.search("ux3402", n_results=3)[0][0]["laptop_id"] == 1
+    
+    index.delete([1, 3])
+    assert len(index) == 1
+    assert index.search("zenbook victus", n_results=3) == ([], False)
+
+def test_reciprocal_rank_fusion():
+    """Test documents ranked well by both lists win and scores are fusion scores over the best possible"""
+    dense = [{"laptop_id": 3, "similarity_score": 0.9}, {"laptop_id": 1, "similarity_score": 0.8}]
+    lexical = [{"laptop_id": 1, "bm25_score": 7.5}, {"laptop_id": 2, "bm25_score": 2.0}]
+    
+    fused = reciprocal_rank_fusion([dense, lexical], n_results=2)
+    
+    assert [r["laptop_id"] for r in fused] == [1, 3]
+    assert fused[0]["fusion_score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[0]["similarity_score"] == pytest.approx((1 / 62 + 1 / 61) / (2 / 61))
+    assert fused[1]["similarity_score"] == pytest.approx(0.5)
+    
+    # A weighted-down list counts for less, and the best possible score shrinks with it
+    fused = reciprocal_rank_fusion([dense, lexical], n_results=3, weights=[1.0, 0.5])
+    assert [r["laptop_id"] for r in fused] == [1, 3, 2]
+    assert fused[1]["similarity_score"] == pytest.approx(1 / 1.5)
+    assert reciprocal_rank_fusion([[], lexical], n_results=1)[0]["similarity_score"] == pytest.approx(0.5)
+
+def test_decisive_query_skips_embedding(monkeypatch, tmp_path):
+    """Test hybrid search answers exact model queries without an embedding call"""
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "NUMPY_INDEX_PATH", str(tmp_path / "index.npz"))
+    monkeypatch.setattr(settings, "HYBRID_SEARCH", True)
+    store = VectorStoreService(backend="numpy")
+    store.index.upsert(
+        list(DOCUMENTS),
+        [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]],
+        list(DOCUMENTS.values()),
+        [make_metadata(1), make_metadata(2), make_metadata(3, brand="HP")]
+    )
+    store.lexical_index.upsert(*store.index.documents())
+    
+    calls = []
+    def fake_embedding(text):
+        calls.append(text)
+        return [0.0, 1.0]
+    monkeypatch.setattr(store.embedding_service, "generate_embedding", fake_embedding)
+    
+    results = store.search("vivobook x1502", n_results=2)
+    assert results[0]["laptop_id"] == 2
+    assert results[0]["similarity_score"] == pytest.approx(settings.LEXICAL_WEIGHT / (1 + settings.LEXICAL_WEIGHT))
+    assert calls == []
+    
+    # The model name only has to be in the user's words, not the built search query
+    results = store.search("laptop for programming", n_results=2, lexical_query="is the x1504 any good")
+    assert results[0]["laptop_id"] == 1
+    assert calls == []
+    
+    results = store.search("vivobook gaming", n_results=3)
+    assert calls == ["vivobook gaming"]
+    assert {r["laptop_id"] for r in results} == {1, 2, 3}
+    assert all("fusion_score" in r for r in results)
@@ -0,0 +1,114 @@
+"""
+Unit tests for the in-process NumPy vector index
+"""
+import pytest
+import numpy as np
+from services.numpy_vector_index import NumpyVectorIndex
+
+def make_metadata(laptop_id, brand="HP", storage_type="SSD"):
+    return {
+        "laptop_id": laptop_id,
+        "brand": brand,
+        "model": f"Model {laptop_id}",
+        "price_pkr": 100000 + laptop_id,
+        "storage_type": storage_type,
+        "ideal_for": ["Programming"]
+    }
+
+@pytest.fixture
+def index():
+    """Index with three orthogonal-ish documents"""
+    index = NumpyVectorIndex()
+    index.upsert(
+        [1, 2, 3],
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 2.0]],
+        ["doc one", "doc two", "doc three"],
+        [make_metadata(1), make_metadata(2, brand="Dell"), make_metadata(3, storage_type="HDD")]
+    )
+    return index
+
+def test_query_returns_best_match_first(index):
+    """Test top-k is ordered by cosine similarity"""
+    results = index.query([0.1, 0.9, 0.0], n_results=2)
+    
+    assert [r["laptop_id"] for r in results] == [2, 1]
+    assert results[0]["metadata"]["brand"] == "Dell"
+    assert results[0]["content"] == "doc two"
+    assert results[0]["similarity_score"] == pytest.approx(0.9 / np.sqrt(0.82))
+    assert results[0]["distance"] == pytest.approx(1 - results[0]["similarity_score"])
+
+def test_query_with_filters(index):
+    """Test categorical filters restrict candidates"""
+    results = index.query([0.0, 1.0, 0.0], n_results=3, filters={"brand": "HP"})
+    
+    assert [r["laptop_id"] for r in results] == [1, 3]
+    
+    results = index.query([0.0, 1.0, 0.0], n_results=3, filters={"storage_type": "NVMe"})
+    assert results == []
+
+def test_query_with_range_and_category_filters(index):
+    """Test numeric ranges and ideal_for membership are applied before top-k"""
+    index.upsert(
+        [4],
+        [[0.0, 1.0, 0.0]],
+        ["doc four"],
+        [{**make_metadata(4), "price_pkr": 250000, "ram_gb": 32, "ideal_for": ["Gaming"]}]
+    )
+    
+    results = index.query([0.0, 1.0, 0.0], n_results=1, filters={"max_price": 100002})
+    assert [r["laptop_id"] for r in results] == [2]
+    
+    results = index.query([0.0, 1.0, 0.0], n_results=3, filters={"min_price": 100002, "max_price": 100003})
+    assert sorted(r["laptop_id"] for r in results) == [2, 3]
+    
+    # Rows without a RAM value never satisfy a RAM bound
+    results = index.query([1.0, 0.0, 0.0], n_results=3, filters={"min_ram": 16})
+    assert [r["laptop_id"] for r in results] == [4]
+    
+    results = index.query([1.0, 0.0, 0.0], n_results=4, filters={"ideal_for": ["Gaming", "Office Work"]})
+    assert [r["laptop_id"] for r in results] == [4]
+    
+    assert index.query([1.0, 0.0, 0.0], n_results=4, filters={"ideal_for": "Video Editing"}) == []
+
+def test_upsert_replaces_existing_row(index):
+    """Test upserting an existing ID updates it in place"""
+    index.upsert([1], [[0.0, 1.0, 0.0]], ["doc one v2"], [make_metadata(1, brand="ASUS")])
+    
+    assert index.count() == 3
+    assert index.get(1)["content"] == "doc one v2"
+    assert index.query([0.0, 1.0, 0.0], n_results=3, filters={"brand": "ASUS"})[0]["laptop_id"] == 1
+
+def test_delete(index):
+    """Test deleted rows are no longer returned"""
+    index.delete([2])
+    
+    assert index.count() == 2
+    assert index.get(2) is None
+    assert 2 not in [r["laptop_id"] for r in index.query([0.0, 1.0, 0.0], n_results=3)]
+    assert index.get(3)["content"] == "doc three"
+
+def test_persistence_roundtrip(index, tmp_path):
+    """Test the index survives a save/load cycle through one .npz file"""
+    path = tmp_path / "index.npz"
+    index.bump_version()
+    index.save(str(path))
+    
+    reloaded = NumpyVectorIndex(path=str(path))
+    
+    assert reloaded.count() == 3
+    assert reloaded.version == 1
+    assert reloaded.get(2)["metadata"] == make_metadata(2, brand="Dell")
+    assert reloaded.query([0.0, 0.0, 1.0], n_results=1)[0]["laptop_id"] == 3
+
+def test_ivf_finds_nearest_neighbour():
+    """Test IVF partitioning still finds exact matches"""
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(400, 16)).astype(np.float32)
+    ids = list(range(1, 401))
+    
+    index = NumpyVectorIndex(n_lists=8, n_probe=2, min_rows_for_ivf=100)
+    index.upsert(ids, vectors, [str(i) for i in ids], [make_metadata(i) for i in ids])
+    
+    assert index.centroids is not None
+    for row in (0, 137, 399):
+        assert index.query(vectors[row], n_results=1)[0]["laptop_id"] == ids[row]
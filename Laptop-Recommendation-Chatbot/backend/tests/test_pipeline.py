@@ -0,0 +1,113 @@
+"""
+Tests for the staged recommendation pipeline and speculative retrieval
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from core.config import settings
+from services.pipeline import PipelineRun
+from services.query_processor import QueryProcessor
+from services.recommendation_engine import RecommendationEngine
+
+LAPTOP = SimpleNamespace(
+    id=1,
+    brand="HP",
+    model="Victus 15",
+    ram_gb=16,
+    storage_gb=512,
+    storage_type="SSD",
+    price_pkr=75000,
+    ideal_for=["Programming"]
+)
+
+class FakeVectorStore:
+    """Records searches and answers after a short delay"""
+    
+    def __init__(self):
+        self.searches = []
+    
+    async def asearch(self, query, n_results=5, filters=None, query_embedding=None, lexical_query=None):
+        self.searches.append((query, filters))
+        await asyncio.sleep(0.05)
+        return [{"laptop_id": 1, "similarity_score": 0.9}]
+    
+    def search(self, query, n_results=5, filters=None, query_embedding=None, lexical_query=None):
+        self.searches.append((query, filters))
+        time.sleep(0.05)
+        return [{"laptop_id": 1, "similarity_score": 0.9}]
+
+def fake_gpt_extraction(result):
+    async def extract(query, conversation_history=None):
+        await asyncio.sleep(0.05)
+        return result
+    return extract
+
+@pytest.fixture
+def engine(monkeypatch):
+    """Engine with real rule extraction and fake GPT, vector store and DB"""
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    engine = RecommendationEngine.__new__(RecommendationEngine)
+    engine.query_processor = QueryProcessor()
+    engine.vector_store = FakeVectorStore()
+    engine._fetch_laptops_released = lambda db, vector_results: [LAPTOP]
+    engine._fetch_laptops = lambda db, vector_results: [LAPTOP]
+    return engine
+
+def test_stage_timings():
+    """Test background stages overlap and are all recorded"""
+    async def main():
+        run = PipelineRun()
+        task = run.start("slow", asyncio.sleep(0.05))
+        await run.run("other", asyncio.sleep(0.05))
+        await task
+        with run.stage("sync"):
+            pass
+        return run
+    
+    run = asyncio.run(main())
+    timings = run.summary()
+    
+    assert set(timings) == {"slow", "other", "sync", "total"}
+    assert timings["total"] < timings["slow"] + timings["other"]
+
+def test_speculative_retrieval_is_reused(engine):
+    """Test results from the regex-only query are kept when GPT adds nothing"""
+    engine.query_processor.aextract_with_gpt = fake_gpt_extraction({})
+    run = PipelineRun()
+    
+    result = asyncio.run(engine.aprepare_candidates("laptop for programming", db=None, run=run))
+    
+    assert result["success"]
+    assert engine.vector_store.searches == [("Laptop for programming", None)]
+    assert "speculative_retrieval" in run.stage_timings_ms
+    assert "retrieval" not in run.stage_timings_ms
+    assert run.outcomes == {"speculative_retrieval": "used"}
+
+def test_requery_when_gpt_changes_requirements(engine):
+    """Test retrieval runs again when GPT extraction changes the filters"""
+    engine.query_processor.aextract_with_gpt = fake_gpt_extraction({"budget": {"min": 0, "max": 80000}})
+    run = PipelineRun()
+    
+    result = asyncio.run(engine.aprepare_candidates("laptop for programming", db=None, run=run))
+    
+    assert result["success"]
+    assert len(engine.vector_store.searches) == 2
+    assert engine.vector_store.searches[1] == ("Laptop for programming budget-friendly affordable", {"max_price": 80000})
+    assert "retrieval" in run.stage_timings_ms
+    assert run.outcomes == {"speculative_retrieval": "discarded"}
+
+def test_sync_path_overlaps_retrieval_with_gpt(engine):
+    """Test prepare_candidates runs speculative retrieval on a thread while GPT extraction blocks"""
+    def extract(query, conversation_history=None):
+        time.sleep(0.05)
+        return {}
+    engine.query_processor.extract_with_gpt = extract
+    run = PipelineRun()
+    
+    result = engine.prepare_candidates("laptop for programming", db=None, run=run)
+    
+    assert result["success"]
+    assert engine.vector_store.searches == [("Laptop for programming", None)]
+    assert run.outcomes == {"speculative_retrieval": "used"}
+    assert run.summary()["total"] < run.stage_timings_ms["extract_gpt"] + run.stage_timings_ms["speculative_retrieval"]
@@ -0,0 +1,103 @@
+"""
+Unit tests for the incrementally maintained popularity rollup
+"""
+import pytest
+from datetime import datetime, timedelta
+from core.config import settings
+from models.database import Laptop, LaptopPopularity, UserSession
+from services.catalogue_snapshot import CatalogueSnapshot
+from services.laptop_service import RecommendationService
+from services.popularity import (
+    PopularityPriors, click_through_rate, decayed_score, event_score, get_score_epoch, rebuild_popularity,
+    record_events
+)
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    db.add(UserSession(session_id="s1", conversation_history=[], preferences={}))
+    for model in ("Victus", "Pavilion 15", "15s"):
+        db.add(Laptop(
+            brand="HP", model=model, cpu="Intel Core i5", ram_gb=8, storage_gb=512, storage_type="SSD",
+            gpu="Intel UHD", display_size=15.6, price_pkr=100000, ideal_for=["Office Work"]
+        ))
+    db.commit()
+    yield db
+    db.close()
+
+def snapshot(db):
+    return {
+        (p.laptop_id, p.recommendation_count, p.click_count)
+        for p in db.query(LaptopPopularity)
+    }
+
+def test_counters_follow_recommendations_and_clicks(db):
+    """Test creating and clicking recommendations updates the rollup, counting a click once"""
+    first = RecommendationService.create_recommendation(db, "s1", 1, rank=1)
+    RecommendationService.create_recommendation(db, "s1", 1, rank=1)
+    RecommendationService.create_recommendation(db, "s1", 2, rank=2)
+    RecommendationService.mark_clicked(db, first.id)
+    RecommendationService.mark_clicked(db, first.id)
+    
+    assert snapshot(db) == {(1, 2, 1), (2, 1, 0)}
+    
+    popular = RecommendationService.get_popular_laptops(db, limit=5)
+    assert [laptop.model for laptop, _ in popular] == ["Victus", "Pavilion 15"]
+    assert click_through_rate(popular[0][1]) == 0.5
+    
+    # Rebuilding from the recommendations table gives the same counters
+    epoch = get_score_epoch(db)
+    incremental = {p.laptop_id: decayed_score(p.score, epoch=epoch) for p in db.query(LaptopPopularity)}
+    assert rebuild_popularity(db) == 2
+    db.commit()
+    assert snapshot(db) == {(1, 2, 1), (2, 1, 0)}
+    epoch = get_score_epoch(db)
+    for p in db.query(LaptopPopularity):
+        assert decayed_score(p.score, epoch=epoch) == pytest.approx(incremental[p.laptop_id], rel=1e-3)
+
+def test_scores_decay_with_age():
+    """Test an event loses half its weight per half-life and recent events outrank old ones"""
+    now = datetime(2025, 6, 1)
+    half_life = timedelta(days=settings.POPULARITY_HALF_LIFE_DAYS)
+    assert decayed_score(event_score(now), now) == pytest.approx(1.0)
+    assert decayed_score(event_score(now - half_life), now) == pytest.approx(0.5)
+    assert event_score(now) > event_score(now - half_life, weight=1.9)
+
+def test_epoch_moves_before_scores_overflow(db, monkeypatch):
+    """Test events thousands of half-lives after the epoch rescale stored scores instead of overflowing"""
+    monkeypatch.setattr(settings, "POPULARITY_HALF_LIFE_DAYS", 1)
+    start = datetime(2026, 10, 21)  # over 1024 one-day half-lives after the original epoch
+    record_events(db, 1, recommendations=3, at=start)
+    record_events(db, 2, recommendations=1, at=start + timedelta(days=1))
+    db.commit()
+    assert get_score_epoch(db) == start
+    
+    later = start + timedelta(days=2000)
+    record_events(db, 3, recommendations=1, at=later)
+    db.commit()
+    
+    epoch = get_score_epoch(db)
+    assert epoch == later
+    scores = {p.laptop_id: decayed_score(p.score, later, epoch=epoch) for p in db.query(LaptopPopularity)}
+    assert scores[3] == pytest.approx(1.0)
+    assert scores[1] == scores[2] == 0.0
+    
+    monkeypatch.setattr(settings, "POPULARITY_HALF_LIFE_DAYS", 0)
+    with pytest.raises(ValueError):
+        event_score(later)
+
+def test_priors_blend_into_ranking(db):
+    """Test popularity priors are scaled to the top laptop and can reorder close candidates"""
+    for _ in range(4):
+        RecommendationService.create_recommendation(db, "s1", 2, rank=1)
+    RecommendationService.create_recommendation(db, "s1", 3, rank=1)
+    
+    priors = PopularityPriors(refresh_seconds=60).get(db)
+    assert priors[2] == pytest.approx(1.0)
+    assert priors[3] == pytest.approx(0.25, rel=1e-3)
+    assert 1 not in priors
+    
+    catalogue = CatalogueSnapshot(db.query(Laptop).all())
+    similarity = {1: 0.82, 2: 0.8, 3: 0.8}
+    assert [r[0] for r in catalogue.rank([1, 2, 3], similarity, {})] == [1, 2, 3]
+    assert [r[0] for r in catalogue.rank([1, 2, 3], similarity, {}, priors=priors, prior_weight=0.1)] == [2, 3, 1]
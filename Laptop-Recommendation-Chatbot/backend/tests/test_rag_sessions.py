@@ -0,0 +1,94 @@
+"""
+Unit tests for the bounded RAG session store
+"""
+import time
+from services.rag_sessions import (
+    RAGSessionStore,
+    MemorySessionBackend,
+    SQLiteSessionBackend,
+    extractive_summary
+)
+
+def add_exchange(store, session_id, text):
+    session = store.get(session_id)
+    session.messages.append({"role": "user", "content": text})
+    session.messages.append({"role": "assistant", "content": f"reply to {text}"})
+    store.save(session)
+
+def test_lru_eviction_and_hit_rate():
+    """Test the least recently saved session is evicted at the size limit"""
+    store = RAGSessionStore(MemorySessionBackend(max_entries=2))
+    add_exchange(store, "a", "hi")
+    add_exchange(store, "b", "hi")
+    add_exchange(store, "a", "again")
+    add_exchange(store, "c", "hi")
+    
+    assert store.get("a").messages[-1]["content"] == "reply to again"
+    assert store.get("b").messages == []
+    
+    stats = store.get_stats()
+    assert stats["sessions"] == 2
+    assert stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (2, 4)
+
+def test_idle_sessions_expire():
+    """Test sessions idle past the TTL come back empty, on read and on sweep"""
+    store = RAGSessionStore(ttl_seconds=0.05)
+    add_exchange(store, "a", "hi")
+    add_exchange(store, "b", "hi")
+    time.sleep(0.1)
+    
+    assert store.get("a").messages == []
+    store.PURGE_INTERVAL = 0
+    store.get("c")
+    assert store.get_stats()["sessions"] == 0
+    assert store.expirations == 2
+
+def test_turn_cap_folds_old_turns_into_summary():
+    """Test only max_turns messages are kept and dropped user turns are summarized"""
+    store = RAGSessionStore(max_turns=4, summarizer=extractive_summary)
+    for text in ["budget 100k", "for programming", "prefer HP"]:
+        add_exchange(store, "s", text)
+    
+    session = store.get("s")
+    assert [m["content"] for m in session.messages][0] == "for programming"
+    assert len(session.messages) == 4
+    assert session.summary == "budget 100k"
+    assert store.summarized_turns == 2
+    
+    # Oldest text is cut first
+    assert extractive_summary("a" * 10, [{"role": "user", "content": "b" * 10}], max_chars=12) == "| " + "b" * 10
+
+def test_sqlite_backend_is_shared(tmp_path):
+    """Test two stores on one SQLite file see each other's sessions"""
+    path = str(tmp_path / "rag_sessions.db")
+    first = RAGSessionStore(SQLiteSessionBackend(path, max_entries=2), max_turns=2, summarizer=extractive_summary)
+    second = RAGSessionStore(SQLiteSessionBackend(path, max_entries=2))
+    
+    add_exchange(first, "a", "budget 80k")
+    add_exchange(first, "a", "gaming")
+    session = second.get("a")
+    assert [m["content"] for m in session.messages] == ["gaming", "reply to gaming"]
+    assert session.summary == "budget 80k"
+    
+    add_exchange(second, "b", "hi")
+    add_exchange(second, "c", "hi")
+    assert first.get("a").messages == []
+    assert second.get_stats()["evictions"] == 1
+
+def test_sqlite_backend_counts_only_to_evict(tmp_path):
+    """Test saves don't count the table until the in-memory row count passes max_entries"""
+    backend = SQLiteSessionBackend(str(tmp_path / "rag_sessions.db"), max_entries=3)
+    store = RAGSessionStore(backend)
+    statements = []
+    backend._conn.set_trace_callback(statements.append)
+    
+    for session_id in ["a", "b", "c", "a", "b"]:
+        add_exchange(store, session_id, "hi")
+    assert sum("COUNT(*)" in sql for sql in statements) == 1
+    
+    add_exchange(store, "d", "hi")
+    assert sum("COUNT(*)" in sql for sql in statements) == 2
+    assert store.evictions == 1
+    assert store.get("c").messages == []
+    assert store.get_stats()["sessions"] == 3
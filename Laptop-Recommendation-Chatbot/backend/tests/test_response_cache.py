@@ -0,0 +1,128 @@
+"""
+Unit tests for the recommendation response cache
+"""
+import json
+import time
+from types import SimpleNamespace
+from services.recommendation_engine import RecommendationEngine
+from services.response_cache import ResponseCache
+
+REQUIREMENTS = {
+    "budget": {"min": 0, "max": 100000},
+    "use_case": ["programming", "studies"],
+    "brand_preference": None,
+    "original_query": "programming laptop under 1 lakh"
+}
+
+def test_key_ignores_query_wording_and_order():
+    """Test equivalent requirements map to the same key"""
+    reordered = {
+        "use_case": ["studies", "programming"],
+        "original_query": "need a laptop for coding, max 100k",
+        "budget": {"max": 100000, "min": 0}
+    }
+    
+    assert ResponseCache.make_key(REQUIREMENTS, [3, 1, 2], 1) == ResponseCache.make_key(reordered, [3, 1, 2], 1)
+    assert ResponseCache.make_key(REQUIREMENTS, [3, 1, 2], 1) != ResponseCache.make_key(REQUIREMENTS, [1, 2, 3], 1)
+    assert ResponseCache.make_key(REQUIREMENTS, [3, 1, 2], 1) != ResponseCache.make_key(REQUIREMENTS, [3, 1, 2], 2)
+    assert (ResponseCache.make_key(REQUIREMENTS, [3, 1, 2], 1, prices=[90000, 80000, 70000])
+            != ResponseCache.make_key(REQUIREMENTS, [3, 1, 2], 1, prices=[95000, 80000, 70000]))
+
+def test_ttl_and_lru_eviction():
+    """Test entries expire and the least recently used one is evicted"""
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", [1], [1])
+    cache.set("b", [2], [2])
+    cache.get("a")
+    cache.set("c", [3], [3])
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert cache.get("c") == [3]
+    
+    expiring = ResponseCache(ttl_seconds=0.01)
+    expiring.set("a", [1], [1])
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+def test_invalidate_laptop():
+    """Test only entries containing the changed laptop are dropped"""
+    cache = ResponseCache()
+    cache.set("a", ["first"], [1, 2])
+    cache.set("b", ["second"], [3])
+    
+    assert cache.invalidate_laptop(2) == 1
+    assert cache.get("a") is None
+    assert cache.get("b") == ["second"]
+    
+    cache.invalidate_laptop(None)
+    assert cache.get("b") is None
+
+def test_persistence_roundtrip(tmp_path):
+    """Test entries survive a save/load cycle with their invalidation index"""
+    path = tmp_path / "responses.json"
+    cache = ResponseCache(persist_path=str(path))
+    cache.set("a", [{"laptop_id": 1, "reason": "Good value"}], [1])
+    cache.save()
+    
+    reloaded = ResponseCache(persist_path=str(path))
+    assert reloaded.get("a") == [{"laptop_id": 1, "reason": "Good value"}]
+    
+    reloaded.invalidate_laptop(1)
+    assert reloaded.get("a") is None
+
+def test_changes_are_saved_in_the_background(tmp_path):
+    """Test set() leaves the file alone; the saver thread and close() write it"""
+    path = tmp_path / "responses.json"
+    cache = ResponseCache(persist_path=str(path), save_interval=0.05)
+    for i in range(20):
+        cache.set(f"key-{i}", [i], [i])
+    assert not path.exists()
+    
+    deadline = time.time() + 2
+    while not path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    assert ResponseCache(persist_path=str(path)).get("key-19") == [19]
+    assert cache.get_stats()["saves"] <= 2
+    
+    cache.invalidate_laptop(19)
+    cache.close()
+    assert ResponseCache(persist_path=str(path)).get("key-19") is None
+
+class FakeCompletions:
+    """Answers the advisor prompt and counts calls"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def create(self, messages, **kwargs):
+        self.calls += 1
+        reply = json.dumps([{"laptop_id": 1, "rank": 1, "reason": f"Reason {self.calls}",
+                             "key_strengths": ["Fast"], "considerations": "None"}])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+def test_engine_serves_cached_reasons_with_current_specs():
+    """Test a cache hit keeps the generated reason but shows specs from the fetched row"""
+    engine = RecommendationEngine.__new__(RecommendationEngine)
+    engine.response_cache = ResponseCache()
+    engine.vector_store = SimpleNamespace(catalogue_version=1)
+    completions = FakeCompletions()
+    engine.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    laptop = SimpleNamespace(
+        id=1, brand="HP", model="Victus 15", cpu="Ryzen 5", ram_gb=16, storage_gb=512, storage_type="SSD",
+        gpu="RTX 3050", display_size=15.6, price_pkr=180000, battery_hours=None, weight_kg=2.3,
+        ideal_for=["Gaming"]
+    )
+    
+    first = engine._generate_recommendations([(laptop, 0.9, 0.8)], REQUIREMENTS, "gaming laptop")
+    laptop.ram_gb = 32
+    cached = engine._generate_recommendations([(laptop, 0.9, 0.8)], REQUIREMENTS, "gaming laptop")
+    assert completions.calls == 1
+    assert cached[0]["reason"] == first[0]["reason"] == "Reason 1"
+    assert cached[0]["ram_gb"] == 32
+    
+    # A new price (from the scraper or PUT /laptops) regenerates the answer
+    laptop.price_pkr = 170000
+    repriced = engine._generate_recommendations([(laptop, 0.9, 0.8)], REQUIREMENTS, "gaming laptop")
+    assert completions.calls == 2
+    assert (repriced[0]["reason"], repriced[0]["price_pkr"]) == ("Reason 2", 170000)
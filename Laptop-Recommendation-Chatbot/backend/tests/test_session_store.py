@@ -0,0 +1,119 @@
+"""
+Unit tests for the write-behind session store
+"""
+import pytest
+from sqlalchemy import event
+from models.database import UserSession, ConversationTurn
+from services.conversation_manager import ConversationFlowManager
+from services.session_store import SessionStore
+
+@pytest.fixture
+def store(session_factory):
+    store = SessionStore(session_factory, max_sessions=2, flush_interval=60)
+    yield store
+    store.close()
+
+def count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+def test_constant_db_work_per_message(session_factory, store):
+    """Test a hot session costs no queries and a flush is one batch regardless of history"""
+    manager = ConversationFlowManager(store)
+    db = session_factory()
+    statements = count_statements(db.get_bind())
+    
+    manager.generate_response(db, "s1", "Hi")
+    loads = len(statements)
+    for _ in range(10):
+        manager.generate_response(db, "s1", "I need it for programming")
+    assert len(statements) == loads
+    
+    store.flush()
+    writes = [s for s in statements[loads:] if not s.startswith("SELECT")]
+    # one session insert and one multi-row turn insert
+    assert len(writes) == 2
+    assert db.query(ConversationTurn).filter(ConversationTurn.session_id == "s1").count() == 22
+    
+    # Once flushed, reusing the cached state costs one turn count per message
+    before = len(statements)
+    manager.generate_response(db, "s1", "What about gaming?")
+    assert len(statements) == before + 1
+    db.close()
+
+def test_sessions_changed_by_another_worker_are_reloaded(session_factory, store):
+    """Test a cached session is reloaded once another worker's turns and preferences are flushed"""
+    other = SessionStore(session_factory, flush_interval=60)
+    first, second = ConversationFlowManager(store), ConversationFlowManager(other)
+    db = session_factory()
+    
+    first.generate_response(db, "s1", "Hi")
+    store.flush()
+    second.generate_response(db, "s1", "I need it for programming")
+    other.flush()
+    
+    state = store.get(db, "s1")
+    assert state.preferences["use_case"] == ["Programming"]
+    assert [turn["content"] for turn in state.recent_turns][-2] == "I need it for programming"
+    assert store.get(db, "s1") is state
+    other.close()
+    db.close()
+
+def test_evicted_dirty_sessions_are_not_lost(session_factory, store):
+    """Test sessions pushed out of the LRU still flush and reload from the queue"""
+    db = session_factory()
+    for session_id in ["a", "b", "c"]:
+        state = store.get(db, session_id)
+        state.preferences["greeted"] = True
+        state.add_turn("user", f"hello from {session_id}")
+        store.save(state)
+    
+    assert store.get_stats()["sessions"] == 2
+    assert store.get(db, "a").preferences == {"greeted": True}
+    
+    assert store.flush() == 3
+    assert db.query(UserSession).count() == 3
+    assert store.history(db, "c")["conversation_history"][0]["content"] == "hello from c"
+    db.close()
+
+def test_history_merges_unflushed_turns(session_factory, store):
+    """Test history has flushed and queued turns exactly once, in order"""
+    db = session_factory()
+    state = store.get(db, "s1")
+    state.add_turn("user", "first")
+    store.save(state)
+    store.flush()
+    
+    state.add_turn("user", "second")
+    store.save(state)
+    
+    history = store.history(db, "s1")["conversation_history"]
+    assert [turn["content"] for turn in history] == ["first", "second"]
+    assert store.history(db, "missing") is None
+    db.close()
+
+def test_legacy_history_and_existing_rows(session_factory, store):
+    """Test old JSON history is still readable and pre-created rows are updated"""
+    db = session_factory()
+    db.add(UserSession(
+        session_id="old",
+        conversation_history=[{"role": "user", "content": "from the JSON column"}],
+        preferences={"budget_max": 100000}
+    ))
+    db.commit()
+    
+    state = store.get(db, "old")
+    assert list(state.recent_turns)[0]["content"] == "from the JSON column"
+    
+    # Created by another code path after this store saw the session as new
+    new_state = store.get(db, "new")
+    db.add(UserSession(session_id="new", conversation_history=[], preferences={}))
+    db.commit()
+    new_state.preferences["greeted"] = True
+    store.save(new_state)
+    
+    assert store.flush() == 1
+    db.expire_all()
+    assert db.query(UserSession).filter(UserSession.session_id == "new").first().preferences == {"greeted": True}
+    db.close()
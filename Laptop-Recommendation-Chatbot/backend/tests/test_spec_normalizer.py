@@ -0,0 +1,72 @@
+"""
+Unit tests for shared spec normalization
+"""
+import pytest
+from services.spec_normalizer import (
+    cpu_generation, cpu_tier, detect_categories, gpu_tier, normalize_listing, parse_price, parse_storage
+)
+
+RAW_LISTINGS = [
+    {"ram_raw": "16GB DDR4", "storage_raw": "1TB NVMe SSD", "price_raw": "Rs. 245,000",
+     "cpu": "Intel Core i7-1255U", "gpu": "NVIDIA RTX 3050", "full_name": "Dell Inspiron 15"},
+    {"ram_raw": "eight", "storage_raw": "500 GB HDD", "price_raw": "Call for price",
+     "cpu": "AMD Ryzen 5 5500U", "gpu": "AMD Radeon Graphics", "full_name": "Lenovo IdeaPad 3"},
+    {"price_raw": "PKR 85000", "cpu": "Intel Core i3-8130U", "brand": "Acer", "full_name": "Aspire 3"},
+]
+
+def test_parsers():
+    """Test raw spec text parses to pipeline values, with defaults for unreadable text"""
+    assert parse_storage("1TB NVMe SSD") == (1024, "SSD")
+    assert parse_storage("1TB HDD + 256GB SSD") == (1024, "SSD")
+    assert parse_storage("hard drive") == (256, "SSD")
+    assert parse_price("Rs. 125,000") == (125000, True)
+    assert parse_price("Call for price") == (0, False)
+    assert cpu_generation("Intel Core i5-1235U") == "12th Gen Intel"
+    assert cpu_generation("Intel Core i7-8550U") == "8th Gen Intel"
+    assert cpu_generation("AMD Ryzen 7 5700U") == "Ryzen 5000 Series"
+    assert cpu_generation("Apple M2") is None
+
+def test_tiers_and_categories():
+    """Test table lookups take the first matching tier and drive category detection"""
+    assert cpu_tier("Intel Core i5-1235U") == "mainstream"
+    assert cpu_tier(None) == "standard"
+    assert gpu_tier("NVIDIA GeForce RTX 4060") == "gaming"
+    assert gpu_tier("NVIDIA GeForce MX450") == "dedicated"
+    assert gpu_tier("AMD Radeon Graphics") == "integrated"
+    
+    assert detect_categories(16, 1024, "performance", "gaming", 245000) == [
+        "Programming", "Gaming", "Video Editing", "Engineering", "Office Work", "CS Student"
+    ]
+    assert detect_categories(4, 256, "entry", "gaming", 60000) == ["FSC Student", "Office Work"]
+    assert detect_categories(2, 128, "standard", "integrated", 150000) == ["General Use"]
+
+def test_nvidia_gpus_count_as_gaming_with_little_ram():
+    """Test NVIDIA and "dedicated" GPUs keep the Gaming tag below 8GB, other gaming-tier GPUs don't"""
+    mainstream = cpu_tier("Intel Core i5-1235U")
+    for gpu in ("NVIDIA GeForce RTX 3050", "NVIDIA GeForce MX550", "RTX 3050 4GB Dedicated"):
+        assert detect_categories(4, 256, mainstream, gpu_tier(gpu), 150000, gpu) == ["Gaming", "Office Work"]
+    
+    assert detect_categories(4, 256, mainstream, gpu_tier("AMD Radeon RX 6500M"), 150000, "AMD Radeon RX 6500M") == ["Office Work"]
+
+def test_normalize_listing_only_returns_present_fields():
+    """Test absent raw fields and an existing brand are left alone"""
+    assert normalize_listing(RAW_LISTINGS[2]) == {
+        "price_pkr": 85000, "price_available": True, "cpu_generation": "8th Gen Intel"
+    }
+    assert normalize_listing(RAW_LISTINGS[1])["brand"] == "Lenovo"
+
+def test_normalize_frame_matches_per_item_rules():
+    """Test the DataFrame batch mode gives the same records as the per-item functions"""
+    pd = pytest.importorskip("pandas")
+    from services.spec_normalizer import normalize_frame
+    
+    frame = normalize_frame(pd.DataFrame(RAW_LISTINGS))
+    
+    for raw, (_, row) in zip(RAW_LISTINGS, frame.iterrows()):
+        expected = {**raw, **normalize_listing(raw)}
+        expected["ideal_for"] = detect_categories(
+            expected.get("ram_gb", 0), expected.get("storage_gb", 0),
+            cpu_tier(raw.get("cpu")), gpu_tier(raw.get("gpu")), expected.get("price_pkr", 0), raw.get("gpu")
+        )
+        actual = {key: value for key, value in row.items() if not (pd.api.types.is_scalar(value) and pd.isna(value))}
+        assert actual == expected
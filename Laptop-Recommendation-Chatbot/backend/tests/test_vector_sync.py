@@ -0,0 +1,112 @@
+"""
+Unit tests for hash-based incremental vector store sync
+"""
+from core.config import settings
+from services.document_processor import DocumentProcessor
+from services.vector_store_service import VectorStoreService
+
+def make_laptop(laptop_id, price=100000, **overrides):
+    laptop = {
+        "id": laptop_id,
+        "brand": "HP",
+        "model": f"Model {laptop_id}",
+        "cpu": "Intel Core i5-1235U",
+        "ram_gb": 8,
+        "storage_gb": 512,
+        "storage_type": "SSD",
+        "gpu": "Intel Iris Xe",
+        "display_size": 15.6,
+        "price_pkr": price,
+        "ideal_for": ["Programming"]
+    }
+    laptop.update(overrides)
+    return laptop
+
+def make_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "NUMPY_INDEX_PATH", str(tmp_path / "index.npz"))
+    store = VectorStoreService(backend="numpy")
+    
+    embedded = []
+    def fake_batch(texts, *args, **kwargs):
+        embedded.extend(texts)
+        return [[1.0, float(len(text) % 7)] for text in texts]
+    monkeypatch.setattr(store.embedding_service, "generate_embeddings_batch", fake_batch)
+    return store, embedded
+
+def documents(*laptops):
+    return (DocumentProcessor.create_laptop_document(laptop) for laptop in laptops)
+
+def test_sync_embeds_only_changed_documents(monkeypatch, tmp_path):
+    """Test unchanged laptops are skipped, changed ones re-embedded and vanished ones deleted"""
+    store, embedded = make_store(monkeypatch, tmp_path)
+    counts = store.sync_documents(documents(make_laptop(1), make_laptop(2), make_laptop(3)))
+    assert counts["added"] == 3
+    version = store.catalogue_version
+    
+    embedded.clear()
+    counts = store.sync_documents(documents(make_laptop(1), make_laptop(2, price=95000)), batch_size=1)
+    
+    assert counts == {"added": 0, "reembedded": 1, "metadata_updated": 0, "deleted": 1, "unchanged": 1}
+    assert len(embedded) == 1 and "PKR 95,000" in embedded[0]
+    assert sorted(store.index.documents()[0]) == [1, 2]
+    assert store.index.get(2)["metadata"]["price_pkr"] == 95000
+    assert store.catalogue_version == version + 1
+    
+    # Nothing changed: no writes, no version bump
+    counts = store.sync_documents(documents(make_laptop(1), make_laptop(2, price=95000)))
+    assert counts["unchanged"] == 2
+    assert store.catalogue_version == version + 1
+
+def test_metadata_only_change_keeps_embedding(monkeypatch, tmp_path):
+    """Test a metadata change with identical content is written without embedding"""
+    store, embedded = make_store(monkeypatch, tmp_path)
+    store.sync_documents(documents(make_laptop(1)))
+    vector = store.index.vectors[0].copy()
+    embedded.clear()
+    
+    document = DocumentProcessor.create_laptop_document(make_laptop(1))
+    document.metadata["source_site"] = "telemart"
+    counts = store.sync_documents([document])
+    
+    assert counts["metadata_updated"] == 1
+    assert embedded == []
+    assert (store.index.vectors[0] == vector).all()
+    assert store.index.get(1)["metadata"]["source_site"] == "telemart"
+    assert store.index.get(1)["metadata"]["metadata_hash"] == document.metadata_hash
+
+def test_dry_run_and_legacy_documents(monkeypatch, tmp_path):
+    """Test dry runs write nothing and documents stored without hashes are not re-embedded"""
+    store, embedded = make_store(monkeypatch, tmp_path)
+    legacy = DocumentProcessor.create_laptop_document(make_laptop(1))
+    store.index.upsert([1], [[1.0, 0.0]], [legacy.content], [legacy.metadata])
+    
+    counts = store.sync_documents(documents(make_laptop(1), make_laptop(2)), dry_run=True)
+    assert (counts["added"], counts["metadata_updated"]) == (1, 1)
+    assert store.index.count() == 1
+    
+    store.sync_documents(documents(make_laptop(1)))
+    assert embedded == []
+    assert store.index.get(1)["metadata"]["content_hash"] == legacy.content_hash
+
+def test_search_reloads_index_synced_by_another_process(monkeypatch, tmp_path):
+    """Test a running store picks up a sync written by a separate VectorStoreService"""
+    monkeypatch.setattr(settings, "INDEX_RELOAD_SECONDS", 0)
+    monkeypatch.setattr(settings, "HYBRID_SEARCH", True)
+    store, _ = make_store(monkeypatch, tmp_path)
+    store.sync_documents(documents(make_laptop(1)))
+    monkeypatch.setattr(store.embedding_service, "generate_embedding", lambda text: [1.0, 0.0])
+    changes = []
+    store.add_change_listener(changes.append)
+    
+    # The API process's own writes are not mistaken for another writer's
+    assert store.reload_if_changed() is False
+    
+    syncer, _ = make_store(monkeypatch, tmp_path)
+    syncer.sync_documents(documents(make_laptop(1), make_laptop(2, model="Victus X1504")))
+    
+    results = store.search("laptop", n_results=5)
+    assert sorted(result["laptop_id"] for result in results) == [1, 2]
+    assert store.catalogue_version == syncer.catalogue_version
+    assert store.lexical_index.search("x1504", 5)[0][0]["laptop_id"] == 2
+    assert changes == [None]
@@ -0,0 +1,176 @@
+"""
+Crawl orchestrator: runs the shop spiders in parallel with per-site budgets and live metrics
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+from twisted.internet import task
+from laptop_scraper.spiders.telemart_spider import TelemartSpider
+from laptop_scraper.spiders.paklap_spider import PaklapSpider
+from laptop_scraper.spiders.czone_spider import CzoneSpider
+
+SPIDERS = {
+    'telemart': TelemartSpider,
+    'paklap': PaklapSpider,
+    'czone': CzoneSpider,
+}
+
+def budget_settings(budget: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Scrapy settings for one site's budget
+    
+    Each spider gets its own crawler (and downloader), so the global
+    request limit is the site's own concurrency rather than a shared 8.
+    """
+    concurrency = budget.get('concurrency', 2)
+    settings = {
+        'CONCURRENT_REQUESTS': concurrency,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': concurrency,
+        'DOWNLOAD_DELAY': budget.get('delay', 1.0),
+        'AUTOTHROTTLE_TARGET_CONCURRENCY': float(concurrency),
+    }
+    if budget.get('max_pages'):
+        settings['CLOSESPIDER_PAGECOUNT'] = budget['max_pages']
+    if budget.get('max_items'):
+        settings['CLOSESPIDER_ITEMCOUNT'] = budget['max_items']
+    return settings
+
+def budgeted_spider(spider_cls, budget: Dict[str, Any]):
+    """
+    Subclass of a spider that applies its site's budget to its crawler's settings
+    
+    CrawlerProcess builds each crawler from the spider class, so the budget
+    is applied in update_settings, at 'cmdline' priority so it wins over
+    the spider's custom_settings.
+    """
+    overrides = budget_settings(budget)
+    
+    class BudgetedSpider(spider_cls):
+        @classmethod
+        def update_settings(cls, settings):
+            super().update_settings(settings)
+            settings.setdict(overrides, priority='cmdline')
+    
+    BudgetedSpider.__name__ = BudgetedSpider.__qualname__ = spider_cls.__name__
+    return BudgetedSpider
+
+def crawl_metrics(stats: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    """Throughput and HTTP cache figures from a crawler's stats"""
+    items = stats.get('item_scraped_count', 0)
+    pages = stats.get('response_received_count', 0)
+    # A page revalidated with a 304 is served from the cache as well
+    cache_hits = stats.get('httpcache/hit', 0) + stats.get('httpcache/revalidate', 0)
+    lookups = cache_hits + stats.get('httpcache/invalidate', 0) + stats.get('httpcache/miss', 0)
+    return {
+        'items': items,
+        'pages': pages,
+        'items_per_sec': items / elapsed if elapsed > 0 else 0.0,
+        'pages_per_sec': pages / elapsed if elapsed > 0 else 0.0,
+        'cache_hit_rate': cache_hits / lookups if lookups else 0.0,
+        'skipped_unchanged': stats.get('incremental/skipped', 0),
+        'not_modified': stats.get('httpcache/not_modified', 0),
+        'unchanged_items_skipped': stats.get('httpcache/unchanged_items_skipped', 0),
+        'errors': stats.get('log_count/ERROR', 0),
+        'finish_reason': stats.get('finish_reason'),
+    }
+
+def format_metrics(name: str, metrics: Dict[str, Any]) -> str:
+    return (
+        f"{name:>9}: {metrics['items']} items ({metrics['items_per_sec']:.2f}/s), "
+        f"{metrics['pages']} pages ({metrics['pages_per_sec']:.2f}/s), "
+        f"cache hit {metrics['cache_hit_rate']:.0%}, {metrics['not_modified']} not modified, "
+        f"{metrics['skipped_unchanged'] + metrics['unchanged_items_skipped']} unchanged skipped"
+    )
+
+def run_crawl(
+    spiders: Optional[List[str]] = None,
+    incremental: Optional[bool] = None,
+    settings_overrides: Optional[Dict[str, Any]] = None,
+    spider_kwargs: Optional[Dict[str, Dict[str, Any]]] = None,
+    report_interval: Optional[float] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run spiders side by side in one reactor and report their metrics
+    
+    Args:
+        spiders: Spider names (default all of SPIDERS)
+        incremental: Override INCREMENTAL_CRAWL
+        settings_overrides: Extra settings for every spider
+        spider_kwargs: Per-spider arguments, e.g. start_urls for a test server
+        report_interval: Seconds between progress lines (0 disables)
+    
+    Returns:
+        Final metrics per spider name
+    """
+    settings = get_project_settings()
+    if settings_overrides:
+        settings.setdict(settings_overrides, priority='cmdline')
+    if incremental is not None:
+        settings.set('INCREMENTAL_CRAWL', incremental, priority='cmdline')
+    if report_interval is None:
+        report_interval = settings.getfloat('CRAWL_REPORT_INTERVAL', 10)
+    budgets = settings.getdict('CRAWL_BUDGETS')
+    
+    process = CrawlerProcess(settings)
+    crawlers = {}
+    for name in spiders or list(SPIDERS):
+        spider_cls = budgeted_spider(SPIDERS[name], budgets.get(name, {}))
+        process.crawl(spider_cls, **(spider_kwargs or {}).get(name, {}))
+        # Keep a handle for metrics; the process forgets crawlers once they finish
+        crawlers[name] = next(crawler for crawler in process.crawlers if crawler.spidercls is spider_cls)
+    
+    started = time.monotonic()
+    
+    def snapshot():
+        elapsed = time.monotonic() - started
+        return {
+            name: crawl_metrics(crawler.stats.get_stats() if crawler.stats else {}, elapsed)
+            for name, crawler in crawlers.items()
+        }
+    
+    def report():
+        for name, metrics in snapshot().items():
+            print(format_metrics(name, metrics))
+    
+    reporter = None
+    if report_interval:
+        reporter = task.LoopingCall(report)
+        reporter.start(report_interval, now=False)
+    
+    process.start()
+    
+    if reporter is not None and reporter.running:
+        reporter.stop()
+    return snapshot()
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl the laptop shops in parallel")
+    parser.add_argument('spiders', nargs='*', help=f"Spiders to run: {', '.join(SPIDERS)} (default all)")
+    parser.add_argument('--incremental', action='store_true', help="Only revisit products whose listing price changed")
+    parser.add_argument('--report-interval', type=float, help="Seconds between progress lines")
+    parser.add_argument('--metrics-json', help="Write final metrics to this file")
+    args = parser.parse_args()
+    
+    unknown = [name for name in args.spiders if name not in SPIDERS]
+    if unknown:
+        parser.error(f"unknown spiders: {', '.join(unknown)}")
+    
+    metrics = run_crawl(
+        spiders=args.spiders or None,
+        incremental=args.incremental or None,
+        report_interval=args.report_interval
+    )
+    
+    print("\nCrawl finished")
+    for name, spider_metrics in metrics.items():
+        print(format_metrics(name, spider_metrics))
+    
+    if args.metrics_json:
+        with open(args.metrics_json, 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+if __name__ == '__main__':
+    main()
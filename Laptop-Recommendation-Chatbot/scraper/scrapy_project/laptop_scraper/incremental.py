@@ -0,0 +1,34 @@
+"""
+Incremental crawl support: skip product pages whose listing price has not changed
+"""
+import re
+from typing import Dict, Optional
+from sqlalchemy import create_engine, text
+
+def parse_listing_price(price_text: Optional[str]) -> Optional[int]:
+    """PKR amount from a listing price label, or None for "Call for price" and the like"""
+    if not price_text:
+        return None
+    digits = re.search(r'\d[\d,]*', price_text)
+    if not digits:
+        return None
+    return int(digits.group(0).replace(',', ''))
+
+def load_known_prices(db_url: str) -> Dict[str, int]:
+    """
+    Last stored price of every laptop, keyed by product URL
+
+    Returns an empty map (crawl everything) if the database is not there yet.
+    """
+    engine = create_engine(db_url)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT source_url, price_pkr FROM laptops WHERE source_url IS NOT NULL"
+            ))
+            return {url: price for url, price in rows}
+    except Exception as e:
+        print(f"Could not load known prices, crawling everything: {e}")
+        return {}
+    finally:
+        engine.dispose()
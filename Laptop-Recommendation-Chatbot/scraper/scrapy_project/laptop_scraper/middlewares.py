@@ -1,5 +1,7 @@
 from scrapy import signals
-from scrapy.http import HtmlResponse
+from scrapy.http import HtmlResponse, Request
+from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
+from scrapy.extensions.httpcache import RFC2616Policy
 import random
 
 class LaptopScraperSpiderMiddleware:
@@ -16,6 +18,10 @@ class LaptopScraperSpiderMiddleware:
         for i in result:
             yield i
 
+    async def process_spider_output_async(self, response, result, spider):
+        async for i in result:
+            yield i
+
     def process_spider_exception(self, response, exception, spider):
         pass
 
@@ -63,3 +69,107 @@ class RotateUserAgentMiddleware:
         user_agent = random.choice(self.user_agents)
         request.headers['User-Agent'] = user_agent
         spider.logger.debug(f'Using User-Agent: {user_agent}')
+
+
+class RevalidatingCachePolicy(RFC2616Policy):
+    """
+    RFC 2616 cache policy that revalidates every cached page
+    
+    Shop pages rarely send Cache-Control, and heuristic freshness from
+    Last-Modified could serve a stale price for days. With
+    HTTPCACHE_ALWAYS_REVALIDATE on, each cached page is requested again
+    with If-None-Match / If-Modified-Since so an unchanged page costs a 304.
+    """
+    
+    def __init__(self, settings):
+        super().__init__(settings)
+        self.always_revalidate = settings.getbool('HTTPCACHE_ALWAYS_REVALIDATE', True)
+        self.ignore_http_codes = [int(x) for x in settings.getlist('HTTPCACHE_IGNORE_HTTP_CODES')]
+    
+    def should_cache_response(self, response, request):
+        if response.status in self.ignore_http_codes:
+            return False
+        return super().should_cache_response(response, request)
+    
+    def is_cached_response_fresh(self, cachedresponse, request):
+        if not self.always_revalidate:
+            return super().is_cached_response_fresh(cachedresponse, request)
+        
+        if b'ETag' in cachedresponse.headers:
+            request.headers[b'If-None-Match'] = cachedresponse.headers[b'ETag']
+        if b'Last-Modified' in cachedresponse.headers:
+            request.headers[b'If-Modified-Since'] = cachedresponse.headers[b'Last-Modified']
+        return False
+
+
+class ConditionalHttpCacheMiddleware(HttpCacheMiddleware):
+    """
+    HTTP cache that flags responses whose content did not change
+    
+    A 304 answer is replaced by the cached page, and a full answer whose body
+    equals the cached one counts as unchanged too (for sites without
+    validators). Either way request.meta['content_unchanged'] is set for
+    SkipUnchangedItemsMiddleware.
+    """
+    
+    def process_request(self, request, spider):
+        response = super().process_request(request, spider)
+        if response is None and (b'If-None-Match' in request.headers
+                                 or b'If-Modified-Since' in request.headers):
+            self.stats.inc_value('httpcache/conditional', spider=spider)
+        return response
+    
+    def process_response(self, request, response, spider):
+        cachedresponse = request.meta.get('cached_response')
+        result = super().process_response(request, response, spider)
+        if cachedresponse is None:
+            return result
+        
+        if response.status == 304:
+            self.stats.inc_value('httpcache/not_modified', spider=spider)
+            self.stats.inc_value('httpcache/bytes_saved', len(cachedresponse.body), spider=spider)
+        if result is cachedresponse or result.body == cachedresponse.body:
+            request.meta['content_unchanged'] = True
+            self.stats.inc_value('httpcache/unchanged', spider=spider)
+        return result
+
+
+class SkipUnchangedItemsMiddleware:
+    """
+    Drop items parsed from unchanged pages the database already holds
+    
+    Only applies to requests the spider marked with skip_if_unchanged (the
+    stored price matches the listing), so a fresh database or a price the
+    incremental crawl wants refreshed still reaches the pipelines. Requests
+    are passed through so an unchanged listing still leads to its products.
+    """
+    
+    def __init__(self, stats, enabled):
+        self.stats = stats
+        self.enabled = enabled
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats, crawler.settings.getbool('HTTPCACHE_SKIP_UNCHANGED', True))
+    
+    def _skips(self, response):
+        return (self.enabled
+                and response.meta.get('content_unchanged')
+                and response.meta.get('skip_if_unchanged'))
+    
+    def process_spider_output(self, response, result, spider):
+        skip = self._skips(response)
+        for i in result:
+            if skip and not isinstance(i, Request):
+                self.stats.inc_value('httpcache/unchanged_items_skipped', spider=spider)
+                continue
+            yield i
+    
+    # Scrapy 2.13+ passes async spider output to middlewares that support it
+    async def process_spider_output_async(self, response, result, spider):
+        skip = self._skips(response)
+        async for i in result:
+            if skip and not isinstance(i, Request):
+                self.stats.inc_value('httpcache/unchanged_items_skipped', spider=spider)
+                continue
+            yield i
@@ -1,5 +1,5 @@
-import re
 import json
+import time
 from datetime import datetime
 from itemadapter import ItemAdapter
 from sqlalchemy import create_engine
@@ -8,9 +8,11 @@ import sys
 import os
 
 # Add backend to path for database models
-sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../../backend'))
 from models.database import Laptop, Base
-
+from models.seed_data import laptop_from_scraped, upsert_laptops
+from core.jsonl import JsonLinesWriter
+from services.spec_normalizer import cpu_tier, detect_categories, gpu_tier, normalize_listing
 
 class DataCleaningPipeline:
     """Clean and normalize scraped data"""
@@ -18,143 +20,33 @@ class DataCleaningPipeline:
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
         
-        # Clean RAM
-        if adapter.get('ram_raw'):
-            ram_match = re.search(r'(\d+)\s*GB', adapter['ram_raw'], re.IGNORECASE)
-            if ram_match:
-                adapter['ram_gb'] = int(ram_match.group(1))
-            else:
-                adapter['ram_gb'] = 8  # Default
-        
-        # Clean Storage
-        if adapter.get('storage_raw'):
-            storage_text = adapter['storage_raw']
-            
-            # Extract GB/TB
-            storage_match = re.search(r'(\d+)\s*(GB|TB)', storage_text, re.IGNORECASE)
-            if storage_match:
-                size = int(storage_match.group(1))
-                unit = storage_match.group(2).upper()
-                adapter['storage_gb'] = size * 1024 if unit == 'TB' else size
-            else:
-                adapter['storage_gb'] = 256  # Default
-            
-            # Detect storage type
-            if 'SSD' in storage_text.upper():
-                adapter['storage_type'] = 'SSD'
-            elif 'HDD' in storage_text.upper():
-                adapter['storage_type'] = 'HDD'
-            elif 'NVME' in storage_text.upper() or 'M.2' in storage_text.upper():
-                adapter['storage_type'] = 'SSD'
-            else:
-                adapter['storage_type'] = 'SSD'  # Default to SSD for modern laptops
-        
-        # Clean Price
-        if adapter.get('price_raw'):
-            price_text = adapter['price_raw']
-            
-            # Check for "Call for price"
-            if any(word in price_text.lower() for word in ['call', 'contact', 'inquiry']):
-                adapter['price_available'] = False
-                adapter['price_pkr'] = 0
-            else:
-                # Extract numbers
-                price_match = re.search(r'[\d,]+', price_text.replace(',', ''))
-                if price_match:
-                    adapter['price_pkr'] = int(price_match.group(0).replace(',', ''))
-                    adapter['price_available'] = True
-                else:
-                    adapter['price_available'] = False
-                    adapter['price_pkr'] = 0
-        
-        # Extract CPU Generation
-        if adapter.get('cpu'):
-            cpu_text = adapter['cpu']
-            
-            # Intel generation (e.g., i5-1235U -> 12th gen)
-            intel_match = re.search(r'i[357]-(\d{1,2})\d{2,3}', cpu_text)
-            if intel_match:
-                gen = int(intel_match.group(1))
-                adapter['cpu_generation'] = f"{gen}th Gen Intel"
-            
-            # AMD Ryzen generation
-            elif 'ryzen' in cpu_text.lower():
-                ryzen_match = re.search(r'ryzen\s+[357]\s+(\d{1})(\d{3})', cpu_text, re.IGNORECASE)
-                if ryzen_match:
-                    gen = int(ryzen_match.group(1))
-                    adapter['cpu_generation'] = f"Ryzen {gen}000 Series"
-        
-        # Extract brand from model name if not set
-        if not adapter.get('brand') and adapter.get('full_name'):
-            name = adapter['full_name']
-            brands = ['HP', 'Dell', 'Lenovo', 'ASUS', 'Acer', 'MSI', 'Apple']
-            for brand in brands:
-                if brand.lower() in name.lower():
-                    adapter['brand'] = brand
-                    break
+        # RAM, storage, price, CPU generation and brand (see services/spec_normalizer.py)
+        for field, value in normalize_listing(adapter).items():
+            adapter[field] = value
         
         # Set scraped timestamp
         adapter['scraped_at'] = datetime.utcnow().isoformat()
         
         return item
 
-
 class CategoryDetectionPipeline:
     """Detect suitable use cases based on specs"""
     
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
-        categories = []
-        
-        ram = adapter.get('ram_gb', 0)
-        storage = adapter.get('storage_gb', 0)
-        cpu = adapter.get('cpu', '').lower()
-        gpu = adapter.get('gpu', '').lower()
-        price = adapter.get('price_pkr', 0)
-        
-        # Programming
-        if ram >= 8 and ('i5' in cpu or 'i7' in cpu or 'ryzen 5' in cpu or 'ryzen 7' in cpu):
-            categories.append('Programming')
-        
-        # Gaming
-        if ('gtx' in gpu or 'rtx' in gpu or 'radeon rx' in gpu) and ram >= 8:
-            categories.append('Gaming')
-        elif 'dedicated' in gpu.lower() or 'nvidia' in gpu.lower():
-            categories.append('Gaming')
-        
-        # Video Editing
-        if ram >= 16 and ('i7' in cpu or 'ryzen 7' in cpu):
-            categories.append('Video Editing')
-        
-        # Engineering
-        if ram >= 8 and storage >= 512:
-            categories.append('Engineering')
-        
-        # FSC Student / Basic Use
-        if price < 90000 or ('i3' in cpu or 'ryzen 3' in cpu):
-            categories.append('FSC Student')
-            categories.append('Office Work')
-        
-        # Office Work
-        if ram >= 4 and storage >= 256:
-            if 'Office Work' not in categories:
-                categories.append('Office Work')
-        
-        # CS Student
-        if 'Programming' in categories:
-            categories.append('CS Student')
-        
-        # Default
-        if not categories:
-            categories.append('General Use')
-        
-        adapter['ideal_for'] = categories
+        adapter['ideal_for'] = detect_categories(
+            adapter.get('ram_gb') or 0,
+            adapter.get('storage_gb') or 0,
+            cpu_tier(adapter.get('cpu')),
+            gpu_tier(adapter.get('gpu')),
+            adapter.get('price_pkr') or 0,
+            adapter.get('gpu')
+        )
         
         return item
 
-
 class JsonExportPipeline:
-    """Export items to JSON file"""
+    """Export items to one JSON file at the end of the crawl (holds every item in memory)"""
     
     def open_spider(self, spider):
         self.items = []
@@ -172,69 +64,117 @@ class JsonExportPipeline:
         self.items.append(dict(item))
         return item
 
+class JsonLinesExportPipeline:
+    """Stream items to rotating JSON Lines files as they are scraped"""
+    
+    def open_spider(self, spider):
+        export_path = spider.settings.get('EXPORT_JSONL_PATH', 'laptops.jsonl')
+        self.writer = JsonLinesWriter(
+            export_path,
+            max_bytes=spider.settings.getint('EXPORT_JSONL_MAX_BYTES', 0),
+            compress=spider.settings.getbool('EXPORT_JSONL_COMPRESS', False),
+            flush_every=spider.settings.getint('EXPORT_JSONL_FLUSH_EVERY', 1)
+        )
+    
+    def close_spider(self, spider):
+        self.writer.close()
+        parts = ', '.join(str(p) for p in self.writer.parts) or 'no files'
+        spider.logger.info(f'Exported {self.writer.count} items to {parts}')
+    
+    def process_item(self, item, spider):
+        self.writer.write(ItemAdapter(item).asdict())
+        return item
 
 class DatabasePipeline:
-    """Insert items into PostgreSQL/SQLite database"""
+    """Upsert items into PostgreSQL/SQLite in batches"""
     
     def open_spider(self, spider):
         # Get database URL from settings
         db_url = spider.settings.get('DATABASE_URL', 'sqlite:///./laptops.db')
+        self.batch_size = spider.settings.getint('DATABASE_BATCH_SIZE', 200)
+        self.flush_interval = spider.settings.getfloat('DATABASE_FLUSH_INTERVAL', 10)
         
         self.engine = create_engine(db_url)
         Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.has_unique_index = self._ensure_unique_index(spider)
         
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        # (brand, model) -> row; a later item for the same laptop replaces the earlier one
+        self.buffer = {}
+        self.last_flush = time.monotonic()
+        self.inserted = 0
+        self.updated = 0
         
         spider.logger.info(f'Connected to database: {db_url}')
     
+    def _ensure_unique_index(self, spider):
+        """Add the (brand, model) index to tables created before it existed"""
+        index = next(i for i in Laptop.__table__.indexes if i.name == 'ix_laptops_brand_model')
+        try:
+            index.create(self.engine, checkfirst=True)
+            return True
+        except Exception as e:
+            spider.logger.error(
+                f"Could not create unique (brand, model) index, remove duplicate laptops first: {e}"
+            )
+            return False
+    
     def close_spider(self, spider):
-        self.session.close()
-        spider.logger.info('Database connection closed')
+        self.flush(spider)
+        self.engine.dispose()
+        spider.logger.info(
+            f'Database connection closed ({self.inserted} added, {self.updated} updated)'
+        )
     
     def process_item(self, item, spider):
         adapter = ItemAdapter(item)
+        row = laptop_from_scraped(adapter.asdict())
         
         # Skip if price not available
-        if not adapter.get('price_available', False):
+        if row is None:
             spider.logger.warning(f"Skipping {adapter.get('full_name')} - Price not available")
             return item
         
-        # Check if laptop already exists
-        existing = self.session.query(Laptop).filter(
-            Laptop.brand == adapter.get('brand'),
-            Laptop.model == adapter.get('model')
-        ).first()
+        self.buffer[(row['brand'], row['model'])] = row
         
-        if existing:
-            # Update existing
-            existing.price_pkr = adapter.get('price_pkr')
-            existing.source_url = adapter.get('product_url')
-            spider.logger.info(f"Updated: {adapter.get('full_name')}")
-        else:
-            # Create new
-            laptop = Laptop(
-                brand=adapter.get('brand', 'Unknown'),
-                model=adapter.get('model', adapter.get('full_name', 'Unknown')),
-                cpu=adapter.get('cpu', 'Unknown'),
-                ram_gb=adapter.get('ram_gb', 8),
-                storage_gb=adapter.get('storage_gb', 256),
-                storage_type=adapter.get('storage_type', 'SSD'),
-                gpu=adapter.get('gpu', 'Integrated'),
-                display_size=adapter.get('display_size', 15.6),
-                price_pkr=adapter.get('price_pkr', 0),
-                battery_hours=adapter.get('battery_hours'),
-                weight_kg=adapter.get('weight_kg'),
-                ideal_for=adapter.get('ideal_for', ['General Use']),
-                source_url=adapter.get('product_url')
-            )
-            self.session.add(laptop)
-            spider.logger.info(f"Added: {adapter.get('full_name')}")
+        if (len(self.buffer) >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush(spider)
+        
+        return item
+    
+    def flush(self, spider):
+        """Write buffered items in one transaction, falling back to one per row"""
+        rows = list(self.buffer.values())
+        self.buffer = {}
+        self.last_flush = time.monotonic()
+        if not rows:
+            return
         
         try:
-            self.session.commit()
+            inserted, updated = self._upsert(rows)
         except Exception as e:
-            self.session.rollback()
-            spider.logger.error(f"Database error: {e}")
+            spider.logger.error(f"Database error, retrying {len(rows)} laptops one at a time: {e}")
+            inserted, updated = self._upsert_each(rows, spider)
         
-        return item
+        self.inserted += inserted
+        self.updated += updated
+        spider.logger.info(f"Saved {len(rows)} laptops ({inserted} added, {updated} updated)")
+    
+    def _upsert(self, rows):
+        with self.Session.begin() as session:
+            return upsert_laptops(session, rows, on_conflict=self.has_unique_index)
+    
+    def _upsert_each(self, rows, spider):
+        """Retry a failed batch row by row so one bad row only loses itself"""
+        inserted = updated = 0
+        for row in rows:
+            try:
+                row_inserted, row_updated = self._upsert([row])
+            except Exception as e:
+                spider.crawler.stats.inc_value('database/failed_rows')
+                spider.logger.error(f"Database error for {row['brand']} {row['model']}: {e}")
+                continue
+            inserted += row_inserted
+            updated += row_updated
+        return inserted, updated
@@ -29,19 +29,22 @@ DEFAULT_REQUEST_HEADERS = {
 # Enable or disable spider middlewares
 SPIDER_MIDDLEWARES = {
    'laptop_scraper.middlewares.LaptopScraperSpiderMiddleware': 543,
+   'laptop_scraper.middlewares.SkipUnchangedItemsMiddleware': 550,
 }
 
 # Enable or disable downloader middlewares
 DOWNLOADER_MIDDLEWARES = {
    'laptop_scraper.middlewares.RotateUserAgentMiddleware': 400,
    'laptop_scraper.middlewares.LaptopScraperDownloaderMiddleware': 543,
+   'scrapy.downloadermiddlewares.httpcache.HttpCacheMiddleware': None,
+   'laptop_scraper.middlewares.ConditionalHttpCacheMiddleware': 900,
 }
 
 # Configure item pipelines
 ITEM_PIPELINES = {
    'laptop_scraper.pipelines.DataCleaningPipeline': 100,
    'laptop_scraper.pipelines.CategoryDetectionPipeline': 200,
-   'laptop_scraper.pipelines.JsonExportPipeline': 300,
+   'laptop_scraper.pipelines.JsonLinesExportPipeline': 300,
    'laptop_scraper.pipelines.DatabasePipeline': 400,
 }
 
@@ -59,14 +62,37 @@ AUTOTHROTTLE_START_DELAY = 2
 AUTOTHROTTLE_MAX_DELAY = 10
 AUTOTHROTTLE_TARGET_CONCURRENCY = 2.0
 
+# Per-site crawl budgets used by laptop_scraper.crawl; each site runs in its
+# own crawler, so these replace the shared CONCURRENT_REQUESTS limit
+CRAWL_BUDGETS = {
+    'telemart': {'concurrency': 4, 'delay': 1.0},
+    'paklap': {'concurrency': 2, 'delay': 1.5},
+    'czone': {'concurrency': 2, 'delay': 1.5},
+}
+CRAWL_REPORT_INTERVAL = 10  # seconds between progress lines
+
+# Only revisit product pages whose listing price differs from the database
+INCREMENTAL_CRAWL = False
+
 # Database settings
 DATABASE_URL = 'sqlite:///../../../backend/laptop_recommendations.db'
+DATABASE_BATCH_SIZE = 200  # items per upsert transaction
+DATABASE_FLUSH_INTERVAL = 10  # seconds before a partial batch is written
 
 # Export settings
 EXPORT_JSON_PATH = '../../../data/scraped_laptops.json'
+EXPORT_JSONL_PATH = '../../../data/scraped/laptops.jsonl'  # parts: laptops.00001.jsonl, ...
+EXPORT_JSONL_MAX_BYTES = 50 * 1024 * 1024  # rotate after 50 MB (0 = single file)
+EXPORT_JSONL_COMPRESS = False  # gzip parts
+EXPORT_JSONL_FLUSH_EVERY = 1  # items between flushes
 
 # Enable and configure HTTP caching
 HTTPCACHE_ENABLED = True
-HTTPCACHE_EXPIRATION_SECS = 86400
+HTTPCACHE_POLICY = 'laptop_scraper.middlewares.RevalidatingCachePolicy'
+HTTPCACHE_EXPIRATION_SECS = 0  # keep entries; the policy revalidates them instead
 HTTPCACHE_DIR = 'httpcache'
 HTTPCACHE_IGNORE_HTTP_CODES = [500, 502, 503, 504, 408, 429]
+HTTPCACHE_ALWAYS_STORE = True  # also cache pages without validators, compared by body
+HTTPCACHE_IGNORE_RESPONSE_CACHE_CONTROLS = ['no-store']
+HTTPCACHE_ALWAYS_REVALIDATE = True  # send If-None-Match / If-Modified-Since for every cached page
+HTTPCACHE_SKIP_UNCHANGED = True  # drop items from unchanged pages whose stored price matches
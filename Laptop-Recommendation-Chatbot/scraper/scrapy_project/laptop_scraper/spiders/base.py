@@ -0,0 +1,67 @@
+import scrapy
+from laptop_scraper.incremental import load_known_prices, parse_listing_price
+
+class LaptopListingSpider(scrapy.Spider):
+    """
+    Listing-page crawl shared by the shop spiders
+    
+    Subclasses set the listing selectors and implement parse_laptop. With
+    INCREMENTAL_CRAWL on, product pages whose listing price matches the
+    stored price are not requested, and listing pages are revalidated (or
+    bypass the HTTP cache) so the prices compared are current. Otherwise
+    such requests are marked skip_if_unchanged, and their items are dropped
+    when the HTTP cache finds the page unchanged.
+    """
+    
+    # Product card on a listing page, and the link and price inside it
+    listing_card = ''
+    listing_link = ''
+    listing_price = ''
+    next_page = ''
+    
+    def start_requests(self):
+        self.incremental = self.settings.getbool('INCREMENTAL_CRAWL')
+        self.known_prices = {}
+        if self.incremental or self.settings.getbool('HTTPCACHE_SKIP_UNCHANGED'):
+            self.known_prices = load_known_prices(self.settings.get('DATABASE_URL'))
+        if self.incremental:
+            self.logger.info(f'Incremental crawl: {len(self.known_prices)} known product prices')
+        
+        # Revalidated cache entries are as current as a fresh fetch
+        self.listing_dont_cache = self.incremental and not self.settings.getbool('HTTPCACHE_ALWAYS_REVALIDATE')
+        for url in self.start_urls:
+            yield scrapy.Request(url, dont_filter=True, meta={'dont_cache': self.listing_dont_cache})
+    
+    async def start(self):
+        # Scrapy 2.13+ entry point; earlier versions call start_requests() directly
+        for request in self.start_requests():
+            yield request
+    
+    def parse(self, response):
+        """Parse laptop listing page"""
+        for card in response.css(self.listing_card):
+            link = card.css(self.listing_link).get()
+            if not link:
+                continue
+            
+            url = response.urljoin(link)
+            price_unchanged = self._price_unchanged(url, card.css(self.listing_price).get())
+            if self.incremental and price_unchanged:
+                self.crawler.stats.inc_value('incremental/skipped')
+                continue
+            
+            yield response.follow(url, callback=self.parse_laptop, meta={'skip_if_unchanged': price_unchanged})
+        
+        # Follow pagination
+        next_page = response.css(self.next_page).get()
+        if next_page:
+            yield response.follow(next_page, callback=self.parse, meta={'dont_cache': self.listing_dont_cache})
+    
+    def _price_unchanged(self, url, price_text):
+        known = self.known_prices.get(url)
+        if known is None:
+            return False
+        return parse_listing_price(price_text) == known
+    
+    def parse_laptop(self, response):
+        raise NotImplementedError
@@ -1,8 +1,8 @@
-import scrapy
 from laptop_scraper.items import LaptopItem
+from laptop_scraper.spiders.base import LaptopListingSpider
 import re
 
-class CzoneSpider(scrapy.Spider):
+class CzoneSpider(LaptopListingSpider):
     name = 'czone'
     allowed_domains = ['czone.pk']
     start_urls = [
@@ -13,18 +13,10 @@ class CzoneSpider(scrapy.Spider):
         'DOWNLOAD_DELAY': 3,
     }
     
-    def parse(self, response):
-        """Parse laptop listing page"""
-        # Extract laptop product links
-        laptop_links = response.css('div.product-item a.product-link::attr(href)').getall()
-        
-        for link in laptop_links:
-            yield response.follow(link, callback=self.parse_laptop)
-        
-        # Follow pagination
-        next_page = response.css('a.next-page::attr(href)').get()
-        if next_page:
-            yield response.follow(next_page, callback=self.parse)
+    listing_card = 'div.product-item'
+    listing_link = 'a.product-link::attr(href)'
+    listing_price = 'span.price::text'
+    next_page = 'a.next-page::attr(href)'
     
     def parse_laptop(self, response):
         """Parse individual laptop page"""
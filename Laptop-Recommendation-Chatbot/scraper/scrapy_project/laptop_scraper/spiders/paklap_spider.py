@@ -1,8 +1,8 @@
-import scrapy
 from laptop_scraper.items import LaptopItem
+from laptop_scraper.spiders.base import LaptopListingSpider
 import re
 
-class PaklapSpider(scrapy.Spider):
+class PaklapSpider(LaptopListingSpider):
     name = 'paklap'
     allowed_domains = ['paklap.pk']
     start_urls = [
@@ -13,18 +13,10 @@ class PaklapSpider(scrapy.Spider):
         'DOWNLOAD_DELAY': 3,
     }
     
-    def parse(self, response):
-        """Parse laptop listing page"""
-        # Extract laptop product links
-        laptop_links = response.css('div.product-item h3 a::attr(href)').getall()
-        
-        for link in laptop_links:
-            yield response.follow(link, callback=self.parse_laptop)
-        
-        # Follow pagination
-        next_page = response.css('a.next::attr(href)').get()
-        if next_page:
-            yield response.follow(next_page, callback=self.parse)
+    listing_card = 'div.product-item'
+    listing_link = 'h3 a::attr(href)'
+    listing_price = 'span.price::text'
+    next_page = 'a.next::attr(href)'
     
     def parse_laptop(self, response):
         """Parse individual laptop page"""
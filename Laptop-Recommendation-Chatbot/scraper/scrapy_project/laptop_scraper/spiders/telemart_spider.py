@@ -1,9 +1,9 @@
-import scrapy
 from laptop_scraper.items import LaptopItem
+from laptop_scraper.spiders.base import LaptopListingSpider
 import re
 import json
 
-class TelemartSpider(scrapy.Spider):
+class TelemartSpider(LaptopListingSpider):
     name = 'telemart'
     allowed_domains = ['telemart.pk']
     start_urls = [
@@ -14,18 +14,10 @@ class TelemartSpider(scrapy.Spider):
         'DOWNLOAD_DELAY': 2,
     }
     
-    def parse(self, response):
-        """Parse laptop listing page"""
-        # Extract laptop product links
-        laptop_links = response.css('div.product-card a.product-link::attr(href)').getall()
-        
-        for link in laptop_links:
-            yield response.follow(link, callback=self.parse_laptop)
-        
-        # Follow pagination
-        next_page = response.css('a.pagination-next::attr(href)').get()
-        if next_page:
-            yield response.follow(next_page, callback=self.parse)
+    listing_card = 'div.product-card'
+    listing_link = 'a.product-link::attr(href)'
+    listing_price = 'span.product-price::text'
+    next_page = 'a.pagination-next::attr(href)'
     
     def parse_laptop(self, response):
         """Parse individual laptop page"""
@@ -1,32 +1,22 @@
 """
-Script to run all spiders sequentially
+Script to run all spiders in parallel with per-site budgets
+See laptop_scraper/crawl.py for options (incremental mode, metrics output)
 """
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
-from laptop_scraper.spiders.telemart_spider import TelemartSpider
-from laptop_scraper.spiders.paklap_spider import PaklapSpider
-from laptop_scraper.spiders.czone_spider import CzoneSpider
+from laptop_scraper.crawl import run_crawl, format_metrics
 
 def run_all_spiders():
-    """Run all spiders one after another"""
-    settings = get_project_settings()
-    process = CrawlerProcess(settings)
-    
-    # Add all spiders
-    process.crawl(TelemartSpider)
-    process.crawl(PaklapSpider)
-    process.crawl(CzoneSpider)
-    
-    # Start crawling
-    process.start()
+    """Run all spiders side by side and print their throughput"""
+    metrics = run_crawl()
     
     print("\n✅ All spiders completed!")
-    print("Check data/scraped_laptops.json for results")
+    for name, spider_metrics in metrics.items():
+        print(format_metrics(name, spider_metrics))
+    print("Check data/scraped/ for JSON Lines exports")
     print("Check backend/laptop_recommendations.db for database entries")
 
 if __name__ == '__main__':
     print("🕷️  Starting all laptop scrapers...")
-    print("This will scrape: Telemart, Paklap, Czone")
-    print("Estimated time: 30-60 minutes\n")
+    print("This will scrape: Telemart, Paklap, Czone (in parallel)")
+    print("Progress is printed every CRAWL_REPORT_INTERVAL seconds\n")
     
     run_all_spiders()
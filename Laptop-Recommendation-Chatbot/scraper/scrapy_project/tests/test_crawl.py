@@ -0,0 +1,146 @@
+"""
+Tests for the crawl orchestrator against locally served HTML fixtures
+"""
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from sqlalchemy import create_engine, text
+from laptop_scraper.incremental import load_known_prices, parse_listing_price
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def test_parse_listing_price():
+    """Test listing labels parse like the cleaning pipeline and "call" labels give None"""
+    assert parse_listing_price('Rs. 120,000') == 120000
+    assert parse_listing_price('PKR 85000') == 85000
+    assert parse_listing_price('Call for price') is None
+    assert parse_listing_price(None) is None
+
+def test_known_prices_tolerate_missing_database(tmp_path):
+    """Test a fresh install crawls everything instead of failing"""
+    assert load_known_prices(f"sqlite:///{tmp_path / 'missing.db'}") == {}
+
+def test_budget_overrides_spider_settings():
+    """Test a budgeted spider class applies its site's budget over the spider's custom_settings"""
+    pytest.importorskip('scrapy')
+    from scrapy.settings import Settings
+    from laptop_scraper.crawl import budgeted_spider
+    from laptop_scraper.spiders.czone_spider import CzoneSpider
+    
+    spider_cls = budgeted_spider(CzoneSpider, {'concurrency': 3, 'delay': 0.5, 'max_items': 20})
+    settings = Settings({'CONCURRENT_REQUESTS': 8})
+    spider_cls.update_settings(settings)
+    
+    assert spider_cls.name == 'czone'
+    assert settings.getint('CONCURRENT_REQUESTS') == 3
+    assert settings.getfloat('DOWNLOAD_DELAY') == 0.5
+    assert settings.getint('CLOSESPIDER_ITEMCOUNT') == 20
+
+@pytest.fixture
+def fixture_server():
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=FIXTURES_DIR)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def crawl(base_url, db_url, cache_dir, incremental=False):
+    """Run the orchestrator in a child process (the Twisted reactor cannot restart)"""
+    options = {
+        'spiders': ['telemart'],
+        'incremental': incremental,
+        'report_interval': 0,
+        'settings_overrides': {
+            'DATABASE_URL': db_url,
+            'HTTPCACHE_DIR': cache_dir,
+            'ROBOTSTXT_OBEY': False,
+            'AUTOTHROTTLE_ENABLED': False,
+            'CRAWL_BUDGETS': {'telemart': {'concurrency': 4, 'delay': 0}},
+            'ITEM_PIPELINES': {
+                'laptop_scraper.pipelines.DataCleaningPipeline': 100,
+                'laptop_scraper.pipelines.CategoryDetectionPipeline': 200,
+                'laptop_scraper.pipelines.DatabasePipeline': 400,
+            },
+        },
+        'spider_kwargs': {
+            'telemart': {
+                'start_urls': [f'{base_url}/telemart/laptops.html'],
+                'allowed_domains': ['127.0.0.1'],
+            },
+        },
+    }
+    code = (
+        "import json, sys\n"
+        "from laptop_scraper.crawl import run_crawl\n"
+        "metrics = run_crawl(**json.loads(sys.argv[1]))\n"
+        "print('METRICS ' + json.dumps(metrics))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code, json.dumps(options)],
+        cwd=PROJECT_DIR, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    line = next(l for l in result.stdout.splitlines() if l.startswith('METRICS '))
+    return json.loads(line[len('METRICS '):])['telemart']
+
+def test_full_then_incremental_crawl(fixture_server, tmp_path):
+    """Test a full crawl stores both laptops and an incremental one revisits only changed prices"""
+    pytest.importorskip('scrapy')
+    db_url = f"sqlite:///{tmp_path / 'laptops.db'}"
+    cache_dir = str(tmp_path / 'httpcache')
+    
+    metrics = crawl(fixture_server, db_url, cache_dir)
+    assert metrics['items'] == 2
+    assert metrics['pages'] == 3
+    assert metrics['items_per_sec'] > 0
+    
+    engine = create_engine(db_url)
+    with engine.begin() as conn:
+        prices = dict(conn.execute(text("SELECT model, price_pkr FROM laptops")).all())
+        assert prices == {'Pavilion 15': 120000, 'Inspiron 15': 145000}
+        # Pretend the Dell was stored at an older price
+        conn.execute(text("UPDATE laptops SET price_pkr = 150000 WHERE model = 'Inspiron 15'"))
+    
+    metrics = crawl(fixture_server, db_url, cache_dir, incremental=True)
+    assert metrics['skipped_unchanged'] == 1
+    assert metrics['items'] == 1
+    # The listing and the revisited product page are both answered with 304
+    assert metrics['not_modified'] == 2
+    assert metrics['cache_hit_rate'] == 1.0
+    
+    with engine.connect() as conn:
+        assert conn.execute(
+            text("SELECT price_pkr FROM laptops WHERE model = 'Inspiron 15'")
+        ).scalar() == 145000
+
+def test_unchanged_pages_skip_pipelines(fixture_server, tmp_path):
+    """Test a repeated crawl revalidates every page and stores nothing new"""
+    pytest.importorskip('scrapy')
+    db_url = f"sqlite:///{tmp_path / 'laptops.db'}"
+    cache_dir = str(tmp_path / 'httpcache')
+    
+    metrics = crawl(fixture_server, db_url, cache_dir)
+    assert metrics['items'] == 2
+    assert metrics['not_modified'] == 0
+    
+    metrics = crawl(fixture_server, db_url, cache_dir)
+    assert metrics['pages'] == 3
+    assert metrics['not_modified'] == 3
+    assert metrics['unchanged_items_skipped'] == 2
+    assert metrics['items'] == 0
+    
+    # A product the database lost is stored again even though its page is unchanged
+    engine = create_engine(db_url)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM laptops WHERE model = 'Inspiron 15'"))
+    
+    metrics = crawl(fixture_server, db_url, cache_dir)
+    assert metrics['unchanged_items_skipped'] == 1
+    assert metrics['items'] == 1
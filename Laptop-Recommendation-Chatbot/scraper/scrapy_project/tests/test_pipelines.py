@@ -0,0 +1,46 @@
+"""
+Tests for the database pipeline's batched upserts
+"""
+import logging
+from collections import Counter
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+pytest.importorskip('scrapy')
+from scrapy.settings import Settings
+from laptop_scraper.pipelines import DatabasePipeline
+from models.database import Laptop
+from models.seed_data import laptop_from_scraped
+
+class FakeStats:
+    def __init__(self):
+        self.values = Counter()
+    
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self.values[key] += count
+
+def test_failed_batch_is_retried_row_by_row(tmp_path):
+    """Test one bad row in a batch only loses itself and is counted in the crawl stats"""
+    db_url = f"sqlite:///{tmp_path / 'laptops.db'}"
+    spider = SimpleNamespace(
+        settings=Settings({'DATABASE_URL': db_url, 'DATABASE_BATCH_SIZE': 10}),
+        crawler=SimpleNamespace(stats=FakeStats()),
+        logger=logging.getLogger('test')
+    )
+    pipeline = DatabasePipeline()
+    pipeline.open_spider(spider)
+    
+    for model in ("Victus 15", "Omen 16", "Pavilion 14"):
+        row = laptop_from_scraped({"brand": "HP", "model": model, "price_available": True, "price_pkr": 150000})
+        pipeline.buffer[(row['brand'], row['model'])] = row
+    pipeline.buffer[("HP", "Omen 16")]['cpu'] = None
+    pipeline.close_spider(spider)
+    
+    engine = create_engine(db_url)
+    with sessionmaker(bind=engine)() as db:
+        assert sorted(laptop.model for laptop in db.query(Laptop)) == ["Pavilion 14", "Victus 15"]
+    engine.dispose()
+    assert pipeline.inserted == 2
+    assert spider.crawler.stats.values['database/failed_rows'] == 1